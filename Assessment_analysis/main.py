@@ -1,21 +1,20 @@
 
-import numpy as np
-import pandas as pd
 from collections import defaultdict
-import pickle
 import logging
 import math
+from Models.main import load_model, LINEAR_MODEL_PATH
 
 
-# --- Python logger ---
-logging.basicConfig(
-    level=logging.INFO, # Adjust to logging.DEBUG for more verbose logs
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-
 logger = logging.getLogger(__name__)
 
 
+def normalized(row) -> float:
+    """The row's score as a percentage of its max_score; feature store rows carry it as norm."""
+    if row.get("norm") is not None:
+        return float(row["norm"])
+    return float(row.get("score")) / float(row.get("max_score")) * 100
+
+
 class AssessmentAnalysis:
     def __init__(self, data: list[dict], attendance_data: dict):
         self.data = data
@@ -44,10 +43,7 @@ class AssessmentAnalysis:
             return None
         
         for row in self.data:
-            score = row.get("score")
-            max_score = row.get("max_score")
-            norm = (float(score) / float(max_score)) * 100
-            moving_averages.append(norm)
+            moving_averages.append(normalized(row))
         return moving_averages
 
     def get_dataset_labels_(self) -> list:
@@ -67,11 +63,11 @@ class AssessmentAnalysis:
         if self.isDataEmpty():
             return None
         for row in self.data:
-            assessment_name, score, max_score = row.get("assessment_title"), row.get("score"), row.get("max_score")
+            assessment_name = row.get("assessment_title")
             alpha_identifier, session_date = row.get("alpha_identifier"), row.get("session_date")
             pre, mid, post = row.get("pre"), row.get("mid"), row.get("post")
             classification = {"pre": pre, "mid": mid, "post": post}
-            norm = (float(score) / float(max_score)) * 100
+            norm = normalized(row)
             # find al least one true for pre, mid, post
             key, value = None, None
             for k, v in classification.items():
@@ -103,15 +99,14 @@ class AssessmentAnalysis:
         if self.isDataEmpty():
             return None
         for row in self.data:
-            score = row.get("score")
-            max_score = row.get("max_score")
             subject = row.get("subject")
-            norm = (float(score) / float(max_score)) * 100
-            subject_sort[subject].append(norm)
+            subject_sort[subject].append(normalized(row))
 
         return subject_sort
 
     def assessment_moving_average_(self)->dict:
+        import pandas as pd
+
         if self.isDataEmpty():
             return None
         moving_averages = self.get_dataset_()
@@ -127,6 +122,8 @@ class AssessmentAnalysis:
     
 
     def subject_moving_average_bias_(self) -> list:
+        import pandas as pd
+
         if self.isDataEmpty():
             return None
         moving_average = self.get_dataset_subjects_()
@@ -150,6 +147,8 @@ class AssessmentAnalysis:
 
 
     def assessment_moving_average_subject_(self)->list:
+        import pandas as pd
+
         if self.isDataEmpty():
             return None
         subject_sort = self.get_dataset_subjects_()
@@ -167,14 +166,15 @@ class AssessmentAnalysis:
         Requires the questionnare column to exist otherwise return None
     """
     def assessment_analysis_lr_(self)->list:
+        import pandas as pd
+
         if self.isDataEmpty():
             return None
         if self.isAttendanceDataEmpty():
             return None
         linear_regression_model = None
         try:
-            with open('./Models/linear_model.pkl', 'rb') as file:
-                linear_regression_model = pickle.load(file)
+            linear_regression_model = load_model(LINEAR_MODEL_PATH)
         except OSError as e:
             logging.error("unable to load linear_model.pkl")
             return None
@@ -185,10 +185,8 @@ class AssessmentAnalysis:
             sport_hours = row.get("sports_hours")
             tutor_sessions = row.get("tutor_sessions")
             study_hours = row.get("study_hours")
-            score = row.get("score")
             assessment_title = row.get("title")
-            max_score = row.get("max_score")
-            norm = float(score) / float(max_score) * 100
+            norm = normalized(row)
             df = pd.DataFrame([{
                 "Hours_Studied": float(study_hours),
                 "Attendance": float(attendance_ratio),
@@ -204,14 +202,15 @@ class AssessmentAnalysis:
         Requires the questionnare column to exist otherwise returns None
     """
     def assessment_analysis_lr_subject_(self)->list:
+        import pandas as pd
+
         if self.isDataEmpty():
             return None
         if self.isAttendanceDataEmpty():
             return None
         linear_regression_model = None
         try:
-            with open('./Models/linear_model.pkl', 'rb') as file:
-                linear_regression_model = pickle.load(file)
+            linear_regression_model = load_model(LINEAR_MODEL_PATH)
         except OSError as e:
             logger.error("unable to load linear_model")
             return None
@@ -222,9 +221,7 @@ class AssessmentAnalysis:
             sport_hours = row.get("sports_hours")
             tutor_sessions = row.get("tutor_sessions")
             study_hours = row.get("study_hours")
-            score = row.get("score")
-            max_score = row.get("max_score")
-            norm = float(score) / float(max_score) * 100
+            norm = normalized(row)
             subject = row.get("subject")
             df = pd.DataFrame([{
                 "Hours_Studied": float(study_hours),
@@ -239,3 +236,65 @@ class AssessmentAnalysis:
         return [{f'{row[0]}': row[1] } for row in subjectsort.items()]
     
 
+
+
+class AssessmentAggregates:
+    """
+        Same outputs as AssessmentAnalysis, built from the aggregates computed in Postgres
+        by PostgresClient.get_assessment_aggregates (SQL pushdown mode).
+    """
+    def __init__(self, aggregates: dict):
+        self.aggregates = aggregates
+
+    def isDataEmpty(self)-> bool:
+        return not self.aggregates
+
+    def get_dataset_(self) -> list:
+        if self.isDataEmpty():
+            return None
+        return [float(row["norm"]) for row in self.aggregates["series"]]
+
+    def get_dataset_labels_(self) -> list:
+        if self.isDataEmpty():
+            return None
+        return [row["label"] for row in self.aggregates["series"]]
+
+    def get_dataset_assessment_(self) -> list:
+        if self.isDataEmpty():
+            return None
+        result = []
+        for row in self.aggregates["pivot"]:
+            classification = {"pre": 0, "mid": 0, "post": 0}
+            for key in classification:
+                if row.get(key) is not None:
+                    classification[key] = float(row[key])
+            result.append({"alpha_identifier": row["alpha_identifier"]} | classification)
+        return result
+
+    def assessment_moving_average_(self) -> dict:
+        import pandas as pd
+
+        if self.isDataEmpty():
+            return None
+        series = self.aggregates["series"]
+        ## EMA is recursive rather than a window aggregate, so it stays in pandas
+        EMA = pd.Series([float(row["norm"]) for row in series]).ewm(span=5).mean().values
+        return {
+            "SMA": [float(row["sma"]) for row in series],
+            "EMA": EMA.tolist(),
+            "CMA": [float(row["cma"]) for row in series],
+        }
+
+    def subject_moving_average_bias_(self) -> list:
+        if self.isDataEmpty():
+            return None
+        subjects = []
+        for row in self.aggregates["subjects"]:
+            percent_change = 0.0 if row["infinite_change"] else float(row["percent_change"])
+            subjects.append({"subject": row["subject"], "percent_change": percent_change, "mean": float(row["mean"])})
+        return subjects
+
+    def assessment_moving_average_subject_(self) -> list:
+        if self.isDataEmpty():
+            return None
+        return [{f'SMA:{row["subject"]}': float(row["mean"])} for row in self.aggregates["subjects"]]
@@ -114,6 +114,15 @@ def test_datasets(assessment_rows, attendance_data):
     assert len(labels) == 6
 
 
+def test_feature_store_rows_are_read_through_their_norm(assessment_rows, attendance_data):
+    stored = [{k: v for k, v in row.items() if k not in ("score", "max_score")}
+              | {"norm": float(row["score"]) / float(row["max_score"]) * 100} for row in assessment_rows]
+    aa, fs = AssessmentAnalysis(assessment_rows, attendance_data), AssessmentAnalysis(stored, attendance_data)
+    assert fs.get_dataset_() == aa.get_dataset_()
+    assert fs.get_dataset_assessment_() == aa.get_dataset_assessment_()
+    assert fs.subject_moving_average_bias_() == aa.subject_moving_average_bias_()
+
+
 def test_get_dataset_assessment(assessment_rows, attendance_data):
     aa = AssessmentAnalysis(assessment_rows, attendance_data)
     out = aa.get_dataset_assessment_()
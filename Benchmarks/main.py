@@ -0,0 +1,204 @@
+import io
+import sys
+import json
+import time
+import queue
+import struct
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from logging.handlers import QueueListener
+from Config.Environment import LOG_FORMAT
+from Config.Logs import DeferredQueueHandler, DebugSampler, SummaryFormatter, message_summary
+from Config.BulkCopy import (INT8, FLOAT8, BINARY_SIGNATURE, CSV_NULL, csv_frames, binary_frames,
+                             binary_row_dtype)
+
+## Queries one report issues; the old PostgresClient logged each of them at INFO
+QUERIES_PER_MESSAGE = 4
+SAMPLE_QUERY = "UPDATE stu_tracker.Event_queue SET status = %s WHERE s3_output_key = %s;"
+
+
+class SlowSink:
+    """A log destination whose flush blocks like a full stdout pipe to the log driver."""
+
+    def __init__(self, write_latency=0.0):
+        self.write_latency = write_latency
+        self.lines = 0
+        self.bytes = 0
+
+    def write(self, text):
+        self.lines += text.count("\n")
+        self.bytes += len(text)
+
+    def flush(self):
+        if self.write_latency:
+            time.sleep(self.write_latency)
+
+
+def per_query_lines(logger, message):
+    for query in range(QUERIES_PER_MESSAGE):
+        logger.info(f"Executed command: {SAMPLE_QUERY} with params: {('DONE', f'reports/{message}.json')}")
+
+
+def summary_line(logger, message):
+    with message_summary(logger, "Report", student_id=message, semester_id=1) as summary:
+        for query in range(QUERIES_PER_MESSAGE):
+            summary.add("queries")
+            summary.add("db_seconds", 0.001)
+        summary.set("outcome", "DONE")
+
+
+def sampled_debug_lines(logger, message):
+    for query in range(QUERIES_PER_MESSAGE):
+        logger.debug("Executed command: %s with params: %s", SAMPLE_QUERY, ("DONE", f"reports/{message}.json"))
+    summary_line(logger, message)
+
+
+## name -> (asynchronous, emit(logger, message), debug sample)
+SCENARIOS = {
+    "sync_per_query": (False, per_query_lines, 1.0),
+    "async_per_query": (True, per_query_lines, 1.0),
+    "async_summary": (True, summary_line, 1.0),
+    "async_sampled_debug": (True, sampled_debug_lines, 0.01),
+}
+
+
+def bench_logging(messages=2000, write_latency=0.0, scenarios=None) -> dict:
+    """
+        Logging cost per message on the consumer thread for each scenario, and how long the
+        writer then needs to drain. Every scenario writes to its own SlowSink.
+    """
+    results = {}
+    for name in scenarios or SCENARIOS:
+        asynchronous, emit, sample = SCENARIOS[name]
+        sink = SlowSink(write_latency)
+        output = logging.StreamHandler(sink)
+        output.setFormatter(SummaryFormatter(LOG_FORMAT))
+        handler, listener = output, None
+        if asynchronous:
+            handler = DeferredQueueHandler(queue.SimpleQueue())
+            listener = QueueListener(handler.queue, output)
+            listener.start()
+        if sample < 1.0:
+            handler.addFilter(DebugSampler(sample))
+        logger = logging.getLogger(f"benchmark.{name}")
+        logger.handlers = [handler]
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG if sample < 1.0 else logging.INFO)
+
+        started = time.perf_counter()
+        for message in range(messages):
+            emit(logger, message)
+        caller = time.perf_counter() - started
+        if listener is not None:
+            listener.stop()
+        total = time.perf_counter() - started
+        results[name] = {
+            "caller_us_per_message": round(caller / messages * 1e6, 2),
+            "drain_seconds": round(total - caller, 4),
+            "lines": sink.lines,
+            "bytes": sink.bytes,
+        }
+    return results
+
+
+## The shape of Training/extract.py's FEATURE_QUERY: a bigint id and seven float8 columns
+COPY_COLUMNS = [("student_id", INT8)] + [(name, FLOAT8) for name in (
+    "norm", "prev_score", "next_norm", "study_hours", "tutor_sessions", "sports_hours", "attendance")]
+COPY_QUERY = "SELECT g::int8 AS student_id, " + ", ".join(
+    f"random() * 100 AS {name}" for name, _ in COPY_COLUMNS[1:]) + " FROM generate_series(1, %s) AS g"
+
+
+def copy_payloads(rows, seed=0) -> tuple:
+    """COPY csv and binary output for `rows` rows of COPY_COLUMNS, as Postgres would send them."""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({name: rng.random(rows) * 100 for name, _ in COPY_COLUMNS[1:]})
+    frame.insert(0, "student_id", np.arange(1, rows + 1, dtype=np.int64))
+    text = frame.to_csv(header=False, index=False, na_rep=CSV_NULL).encode()
+    records = np.zeros(rows, dtype=binary_row_dtype(COPY_COLUMNS))
+    records["_count"] = len(COPY_COLUMNS)
+    for index, (name, _) in enumerate(COPY_COLUMNS):
+        records[f"_length{index}"] = 8
+        records[name] = frame[name].to_numpy()
+    binary = BINARY_SIGNATURE + struct.pack(">ii", 0, 0) + records.tobytes() + b"\xff\xff"
+    return text, binary
+
+
+def _timed(load) -> dict:
+    started = time.perf_counter()
+    frame = load()
+    seconds = time.perf_counter() - started
+    return {"seconds": round(seconds, 3), "rows": len(frame),
+            "rows_per_second": round(len(frame) / seconds) if seconds else None}
+
+
+def bench_copy(rows=1_000_000, chunk_rows=100000) -> dict:
+    """
+        Client-side cost of getting `rows` rows into a DataFrame without a database. fetch_all
+        is modelled by its per-value work: a Python object per value and a dict per row, then
+        pd.DataFrame(rows). The COPY paths parse the bytes Postgres would send.
+    """
+    text, binary = copy_payloads(rows)
+    fields = [line.split(",") for line in text.decode().splitlines()]
+    casts = [(name, int if type_code == INT8 else float) for name, type_code in COPY_COLUMNS]
+
+    def dict_rows():
+        return pd.DataFrame([{name: cast(value) for (name, cast), value in zip(casts, row)} for row in fields])
+
+    def copy_csv():
+        return pd.concat(csv_frames(io.BytesIO(text), COPY_COLUMNS, chunk_rows), ignore_index=True)
+
+    def copy_binary():
+        return pd.concat(binary_frames(io.BytesIO(binary), COPY_COLUMNS, chunk_rows), ignore_index=True)
+
+    results = {"fetch_all_dicts": _timed(dict_rows), "copy_csv": _timed(copy_csv),
+               "copy_binary": _timed(copy_binary)}
+    results["payload_bytes"] = {"csv": len(text), "binary": len(binary)}
+    return results
+
+
+def bench_copy_live(dsn, rows=1_000_000) -> dict:
+    """The same comparison end to end against the Postgres at `dsn` (COPY_QUERY over generate_series)."""
+    import psycopg2
+    from Config.PostgresClient import PostgresClient
+
+    db = PostgresClient.__new__(PostgresClient)
+    db.conn = psycopg2.connect(dsn)
+    db.conn.autocommit = True
+    try:
+        return {
+            "fetch_all": _timed(lambda: pd.DataFrame(db.fetch_all(COPY_QUERY, (rows,)))),
+            "copy_csv": _timed(lambda: db.copy_frame(COPY_QUERY, (rows,))),
+            "copy_binary": _timed(lambda: db.copy_frame(COPY_QUERY, (rows,), fmt="binary")),
+        }
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the consumer's hot path.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    logs = commands.add_parser("logging", help="cost of logging per report message")
+    logs.add_argument("--messages", type=int, default=2000)
+    logs.add_argument("--write-latency", type=float, default=0.0,
+                      help="seconds each flush blocks, e.g. 0.0002 for a busy log driver")
+    logs.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+    copy = commands.add_parser("copy", help="fetch_all versus COPY csv/binary into DataFrames")
+    copy.add_argument("--rows", type=int, default=1_000_000)
+    copy.add_argument("--chunk-rows", type=int, default=100000)
+    copy.add_argument("--dsn", help="run against this Postgres instead of synthetic COPY output")
+    args = parser.parse_args(argv)
+
+    if args.command == "logging":
+        report = bench_logging(args.messages, args.write_latency, args.scenario)
+    elif args.dsn:
+        report = bench_copy_live(args.dsn, args.rows)
+    else:
+        report = bench_copy(args.rows, args.chunk_rows)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,11 @@
+# test_benchmarks.py
+from Benchmarks.main import bench_logging, QUERIES_PER_MESSAGE
+
+
+def test_logging_benchmark_reports_every_scenario():
+    results = bench_logging(messages=20)
+    assert set(results) == {"sync_per_query", "async_per_query", "async_summary", "async_sampled_debug"}
+    assert results["sync_per_query"]["lines"] == 20 * QUERIES_PER_MESSAGE
+    assert results["async_per_query"]["lines"] == 20 * QUERIES_PER_MESSAGE
+    assert results["async_summary"]["lines"] == 20
+    assert 20 <= results["async_sampled_debug"]["lines"] < 20 * (QUERIES_PER_MESSAGE + 1)
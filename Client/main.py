@@ -1,9 +1,4 @@
-import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from dotenv import load_dotenv
 import json
-load_dotenv()
 
 class Client:
     def __init__(self, body):
@@ -15,9 +10,16 @@ class Client:
     def get_output_key(self) -> str:
         return str(self.payload.get("s3_output_key")) 
     
+    def get_organization_id(self):
+        return self.payload.get("organization_id")
+
     def get_student_id(self):
         return self.payload.get("student_id")
 
+    def get_sections(self):
+        """Report sections the request asks for (see Report.main.SECTIONS), or None for all of them."""
+        return self.payload.get("sections")
+
     def get_semester_id(self):
         try:
             semester_id = self.payload.get("semester_id")
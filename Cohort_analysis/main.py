@@ -0,0 +1,267 @@
+import numpy as np
+import pandas as pd
+import logging
+from Models.main import load_model, LINEAR_MODEL_PATH, LOGISTIC_MODEL_PATH
+from Disability_analysis.main import prediction_summary
+
+
+logger = logging.getLogger(__name__)
+
+STUDENT = "student_id"
+LR_FEATURES = ["Hours_Studied", "Attendance", "Previous_Scores", "Tutoring_Sessions", "Physical_Activity"]
+DISABILITY_FEATURES = ["Attendance", "Previous_Scores", "Exam_Score", "Tutoring_Sessions"]
+
+
+"""
+    Mean of each contiguous group of `values`, rounded exactly like pandas.Series.mean:
+    groups of the same length are stacked and reduced together, so numpy sums every group
+    over its own length (same pairwise order) with one call per distinct length.
+"""
+def grouped_mean(values: np.ndarray, starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    means = np.full(len(starts), np.nan)
+    for length in np.unique(counts):
+        rows = np.flatnonzero(counts == length)
+        block = values[starts[rows, None] + np.arange(length)]
+        valid = ~np.isnan(block)
+        if valid.all():
+            means[rows] = block.sum(axis=1) / length
+        else:
+            total = np.where(valid, block, 0.0).sum(axis=1)
+            count = valid.sum(axis=1)
+            means[rows] = np.divide(total, count, out=np.full(len(rows), np.nan), where=count > 0)
+    return means
+
+
+"""
+    Long-format frame sorted by student_id, keeping each student's row order (session_date DESC),
+    plus the start offset and row count of every student's block. Rows given as dicts keep their
+    values as is (object columns), so None labels and subjects stay None rather than NaN.
+"""
+def student_blocks(rows) -> tuple:
+    frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows or [], dtype=object)
+    if frame.empty or STUDENT not in frame.columns:
+        return pd.DataFrame(columns=[STUDENT]), [], np.array([], dtype=int), np.array([], dtype=int)
+    frame = frame.sort_values(STUDENT, kind="stable").reset_index(drop=True)
+    codes, students = pd.factorize(frame[STUDENT], sort=False)
+    starts = np.r_[0, np.flatnonzero(np.diff(codes)) + 1]
+    counts = np.diff(np.r_[starts, len(frame)])
+    return frame, students.tolist(), starts, counts
+
+
+"""
+    float(a / b) elementwise as DisabilityAnalysis computes it; Decimal columns (numeric in
+    Postgres) are divided as Decimals first so the rounding matches.
+"""
+def quotient(numerator: pd.Series, denominator: pd.Series) -> np.ndarray:
+    if "decimal" in (pd.api.types.infer_dtype(numerator), pd.api.types.infer_dtype(denominator)):
+        return np.array([float(a / b) for a, b in zip(numerator, denominator)], dtype=float)
+    return numerator.to_numpy(dtype=float) / denominator.to_numpy(dtype=float)
+
+
+def split(values, starts) -> list:
+    return np.split(np.asarray(values), starts[1:]) if len(starts) else []
+
+
+class CohortAnalysis:
+    """
+        AssessmentAnalysis and DisabilityAnalysis for a whole class or semester in one pass.
+
+        assessments     rows of get_all_student_assessments plus a student_id column
+        questionnaire   rows of get_student_prior_assessments_guestionnaire plus student_id
+        attendance      rows of get_student_attendance plus student_id
+
+        Every method returns {student_id: value}, where value equals what the per-student
+        class returns for that student's rows (None when it would return None). Work is done
+        with grouped pandas/numpy operations and one model.predict per model, so the cost
+        grows with the number of rows, not the number of students. Model predictions come
+        from one batched call; BLAS may round the last bit of a linear prediction differently
+        than a single-row call.
+    """
+    def __init__(self, assessments, questionnaire=None, attendance=None):
+        self.assessments, self.students, self.starts, self.counts = student_blocks(assessments)
+        self.questionnaire, self.q_students, self.q_starts, self.q_counts = student_blocks(questionnaire)
+        attendance_frame = attendance if isinstance(attendance, pd.DataFrame) else pd.DataFrame(attendance or [])
+        self.attendance_ratio = {}
+        if not attendance_frame.empty:
+            ratio = attendance_frame["present"].astype(float) / attendance_frame["total_sessions"].astype(float) * 100
+            self.attendance_ratio = dict(zip(attendance_frame[STUDENT], ratio))
+        if not self.assessments.empty:
+            self.assessments["norm"] = (
+                self.assessments["score"].astype(float) / self.assessments["max_score"].astype(float) * 100
+            )
+
+    def student_ids(self) -> list:
+        return list(dict.fromkeys(self.students + self.q_students))
+
+    def _per_student(self, values) -> dict:
+        return dict(zip(self.students, values))
+
+    def get_dataset_(self) -> dict:
+        if self.assessments.empty:
+            return {}
+        return self._per_student(part.tolist() for part in split(self.assessments["norm"], self.starts))
+
+    def get_dataset_labels_(self) -> dict:
+        if self.assessments.empty:
+            return {}
+        return self._per_student(part.tolist() for part in split(self.assessments["assessment_title"], self.starts))
+
+    def assessment_moving_average_(self) -> dict:
+        if self.assessments.empty:
+            return {}
+        grouped = self.assessments.groupby(STUDENT, sort=False)["norm"]
+        sma = grouped.rolling(window=5).mean().fillna(0).to_numpy()
+        ema = grouped.ewm(span=5).mean().to_numpy()
+        cma = grouped.expanding().mean().to_numpy()
+        return self._per_student(
+            {"SMA": s.tolist(), "EMA": e.tolist(), "CMA": c.tolist()}
+            for s, e, c in zip(split(sma, self.starts), split(ema, self.starts), split(cma, self.starts))
+        )
+
+    def _subject_groups(self) -> tuple:
+        """(student, subject) blocks in first-appearance order, rows in their original order."""
+        frame = self.assessments
+        codes = frame.groupby([STUDENT, "subject"], sort=False, dropna=False).ngroup().to_numpy()
+        order = np.argsort(codes, kind="stable")
+        grouped = frame.iloc[order].reset_index(drop=True)
+        sorted_codes = codes[order]
+        starts = np.r_[0, np.flatnonzero(np.diff(sorted_codes)) + 1]
+        counts = np.diff(np.r_[starts, len(grouped)])
+        return grouped, starts, counts
+
+    def subject_moving_average_bias_(self) -> dict:
+        if self.assessments.empty:
+            return {}
+        grouped, starts, counts = self._subject_groups()
+        norm = grouped["norm"].to_numpy(dtype=float)
+        change = grouped.groupby([STUDENT, "subject"], sort=False, dropna=False)["norm"].pct_change()
+        change = change.fillna(0).to_numpy(dtype=float)
+        means = grouped_mean(norm, starts, counts)
+        changes = grouped_mean(change, starts, counts)
+        result = {student: [] for student in self.students}
+        for student, subject, percent_change, mean in zip(
+            grouped[STUDENT].to_numpy()[starts], grouped["subject"].to_numpy()[starts], changes, means
+        ):
+            if np.isinf(percent_change):
+                percent_change = 0
+            result[student].append({"subject": subject, "percent_change": percent_change, "mean": mean})
+        return result
+
+    def assessment_moving_average_subject_(self) -> dict:
+        if self.assessments.empty:
+            return {}
+        grouped, starts, counts = self._subject_groups()
+        means = grouped_mean(grouped["norm"].to_numpy(dtype=float), starts, counts)
+        result = {student: [] for student in self.students}
+        for student, subject, mean in zip(
+            grouped[STUDENT].to_numpy()[starts], grouped["subject"].to_numpy()[starts], means
+        ):
+            result[student].append({f'SMA:{subject}': mean})
+        return result
+
+    def get_dataset_assessment_(self) -> dict:
+        if self.assessments.empty:
+            return {}
+        frame = self.assessments
+        flags = {k: frame[k].astype(object).eq(True).to_numpy() if k in frame else np.zeros(len(frame), bool)
+                 for k in ("pre", "mid", "post")}
+        ## The last true flag wins, as in AssessmentAnalysis
+        key_type = np.select([flags["post"], flags["mid"], flags["pre"]], ["post", "mid", "pre"], default="")
+        scored = frame.assign(key_type=key_type)[key_type != ""]
+        result = {student: [] for student in self.students}
+        if scored.empty:
+            return result
+        group = scored.groupby([STUDENT, "alpha_identifier"], sort=False, dropna=False).ngroup().to_numpy()
+        pivot = {}
+        for code, student, alpha in zip(group, scored[STUDENT].to_numpy(), scored["alpha_identifier"].to_numpy()):
+            if code not in pivot:
+                pivot[code] = (student, {"alpha_identifier": alpha, "pre": 0, "mid": 0, "post": 0})
+        for code, kind, norm in zip(group, scored["key_type"].to_numpy(), scored["norm"].to_numpy()):
+            pivot[code][1][kind] = float(norm)
+        for student, row in pivot.values():
+            result[student].append(row)
+        return result
+
+    def _lr_predictions(self):
+        """Rows with attendance, one prediction per row; None when the model is unavailable."""
+        frame = self.questionnaire
+        if frame.empty:
+            return None, None
+        try:
+            model = load_model(LINEAR_MODEL_PATH)
+        except OSError:
+            logger.error("unable to load linear_model")
+            return None, None
+        ratio = frame[STUDENT].map(self.attendance_ratio)
+        rows = frame[ratio.notna()]
+        if rows.empty:
+            return rows, np.array([])
+        norm = rows["score"].astype(float) / rows["max_score"].astype(float) * 100
+        features = pd.DataFrame({
+            "Hours_Studied": rows["study_hours"].astype(float),
+            "Attendance": ratio[rows.index].astype(float),
+            "Previous_Scores": norm,
+            "Tutoring_Sessions": rows["tutor_sessions"].astype(float),
+            "Physical_Activity": rows["sports_hours"].astype(float),
+        })[LR_FEATURES]
+        return rows.assign(norm=norm), np.asarray(model.predict(features), dtype=float)
+
+    def assessment_analysis_lr_(self) -> dict:
+        result = {student: None for student in self.q_students}
+        rows, predictions = self._lr_predictions()
+        if rows is None:
+            return result
+        titles = rows["title"].to_numpy() if "title" in rows else [None] * len(rows)
+        for student, prediction, actual, title in zip(rows[STUDENT].to_numpy(), predictions, rows["norm"].to_numpy(), titles):
+            if result[student] is None:
+                result[student] = []
+            result[student].append({"prediction": float(prediction), "actual": float(actual), "title": title})
+        return result
+
+    def assessment_analysis_lr_subject_(self) -> dict:
+        result = {student: None for student in self.q_students}
+        rows, predictions = self._lr_predictions()
+        if rows is None:
+            return result
+        subjects = {}
+        for student, prediction, subject in zip(rows[STUDENT].to_numpy(), predictions, rows["subject"].to_numpy()):
+            subjects.setdefault(student, {}).setdefault(f'LR_{subject}', []).append(float(prediction))
+        for student, by_subject in subjects.items():
+            result[student] = [{key: values} for key, values in by_subject.items()]
+        return result
+
+    def student_analysis_(self) -> dict:
+        result = {student: None for student in self.q_students}
+        frame = self.questionnaire
+        if frame.empty:
+            return result
+        try:
+            model = load_model(LOGISTIC_MODEL_PATH)
+        except OSError:
+            logging.info("unable to load logistic_model.pkl")
+            return result
+        values = quotient(frame["score"], frame["max_score"]) * 100
+        ratio = frame[STUDENT].map(self.attendance_ratio).to_numpy(dtype=float)
+        ## Every row but a student's first is scored against the row before it
+        follows = np.ones(len(frame), dtype=bool)
+        follows[self.q_starts] = False
+        rows = np.flatnonzero(follows & ~np.isnan(ratio))
+        predictions = []
+        if len(rows):
+            ## Same as DisabilityAnalysis: the previous score is normalized by the current max_score
+            prev_score = quotient(frame["score"].iloc[rows - 1], frame["max_score"].iloc[rows]) * 100
+            features = pd.DataFrame({
+                "Attendance": ratio[rows],
+                "Previous_Scores": prev_score,
+                "Exam_Score": values[rows],
+                "Tutoring_Sessions": frame["tutor_sessions"].to_numpy(dtype=float)[rows],
+            })[DISABILITY_FEATURES]
+            predictions = np.asarray(model.predict(features)).tolist()
+        offset = 0
+        for student, start, count in zip(self.q_students, self.q_starts, self.q_counts):
+            if student not in self.attendance_ratio:
+                continue
+            student_predictions = predictions[offset:offset + count - 1]
+            offset += count - 1
+            result[student] = prediction_summary(student_predictions, values[start:start + count].tolist())
+        return result
@@ -0,0 +1,117 @@
+# test_cohort_analysis.py
+import random
+from decimal import Decimal
+from datetime import datetime, timedelta
+import pytest
+
+from Assessment_analysis.main import AssessmentAnalysis
+from Disability_analysis.main import DisabilityAnalysis
+from Cohort_analysis.main import CohortAnalysis
+from Report.main import build_report, build_cohort_reports
+
+
+SUBJECTS = ["Algebra", "Biology", "History", None]
+FLAGS = [(True, False, False), (False, True, False), (False, False, True), (True, False, True), (False, False, False)]
+
+
+def make_cohort(students=40, seed=7, decimal=False):
+    rng = random.Random(seed)
+    assessments, questionnaire, attendance = [], [], []
+    for student_id in rng.sample(range(1, 100000), students):
+        start = datetime(2025, 1, 1)
+        for i in range(rng.randint(0, 14)):
+            pre, mid, post = rng.choice(FLAGS)
+            score = rng.choice([0, rng.randint(1, 100)]) if i % 4 == 0 else rng.randint(0, 100)
+            max_score = rng.choice([50, 100, 30])
+            row = {
+                "student_id": student_id,
+                "session_date": start - timedelta(days=i),
+                "score": Decimal(score) if decimal else score,
+                "max_score": Decimal(max_score) if decimal else max_score,
+                "subject": rng.choice(SUBJECTS),
+                "pre": pre, "mid": mid, "post": post,
+                "alpha_identifier": rng.choice(["ALG-1", "ALG-2", "BIO-1", None]),
+                "assessment_title": f"Assessment {i}", "title": f"Assessment {i}",
+                "tutor_sessions": rng.randint(0, 5), "sports_hours": rng.randint(0, 8),
+                "study_hours": rng.randint(0, 20),
+            }
+            assessments.append(row)
+            if rng.random() < 0.6:
+                questionnaire.append(row)
+        if rng.random() < 0.9:
+            total = rng.randint(1, 40)
+            attendance.append({"student_id": student_id, "total_sessions": total, "present": rng.randint(0, total)})
+    ## Interleave students so the engine has to group them
+    rng.shuffle(assessments)
+    assessments.sort(key=lambda row: row["session_date"], reverse=True)
+    return assessments, questionnaire, attendance
+
+
+def rows_of(rows, student_id):
+    selected = [row for row in rows if row["student_id"] == student_id]
+    return selected or None
+
+
+def attendance_of(attendance, student_id):
+    return next((row for row in attendance if row["student_id"] == student_id), None)
+
+
+@pytest.mark.parametrize("decimal", [False, True])
+def test_assessment_outputs_match_per_student(decimal):
+    assessments, questionnaire, attendance = make_cohort(decimal=decimal)
+    cohort = CohortAnalysis(assessments, questionnaire, attendance)
+    outputs = {
+        "get_dataset_": cohort.get_dataset_(),
+        "get_dataset_labels_": cohort.get_dataset_labels_(),
+        "assessment_moving_average_": cohort.assessment_moving_average_(),
+        "subject_moving_average_bias_": cohort.subject_moving_average_bias_(),
+        "assessment_moving_average_subject_": cohort.assessment_moving_average_subject_(),
+        "get_dataset_assessment_": cohort.get_dataset_assessment_(),
+    }
+    for student_id in cohort.student_ids():
+        an = AssessmentAnalysis(rows_of(assessments, student_id), attendance_of(attendance, student_id))
+        for method, result in outputs.items():
+            ## Exact equality: same rounding as the per-student implementation
+            assert result.get(student_id) == getattr(an, method)(), (method, student_id)
+
+
+@pytest.mark.parametrize("decimal", [False, True])
+def test_model_outputs_match_per_student(decimal):
+    assessments, questionnaire, attendance = make_cohort(decimal=decimal)
+    cohort = CohortAnalysis(assessments, questionnaire, attendance)
+    disability = cohort.student_analysis_()
+    linear_regression = cohort.assessment_analysis_lr_()
+    linear_regression_subject = cohort.assessment_analysis_lr_subject_()
+    for student_id in cohort.student_ids():
+        rows = rows_of(questionnaire, student_id)
+        student_attendance = attendance_of(attendance, student_id)
+        assert disability.get(student_id) == DisabilityAnalysis(rows, student_attendance).student_analysis_()
+
+        an = AssessmentAnalysis(rows, student_attendance)
+        expected = an.assessment_analysis_lr_()
+        result = linear_regression.get(student_id)
+        assert (result is None) == (expected is None)
+        for got, want in zip(result or [], expected or []):
+            assert got["actual"] == want["actual"] and got["title"] == want["title"]
+            assert got["prediction"] == pytest.approx(want["prediction"], rel=1e-12, abs=1e-12)
+        assert [list(d) for d in linear_regression_subject.get(student_id) or []] == \
+            [list(d) for d in an.assessment_analysis_lr_subject_() or []]
+
+
+def test_cohort_reports_match_build_report():
+    assessments, questionnaire, attendance = make_cohort(students=15, seed=3)
+    reports = build_cohort_reports(assessments, questionnaire, attendance)
+    for student_id, report in reports.items():
+        expected = build_report(
+            rows_of(assessments, student_id), rows_of(questionnaire, student_id), attendance_of(attendance, student_id),
+        )
+        for key in ("all_scores", "subject_bias", "assessment_comparison", "learning_disability"):
+            assert report[key] == expected[key], (key, student_id)
+
+
+def test_empty_cohort():
+    cohort = CohortAnalysis([], None, None)
+    assert cohort.student_ids() == []
+    assert cohort.assessment_moving_average_() == {}
+    assert cohort.student_analysis_() == {}
+    assert build_cohort_reports([], [], []) == {}
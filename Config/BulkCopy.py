@@ -0,0 +1,166 @@
+import os
+import struct
+import threading
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+
+CSV = "csv"
+BINARY = "binary"
+
+## Column types by Postgres type oid (cursor.description type_code)
+BOOL, INT8, INT2, INT4, TEXT, FLOAT4, FLOAT8, VARCHAR, DATE, TIMESTAMP, TIMESTAMPTZ, NUMERIC = \
+    16, 20, 21, 23, 25, 700, 701, 1043, 1082, 1114, 1184, 1700
+## CSV columns parsed straight into these dtypes (numeric becomes float64); other columns stay strings
+CSV_DTYPES = {
+    BOOL: "boolean", INT2: "Int64", INT4: "Int64", INT8: "Int64",
+    FLOAT4: "float64", FLOAT8: "float64", NUMERIC: "float64",
+}
+DATETIME_TYPES = (DATE, TIMESTAMP, TIMESTAMPTZ)
+## Wire layout of fixed-width types in binary COPY
+BINARY_TYPES = {
+    BOOL: np.dtype("?"), INT2: np.dtype(">i2"), INT4: np.dtype(">i4"), INT8: np.dtype(">i8"),
+    FLOAT4: np.dtype(">f4"), FLOAT8: np.dtype(">f8"),
+    DATE: np.dtype(">i4"), TIMESTAMP: np.dtype(">i8"), TIMESTAMPTZ: np.dtype(">i8"),
+}
+BINARY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+POSTGRES_EPOCH = np.datetime64("2000-01-01T00:00:00", "us")
+## Written for NULL in CSV so empty strings stay distinguishable from missing values
+CSV_NULL = "\\N"
+
+
+def copy_statement(query, fmt) -> str:
+    if fmt == CSV:
+        return f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER false, NULL '{CSV_NULL}')"
+    if fmt == BINARY:
+        return f"COPY ({query}) TO STDOUT WITH (FORMAT binary)"
+    raise ValueError(f"Unknown COPY format {fmt!r}")
+
+
+@contextmanager
+def copy_reader(conn, statement):
+    """
+        A binary file object streaming the output of `statement` (COPY ... TO STDOUT). The copy
+        runs on a thread that writes into a pipe, so the caller parses while Postgres is still
+        sending and the whole result is never buffered. Leaving the block early cancels the copy.
+        Errors of the copy are raised once the stream has been read to its end.
+    """
+    read_fd, write_fd = os.pipe()
+    errors = []
+
+    def produce():
+        try:
+            with os.fdopen(write_fd, "wb", buffering=1 << 20) as writer, conn.cursor() as cursor:
+                cursor.copy_expert(statement, writer, size=1 << 16)
+        except BaseException as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=produce, name="copy-to-stdout", daemon=True)
+    thread.start()
+    reader = os.fdopen(read_fd, "rb", buffering=1 << 20)
+    try:
+        yield reader
+    except BaseException as e:
+        cancelled = thread.is_alive()
+        if cancelled:
+            conn.cancel()
+        reader.close()
+        thread.join()
+        if errors and not cancelled and not isinstance(e, GeneratorExit):
+            ## The stream ended early because the copy failed; that is the error to report
+            raise errors[0] from e
+        raise
+    reader.close()
+    thread.join()
+    if errors:
+        raise errors[0]
+
+
+def _plain(frame, columns):
+    """
+        Column types as in rows from the database: integers and booleans without NULLs become
+        numpy columns (integers with NULLs become float64), missing strings and booleans None.
+    """
+    for name, type_code in columns:
+        column = frame[name]
+        if type_code in DATETIME_TYPES:
+            frame[name] = pd.to_datetime(column, format="ISO8601", utc=type_code == TIMESTAMPTZ)
+        elif CSV_DTYPES.get(type_code) == "Int64":
+            frame[name] = column.to_numpy(dtype="float64" if column.hasnans else "int64", na_value=np.nan)
+        elif type_code == BOOL or type_code not in CSV_DTYPES:
+            if column.hasnans:
+                column = column.astype(object)
+                frame[name] = column.where(column.notna(), None)
+            elif type_code == BOOL:
+                frame[name] = column.astype(bool)
+    return frame
+
+
+def csv_frames(stream, columns, chunk_rows):
+    """DataFrames of at most `chunk_rows` rows parsed by pandas' C reader from COPY csv output."""
+    names = [name for name, _ in columns]
+    dtypes = {name: CSV_DTYPES.get(type_code, object) for name, type_code in columns}
+    reader = pd.read_csv(
+        stream, names=names, header=None, dtype=dtypes, chunksize=chunk_rows,
+        na_values=[CSV_NULL], keep_default_na=False, true_values=["t"], false_values=["f"],
+    )
+    for frame in reader:
+        yield _plain(frame, columns)
+
+
+def binary_row_dtype(columns) -> np.dtype:
+    """One COPY binary tuple: field count, then length and value of every field."""
+    fields = [("_count", ">i2")]
+    for index, (name, type_code) in enumerate(columns):
+        if type_code not in BINARY_TYPES:
+            raise ValueError(f"Binary COPY needs fixed-width columns; {name} (oid {type_code}) is not, use csv")
+        fields += [(f"_length{index}", ">i4"), (name, BINARY_TYPES[type_code])]
+    return np.dtype(fields)
+
+
+def _binary_frame(records, columns) -> pd.DataFrame:
+    data = {}
+    for index, (name, type_code) in enumerate(columns):
+        if (records["_count"] != len(columns)).any() or \
+                (records[f"_length{index}"] != BINARY_TYPES[type_code].itemsize).any():
+            raise ValueError(f"Binary COPY cannot read NULLs ({name}); use csv")
+        values = records[name]
+        if type_code in (TIMESTAMP, TIMESTAMPTZ):
+            values = POSTGRES_EPOCH + values.astype("i8").astype("timedelta64[us]")
+            data[name] = pd.to_datetime(values, utc=type_code == TIMESTAMPTZ)
+        elif type_code == DATE:
+            data[name] = (POSTGRES_EPOCH.astype("datetime64[D]") + values.astype("i8").astype("timedelta64[D]"))
+        else:
+            data[name] = values.astype(values.dtype.newbyteorder("="))
+    return pd.DataFrame(data)
+
+
+def binary_frames(stream, columns, chunk_rows):
+    """
+        DataFrames from COPY binary output, decoded with numpy: every tuple has the same size,
+        so a chunk is one structured array view over the bytes read. Only NOT NULL columns of
+        fixed-width types (bool, integers, floats, date, timestamp) can be read this way.
+        An empty result gives one empty frame, as pandas does for csv.
+    """
+    row = binary_row_dtype(columns)
+    header = stream.read(len(BINARY_SIGNATURE) + 8)
+    if not header.startswith(BINARY_SIGNATURE):
+        raise ValueError("Not a COPY binary stream")
+    extension = struct.unpack(">i", header[-4:])[0]
+    stream.read(extension)
+    pending, empty = b"", True
+    while True:
+        block = stream.read(row.itemsize * chunk_rows)
+        data = pending + block
+        rows = len(data) // row.itemsize
+        if not block:
+            ## Only the trailer (field count -1) may be left
+            if data not in (b"", b"\xff\xff"):
+                raise ValueError("Truncated COPY binary stream")
+            if empty:
+                yield _binary_frame(np.empty(0, dtype=row), columns)
+            return
+        pending = data[rows * row.itemsize:]
+        if rows:
+            empty = False
+            yield _binary_frame(np.frombuffer(data, dtype=row, count=rows), columns)
@@ -0,0 +1,66 @@
+import time
+import contextvars
+from contextlib import contextmanager
+
+## The deadline of the report being computed on this thread (or task), if any
+_current = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The report's time budget ran out before a query or stage could finish."""
+
+
+class Deadline:
+    """
+        `budget` seconds from creation for one message; a budget <= 0 never expires. With no more
+        than `reserve` seconds left it is low, and the report stops fetching what only its
+        expensive sections read.
+    """
+
+    def __init__(self, budget, clock=time.monotonic, reserve=0.0):
+        self.budget = budget
+        self.clock = clock
+        self.reserve = reserve
+        self.expires_at = clock() + budget if budget > 0 else None
+        ## Set once inputs of the expensive sections were left unfetched; those sections are then skipped
+        self.degraded = False
+
+    def remaining(self):
+        """Seconds left, or None without a budget."""
+        if self.expires_at is None:
+            return None
+        return self.expires_at - self.clock()
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def low(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= self.reserve
+
+    def statement_timeout_ms(self):
+        """The remaining budget as a Postgres statement_timeout (at least 1 ms, 0 would disable it)."""
+        remaining = self.remaining()
+        if remaining is None:
+            return None
+        return max(1, int(remaining * 1000))
+
+
+def current_deadline():
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(deadline):
+    """Make `deadline` the current one for the block; PostgresClient and package_report read it."""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def submit(executor, fn, *args):
+    """executor.submit that carries the current deadline (and span and log summary) into the worker thread."""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
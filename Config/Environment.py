@@ -0,0 +1,76 @@
+import os
+from dotenv import load_dotenv
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_environment_loaded = False
+_logging_configured = False
+_tracing_configured = False
+
+
+def load_environment():
+    """Load variables from .env once per process; later calls are no-ops."""
+    global _environment_loaded
+    if not _environment_loaded:
+        load_dotenv()
+        _environment_loaded = True
+
+
+def configure_logging(level=None):
+    """
+        Set up console logging once per process so that all log messages
+        (including pika's) are captured by the ECS awslogs driver.
+
+        LOG_LEVEL        level name when `level` is not given (INFO)
+        LOG_ASYNC        0 writes on the calling thread instead of a background writer (1)
+        LOG_JSON         1 writes one JSON object per line (0)
+        LOG_DEBUG_SAMPLE fraction of DEBUG records kept (1.0)
+        LOG_DEBUG_RATE   DEBUG records per second per logger, 0 = unlimited (0)
+        LOG_QUEUE_SIZE   records buffered for the writer before new ones are dropped (10000)
+    """
+    global _logging_configured
+    if _logging_configured:
+        return
+    from Config import Logs
+
+    load_environment()
+    Logs.install(
+        level=level if level is not None else os.getenv("LOG_LEVEL", "INFO").upper(),
+        asynchronous=os.getenv("LOG_ASYNC", "1") == "1",
+        json_lines=os.getenv("LOG_JSON", "0") == "1",
+        debug_sample=float(os.getenv("LOG_DEBUG_SAMPLE", "1.0")),
+        debug_rate=int(os.getenv("LOG_DEBUG_RATE", "0")),
+        queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+    )
+    _logging_configured = True
+
+
+def configure_tracing():
+    """
+        Install the tracer once per process; tracing is off unless TRACE_EXPORT is set.
+
+        TRACE_EXPORT    file (OTLP/JSON lines in TRACE_FILE) or otlp (POST to TRACE_ENDPOINT)
+        TRACE_FILE      traces.jsonl
+        TRACE_ENDPOINT  OTLP/HTTP traces endpoint of a collector (http://localhost:4318/v1/traces)
+        TRACE_SAMPLE    fraction of new traces kept; traces started by a publisher keep its decision (1.0)
+        TRACE_SERVICE   service.name of the spans (pg_reports)
+    """
+    global _tracing_configured
+    if _tracing_configured:
+        return
+    from Config import Tracing
+
+    load_environment()
+    export = os.getenv("TRACE_EXPORT", "")
+    service = os.getenv("TRACE_SERVICE", "pg_reports")
+    if export == "file":
+        exporter = Tracing.FileExporter(os.getenv("TRACE_FILE", "traces.jsonl"), service)
+    elif export == "otlp":
+        exporter = Tracing.OtlpHttpExporter(os.getenv("TRACE_ENDPOINT", "http://localhost:4318/v1/traces"), service)
+    elif export:
+        raise ValueError(f"Unknown TRACE_EXPORT {export!r}; use file or otlp")
+    else:
+        exporter = None
+    if exporter is not None:
+        Tracing.install(Tracing.Tracer(exporter, sample=float(os.getenv("TRACE_SAMPLE", "1.0"))))
+    _tracing_configured = True
@@ -0,0 +1,208 @@
+import os
+import sys
+import copy
+import json
+import time
+import queue
+import random
+import atexit
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from Config.Metrics import metrics
+from Config.Environment import LOG_FORMAT
+
+## The summary of the message being processed on this thread (or task), if any
+_summary = contextvars.ContextVar("summary", default=None)
+_listener = None
+_handler = None
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+        QueueHandler for an in-process queue. The stock prepare() formats the whole record on
+        the calling thread; here only the message arguments are merged (they may change after
+        the call returns) and the timestamp, formatting and tracebacks are left to the listener.
+        A full queue drops the record instead of blocking the caller (logging.dropped).
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc("logging.dropped")
+
+
+class DebugSampler(logging.Filter):
+    """
+        Lets a `sample` fraction of DEBUG records through, and at most `rate` per second per
+        logger (0 = no limit). INFO and above always pass. Dropped records are counted as
+        logging.sampled_out. Counts are approximate under concurrent logging.
+    """
+
+    def __init__(self, sample=1.0, rate=0, clock=time.monotonic, rng=random.random):
+        super().__init__()
+        self.sample = sample
+        self.rate = rate
+        self.clock = clock
+        self.rng = rng
+        ## logger name -> (second, records let through in it)
+        self.windows = {}
+
+    def filter(self, record) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        if self.sample < 1.0 and self.rng() >= self.sample:
+            metrics.inc("logging.sampled_out")
+            return False
+        if self.rate > 0:
+            second = int(self.clock())
+            window, count = self.windows.get(record.name, (second, 0))
+            if window != second:
+                count = 0
+            if count >= self.rate:
+                metrics.inc("logging.sampled_out")
+                return False
+            self.windows[record.name] = (second, count + 1)
+        return True
+
+
+class SummaryFormatter(logging.Formatter):
+    """LOG_FORMAT lines with a record's `summary` fields appended as key=value."""
+
+    def format(self, record) -> str:
+        line = super().format(record)
+        summary = getattr(record, "summary", None)
+        if summary:
+            line += " " + " ".join(f"{key}={value}" for key, value in summary.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; a record's `summary` fields are top-level keys."""
+
+    def format(self, record) -> str:
+        entry = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "summary", None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class MessageSummary:
+    """Fields, counters and timings of one message, logged as a single line at the end."""
+
+    def __init__(self, **fields):
+        self.fields = dict(fields)
+        self.lock = threading.Lock()
+
+    def set(self, key, value):
+        with self.lock:
+            self.fields[key] = value
+
+    def add(self, key, amount=1):
+        with self.lock:
+            self.fields[key] = self.fields.get(key, 0) + amount
+
+
+def current_summary():
+    return _summary.get()
+
+
+def summary_set(key, value):
+    summary = _summary.get()
+    if summary is not None:
+        summary.set(key, value)
+
+
+def summary_add(key, amount=1):
+    summary = _summary.get()
+    if summary is not None:
+        summary.add(key, amount)
+
+
+@contextmanager
+def message_summary(logger, message, **fields):
+    """
+        Collect what happens in the block (PostgresClient queries, pipeline stages and
+        whatever is summary_set/summary_add-ed) and log it as one INFO line on exit.
+    """
+    summary = MessageSummary(**fields)
+    token = _summary.set(summary)
+    started = time.perf_counter()
+    try:
+        yield summary
+    except BaseException as e:
+        summary.fields.setdefault("outcome", type(e).__name__)
+        raise
+    finally:
+        _summary.reset(token)
+        summary.fields["seconds"] = time.perf_counter() - started
+        fields = {key: round(value, 4) if isinstance(value, float) else value
+                  for key, value in summary.fields.items()}
+        logger.info(message, extra={"summary": fields})
+
+
+def install(level=logging.INFO, asynchronous=True, json_lines=False, debug_sample=1.0, debug_rate=0,
+            queue_size=10000, stream=None, force=False):
+    """
+        Route the root logger to `stream` (stderr, like basicConfig): through a bounded queue and
+        a background writer thread when `asynchronous`, else directly. Like basicConfig, does
+        nothing if the root logger already has handlers unless `force`. Returns the new handler.
+    """
+    global _listener, _handler
+    root = logging.getLogger()
+    if root.handlers and not force:
+        return None
+    stop()
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if json_lines else SummaryFormatter(LOG_FORMAT))
+    handler = output
+    if asynchronous:
+        handler = DeferredQueueHandler(queue.Queue(queue_size) if queue_size > 0 else queue.SimpleQueue())
+        _listener = QueueListener(handler.queue, output)
+        _listener.start()
+        _handler = handler
+    if debug_sample < 1.0 or debug_rate > 0:
+        handler.addFilter(DebugSampler(debug_sample, debug_rate))
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    return handler
+
+
+def stop():
+    """Write out what is still queued and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_in_child():
+    """A forked worker has no writer thread; give it a fresh queue and one of its own."""
+    global _listener
+    if _listener is None:
+        return
+    _handler.queue = queue.Queue(_handler.queue.maxsize) if isinstance(_handler.queue, queue.Queue) \
+        else queue.SimpleQueue()
+    _listener = QueueListener(_handler.queue, *_listener.handlers)
+    _listener.start()
+
+
+atexit.register(stop)
+os.register_at_fork(after_in_child=_restart_in_child)
@@ -1,21 +1,54 @@
 import os
+import re
+import sys
+import time
+import select
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from psycopg2 import OperationalError, ProgrammingError, Error
-from dotenv import load_dotenv
+from psycopg2.extensions import QueryCanceledError
 import logging
+from Config.Environment import load_environment
+from Config.Metrics import metrics
+from Config.Retry import jittered_backoff
+from Config.QueryCache import QueryCache, cached, cache_key
+from Config.QueryStats import query_stats, row_bytes
+from Config.Deadline import current_deadline, DeadlineExceeded
+from Config.Logs import current_summary
+from Config import Tracing
+from contextlib import contextmanager
 
-# --- 1. Set up basic logging to stdout ---
-logging.basicConfig(
-    level=logging.INFO, # Adjust to logging.DEBUG for more verbose logs
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
-load_dotenv()
+load_environment()
+
+## Retries for idempotent statements that fail with OperationalError (dropped connection, failover)
+POSTGRES_RETRIES = int(os.getenv("POSTGRES_RETRIES", "3"))
+POSTGRES_RETRY_BASE = float(os.getenv("POSTGRES_RETRY_BASE", "0.2"))
+## Read-through cache for slow-changing reads: entries kept (0 disables) and seconds each query is reused
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "0"))
+QUERY_CACHE_TTLS = {
+    "attendance": float(os.getenv("CACHE_TTL_ATTENDANCE", "60")),
+    "subject": float(os.getenv("CACHE_TTL_SUBJECT", "3600")),
+    "questionnaire": float(os.getenv("CACHE_TTL_QUESTIONNAIRE", "300")),
+}
+
+## Statements EXPLAIN accepts without side effects; other slow statements are captured without a plan
+EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+## statement_timeout of a session after a statement that changed it failed
+TIMEOUT_UNKNOWN = -1
+
+
+def _leading_id(params):
+    """The student id of a cached params argument (as cache_key stores it): its first value, or itself if scalar."""
+    if isinstance(params, tuple):
+        return params[0] if params else None
+    return params
+
 
 class PostgresClient:
     def __init__(self):
         self.conn = None
+        self.cache = QueryCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTLS) if QUERY_CACHE_SIZE > 0 else None
         self._connect()
     
     def _connect(self):
@@ -30,6 +63,12 @@ class PostgresClient:
                 dbname=os.getenv("POSTGRES_DB_NAME")
             )
             self.conn.autocommit = True
+            ## None = the server's default statement_timeout
+            self.statement_timeout_ms = None
+            ## Notifications sent while disconnected are lost; callers of listen() must resync
+            with self.conn.cursor() as cursor:
+                for channel in getattr(self, "channels", ()):
+                    cursor.execute(f"LISTEN {channel};")
             logger.info("Successfully connected to PostgreSQL database.")
         except OperationalError as e:
             # This handles connection-related errors
@@ -47,37 +86,268 @@ class PostgresClient:
             self._connect()
         return self.conn.cursor(cursor_factory=cursor_factory)
 
-    def fetch_one(self, query, params=None):
+    def _with_retry(self, operation, retries):
+        """
+            Run operation(). On OperationalError, wait with jittered backoff, reconnect if the
+            connection was lost and try again, at most `retries` times. Cancelled statements
+            (statement_timeout) are not retried. Only use with idempotent statements.
+        """
+        failed_at, attempt = None, 0
+        while True:
+            try:
+                result = operation()
+                if failed_at is not None:
+                    metrics.observe("postgres.recovery_seconds", time.perf_counter() - failed_at)
+                    logger.info(f"Postgres operation recovered after {attempt} retries")
+                return result
+            except QueryCanceledError as e:
+                deadline = current_deadline()
+                if deadline is not None and deadline.expired():
+                    raise DeadlineExceeded("Query cancelled by the report deadline") from e
+                raise
+            except OperationalError as e:
+                error = e
+                failed_at = failed_at or time.perf_counter()
+            except RuntimeError as e:
+                ## _get_cursor could not reconnect
+                if not isinstance(e.__cause__, OperationalError):
+                    raise
+                error = e.__cause__
+                failed_at = failed_at or time.perf_counter()
+
+            while True:
+                if attempt >= retries:
+                    raise error
+                delay = jittered_backoff(attempt, base=POSTGRES_RETRY_BASE)
+                attempt += 1
+                metrics.inc("postgres.retries")
+                logger.warning(f"Postgres operation failed ({error}); retry {attempt}/{retries} in {delay:.2f}s")
+                time.sleep(delay)
+                if self.conn is not None and not self.conn.closed:
+                    break
+                try:
+                    self._connect()
+                    metrics.inc("postgres.reconnects")
+                    break
+                except RuntimeError as e:
+                    error = e.__cause__ if isinstance(e.__cause__, OperationalError) else error
+
+    def _execute(self, cursor, query, params):
+        """
+            cursor.execute, bounded by the current Deadline: its remaining budget is sent as
+            statement_timeout in the same round trip. The setting stays on the session, so the
+            first statement outside a deadline resets it.
+        """
+        deadline = current_deadline()
+        timeout_ms = None
+        if deadline is not None:
+            if deadline.expired():
+                raise DeadlineExceeded("Report deadline passed before the query was sent")
+            timeout_ms = deadline.statement_timeout_ms()
+        if timeout_ms == getattr(self, "statement_timeout_ms", None):
+            cursor.execute(query, params)
+            return
+        prefix = f"SET statement_timeout = {timeout_ms}; " if timeout_ms is not None else "RESET statement_timeout; "
+        self.statement_timeout_ms = TIMEOUT_UNKNOWN
+        cursor.execute(prefix + query, params)
+        self.statement_timeout_ms = timeout_ms
+
+    @contextmanager
+    def _observe(self, name, query, params):
+        """
+            Record one call in query_stats under `name` (the calling method by default). The
+            block sets observation["rows"] and ["bytes"]; a slow call gets its plan captured.
+        """
+        observation = {"rows": 0, "bytes": 0}
+        span = self._start_span(name, query)
+        started = time.perf_counter()
+        error = None
         try:
+            yield observation
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            query_stats.record(name, seconds, observation["rows"], observation["bytes"], error)
+            self._end_span(span, observation["rows"], error)
+            summary = current_summary()
+            if summary is not None:
+                summary.add("queries")
+                summary.add("rows", observation["rows"])
+                summary.add("db_seconds", seconds)
+            if error is None and query_stats.is_slow(seconds):
+                self._capture_slow(name, query, params, seconds)
+
+    def _start_span(self, name, query):
+        """A client span for one query (no-op while tracing is off); the statement is kept without params."""
+        if not Tracing.enabled():
+            return None
+        return Tracing.start_span(f"postgres.{name}", kind=Tracing.CLIENT, **{
+            "db.system": "postgresql", "db.operation": name,
+            "db.statement": " ".join(query.split())[:Tracing.MAX_STATEMENT],
+        })
+
+    def _end_span(self, span, rows, error):
+        if span is not None:
+            span.set("db.rows", rows)
+            Tracing.end_span(span, error)
+
+    def _capture_slow(self, name, query, params, seconds):
+        plan = None
+        ## EXPLAIN only on autocommit connections: a failed EXPLAIN would abort a caller's transaction
+        explain = (EXPLAINABLE.match(query) and self.conn is not None and not self.conn.closed
+                   and self.conn.autocommit and query_stats.should_explain(name))
+        if explain:
+            try:
+                with self.conn.cursor() as cursor:
+                    cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+                    plan = cursor.fetchone()[0]
+            except Error as e:
+                plan = f"EXPLAIN failed: {e!r}"
+        query_stats.capture(name, seconds, query, params, plan)
+
+    def fetch_one(self, query, params=None, name=None):
+        def run():
             with self._get_cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute(query, params)
-                logger.debug(f"Executed query: {query} with params: {params}")
+                self._execute(cursor, query, params)
+                logger.debug("Executed query: %s with params: %s", query, params)
                 return cursor.fetchone()
-        except (OperationalError, ProgrammingError) as e:
-            logger.error(f"Failed to execute query: {query}")
-            logger.exception(e)
-            raise RuntimeError("Database query failed") from e
+        with self._observe(name or sys._getframe(1).f_code.co_name, query, params) as observation:
+            try:
+                row = self._with_retry(run, POSTGRES_RETRIES)
+            except (OperationalError, ProgrammingError) as e:
+                logger.error(f"Failed to execute query: {query}")
+                logger.exception(e)
+                raise RuntimeError("Database query failed") from e
+            if row is not None:
+                observation["rows"], observation["bytes"] = 1, row_bytes([row])
+            return row
 
-    def fetch_all(self, query, params=None):
-        try:
+    def fetch_all(self, query, params=None, name=None):
+        def run():
             with self._get_cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute(query, params)
-                logger.debug(f"Executed query: {query} with params: {params}")
+                self._execute(cursor, query, params)
+                logger.debug("Executed query: %s with params: %s", query, params)
                 return cursor.fetchall()
+        with self._observe(name or sys._getframe(1).f_code.co_name, query, params) as observation:
+            try:
+                rows = self._with_retry(run, POSTGRES_RETRIES)
+            except (OperationalError, ProgrammingError) as e:
+                logger.error(f"Failed to execute query: {query}")
+                logger.exception(e)
+                raise RuntimeError("Database query failed") from e
+            observation["rows"], observation["bytes"] = len(rows), row_bytes(rows)
+            return rows
+
+    def fetch_chunks(self, query, params=None, chunk_size=10000, name=None):
+        """
+            Stream a large result through a server-side (named) cursor, yielding lists of at
+            most `chunk_size` rows so the full result is never held in memory. WITH HOLD lets
+            the cursor live on the autocommit connection. Not retried: a broken stream has
+            already yielded rows. Only time spent in the database counts as its latency.
+        """
+        name = name or sys._getframe(1).f_code.co_name
+        if not self.conn or self.conn.closed:
+            self._connect()
+        cursor = self.conn.cursor(name=f"chunks_{id(self)}_{time.monotonic_ns()}",
+                                  cursor_factory=RealDictCursor, withhold=True)
+        cursor.itersize = chunk_size
+        waited, rows, nbytes, error = 0.0, 0, 0, None
+        span = self._start_span(name, query)
+        try:
+            started = time.perf_counter()
+            cursor.execute(query, params)
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                waited += time.perf_counter() - started
+                if not chunk:
+                    break
+                rows, nbytes = rows + len(chunk), nbytes + row_bytes(chunk)
+                yield chunk
+                started = time.perf_counter()
         except (OperationalError, ProgrammingError) as e:
-            logger.error(f"Failed to execute query: {query}")
+            error = e
+            logger.error(f"Failed to stream query: {query}")
             logger.exception(e)
             raise RuntimeError("Database query failed") from e
+        finally:
+            cursor.close()
+            query_stats.record(name, waited, rows, nbytes, error)
+            self._end_span(span, rows, error)
+
+    def copy_frames(self, query, params=None, chunk_rows=100000, fmt="csv", name=None):
+        """
+            Stream a large result with COPY (query) TO STDOUT, yielding DataFrames of at most
+            `chunk_rows` rows. Values are parsed column by column (pandas' C reader for csv,
+            numpy for binary) instead of into a dict per row; column types come from the
+            query's description (see Config/BulkCopy.py). Binary only reads NOT NULL
+            fixed-width columns. Not retried, and timed like fetch_chunks.
+        """
+        ## numpy and pandas are only loaded by the queries that copy
+        from Config.BulkCopy import BINARY, copy_statement, copy_reader, csv_frames, binary_frames, binary_row_dtype
 
-    def execute(self, query, params=None):
+        name = name or sys._getframe(1).f_code.co_name
+        if not self.conn or self.conn.closed:
+            self._connect()
+        waited, rows, nbytes, error = 0.0, 0, 0, None
+        span = self._start_span(name, query)
         try:
-            with self._get_cursor() as cursor:
-                cursor.execute(query, params)
-                logger.info(f"Executed command: {query} with params: {params}")
+            started = time.perf_counter()
+            with self.conn.cursor() as cursor:
+                statement = cursor.mogrify(query, params).decode().strip().rstrip(";")
+                ## LIMIT 0 plans the query without running it, for the column types
+                self._execute(cursor, f"SELECT * FROM ({statement}) AS copied LIMIT 0", None)
+                columns = [(column.name, column.type_code) for column in cursor.description]
+            if fmt == BINARY:
+                binary_row_dtype(columns)
+            parse = binary_frames if fmt == BINARY else csv_frames
+            with copy_reader(self.conn, copy_statement(statement, fmt)) as stream:
+                for frame in parse(stream, columns, chunk_rows):
+                    waited += time.perf_counter() - started
+                    rows, nbytes = rows + len(frame), nbytes + int(frame.memory_usage(index=False).sum())
+                    yield frame
+                    started = time.perf_counter()
+        except QueryCanceledError as e:
+            error = e
+            deadline = current_deadline()
+            if deadline is not None and deadline.expired():
+                raise DeadlineExceeded("Query cancelled by the report deadline") from e
+            raise
         except (OperationalError, ProgrammingError) as e:
-            logger.error(f"Failed to execute command: {query}")
+            error = e
+            logger.error(f"Failed to copy query: {query}")
             logger.exception(e)
-            raise RuntimeError("Database command failed") from e
+            raise RuntimeError("Database query failed") from e
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            query_stats.record(name, waited, rows, nbytes, error)
+            self._end_span(span, rows, error)
+
+    def copy_frame(self, query, params=None, fmt="csv", name=None):
+        """The whole result of copy_frames as one DataFrame."""
+        import pandas as pd
+
+        frames = list(self.copy_frames(query, params, fmt=fmt, name=name or sys._getframe(1).f_code.co_name))
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+    def execute(self, query, params=None, idempotent=False, name=None):
+        """Run a command; it is only retried on connection failures when `idempotent` is True."""
+        def run():
+            with self._get_cursor() as cursor:
+                self._execute(cursor, query, params)
+                logger.debug("Executed command: %s with params: %s", query, params)
+                return cursor.rowcount
+        with self._observe(name or sys._getframe(1).f_code.co_name, query, params) as observation:
+            try:
+                rowcount = self._with_retry(run, POSTGRES_RETRIES if idempotent else 0)
+            except (OperationalError, ProgrammingError) as e:
+                logger.error(f"Failed to execute command: {query}")
+                logger.exception(e)
+                raise RuntimeError("Database command failed") from e
+            observation["rows"] = max(rowcount, 0)
     
 
     def get_all_student_assessments(self, student_id, semester_id: None):
@@ -109,7 +379,7 @@ class PostgresClient:
             sql.append("AND ast.semester_id = %s")
             params.append(semester_id)
 
-        sql.append("ORDER BY ss.session_date DESC;")
+        sql.append("ORDER BY ss.session_date DESC, ast.id DESC;")
         query = " ".join(sql) 
         data_cursor = self.fetch_all(query, params)
         if len(data_cursor) == 0:
@@ -145,7 +415,7 @@ class PostgresClient:
             params.append(semester_id)
 
         sql.append("AND ast.questionnaire_id IS NULL")
-        sql.append("ORDER BY ss.session_date DESC;")
+        sql.append("ORDER BY ss.session_date DESC, ast.id DESC;")
         query = " ".join(sql) 
         data_cursor = self.fetch_all(query, params)
         if len(data_cursor) == 0:
@@ -189,7 +459,7 @@ class PostgresClient:
             params.append(semester_id)
 
         sql.append("AND ast.questionnaire_id IS NOT NULL")
-        sql.append("ORDER BY ss.session_date DESC;")
+        sql.append("ORDER BY ss.session_date DESC, ast.id DESC;")
         query = " ".join(sql) 
         data_cursor = self.fetch_all(query, params)
         if len(data_cursor) == 0:
@@ -197,15 +467,115 @@ class PostgresClient:
         data = [dict(row) for row in data_cursor]
         return data
 
+    ## SQL pushdown: the aggregates behind AssessmentAnalysis computed next to the data.
+    ## Rows are numbered in the same order as get_all_student_assessments (session_date DESC)
+    ## so windows, first appearances and "last row wins" match the Python implementations.
+    def get_assessment_aggregates(self, student_id, semester_id=None):
+        sql = [
+            """
+                WITH scored AS (
+                    SELECT
+                        ROW_NUMBER() OVER (ORDER BY ss.session_date DESC, ast.id DESC) AS rn,
+                        ast.score::float8 / asmt.max_score::float8 * 100 AS norm,
+                        sj.title AS subject,
+                        asmt.title AS assessment_title,
+                        asmt.alpha_identifier,
+                        CASE
+                            WHEN asmt.post IS TRUE THEN 'post'
+                            WHEN asmt.mid IS TRUE THEN 'mid'
+                            WHEN asmt.pre IS TRUE THEN 'pre'
+                        END AS key_type
+                    FROM stu_tracker.Assessments_students ast
+                    LEFT JOIN stu_tracker.Sessions ss ON
+                        ss.id = ast.session_id
+                    LEFT JOIN stu_tracker.Assessments asmt ON
+                        asmt.id = ast.assessment_id
+                    LEFT JOIN stu_tracker.Subjects sj ON
+                        sj.id = asmt.subject_id
+                    WHERE ast.student_id = %s
+            """
+        ]
+        params = [student_id]
+        if semester_id is not None:
+            sql.append("AND ast.semester_id = %s")
+            params.append(semester_id)
+
+        sql.append(
+            """
+                ),
+                series AS (
+                    SELECT
+                        rn,
+                        norm,
+                        assessment_title,
+                        CASE WHEN COUNT(*) OVER w5 = 5 THEN AVG(norm) OVER w5 ELSE 0 END AS sma,
+                        AVG(norm) OVER (ORDER BY rn ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) AS cma
+                    FROM scored
+                    WINDOW w5 AS (ORDER BY rn ROWS BETWEEN 4 PRECEDING AND CURRENT ROW)
+                ),
+                changes AS (
+                    SELECT
+                        subject,
+                        rn,
+                        norm,
+                        LAG(norm) OVER (PARTITION BY subject ORDER BY rn) AS prev
+                    FROM scored
+                ),
+                subjects AS (
+                    SELECT
+                        subject,
+                        MIN(rn) AS first_rn,
+                        AVG(norm) AS mean,
+                        AVG(CASE WHEN prev IS NULL OR prev = 0 THEN 0 ELSE norm / prev - 1 END) AS percent_change,
+                        BOOL_OR(prev = 0 AND norm <> 0) AS infinite_change
+                    FROM changes
+                    GROUP BY subject
+                ),
+                pivot AS (
+                    SELECT
+                        alpha_identifier,
+                        MIN(rn) AS first_rn,
+                        (ARRAY_AGG(norm ORDER BY rn DESC) FILTER (WHERE key_type = 'pre'))[1] AS pre,
+                        (ARRAY_AGG(norm ORDER BY rn DESC) FILTER (WHERE key_type = 'mid'))[1] AS mid,
+                        (ARRAY_AGG(norm ORDER BY rn DESC) FILTER (WHERE key_type = 'post'))[1] AS post
+                    FROM scored
+                    WHERE key_type IS NOT NULL
+                    GROUP BY alpha_identifier
+                )
+                SELECT
+                    (SELECT COUNT(*) FROM scored) AS total,
+                    (SELECT json_agg(json_build_object(
+                        'norm', norm, 'label', assessment_title, 'sma', sma, 'cma', cma) ORDER BY rn)
+                     FROM series) AS series,
+                    (SELECT json_agg(json_build_object(
+                        'subject', subject, 'mean', mean, 'percent_change', percent_change,
+                        'infinite_change', infinite_change) ORDER BY first_rn)
+                     FROM subjects) AS subjects,
+                    (SELECT json_agg(json_build_object(
+                        'alpha_identifier', alpha_identifier, 'pre', pre, 'mid', mid, 'post', post) ORDER BY first_rn)
+                     FROM pivot) AS pivot;
+            """
+        )
+        query = " ".join(sql)
+        row = self.fetch_one(query, params)
+        if row is None or row["total"] == 0:
+            return None
+        return {
+            "series": row["series"] or [],
+            "subjects": row["subjects"] or [],
+            "pivot": row["pivot"] or [],
+        }
+
     def get_subject_(self):
         return None
 
 
+    @cached("questionnaire")
     def get_student_questionnaire(self, params):
         query = (
-        "SELECT" 
-        "q.subject_id AS subject_id,"
-        "q.created_at AS date,"
+        "SELECT " 
+        "q.subject_id AS subject_id, "
+        "q.created_at AS date, "
         "q.study_hours, " 
         "q.sleep_hours, " 
         "q.effort_score, " 
@@ -214,10 +584,10 @@ class PostgresClient:
         "q.sports_hours, " 
         "q.peer_influence, " 
         "q.assessment_id "
-        "FROM stu_tracker.Pre_assessment_questionnaire q"
+        "FROM stu_tracker.Pre_assessment_questionnaire q "
         "LEFT JOIN stu_tracker.Assessments ast " 
-        "ON ast.id = q.assessment_id"
-        "WHERE student_id = %s")
+        "ON ast.id = q.assessment_id "
+        "WHERE q.student_id = %s")
         data_cursor = self.fetch_all(query, params)
         return [dict(row) for row in data_cursor]
     
@@ -237,6 +607,7 @@ class PostgresClient:
         return self.fetch_one(query, params)
 
     ## Can filter by semester_id
+    @cached("attendance")
     def get_student_attendance(self, student_id, semester_id: None):
 
         sql = [
@@ -266,6 +637,100 @@ class PostgresClient:
         else:
             return dict(cursor)
 
+    ## Cohort queries: the per-student report queries for a whole semester, with a student_id
+    ## column, ordered by student and then like the per-student queries (session_date DESC).
+    ## frame=True streams them through COPY into a DataFrame instead of a list of dicts.
+    def _cohort_filter(self, semester_column, student_column, semester_id, student_ids):
+        sql, params = [f"WHERE {semester_column} = %s"], [semester_id]
+        if student_ids is not None:
+            sql.append(f"AND {student_column} = ANY(%s)")
+            params.append(list(student_ids))
+        return sql, params
+
+    def get_cohort_assessments(self, semester_id, student_ids=None, frame=False):
+        filters, params = self._cohort_filter("ast.semester_id", "ast.student_id", semester_id, student_ids)
+        sql = [
+            """
+                SELECT 
+                    ast.student_id,
+                    ss.session_date,
+                    ast.score,
+                    asmt.max_score,
+                    asmt.subject_id,
+                    sj.title AS subject,
+                    asmt.pre,
+                    asmt.post,
+                    asmt.mid,
+                    asmt.alpha_identifier,
+                    asmt.title AS assessment_title
+                FROM stu_tracker.Assessments_students ast
+                LEFT JOIN stu_tracker.Sessions ss ON
+                    ss.id = ast.session_id
+                LEFT JOIN stu_tracker.Assessments asmt ON
+                    asmt.id = ast.assessment_id
+                LEFT JOIN stu_tracker.Subjects sj ON
+                    sj.id = asmt.subject_id
+            """
+        ] + filters
+        sql.append("ORDER BY ast.student_id, ss.session_date DESC, ast.id DESC;")
+        if frame:
+            return self.copy_frame(" ".join(sql), params)
+        return [dict(row) for row in self.fetch_all(" ".join(sql), params)]
+
+    def get_cohort_assessments_questionnaire(self, semester_id, student_ids=None, frame=False):
+        filters, params = self._cohort_filter("ast.semester_id", "ast.student_id", semester_id, student_ids)
+        sql = [
+            """
+                SELECT 
+                    ast.student_id,
+                    ss.session_date,
+                    ast.score,
+                    asmt.max_score,
+                    asmt.subject_id,
+                    asmt.title,
+                    paq.sleep_hours,
+                    paq.effort_score,
+                    paq.tutor_sessions,
+                    paq.sports_hours,
+                    paq.peer_influence,
+                    paq.study_hours,
+                    paq.id AS questionnaire_id,
+                    sj.title AS subject
+                FROM stu_tracker.Assessments_students ast
+                LEFT JOIN stu_tracker.Sessions ss ON
+                    ss.id = ast.session_id
+                LEFT JOIN stu_tracker.Assessments asmt ON
+                    asmt.id = ast.assessment_id
+                LEFT JOIN stu_tracker.Pre_assessment_questionnaire paq ON
+                    paq.id = ast.questionnaire_id
+                LEFT JOIN stu_tracker.Subjects sj ON
+                    sj.id = asmt.subject_id
+            """
+        ] + filters
+        sql.append("AND ast.questionnaire_id IS NOT NULL")
+        sql.append("ORDER BY ast.student_id, ss.session_date DESC, ast.id DESC;")
+        if frame:
+            return self.copy_frame(" ".join(sql), params)
+        return [dict(row) for row in self.fetch_all(" ".join(sql), params)]
+
+    def get_cohort_attendance(self, semester_id, student_ids=None, frame=False):
+        filters, params = self._cohort_filter("st.semester_id", "ss.student_id", semester_id, student_ids)
+        sql = [
+            """
+                SELECT
+                ss.student_id,
+                COUNT(*) AS total_sessions,
+                SUM( CASE WHEN NOT ss.absent THEN 1 ELSE 0 END) AS present,
+                SUM( CASE WHEN ss.absent THEN 1 ELSE 0 END) as absent
+                FROM stu_tracker.Session_students ss
+                LEFT JOIN stu_tracker.Sessions st ON st.id = ss.session_id
+            """
+        ] + filters
+        sql.append("GROUP BY ss.student_id;")
+        if frame:
+            return self.copy_frame(" ".join(sql), params)
+        return [dict(row) for row in self.fetch_all(" ".join(sql), params)]
+
     def update_event_queue(self, params):
         query = [
             """
@@ -275,11 +740,119 @@ class PostgresClient:
         ]
         
         q = " ".join(query) 
-        self.execute(q, params)
+        ## Setting the same status twice is harmless, so this can be retried
+        self.execute(q, params, idempotent=True)
     
+    @cached("subject")
     def get_subject_data(self, params):
         subject_query = "SELECT title, description FROM stu_tracker.Subjects WHERE organization_id = %s AND id = %s"
         return self.fetch_one(subject_query, params)
+
+    ## Invalidation hooks for the query cache
+    def invalidate_student(self, student_id, semester_id=None):
+        """Forget cached attendance and questionnaire rows after a student's data changed."""
+        cache = getattr(self, "cache", None)
+        if cache is None:
+            return
+        student_id, semester_id = cache_key((student_id, semester_id))
+        ## The whole-history attendance (semester None) covers every semester
+        cache.invalidate("attendance", lambda key: key[0] == student_id
+                         and (semester_id is None or key[1] in (semester_id, None)))
+        ## get_student_questionnaire is keyed by its single params argument
+        cache.invalidate("questionnaire", lambda key: bool(key) and _leading_id(key[0]) == student_id)
+
+    def invalidate_subjects(self):
+        cache = getattr(self, "cache", None)
+        if cache is not None:
+            cache.invalidate("subject")
+
+    ## Feature store (stu_tracker.Student_features, see Migrations/features.py): one primary-key read
+    def get_student_features(self, student_id, semester_id):
+        query = """
+            SELECT total_sessions, present, absent, assessments, questionnaire
+            FROM stu_tracker.Student_features
+            WHERE student_id = %s AND semester_id = %s
+        """
+        row = self.fetch_one(query, (student_id, semester_id))
+        if row is None:
+            return None
+        return dict(row)
+
+    ## Precomputed reports (stu_tracker.Precomputed_report, see Migrations/precompute.py)
+    def get_precomputed_report(self, student_id, semester_id):
+        """S3 key of the precomputed report if no input changed since it was computed, else None."""
+        if semester_id is None:
+            return None
+        query = """
+            SELECT s3_key FROM stu_tracker.Precomputed_report
+            WHERE student_id = %s AND semester_id = %s AND computed_version = version
+        """
+        row = self.fetch_one(query, (student_id, semester_id))
+        return row["s3_key"] if row is not None else None
+
+    def get_report_version(self, student_id, semester_id):
+        query = "SELECT version FROM stu_tracker.Precomputed_report WHERE student_id = %s AND semester_id = %s"
+        row = self.fetch_one(query, (student_id, semester_id))
+        return row["version"] if row is not None else None
+
+    def save_precomputed_report(self, student_id, semester_id, s3_key, version):
+        query = """
+            UPDATE stu_tracker.Precomputed_report
+            SET s3_key = %s, computed_version = %s, computed_at = now()
+            WHERE student_id = %s AND semester_id = %s
+        """
+        self.execute(query, (s3_key, version, student_id, semester_id), idempotent=True)
+
+    def get_stale_precomputed_reports(self, limit=10000):
+        query = """
+            SELECT student_id, semester_id FROM stu_tracker.Precomputed_report
+            WHERE computed_version IS DISTINCT FROM version
+            ORDER BY changed_at
+            LIMIT %s
+        """
+        return self.fetch_all(query, (limit,))
+
+    def listen(self, channel):
+        """LISTEN on `channel`; the subscription is renewed whenever the connection is re-established."""
+        self.channels = getattr(self, "channels", set()) | {channel}
+        self.execute(f"LISTEN {channel};", idempotent=True)
+
+    def wait_notifications(self, timeout) -> list:
+        """Payloads of NOTIFYs on the LISTENed channels, waiting up to `timeout` seconds for the first."""
+        def run():
+            if not self.conn or self.conn.closed:
+                self._connect()
+            if not self.conn.notifies:
+                select.select([self.conn], [], [], timeout)
+            self.conn.poll()
+            payloads = [notify.payload for notify in self.conn.notifies]
+            del self.conn.notifies[:]
+            return payloads
+        return self._with_retry(run, POSTGRES_RETRIES)
+
+    ## Report pipeline checkpoints (stu_tracker.Report_checkpoint, see Migrations/main.py)
+    def save_checkpoint(self, checkpoint_key, stage, artifact: bytes):
+        query = """
+            INSERT INTO stu_tracker.Report_checkpoint (checkpoint_key, stage, artifact, saved_at)
+            VALUES (%s, %s, %s, now())
+            ON CONFLICT (checkpoint_key) DO UPDATE
+            SET stage = EXCLUDED.stage, artifact = EXCLUDED.artifact, saved_at = EXCLUDED.saved_at
+        """
+        self.execute(query, (checkpoint_key, stage, psycopg2.Binary(artifact)), idempotent=True)
+
+    def load_checkpoint(self, checkpoint_key, max_age_seconds):
+        query = """
+            SELECT stage, artifact FROM stu_tracker.Report_checkpoint
+            WHERE checkpoint_key = %s AND saved_at > now() - %s * interval '1 second'
+        """
+        row = self.fetch_one(query, (checkpoint_key, max_age_seconds))
+        if row is None:
+            return None
+        return {"stage": row["stage"], "artifact": bytes(row["artifact"])}
+
+    def clear_checkpoint(self, checkpoint_key):
+        query = "DELETE FROM stu_tracker.Report_checkpoint WHERE checkpoint_key = %s"
+        self.execute(query, (checkpoint_key,), idempotent=True)
             
     def close(self):
         if self.conn and not self.conn.closed:
@@ -0,0 +1,65 @@
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class PostgresPool:
+    """
+        Up to `size` PostgresClient connections shared between threads. Connections are opened
+        on first demand and handed out one thread at a time; client() blocks while all of them
+        are busy. Each client keeps its own reconnect and retry handling, and all of them use
+        `cache` (the consumer's query cache) when one is given.
+    """
+
+    def __init__(self, size, factory=None, cache=None):
+        if factory is None:
+            from Config.PostgresClient import PostgresClient
+            factory = PostgresClient
+        self.size = max(1, size)
+        self.factory = factory
+        self.cache = cache
+        self.available = queue.LifoQueue()
+        self.clients = []
+        self.lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self.available.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            create = len(self.clients) < self.size
+            if create:
+                ## Reserve the slot before connecting so concurrent callers do not overshoot size
+                self.clients.append(None)
+        if not create:
+            return self.available.get()
+        try:
+            db = self.factory()
+        except Exception:
+            with self.lock:
+                self.clients.remove(None)
+            raise
+        if self.cache is not None:
+            db.cache = self.cache
+        with self.lock:
+            self.clients[self.clients.index(None)] = db
+        logger.info(f"Opened pooled Postgres connection {len(self.clients)}/{self.size}")
+        return db
+
+    @contextmanager
+    def client(self):
+        db = self._acquire()
+        try:
+            yield db
+        finally:
+            self.available.put(db)
+
+    def close(self):
+        with self.lock:
+            clients, self.clients = [db for db in self.clients if db is not None], []
+        for db in clients:
+            db.close()
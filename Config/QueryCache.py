@@ -0,0 +1,143 @@
+import copy
+import time
+import threading
+import functools
+from collections import OrderedDict
+from Config.Metrics import metrics
+
+
+class _Flight:
+    """One in-progress load that concurrent readers of the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.stale = False
+
+
+class QueryCache:
+    """
+        Read-through cache for slow-changing query results, shared by the threads of one process.
+
+        Entries live for the TTL of their query name (`ttls`, else `default_ttl`; 0 disables
+        caching for that name) and the least recently used entry is evicted beyond `maxsize`.
+        Concurrent misses on the same key run the query once and share its result. An
+        invalidation during a load keeps that load's result out of the cache. Values are
+        returned as copies so callers cannot modify the cached rows.
+
+        Metrics per name: cache.<name>.hits, .misses, .coalesced (waited on another thread's
+        load) and .evictions.
+    """
+
+    def __init__(self, maxsize=10000, ttls=None, default_ttl=60.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        ## (name, key) -> (expires_at, value), least recently used first
+        self.entries = OrderedDict()
+        self.loading = {}
+
+    def ttl(self, name) -> float:
+        return self.ttls.get(name, self.default_ttl)
+
+    def get(self, name, key, load):
+        """The cached value of (name, key), or load() it once and cache it."""
+        ttl = self.ttl(name)
+        if ttl <= 0 or self.maxsize <= 0:
+            return load()
+        entry_key = (name, key)
+        with self.lock:
+            entry = self.entries.get(entry_key)
+            if entry is not None:
+                if entry[0] > self.clock():
+                    self.entries.move_to_end(entry_key)
+                    metrics.inc(f"cache.{name}.hits")
+                    return copy.deepcopy(entry[1])
+                del self.entries[entry_key]
+            flight = self.loading.get(entry_key)
+            leader = flight is None
+            if leader:
+                flight = self.loading[entry_key] = _Flight()
+
+        if not leader:
+            metrics.inc(f"cache.{name}.coalesced")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.value)
+
+        metrics.inc(f"cache.{name}.misses")
+        try:
+            value = load()
+        except BaseException as e:
+            flight.error = e
+            with self.lock:
+                self.loading.pop(entry_key, None)
+            flight.done.set()
+            raise
+        flight.value = value
+        with self.lock:
+            self.loading.pop(entry_key, None)
+            if not flight.stale:
+                self.entries[entry_key] = (self.clock() + ttl, value)
+                self.entries.move_to_end(entry_key)
+                while len(self.entries) > self.maxsize:
+                    (evicted, _), _ = self.entries.popitem(last=False)
+                    metrics.inc(f"cache.{evicted}.evictions")
+        flight.done.set()
+        return copy.deepcopy(value)
+
+    def invalidate(self, name, match=None) -> int:
+        """
+            Drop the entries of `name` whose key satisfies match(key) (all of them without
+            `match`) and keep in-flight loads of those keys from being cached.
+        """
+        with self.lock:
+            keys = [k for k in self.entries if k[0] == name and (match is None or match(k[1]))]
+            for key in keys:
+                del self.entries[key]
+            for (flight_name, key), flight in self.loading.items():
+                if flight_name == name and (match is None or match(key)):
+                    flight.stale = True
+        return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            for flight in self.loading.values():
+                flight.stale = True
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def cache_key(value):
+    """
+        `value` as a cache key: lists become tuples and integer strings become ints, so a
+        request sending "42" shares (and loses on invalidation) the entries of student 42.
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(cache_key(v) for v in value)
+    if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        return int(value)
+    return value
+
+
+def cached(name):
+    """
+        Cache a PostgresClient method in self.cache under `name`, keyed by its positional
+        arguments (see cache_key). Clients without a cache run the query directly.
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args):
+            cache = getattr(self, "cache", None)
+            if cache is None:
+                return method(self, *args)
+            key = cache_key(args)
+            return cache.get(name, key, lambda: method(self, *args))
+        return wrapper
+    return decorate
@@ -0,0 +1,116 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from Config.Environment import load_environment
+from Config.Metrics import Histogram
+
+logger = logging.getLogger(__name__)
+load_environment()
+
+## Calls slower than this many seconds have their parameters and EXPLAIN plan captured (0 disables)
+POSTGRES_SLOW_QUERY_SECONDS = float(os.getenv("POSTGRES_SLOW_QUERY_SECONDS", "1.0"))
+## At most one EXPLAIN per query name per interval, so a slow database is not loaded further
+POSTGRES_EXPLAIN_INTERVAL   = float(os.getenv("POSTGRES_EXPLAIN_INTERVAL", "60"))
+## Slow calls kept for the dump, most recent last
+POSTGRES_SLOW_QUERY_KEEP    = int(os.getenv("POSTGRES_SLOW_QUERY_KEEP", "50"))
+
+
+def row_bytes(rows) -> int:
+    """Size of the rows as text, which is close to what the text protocol sent over the wire."""
+    total = 0
+    for row in rows:
+        for value in (row.values() if isinstance(row, dict) else row):
+            if value is not None:
+                total += len(value) if isinstance(value, (str, bytes, memoryview)) else len(str(value))
+    return total
+
+
+class QueryStats:
+    """
+        Per query name (the PostgresClient method that issued it): calls, errors, rows, bytes
+        and a latency histogram, plus the most recent slow calls with their parameters and plan.
+    """
+
+    def __init__(self, slow_seconds=POSTGRES_SLOW_QUERY_SECONDS, explain_interval=POSTGRES_EXPLAIN_INTERVAL,
+                 keep=POSTGRES_SLOW_QUERY_KEEP, clock=time.monotonic):
+        self.slow_seconds = slow_seconds
+        self.explain_interval = explain_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.queries = {}
+        self.slow = deque(maxlen=keep)
+        self.explained_at = {}
+
+    def record(self, name, seconds, rows=0, nbytes=0, error=None):
+        with self._lock:
+            stats = self.queries.get(name)
+            if stats is None:
+                stats = self.queries[name] = {"calls": 0, "errors": 0, "rows": 0, "bytes": 0, "latency": Histogram()}
+            stats["calls"] += 1
+            stats["rows"] += rows
+            stats["bytes"] += nbytes
+            stats["latency"].observe(seconds)
+            if error is not None:
+                stats["errors"] += 1
+                stats["last_error"] = repr(error)
+
+    def is_slow(self, seconds) -> bool:
+        return 0 < self.slow_seconds <= seconds
+
+    def should_explain(self, name) -> bool:
+        now = self.clock()
+        with self._lock:
+            last = self.explained_at.get(name)
+            if last is not None and now - last < self.explain_interval:
+                return False
+            self.explained_at[name] = now
+            return True
+
+    def capture(self, name, seconds, query, params, plan=None):
+        entry = {
+            "name": name,
+            "seconds": round(seconds, 6),
+            "at": time.time(),
+            "query": " ".join(query.split()),
+            "params": json.loads(json.dumps(params, default=str)),
+            "plan": plan,
+        }
+        with self._lock:
+            self.slow.append(entry)
+        logger.warning(f"Slow query {name}: {seconds:.3f}s params={entry['params']}")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "timestamp": time.time(),
+                "queries": {
+                    name: {**{k: v for k, v in stats.items() if k != "latency"}, "latency": stats["latency"].as_dict()}
+                    for name, stats in self.queries.items()
+                },
+                "slow_queries": list(self.slow),
+            }
+
+    def reset(self):
+        with self._lock:
+            self.queries.clear()
+            self.slow.clear()
+            self.explained_at.clear()
+
+    def dump(self, path=None) -> dict:
+        """Log the snapshot and, when `path` (or QUERY_STATS_FILE) is set, write it there as JSON."""
+        snapshot = self.snapshot()
+        path = path or os.getenv("QUERY_STATS_FILE")
+        if path:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as file:
+                json.dump(snapshot, file)
+            os.replace(tmp_path, path)
+        logger.info(f"Query stats: {json.dumps(snapshot)}")
+        return snapshot
+
+
+## Process-wide statistics of every PostgresClient
+query_stats = QueryStats()
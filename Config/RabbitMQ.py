@@ -1,22 +1,15 @@
 
 import os
+import time
 import logging
-import json
 import pika
-import psycopg2
-from dotenv import load_dotenv
-import boto3
 import ssl
+from Config.Environment import load_environment
+from Config.Metrics import metrics
+from Config.Retry import jittered_backoff
 
-load_dotenv()  # loads variables from .env
+load_environment()  # loads variables from .env
 
-# --- 1. Set up basic logging to stdout ---
-# This ensures that all log messages from your script and libraries
-# like pika will be captured by the ECS awslogs driver.
-logging.basicConfig(
-    level=logging.INFO, # You can set this to logging.DEBUG for more detail
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 # --- Configure Pika's logging to be verbose ---
@@ -26,46 +19,70 @@ pika_logger = logging.getLogger('pika')
 pika_logger.setLevel(logging.INFO)
 
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST")
-RABBITMQ_PORT = int(os.getenv("RABBITMQ_PORT"))
+RABBITMQ_PORT = int(os.getenv("RABBITMQ_PORT", "5672"))
 RABBITMQ_USER = os.getenv("RABBITMQ_USER")
 RABBITMQ_PASS = os.getenv("RABBITMQ_PASS")
 RABBIT_LOCAL  = os.getenv("RABBIT_LOCAL")
-s3 = boto3.client('s3')
+
+RABBITMQ_HEARTBEAT = int(os.getenv("RABBITMQ_HEARTBEAT", "60"))
+## Reconnect attempts before giving up and letting the task die (0 = retry forever)
+RABBITMQ_RECONNECT_ATTEMPTS = int(os.getenv("RABBITMQ_RECONNECT_ATTEMPTS", "0"))
+
+## Connection or channel failures the consumer recovers from by reconnecting in-process
+RECOVERABLE_ERRORS = (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError)
+
+## Header counting how many times a message went through `<queue>.retry`
+RETRY_HEADER = "x-retry-count"
+
+## Exchange type of the rabbitmq_consistent_hash_exchange plugin
+CONSISTENT_HASH = "x-consistent-hash"
 
 credentials = pika.PlainCredentials(RABBITMQ_USER, RABBITMQ_PASS)
+
+
+def retry_count(properties) -> int:
+    headers = getattr(properties, "headers", None) or {}
+    return int(headers.get(RETRY_HEADER, 0))
+
+
+def retry_properties(properties, attempt) -> pika.BasicProperties:
+    """Copy of a delivery's properties for republishing, with the retry counter set to `attempt`."""
+    headers = dict(getattr(properties, "headers", None) or {})
+    headers[RETRY_HEADER] = attempt
+    return pika.BasicProperties(
+        headers=headers,
+        priority=getattr(properties, "priority", None),
+        timestamp=getattr(properties, "timestamp", None),
+        content_type=getattr(properties, "content_type", None),
+        correlation_id=getattr(properties, "correlation_id", None),
+        delivery_mode=2,
+    )
+
+
+def expired_from_shard(properties) -> bool:
+    """True for a message dead-lettered by the TTL of a shard queue nobody consumed."""
+    deaths = (getattr(properties, "headers", None) or {}).get("x-death") or []
+    ## The broker keeps the most recent death first
+    return bool(deaths) and deaths[0].get("reason") == "expired" and ".shard." in str(deaths[0].get("queue", ""))
+
 class RabbitMQ:
-    def __init__(self, prefetch_count, exchange, queue, routing_key, exchange_type):
+    def __init__(self, prefetch_count, exchange, queue, routing_key, exchange_type, max_priority=None):
+        self.queue = queue
+        self.exchange = exchange
+        self.exchange_type = exchange_type
+        self.prefetch_count = prefetch_count
+        ## Everything declared or registered is recorded so reconnect() can replay it
+        self.queues = [(queue, routing_key, max_priority)]
+        self.retry_delay_ms = None
+        ## (shard exchange, shard queue, weight, message ttl) once enable_sharding() was called
+        self.shard = None
+        self.consumers = []
+        self.channel_prefetch = None
+        self.timers = []
+        self.connection = None
+        self.channel = None
         try:
-            logger.info(f"Attempting to connect to RabbitMQ at host: {RABBITMQ_HOST}:{RABBITMQ_PORT}")
-            params = None
-            self.queue = queue
-            if RABBIT_LOCAL == str(1) or RABBIT_LOCAL == 1:
-                params = pika.ConnectionParameters(
-                    host=RABBITMQ_HOST, 
-                    port=RABBITMQ_PORT, 
-                    credentials=credentials, 
-                    heartbeat=60, 
-                    blocked_connection_timeout=30
-                )
-            else:
-                ssl_context = ssl.create_default_context()
-                params = pika.ConnectionParameters(
-                    host=RABBITMQ_HOST, 
-                    port=RABBITMQ_PORT,
-                    virtual_host="/",
-                    credentials=credentials, 
-                    heartbeat=60, 
-                    blocked_connection_timeout=30,
-                    ssl_options=pika.SSLOptions(context=ssl_context)
-                )
-            self.connection = pika.BlockingConnection(params)
-            logger.info("Successfully established connection to RabbitMQ.")
-            self.channel = self.connection.channel()
-            self.channel.exchange_declare(exchange=exchange, exchange_type=exchange_type, durable=True)
-            self.channel.queue_declare(queue=queue, durable=True)
-            self.channel.queue_bind(exchange=exchange, queue=queue, routing_key=routing_key)
-            self.channel.basic_qos(prefetch_count=prefetch_count)
-            logger.info(f"RabbitMQ channel and queue '{self.queue}' configured successfully.")
+            self._connect()
         except pika.exceptions.AMQPConnectionError as e:
             logger.error(f"Failed to connect to RabbitMQ: {e}")
             raise # Re-raise the exception to terminate the task if connection fails
@@ -73,9 +90,238 @@ class RabbitMQ:
             logger.exception("An unexpected error occurred during RabbitMQ setup.")
             raise
 
+    def _connection_params(self):
+        if RABBIT_LOCAL == str(1) or RABBIT_LOCAL == 1:
+            return pika.ConnectionParameters(
+                host=RABBITMQ_HOST, 
+                port=RABBITMQ_PORT, 
+                credentials=credentials, 
+                heartbeat=RABBITMQ_HEARTBEAT, 
+                blocked_connection_timeout=30
+            )
+        ssl_context = ssl.create_default_context()
+        return pika.ConnectionParameters(
+            host=RABBITMQ_HOST, 
+            port=RABBITMQ_PORT,
+            virtual_host="/",
+            credentials=credentials, 
+            heartbeat=RABBITMQ_HEARTBEAT, 
+            blocked_connection_timeout=30,
+            ssl_options=pika.SSLOptions(context=ssl_context)
+        )
+
+    def _connect(self):
+        """Open the connection and channel and (re)declare the exchange, queues, bindings and QoS."""
+        logger.info(f"Attempting to connect to RabbitMQ at host: {RABBITMQ_HOST}:{RABBITMQ_PORT}")
+        self.connection = pika.BlockingConnection(self._connection_params())
+        logger.info("Successfully established connection to RabbitMQ.")
+        self.channel = self.connection.channel()
+        self.channel.exchange_declare(exchange=self.exchange, exchange_type=self.exchange_type, durable=True)
+        for queue, routing_key, max_priority in self.queues:
+            self._declare_queue(queue, routing_key, max_priority)
+        if self.shard is not None:
+            self._declare_shard()
+        if self.retry_delay_ms is not None:
+            self._declare_retry_queues()
+        self.channel.basic_qos(prefetch_count=self.prefetch_count)
+        if self.channel_prefetch is not None:
+            self.channel.basic_qos(prefetch_count=self.channel_prefetch, global_qos=True)
+        for queue, callback_ in self.consumers:
+            self.channel.basic_consume(queue=queue, on_message_callback=callback_)
+        for interval, fn in self.timers:
+            self._arm_timer(interval, fn)
+        logger.info(f"RabbitMQ channel and queue '{self.queue}' configured successfully.")
+
+    def reconnect(self):
+        """
+            Re-establish the connection after a failure, with jittered exponential backoff.
+            Declarations, QoS, consumers and recurring timers are restored; unacked deliveries
+            from the old channel are redelivered by the broker.
+        """
+        started = time.perf_counter()
+        metrics.inc("rabbitmq.disconnects")
+        try:
+            if self.connection is not None and self.connection.is_open:
+                self.connection.close()
+        except Exception:
+            logger.debug("Ignoring error while closing the broken RabbitMQ connection", exc_info=True)
+
+        attempt = 0
+        while True:
+            delay = jittered_backoff(attempt)
+            logger.warning(f"Reconnecting to RabbitMQ in {delay:.2f}s (attempt {attempt + 1})")
+            time.sleep(delay)
+            try:
+                self._connect()
+                break
+            except RECOVERABLE_ERRORS as e:
+                attempt += 1
+                logger.error(f"RabbitMQ reconnect attempt {attempt} failed: {e}")
+                if RABBITMQ_RECONNECT_ATTEMPTS and attempt >= RABBITMQ_RECONNECT_ATTEMPTS:
+                    raise
+        recovery = time.perf_counter() - started
+        metrics.inc("rabbitmq.reconnects")
+        metrics.observe("rabbitmq.recovery_seconds", recovery)
+        logger.info(f"RabbitMQ connection recovered in {recovery:.2f}s")
+
+    def _declare_queue(self, queue, routing_key, max_priority=None):
+        arguments = {"x-max-priority": int(max_priority)} if max_priority else None
+        self.channel.queue_declare(queue=queue, durable=True, arguments=arguments)
+        self.channel.queue_bind(exchange=self.exchange, queue=queue, routing_key=routing_key)
+
+    def _declare_retry_queues(self):
+        for queue, routing_key, max_priority in self.queues:
+            arguments = {
+                "x-message-ttl": int(self.retry_delay_ms),
+                "x-dead-letter-exchange": self.exchange,
+                "x-dead-letter-routing-key": routing_key,
+            }
+            self.channel.queue_declare(queue=f"{queue}.retry", durable=True, arguments=arguments)
+            self.channel.queue_declare(queue=f"{queue}.dead", durable=True)
+
+    def _declare_shard(self):
+        exchange, queue, weight, message_ttl_ms = self.shard
+        _, routing_key, max_priority = self.queues[0]
+        self.channel.exchange_declare(exchange=exchange, exchange_type=CONSISTENT_HASH, durable=True)
+        ## Messages left behind by a worker that stopped without leave_shard() expire back to the
+        ## main queue, where a running worker picks them up (see expired_from_shard)
+        arguments = {
+            "x-message-ttl": int(message_ttl_ms),
+            "x-dead-letter-exchange": self.exchange,
+            "x-dead-letter-routing-key": routing_key,
+        }
+        if max_priority:
+            arguments["x-max-priority"] = int(max_priority)
+        self.channel.queue_declare(queue=queue, durable=True, arguments=arguments)
+        ## For a consistent-hash exchange the binding key is the queue's weight on the ring
+        self.channel.queue_bind(exchange=exchange, queue=queue, routing_key=str(weight))
+
+    def _arm_timer(self, interval, fn):
+        connection = self.connection
+
+        def fire():
+            try:
+                fn()
+            finally:
+                ## Timers belong to a connection; stop re-arming once it has been replaced
+                if connection is self.connection and connection.is_open:
+                    connection.call_later(interval, fire)
+
+        connection.call_later(interval, fire)
+
+    def call_every(self, interval, fn):
+        """Run fn every `interval` seconds on the consumer thread; survives reconnects."""
+        self.timers.append((interval, fn))
+        self._arm_timer(interval, fn)
+
+    def call_later(self, delay, fn):
+        """One-off timer on the current connection."""
+        self.connection.call_later(delay, fn)
+
+    def add_queue(self, queue, routing_key, max_priority=None):
+        """
+            Declare a durable queue bound to the exchange. `max_priority` enables AMQP message
+            priorities (x-max-priority); it cannot be changed on an existing queue.
+        """
+        self.queues.append((queue, routing_key, max_priority))
+        self._declare_queue(queue, routing_key, max_priority)
+
+    def declare_retry_queues(self, delay_ms):
+        """
+            Declare `<queue>.retry` and `<queue>.dead` for every consumed queue. A message
+            published to `<queue>.retry` waits `delay_ms` and is then dead-lettered back to
+            the exchange with the queue's routing key; `<queue>.dead` holds messages that
+            exhausted their retries for inspection or manual replay.
+        """
+        self.retry_delay_ms = delay_ms
+        self._declare_retry_queues()
+
+    def retry_queues(self, routing_key):
+        """(retry queue, dead queue) for messages delivered with `routing_key`."""
+        for queue, key, _ in self.queues:
+            if key == routing_key:
+                return f"{queue}.retry", f"{queue}.dead"
+        return f"{self.queue}.retry", f"{self.queue}.dead"
+
+    def enable_sharding(self, worker_id, weight=1, message_ttl_ms=60000) -> str:
+        """
+            Join the student-affinity ring and return this worker's shard queue.
+
+            `<exchange>.shard` is a consistent-hash exchange (rabbitmq_consistent_hash_exchange
+            plugin) that hashes the routing key, the student_id, onto the bound queues. Each
+            worker binds `<queue>.shard.<worker_id>` with `weight` points on the ring, so a
+            worker joining or leaving only moves about 1/n of the students. Worker ids should be
+            stable across restarts: a restarted worker takes its queue back. Queue arguments are
+            fixed at declaration, so changing `message_ttl_ms` needs the queue deleted first.
+        """
+        queue = f"{self.queue}.shard.{worker_id}"
+        self.shard = (f"{self.exchange}.shard", queue, weight, message_ttl_ms)
+        self._declare_shard()
+        return queue
+
+    def route_to_shard(self, key, body, properties=None):
+        """Publish to the worker that owns `key` on the ring."""
+        self.publish(str(key), body, properties, exchange=self.shard[0])
+
+    def leave_shard(self) -> int:
+        """
+            Leave the ring before shutting down: unbind the shard queue so its students hash to
+            the remaining workers, re-publish what is still queued there and delete the queue.
+            The consuming channel is closed first so its unacked deliveries return to the queue.
+            Returns the number of messages handed over.
+        """
+        if self.shard is None:
+            return 0
+        exchange, queue, weight, _ = self.shard
+        self.shard = None
+        self.consumers = [(q, callback_) for q, callback_ in self.consumers if q != queue]
+        if self.channel.is_open:
+            self.channel.close()
+        self.channel = self.connection.channel()
+        self.channel.confirm_delivery()
+        self.channel.queue_unbind(queue=queue, exchange=exchange, routing_key=str(weight))
+        moved = 0
+        while True:
+            method, properties, body = self.channel.basic_get(queue=queue)
+            if method is None:
+                break
+            ## Routing keys in a shard queue are the student ids, so they re-hash to the new owners
+            self.channel.basic_publish(exchange=exchange, routing_key=method.routing_key, body=body,
+                                       properties=properties)
+            self.channel.basic_ack(delivery_tag=method.delivery_tag)
+            moved += 1
+        metrics.inc("rabbitmq.shard_handoffs", moved)
+        try:
+            self.channel.queue_delete(queue=queue, if_empty=True)
+        except pika.exceptions.ChannelClosedByBroker as e:
+            ## A message routed before the unbind took effect; the queue TTL returns it to the main queue
+            logger.warning(f"Shard queue {queue} not deleted: {e}")
+        logger.info(f"Left the shard ring, handed {moved} messages from {queue} to the remaining workers")
+        return moved
+
+    def publish(self, routing_key, body, properties=None, exchange=""):
+        """Publish on the consumer channel; the default exchange routes straight to a queue name."""
+        self.channel.basic_publish(exchange=exchange, routing_key=routing_key, body=body, properties=properties)
+
+    def set_callback(self, callback_, queue=None):
+        self.consumers.append((queue or self.queue, callback_))
+        self.channel.basic_consume(queue=queue or self.queue, on_message_callback=callback_)
+
+    def set_prefetch(self, prefetch_count, global_qos=True):
+        """
+            Change prefetch at runtime. A per-channel (global) limit applies to existing consumers
+            immediately, while per-consumer limits only apply to consumers registered afterwards.
+        """
+        if global_qos:
+            self.channel_prefetch = prefetch_count
+        else:
+            self.prefetch_count = prefetch_count
+        self.channel.basic_qos(prefetch_count=prefetch_count, global_qos=global_qos)
 
-    def set_callback(self, callback_):
-        self.channel.basic_consume(queue=self.queue, on_message_callback=callback_)
+    def queue_depth(self, queue=None) -> int:
+        """Messages ready in the broker queue (passive declare, does not create the queue)."""
+        result = self.channel.queue_declare(queue=queue or self.queue, passive=True)
+        return result.method.message_count
 
     def get_connection(self)->pika.BlockingConnection:
         return self.connection
@@ -0,0 +1,6 @@
+import random
+
+
+def jittered_backoff(attempt, base=0.5, cap=30.0, rng=random.random) -> float:
+    """Seconds to wait before retry `attempt` (0-based): full jitter over an exponential ceiling."""
+    return rng() * min(cap, base * (2 ** attempt))
@@ -0,0 +1,67 @@
+import os
+import mmap
+import pickle
+import struct
+import tempfile
+
+## File layout: magic, skeleton length, buffer count, (offset, length) per buffer, skeleton, buffers
+MAGIC = b"PGRSHM01"
+HEADER = struct.Struct("<8sQI")
+BUFFER_ENTRY = struct.Struct("<QQ")
+## Buffers start on cache-line boundaries so numpy never sees a misaligned array
+ALIGNMENT = 64
+
+
+def _aligned(offset) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_shared(obj, path):
+    """
+        Pickle `obj` (protocol 5) with its numpy arrays out of band, each copied once into the
+        file after the pickled skeleton. Written through a temporary file of its own and
+        renamed, so processes that mapped the previous version keep it, and processes publishing
+        the same path at once each rename a complete file.
+    """
+    buffers = []
+    skeleton = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+    offset = _aligned(HEADER.size + BUFFER_ENTRY.size * len(raws) + len(skeleton))
+    entries = []
+    for raw in raws:
+        entries.append((offset, raw.nbytes))
+        offset = _aligned(offset + raw.nbytes)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".",
+                                    suffix=".tmp")
+    try:
+        ## mkstemp creates it private; other workers' users must still be able to map it
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, "wb") as file:
+            file.write(HEADER.pack(MAGIC, len(skeleton), len(raws)))
+            for entry in entries:
+                file.write(BUFFER_ENTRY.pack(*entry))
+            file.write(skeleton)
+            for (start, _), raw in zip(entries, raws):
+                file.write(b"\0" * (start - file.tell()))
+                file.write(raw)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_shared(path):
+    """
+        The object written by write_shared. Its numpy arrays are read-only views of the mapped
+        file: every process reading the same file shares those pages through the page cache.
+    """
+    with open(path, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    magic, skeleton_size, count = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a shared object file")
+    entries = [BUFFER_ENTRY.unpack_from(view, HEADER.size + BUFFER_ENTRY.size * index) for index in range(count)]
+    start = HEADER.size + BUFFER_ENTRY.size * count
+    buffers = [view[offset:offset + size] for offset, size in entries]
+    return pickle.loads(view[start:start + skeleton_size], buffers=buffers)
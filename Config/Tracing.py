@@ -0,0 +1,353 @@
+import os
+import re
+import json
+import time
+import queue
+import random
+import atexit
+import logging
+import threading
+import contextvars
+from collections import namedtuple, OrderedDict
+from contextlib import contextmanager
+from urllib import request as urllib_request
+from Config.Metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+## W3C trace context headers, carried in the AMQP message headers
+TRACEPARENT = "traceparent"
+TRACESTATE = "tracestate"
+TRACEPARENT_FORMAT = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-.*)?$")
+## OTLP span kinds
+INTERNAL, SERVER, CLIENT, PRODUCER, CONSUMER = 1, 2, 3, 4, 5
+## Longest db.statement attribute kept on a span
+MAX_STATEMENT = 2048
+
+## Identity of a span: 32 and 16 lowercase hex digits, whether the trace is sampled, vendor state
+SpanContext = namedtuple("SpanContext", ["trace_id", "span_id", "sampled", "tracestate"], defaults=(True, None))
+
+## The span open on this thread (or task), if any
+_current = contextvars.ContextVar("span", default=None)
+_tracer = None
+
+
+def parse_traceparent(value, tracestate=None):
+    """SpanContext of a traceparent header ("00-<trace id>-<parent id>-<flags>"), or None if it is invalid."""
+    if isinstance(value, bytes):
+        value = value.decode("ascii", "replace")
+    match = TRACEPARENT_FORMAT.match(value.strip().lower()) if isinstance(value, str) else None
+    if match is None:
+        return None
+    version, trace_id, span_id, flags, rest = match.groups()
+    if version == "ff" or (version == "00" and rest) or set(trace_id) == {"0"} or set(span_id) == {"0"}:
+        return None
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & 1), tracestate)
+
+
+def _random_id(size) -> str:
+    return random.getrandbits(size * 8).to_bytes(size, "big").hex()
+
+
+def format_traceparent(context) -> str:
+    return f"00-{context.trace_id}-{context.span_id}-{'01' if context.sampled else '00'}"
+
+
+def extract(properties):
+    """The publisher's SpanContext from a delivery's AMQP headers, or None."""
+    headers = getattr(properties, "headers", None) or {}
+    value = headers.get(TRACEPARENT)
+    if not value:
+        return None
+    tracestate = headers.get(TRACESTATE)
+    if isinstance(tracestate, bytes):
+        tracestate = tracestate.decode("ascii", "replace")
+    return parse_traceparent(value, tracestate)
+
+
+def inject(headers=None) -> dict:
+    """A copy of `headers` with the current span as traceparent, for messages published under it."""
+    headers = dict(headers or {})
+    span = _current.get()
+    if span is not None:
+        headers[TRACEPARENT] = format_traceparent(span.context)
+        if span.context.tracestate:
+            headers[TRACESTATE] = span.context.tracestate
+    return headers
+
+
+class Span:
+    """One timed operation. Attributes can be added until end(); only sampled spans are exported."""
+
+    def __init__(self, name, context, parent_id=None, kind=INTERNAL, attributes=None, links=()):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.links = [link for link in links if link is not None]
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def end(self, error=None):
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.end_ns = time.time_ns()
+
+    @property
+    def seconds(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+
+def _attribute(key, value) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def otlp_json(spans, service) -> dict:
+    """`spans` as an OTLP/JSON ExportTraceServiceRequest (what collectors accept on /v1/traces)."""
+    encoded = []
+    for span in spans:
+        entry = {
+            "traceId": span.context.trace_id,
+            "spanId": span.context.span_id,
+            "name": span.name,
+            "kind": span.kind,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns or span.start_ns),
+            "attributes": [_attribute(key, value) for key, value in span.attributes.items() if value is not None],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+        }
+        if span.parent_id:
+            entry["parentSpanId"] = span.parent_id
+        if span.context.tracestate:
+            entry["traceState"] = span.context.tracestate
+        if span.links:
+            entry["links"] = [{"traceId": link.trace_id, "spanId": link.span_id} for link in span.links]
+        encoded.append(entry)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [_attribute("service.name", service)]},
+        "scopeSpans": [{"scope": {"name": "pg_reports"}, "spans": encoded}],
+    }]}
+
+
+class FileExporter:
+    """Appends one OTLP/JSON request per batch and line (the collector's otlpjsonfile receiver reads it)."""
+
+    def __init__(self, path, service):
+        self.path = path
+        self.service = service
+
+    def __call__(self, spans):
+        with open(self.path, "a") as file:
+            file.write(json.dumps(otlp_json(spans, self.service)) + "\n")
+
+
+class OtlpHttpExporter:
+    """POSTs batches to an OpenTelemetry collector's OTLP/HTTP endpoint (e.g. http://localhost:4318/v1/traces)."""
+
+    def __init__(self, endpoint, service, timeout=2.0):
+        self.endpoint = endpoint
+        self.service = service
+        self.timeout = timeout
+
+    def __call__(self, spans):
+        body = json.dumps(otlp_json(spans, self.service)).encode()
+        http_request = urllib_request.Request(self.endpoint, data=body, method="POST",
+                                              headers={"Content-Type": "application/json"})
+        with urllib_request.urlopen(http_request, timeout=self.timeout) as response:
+            response.read()
+
+
+class Tracer:
+    """
+        Creates spans and exports the sampled ones in batches of `batch_size` (or every
+        `interval` seconds) from a background thread, so a slow collector never stalls a
+        report. New traces are sampled with probability `sample`; spans with a parent follow
+        the parent's decision. A full queue drops spans (tracing.dropped) instead of blocking.
+    """
+
+    def __init__(self, export, sample=1.0, queue_size=10000, batch_size=512, interval=2.0, rng=random.random):
+        self.export = export
+        self.sample = sample
+        self.batch_size = batch_size
+        self.interval = interval
+        self.rng = rng
+        self.queue = queue.Queue(queue_size)
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start_span(self, name, parent=None, kind=INTERNAL, links=(), attributes=None) -> Span:
+        if parent is None:
+            context = SpanContext(_random_id(16), _random_id(8), self.rng() < self.sample)
+            return Span(name, context, None, kind, attributes, links)
+        context = SpanContext(parent.trace_id, _random_id(8), parent.sampled, parent.tracestate)
+        return Span(name, context, parent.span_id, kind, attributes, links)
+
+    def finish(self, span):
+        if not span.context.sampled:
+            return
+        self._ensure_thread()
+        try:
+            self.queue.put_nowait(span)
+        except queue.Full:
+            metrics.inc("tracing.dropped")
+
+    def _ensure_thread(self):
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self.thread.start()
+
+    def _run(self):
+        batch, stopping = [], False
+        while not stopping:
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    span = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if span is None:
+                    stopping = True
+                    break
+                batch.append(span)
+            if batch:
+                self._export(batch)
+                batch = []
+
+    def _export(self, batch):
+        try:
+            self.export(batch)
+            metrics.inc("tracing.exported", len(batch))
+        except Exception as e:
+            metrics.inc("tracing.export_errors")
+            logger.warning(f"Unable to export {len(batch)} spans: {e!r}")
+
+    def reset_after_fork(self):
+        """A forked worker has no exporter thread; spans queued before the fork are the parent's to export."""
+        self.queue = queue.Queue(self.queue.maxsize)
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def stop(self):
+        """Export what is still queued and stop the exporter thread."""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+
+def install(tracer):
+    """Make `tracer` the process-wide one; None turns tracing off."""
+    global _tracer
+    stop()
+    _tracer = tracer
+    return tracer
+
+
+def stop():
+    if _tracer is not None:
+        _tracer.stop()
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def current_span():
+    return _current.get()
+
+
+def start_span(name, parent=None, kind=INTERNAL, links=(), **attributes):
+    """
+        A Span under `parent` (default: the current span), or None while tracing is off. It is
+        not made current; for generators, whose context changes between yields. See end_span.
+    """
+    if _tracer is None:
+        return None
+    if parent is None:
+        current = _current.get()
+        parent = current.context if current is not None else None
+    return _tracer.start_span(name, parent, kind, links, attributes)
+
+
+def end_span(span, error=None):
+    if span is not None and _tracer is not None:
+        span.end(error)
+        _tracer.finish(span)
+
+
+@contextmanager
+def span(name, parent=None, kind=INTERNAL, links=(), **attributes):
+    """
+        Time the block as a span, current for everything the block runs (including work
+        submitted with Deadline.submit). Yields the Span, or None while tracing is off.
+    """
+    opened = start_span(name, parent, kind, links, **attributes)
+    if opened is None:
+        yield None
+        return
+    token = _current.set(opened)
+    error = None
+    try:
+        yield opened
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current.reset(token)
+        end_span(opened, error)
+
+
+def traced(name, fn, kind=INTERNAL):
+    """`fn` wrapped to run in a span called `name`; `fn` itself while tracing is off."""
+    if _tracer is None:
+        return fn
+
+    def run(*args, **kwargs):
+        with span(name, kind=kind):
+            return fn(*args, **kwargs)
+
+    return run
+
+
+class RecentContexts:
+    """The span contexts of the last `size` keys, for linking later spans to them."""
+
+    def __init__(self, size=1024):
+        self.size = size
+        self.contexts = OrderedDict()
+        self.lock = threading.Lock()
+
+    def set(self, key, context):
+        with self.lock:
+            self.contexts[key] = context
+            self.contexts.move_to_end(key)
+            while len(self.contexts) > self.size:
+                self.contexts.popitem(last=False)
+
+    def get(self, key):
+        with self.lock:
+            return self.contexts.get(key)
+
+
+def _reset_in_child():
+    if _tracer is not None:
+        _tracer.reset_after_fork()
+
+
+atexit.register(stop)
+os.register_at_fork(after_in_child=_reset_in_child)
@@ -0,0 +1,221 @@
+import io
+import os
+import struct
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from collections import namedtuple
+from psycopg2.extensions import QueryCanceledError
+from Config.BulkCopy import (
+    BOOL, INT4, INT8, TEXT, FLOAT8, NUMERIC, DATE, TIMESTAMP, BINARY_SIGNATURE,
+    copy_statement, copy_reader, csv_frames, binary_frames, binary_row_dtype,
+)
+from Config.PostgresClient import PostgresClient
+from Benchmarks.main import bench_copy, copy_payloads, COPY_COLUMNS
+
+POSTGRES_TEST_DSN = os.getenv("POSTGRES_TEST_DSN")
+Column = namedtuple("Column", "name type_code")
+
+CSV_COLUMNS = [("student_id", INT8), ("subject", TEXT), ("score", NUMERIC), ("pre", BOOL),
+               ("session_date", TIMESTAMP), ("sessions", INT4)]
+CSV_OUTPUT = (
+    b'1,Algebra,81.5,t,2025-03-01 09:30:00,\\N\n'
+    b'1,\\N,\\N,\\N,\\N,4\n'
+    b'2,"Geometry, honors",70,f,2025-03-02 00:00:00,5\n'
+    b'3,"",12.25,f,2025-03-03 10:00:00,6\n'
+)
+
+
+def binary_output(columns, values, extension=b""):
+    """COPY binary bytes for NOT NULL rows of `values` ({name: array})."""
+    records = np.zeros(len(next(iter(values.values()))), dtype=binary_row_dtype(columns))
+    records["_count"] = len(columns)
+    for index, (name, _) in enumerate(columns):
+        records[f"_length{index}"] = records.dtype[name].itemsize
+        records[name] = values[name]
+    header = BINARY_SIGNATURE + struct.pack(">ii", 0, len(extension)) + extension
+    return header + records.tobytes() + b"\xff\xff"
+
+
+def test_csv_frames_types_and_nulls():
+    frame = pd.concat(csv_frames(io.BytesIO(CSV_OUTPUT), CSV_COLUMNS, 2), ignore_index=True)
+    assert frame["student_id"].tolist() == [1, 1, 2, 3]
+    assert frame["subject"].tolist() == ["Algebra", None, "Geometry, honors", ""]
+    assert frame["score"].tolist()[::2] == [81.5, 70.0]
+    assert np.isnan(frame["score"][1])
+    assert frame["pre"].tolist() == [True, None, False, False]
+    assert frame["session_date"][0] == pd.Timestamp("2025-03-01 09:30:00")
+    assert pd.isna(frame["session_date"][1])
+    ## An integer column with a NULL becomes float, like pd.DataFrame(rows) would make it
+    assert frame["sessions"].dtype == np.float64
+
+    first = next(csv_frames(io.BytesIO(CSV_OUTPUT), CSV_COLUMNS, 2))
+    assert first["sessions"].dtype == np.float64 and len(first) == 2
+    last = list(csv_frames(io.BytesIO(CSV_OUTPUT), CSV_COLUMNS, 2))[-1]
+    assert last["sessions"].dtype == np.int64 and last["pre"].dtype == bool
+
+
+def test_csv_frames_empty_result_keeps_columns():
+    frames = list(csv_frames(io.BytesIO(b""), CSV_COLUMNS, 10))
+    assert len(frames) == 1 and frames[0].empty
+    assert list(frames[0].columns) == [name for name, _ in CSV_COLUMNS]
+
+
+def test_binary_frames_decode_fixed_width_columns():
+    columns = [("student_id", INT8), ("score", FLOAT8), ("pre", BOOL), ("day", DATE), ("at", TIMESTAMP)]
+    values = {
+        "student_id": np.arange(7), "score": np.linspace(0, 60, 7), "pre": np.arange(7) % 2 == 0,
+        "day": np.arange(7), "at": np.arange(7) * 1_000_000,
+    }
+    stream = io.BytesIO(binary_output(columns, values, extension=b"\x00" * 4))
+    frames = list(binary_frames(stream, columns, 3))
+    assert [len(frame) for frame in frames] == [3, 3, 1]
+    frame = pd.concat(frames, ignore_index=True)
+    assert frame["student_id"].tolist() == list(range(7))
+    assert frame["score"].tolist() == values["score"].tolist()
+    assert frame["pre"].tolist() == values["pre"].tolist()
+    assert frame["day"][1] == pd.Timestamp("2000-01-02")
+    assert frame["at"][2] == pd.Timestamp("2000-01-01 00:00:02")
+
+
+def test_binary_frames_reject_nulls_variable_width_and_truncation():
+    columns = [("student_id", INT8), ("score", FLOAT8)]
+    data = bytearray(binary_output(columns, {"student_id": np.arange(2), "score": np.ones(2)}))
+    header = len(BINARY_SIGNATURE) + 8
+    ## A NULL score: length -1 and no value
+    null_row = struct.pack(">hiqi", 2, 8, 5, -1)
+    with pytest.raises(ValueError, match="NULL"):
+        list(binary_frames(io.BytesIO(bytes(data[:header]) + null_row + b"\x00" * 8 + b"\xff\xff"), columns, 10))
+    with pytest.raises(ValueError, match="Truncated"):
+        list(binary_frames(io.BytesIO(bytes(data[:-5])), columns, 10))
+    with pytest.raises(ValueError, match="use csv"):
+        binary_row_dtype([("subject", TEXT)])
+    empty = list(binary_frames(io.BytesIO(bytes(data[:header]) + b"\xff\xff"), columns, 10))
+    assert len(empty) == 1 and empty[0].empty
+
+
+def test_copy_statement():
+    assert copy_statement("SELECT 1", "csv").startswith("COPY (SELECT 1) TO STDOUT WITH (FORMAT csv")
+    assert copy_statement("SELECT 1", "binary") == "COPY (SELECT 1) TO STDOUT WITH (FORMAT binary)"
+    with pytest.raises(ValueError):
+        copy_statement("SELECT 1", "json")
+
+
+class CopyCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def mogrify(self, query, params):
+        return (query.replace("%s", "{}").format(*params) if params else query).encode()
+
+    def execute(self, query, params=None):
+        self.conn.executed.append(query)
+        self.description = [Column(name, type_code) for name, type_code in self.conn.columns]
+
+    def copy_expert(self, statement, file, size=8192):
+        self.conn.copies.append(statement)
+        for start in range(0, len(self.conn.output), size):
+            if self.conn.cancelled.is_set():
+                raise QueryCanceledError("canceling statement due to user request")
+            file.write(self.conn.output[start:start + size])
+            file.flush()
+        if self.conn.error is not None:
+            raise self.conn.error
+
+
+class CopyConnection:
+    closed = False
+    autocommit = True
+
+    def __init__(self, columns, output, error=None):
+        self.columns, self.output, self.error = columns, output, error
+        self.executed, self.copies = [], []
+        self.cancelled = threading.Event()
+
+    def cursor(self, cursor_factory=None):
+        return CopyCursor(self)
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+def copy_client(conn):
+    db = PostgresClient.__new__(PostgresClient)
+    db.conn = conn
+    return db
+
+
+def test_copy_frames_streams_csv_in_chunks():
+    conn = CopyConnection(CSV_COLUMNS, CSV_OUTPUT)
+    db = copy_client(conn)
+    frames = list(db.copy_frames("SELECT * FROM scores WHERE semester_id = %s;", (4,), chunk_rows=3))
+    assert [len(frame) for frame in frames] == [3, 1]
+    assert conn.executed[-1] == "SELECT * FROM (SELECT * FROM scores WHERE semester_id = 4) AS copied LIMIT 0"
+    assert conn.copies == [copy_statement("SELECT * FROM scores WHERE semester_id = 4", "csv")]
+    assert db.copy_frame("SELECT * FROM scores")["subject"].tolist() == ["Algebra", None, "Geometry, honors", ""]
+
+
+def test_copy_frames_stopped_early_cancels_the_copy():
+    rows = 20000
+    columns = [("student_id", INT8), ("score", FLOAT8)]
+    output = binary_output(columns, {"student_id": np.arange(rows), "score": np.zeros(rows)})
+    conn = CopyConnection(columns, output)
+    frames = copy_client(conn).copy_frames("SELECT 1", chunk_rows=100, fmt="binary")
+    assert len(next(frames)) == 100
+    frames.close()
+    assert conn.cancelled.is_set()
+
+
+def test_copy_errors_are_raised():
+    conn = CopyConnection(CSV_COLUMNS, CSV_OUTPUT[:20], error=QueryCanceledError("statement timeout"))
+    with pytest.raises(QueryCanceledError):
+        copy_client(conn).copy_frame("SELECT 1")
+
+    with pytest.raises(ValueError, match="use csv"):
+        copy_client(CopyConnection(CSV_COLUMNS, CSV_OUTPUT)).copy_frame("SELECT 1", fmt="binary")
+
+    with pytest.raises(RuntimeError):
+        with copy_reader(CopyConnection(CSV_COLUMNS, b"1\n"), "COPY") as stream:
+            stream.read()
+            raise RuntimeError("parser failed")
+
+
+def test_copy_benchmark_paths_agree():
+    text, binary = copy_payloads(500)
+    from_csv = pd.concat(csv_frames(io.BytesIO(text), COPY_COLUMNS, 128), ignore_index=True)
+    from_binary = pd.concat(binary_frames(io.BytesIO(binary), COPY_COLUMNS, 128), ignore_index=True)
+    pd.testing.assert_frame_equal(from_csv, from_binary)
+    results = bench_copy(rows=500, chunk_rows=128)
+    assert all(results[path]["rows"] == 500 for path in ("fetch_all_dicts", "copy_csv", "copy_binary"))
+
+
+@pytest.mark.skipif(not POSTGRES_TEST_DSN, reason="POSTGRES_TEST_DSN not set")
+def test_postgres_copy_matches_fetch_all():
+    import psycopg2
+
+    db = PostgresClient.__new__(PostgresClient)
+    db.conn = psycopg2.connect(POSTGRES_TEST_DSN)
+    db.conn.autocommit = True
+    query = ("SELECT g::int8 AS id, g::float8 / 3 AS ratio, g %% 2 = 0 AS even, "
+             "CASE WHEN g %% 3 = 0 THEN NULL ELSE 'row ' || g END AS label "
+             "FROM generate_series(1, %s) AS g ORDER BY g")
+    try:
+        rows = db.fetch_all(query, (2500,))
+        expected = pd.DataFrame(rows)
+        from_csv = db.copy_frame(query, (2500,))
+        numeric = ["id", "ratio", "even"]
+        pd.testing.assert_frame_equal(from_csv[numeric], expected[numeric], check_dtype=False)
+        ## Missing strings are None, as in the rows themselves
+        assert from_csv["label"].tolist() == [row["label"] for row in rows]
+        from_binary = db.copy_frame("SELECT id, ratio, even FROM (" + query + ") AS q", (2500,), fmt="binary")
+        pd.testing.assert_frame_equal(from_binary, expected[numeric], check_dtype=False)
+    finally:
+        db.close()
@@ -0,0 +1,106 @@
+# test_deadline.py
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from psycopg2.extensions import QueryCanceledError
+
+from Config import Deadline as deadline_module
+from Config.Deadline import Deadline, DeadlineExceeded, deadline_scope, current_deadline
+from Config.PostgresClient import PostgresClient
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingCursor:
+    def __init__(self, executed, fail=None):
+        self.executed = executed
+        self.fail = fail
+
+    def execute(self, query, params=None):
+        self.executed.append(query)
+        if self.fail is not None:
+            raise self.fail
+
+
+def test_deadline_counts_down_to_statement_timeout():
+    clock = Clock()
+    deadline = Deadline(2.0, clock=clock)
+    assert deadline.statement_timeout_ms() == 2000 and not deadline.expired()
+    clock.now = 1.75
+    assert deadline.statement_timeout_ms() == 250
+    clock.now = 3.0
+    assert deadline.expired() and deadline.statement_timeout_ms() == 1
+
+    clock.now = 0.0
+    reserved = Deadline(2.0, clock=clock, reserve=0.5)
+    clock.now = 1.25
+    assert not reserved.low()
+    clock.now = 1.5
+    assert reserved.low() and not reserved.expired()
+
+    unbounded = Deadline(0)
+    assert unbounded.remaining() is None and not unbounded.expired() and not unbounded.low()
+    assert unbounded.statement_timeout_ms() is None
+
+
+def test_scope_is_carried_into_executor_threads():
+    deadline = Deadline(5)
+    with ThreadPoolExecutor(1) as executor:
+        with deadline_scope(deadline):
+            assert deadline_module.submit(executor, current_deadline).result() is deadline
+            assert executor.submit(current_deadline).result() is None
+    assert current_deadline() is None
+
+
+def test_statement_timeout_is_sent_with_the_query_and_reset_after():
+    db = PostgresClient.__new__(PostgresClient)
+    executed = []
+    clock = Clock()
+    deadline = Deadline(1.5, clock=clock)
+
+    db._execute(RecordingCursor(executed), "SELECT 1", None)
+    with deadline_scope(deadline):
+        db._execute(RecordingCursor(executed), "SELECT 2", None)
+        clock.now = 2.0
+        with pytest.raises(DeadlineExceeded):
+            db._execute(RecordingCursor(executed), "SELECT 3", None)
+    db._execute(RecordingCursor(executed), "SELECT 4", None)
+    db._execute(RecordingCursor(executed), "SELECT 5", None)
+
+    assert executed == [
+        "SELECT 1",
+        "SET statement_timeout = 1500; SELECT 2",
+        "RESET statement_timeout; SELECT 4",
+        "SELECT 5",
+    ]
+
+
+def test_failed_statement_leaves_the_timeout_unknown():
+    db = PostgresClient.__new__(PostgresClient)
+    executed = []
+    with deadline_scope(Deadline(1.0)):
+        with pytest.raises(QueryCanceledError):
+            db._execute(RecordingCursor(executed, QueryCanceledError("canceling statement")), "SELECT 1", None)
+    db._execute(RecordingCursor(executed), "SELECT 2", None)
+    assert executed[-1] == "RESET statement_timeout; SELECT 2"
+
+
+def test_cancelled_query_past_the_deadline_raises_deadline_exceeded():
+    db = PostgresClient.__new__(PostgresClient)
+    db.conn = None
+
+    def cancelled():
+        raise QueryCanceledError("canceling statement due to statement timeout")
+
+    clock = Clock()
+    with deadline_scope(Deadline(1.0, clock=clock)):
+        clock.now = 1.0
+        with pytest.raises(DeadlineExceeded):
+            db._with_retry(cancelled, 3)
+    with pytest.raises(QueryCanceledError):
+        db._with_retry(cancelled, 3)
@@ -0,0 +1,94 @@
+# test_logs.py
+import io
+import json
+import queue
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueListener
+import pytest
+
+from Config import Deadline
+from Config.Logs import DeferredQueueHandler, DebugSampler, JsonFormatter, SummaryFormatter, message_summary, \
+    summary_add, current_summary
+from Config.Metrics import metrics
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def make_logger(name, handler, level=logging.DEBUG):
+    logger = logging.getLogger(f"test_logs.{name}")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(level)
+    return logger
+
+
+def record(level=logging.DEBUG, name="x"):
+    return logging.LogRecord(name, level, __file__, 1, "query", None, None)
+
+
+def test_queue_handler_merges_arguments_and_leaves_formatting_to_the_writer():
+    stream = io.StringIO()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(SummaryFormatter("%(levelname)s %(message)s"))
+    handler = DeferredQueueHandler(queue.SimpleQueue())
+    listener = QueueListener(handler.queue, output)
+    params = ["DONE"]
+    logger = make_logger("queued", handler)
+    listener.start()
+    logger.info("params: %s", params)
+    params.append("changed")
+    listener.stop()
+    assert stream.getvalue() == "INFO params: ['DONE']\n"
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = DeferredQueueHandler(queue.Queue(1))
+    logger = make_logger("full", handler)
+    logger.info("one")
+    logger.info("two")
+    assert handler.queue.qsize() == 1
+    assert metrics.snapshot()["counters"]["logging.dropped"] == 1
+
+
+def test_debug_sampler_samples_and_rate_limits_debug_only():
+    now = [0.0]
+    sampler = DebugSampler(rate=2, clock=lambda: now[0])
+    assert [sampler.filter(record()) for _ in range(3)] == [True, True, False]
+    assert sampler.filter(record(name="other"))
+    assert sampler.filter(record(logging.INFO))
+    now[0] = 1.0
+    assert sampler.filter(record())
+
+    rolls = iter([0.5, 0.05])
+    sampled = DebugSampler(sample=0.1, rng=lambda: next(rolls))
+    assert [sampled.filter(record()), sampled.filter(record())] == [False, True]
+    assert metrics.snapshot()["counters"]["logging.sampled_out"] == 2
+
+
+def test_message_summary_logs_one_line_with_worker_thread_counts():
+    stream = io.StringIO()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter())
+    logger = make_logger("summary", output)
+
+    with message_summary(logger, "Report", student_id=7) as summary:
+        with ThreadPoolExecutor(2) as executor:
+            for future in [Deadline.submit(executor, summary_add, "queries") for _ in range(4)]:
+                future.result()
+        summary.set("outcome", "DONE")
+    assert current_summary() is None
+
+    with pytest.raises(ValueError):
+        with message_summary(logger, "Report", student_id=8):
+            raise ValueError("bad row")
+
+    first, second = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert first["message"] == "Report" and first["student_id"] == 7
+    assert first["queries"] == 4 and first["outcome"] == "DONE" and first["seconds"] >= 0
+    assert second["outcome"] == "ValueError"
@@ -0,0 +1,72 @@
+# test_postgres_pool.py
+import threading
+import pytest
+
+from Config.PostgresPool import PostgresPool
+from Config.QueryCache import QueryCache
+
+
+class FakeClient:
+    created = 0
+
+    def __init__(self):
+        FakeClient.created += 1
+        self.closed = False
+        self.cache = None
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def reset_created():
+    FakeClient.created = 0
+
+
+def test_connections_are_opened_lazily_and_reused():
+    pool = PostgresPool(3, FakeClient)
+    with pool.client() as a:
+        pass
+    with pool.client() as b:
+        assert b is a
+    with pool.client() as a, pool.client() as b:
+        assert a is not b
+    assert FakeClient.created == 2
+    pool.close()
+    assert a.closed and b.closed
+
+
+def test_client_blocks_when_every_connection_is_busy():
+    pool = PostgresPool(1, FakeClient)
+    acquired = threading.Event()
+    with pool.client():
+        thread = threading.Thread(target=lambda: pool.client().__enter__() and acquired.set())
+        thread.start()
+        assert not acquired.wait(0.1)
+    thread.join(5)
+    assert acquired.is_set()
+    assert FakeClient.created == 1
+
+
+def test_pool_shares_the_query_cache():
+    cache = QueryCache()
+    pool = PostgresPool(2, FakeClient, cache=cache)
+    with pool.client() as a, pool.client() as b:
+        assert a.cache is cache and b.cache is cache
+
+
+def test_failed_connect_frees_the_slot():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("Database connection failed")
+        return FakeClient()
+
+    pool = PostgresPool(1, factory)
+    with pytest.raises(RuntimeError):
+        with pool.client():
+            pass
+    with pool.client() as db:
+        assert isinstance(db, FakeClient)
@@ -0,0 +1,215 @@
+# test_query_cache.py
+import threading
+import pytest
+
+from Config.QueryCache import QueryCache, cached
+from Config.PostgresClient import PostgresClient
+from Config.Metrics import metrics
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Loader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, value):
+        def load():
+            self.calls += 1
+            return value
+        return load
+
+
+def test_hits_until_ttl_expires():
+    clock, load = Clock(), Loader()
+    cache = QueryCache(ttls={"attendance": 10}, clock=clock)
+    assert cache.get("attendance", (7, 3), load({"present": 8})) == {"present": 8}
+    assert cache.get("attendance", (7, 3), load({"present": 9})) == {"present": 8}
+    clock.now = 11
+    assert cache.get("attendance", (7, 3), load({"present": 9})) == {"present": 9}
+    assert load.calls == 2
+    counters = metrics.snapshot()["counters"]
+    assert counters["cache.attendance.hits"] == 1 and counters["cache.attendance.misses"] == 2
+
+
+def test_none_results_are_cached_and_zero_ttl_disables():
+    load = Loader()
+    cache = QueryCache(ttls={"attendance": 10, "subject": 0})
+    cache.get("attendance", (8, 3), load(None))
+    cache.get("attendance", (8, 3), load(None))
+    cache.get("subject", (1, 2), load("x"))
+    cache.get("subject", (1, 2), load("x"))
+    assert load.calls == 3
+    assert len(cache) == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    load = Loader()
+    cache = QueryCache(maxsize=2)
+    cache.get("q", 1, load(1))
+    cache.get("q", 2, load(2))
+    cache.get("q", 1, load(1))
+    cache.get("q", 3, load(3))
+    cache.get("q", 1, load(1))
+    cache.get("q", 2, load(2))
+    assert load.calls == 4
+    assert metrics.snapshot()["counters"]["cache.q.evictions"] == 2
+
+
+def test_cached_values_cannot_be_modified_by_callers():
+    cache = QueryCache()
+    rows = cache.get("q", 1, lambda: [{"score": 1}])
+    rows[0]["score"] = 99
+    assert cache.get("q", 1, lambda: None) == [{"score": 1}]
+
+
+def test_concurrent_misses_run_one_query():
+    cache = QueryCache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"present": 8}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("attendance", (7, 3), load)))
+               for _ in range(8)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
+    assert results == [{"present": 8}] * 8
+
+
+def test_failed_load_is_not_cached():
+    cache = QueryCache()
+
+    def fail():
+        raise RuntimeError("Database query failed")
+
+    with pytest.raises(RuntimeError):
+        cache.get("q", 1, fail)
+    assert cache.get("q", 1, lambda: "ok") == "ok"
+
+
+def test_invalidation_during_load_keeps_result_out():
+    cache = QueryCache()
+
+    def load():
+        cache.invalidate("attendance", lambda key: key[0] == 7)
+        return {"present": 8}
+
+    assert cache.get("attendance", (7, 3), load) == {"present": 8}
+    assert len(cache) == 0
+
+
+def client_with_cache(ttls=None):
+    db = PostgresClient.__new__(PostgresClient)
+    db.cache = QueryCache(ttls=ttls)
+    db.queries = []
+
+    def fetch_one(query, params=None):
+        db.queries.append(params)
+        return {"total_sessions": 10, "present": 8, "absent": 2}
+
+    db.fetch_one = fetch_one
+    return db
+
+
+def test_postgres_client_reads_are_cached_and_invalidated():
+    db = client_with_cache()
+    for _ in range(3):
+        assert db.get_student_attendance(7, 3)["present"] == 8
+    db.get_student_attendance(7, None)
+    db.get_student_attendance(9, 3)
+    assert len(db.queries) == 3
+
+    db.invalidate_student(7, 3)
+    db.get_student_attendance(7, 3)
+    db.get_student_attendance(7, None)
+    db.get_student_attendance(9, 3)
+    assert len(db.queries) == 5
+
+    db.get_subject_data((1, 2))
+    db.get_subject_data([1, 2])
+    assert len(db.queries) == 6
+    db.invalidate_subjects()
+    db.get_subject_data((1, 2))
+    assert len(db.queries) == 7
+
+
+def test_string_ids_share_entries_and_are_invalidated():
+    db = client_with_cache()
+    db.fetch_all = lambda query, params=None: db.queries.append(params) or []
+    db.get_student_attendance("42", "3")
+    db.get_student_attendance(42, 3)
+    db.get_student_questionnaire(["42", 3])
+    assert len(db.queries) == 2
+    ## NOTIFY payloads are parsed to ints (Precompute.main.parse_payload)
+    db.invalidate_student(42, 3)
+    db.get_student_attendance("42", "3")
+    db.get_student_questionnaire(("42", "3"))
+    assert len(db.queries) == 4
+    db.invalidate_student("42", "3")
+    db.get_student_attendance(42, 3)
+    assert len(db.queries) == 5
+
+
+def test_questionnaire_entries_are_invalidated_whatever_the_params_shape():
+    db = client_with_cache()
+    db.fetch_all = lambda query, params=None: db.queries.append(params) or []
+    for params in (42, "42", (42,), ["42", 3], "not an id", ()):
+        db.get_student_questionnaire(params)
+    assert len(db.queries) == 5
+    db.invalidate_student(42, 3)
+    for params in (42, (42,), [42, 3], "not an id", ()):
+        db.get_student_questionnaire(params)
+    ## Only the entries of student 42 were dropped
+    assert len(db.queries) == 8
+
+
+def test_client_without_cache_queries_every_time():
+    db = client_with_cache()
+    db.cache = None
+    db.get_student_attendance(7, 3)
+    db.get_student_attendance(7, 3)
+    db.invalidate_student(7, 3)
+    assert len(db.queries) == 2
+
+
+def test_cached_decorator_keys_on_arguments():
+    class Reader:
+        def __init__(self):
+            self.cache = QueryCache()
+            self.calls = 0
+
+        @cached("rows")
+        def rows(self, student_id, semester_id):
+            self.calls += 1
+            return [student_id, semester_id]
+
+    reader = Reader()
+    assert reader.rows(1, 2) == [1, 2]
+    reader.rows(1, 2)
+    reader.rows(1, 3)
+    assert reader.calls == 2
@@ -0,0 +1,137 @@
+# test_query_stats.py
+import json
+import pytest
+
+from Config.PostgresClient import PostgresClient
+from Config.QueryStats import QueryStats, query_stats, row_bytes
+
+
+@pytest.fixture(autouse=True)
+def reset_stats():
+    query_stats.reset()
+    yield
+    query_stats.reset()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class StatsCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = -1
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.executed.append(query)
+        if query.startswith("EXPLAIN"):
+            self.rows = [([{"Plan": {"Node Type": "Index Scan"}}],)]
+        else:
+            self.rows = [dict(row) for row in self.conn.rows]
+            self.rowcount = len(self.rows)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+
+class StatsConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+        self.closed = 0
+        self.autocommit = True
+
+    def cursor(self, cursor_factory=None):
+        return StatsCursor(self)
+
+
+def make_client(rows):
+    db = PostgresClient.__new__(PostgresClient)
+    db.conn = StatsConnection(rows)
+    return db
+
+
+def test_row_bytes_counts_text_size():
+    assert row_bytes([{"a": "abc", "b": 12, "c": None}, (1.5, b"xy")]) == 3 + 2 + 3 + 2
+
+
+def test_calls_are_recorded_under_the_calling_method():
+    db = make_client([{"total_sessions": 10, "present": 8, "absent": 2}])
+    db.get_student_attendance(7, 3)
+    db.get_student_attendance(7, 3)
+    db.fetch_all("SELECT 1", name="adhoc")
+    db.update_event_queue(("DONE", "key"))
+    queries = query_stats.snapshot()["queries"]
+    attendance = queries["get_student_attendance"]
+    assert attendance["calls"] == 2 and attendance["rows"] == 2 and attendance["bytes"] == 2 * 4
+    assert attendance["latency"]["count"] == 2
+    assert queries["adhoc"]["calls"] == 1
+    assert queries["update_event_queue"]["rows"] == 1
+
+
+def test_failures_are_counted():
+    db = make_client([])
+
+    def broken(cursor, query, params=None):
+        raise ValueError("boom")
+
+    db.conn.cursor = lambda cursor_factory=None: type("C", (StatsCursor,), {"execute": broken})(db.conn)
+    with pytest.raises(ValueError):
+        db.fetch_one("SELECT 1")
+    stats = query_stats.snapshot()["queries"]["test_failures_are_counted"]
+    assert stats["errors"] == 1 and "boom" in stats["last_error"]
+
+
+def test_slow_query_captures_params_and_plan(monkeypatch):
+    db = make_client([{"ok": 1}])
+    monkeypatch.setattr(query_stats, "slow_seconds", 1e-9)
+    db.fetch_one("SELECT %s", (7,), name="slow_read")
+    db.fetch_one("SELECT %s", (8,), name="slow_read")
+    slow = query_stats.snapshot()["slow_queries"]
+    assert [entry["params"] for entry in slow] == [[7], [8]]
+    assert slow[0]["plan"] == [{"Plan": {"Node Type": "Index Scan"}}]
+    ## Explained once per interval
+    assert slow[1]["plan"] is None
+    assert sum(query.startswith("EXPLAIN") for query in db.conn.executed) == 1
+
+
+def test_slow_ddl_is_captured_without_explain(monkeypatch):
+    db = make_client([])
+    monkeypatch.setattr(query_stats, "slow_seconds", 1e-9)
+    db.execute("CREATE INDEX IF NOT EXISTS i ON t (a)", name="ddl")
+    assert query_stats.snapshot()["slow_queries"][0]["plan"] is None
+    assert not any(query.startswith("EXPLAIN") for query in db.conn.executed)
+
+
+def test_explain_interval_per_name():
+    clock = Clock()
+    stats = QueryStats(slow_seconds=1, explain_interval=60, clock=clock)
+    assert stats.should_explain("a") and stats.should_explain("b")
+    assert not stats.should_explain("a")
+    clock.now = 61
+    assert stats.should_explain("a")
+    assert not stats.is_slow(0.5) and stats.is_slow(1)
+    assert not QueryStats(slow_seconds=0).is_slow(100)
+
+
+def test_dump_writes_snapshot(tmp_path):
+    stats = QueryStats()
+    stats.record("get_student_attendance", 0.02, rows=1, nbytes=10)
+    path = tmp_path / "stats.json"
+    stats.dump(str(path))
+    written = json.loads(path.read_text())
+    assert written["queries"]["get_student_attendance"]["latency"]["count"] == 1
@@ -0,0 +1,317 @@
+# test_recovery.py
+import pytest
+import pika
+from types import SimpleNamespace
+from psycopg2 import OperationalError
+from psycopg2.extensions import QueryCanceledError
+
+from Config import PostgresClient as postgres_module
+from Config import RabbitMQ as rabbit_module
+from Config.PostgresClient import PostgresClient
+from Config.RabbitMQ import RabbitMQ
+from Config.Retry import jittered_backoff
+from Config.Metrics import metrics
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(postgres_module.time, "sleep", lambda seconds: None)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+# ---- Postgres ----
+class FakeCursor:
+    rowcount = -1
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.executed.append(query)
+        if self.conn.failures:
+            error = self.conn.failures.pop(0)
+            if isinstance(error, OperationalError) and not isinstance(error, QueryCanceledError):
+                self.conn.closed = 2
+            raise error
+
+    def fetchone(self):
+        return {"ok": 1}
+
+    def fetchall(self):
+        return [{"ok": 1}]
+
+
+class FakeConnection:
+    def __init__(self, failures):
+        self.failures = failures
+        self.executed = []
+        self.closed = 0
+        self.autocommit = False
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def fake_postgres(monkeypatch):
+    state = {"connects": 0, "failures": []}
+
+    def connect(**kwargs):
+        state["connects"] += 1
+        return FakeConnection(state["failures"])
+
+    monkeypatch.setattr(postgres_module.psycopg2, "connect", connect)
+    return state
+
+
+def test_read_is_retried_after_connection_loss(fake_postgres):
+    db = PostgresClient()
+    fake_postgres["failures"].extend([OperationalError("server closed the connection")])
+    assert db.fetch_all("SELECT 1") == [{"ok": 1}]
+    assert fake_postgres["connects"] == 2
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["postgres.retries"] == 1
+    assert snapshot["histograms"]["postgres.recovery_seconds"]["count"] == 1
+
+
+def test_read_gives_up_after_retries(fake_postgres, monkeypatch):
+    monkeypatch.setattr(postgres_module, "POSTGRES_RETRIES", 2)
+    db = PostgresClient()
+    fake_postgres["failures"].extend([OperationalError("down")] * 3)
+    with pytest.raises(RuntimeError):
+        db.fetch_one("SELECT 1")
+    assert metrics.snapshot()["counters"]["postgres.retries"] == 2
+
+
+def test_cancelled_statement_is_not_retried(fake_postgres):
+    db = PostgresClient()
+    fake_postgres["failures"].append(QueryCanceledError("canceling statement due to statement timeout"))
+    with pytest.raises(RuntimeError):
+        db.fetch_one("SELECT pg_sleep(10)")
+    assert "postgres.retries" not in metrics.snapshot()["counters"]
+
+
+def test_non_idempotent_command_is_not_retried(fake_postgres):
+    db = PostgresClient()
+    fake_postgres["failures"].append(OperationalError("down"))
+    with pytest.raises(RuntimeError):
+        db.execute("INSERT INTO t VALUES (1)")
+    fake_postgres["failures"].append(OperationalError("down"))
+    db.update_event_queue(("DONE", "key.json"))
+    assert metrics.snapshot()["counters"]["postgres.retries"] == 1
+
+
+# ---- RabbitMQ ----
+class FakeChannel:
+    def __init__(self, log, queued=None):
+        self.log = log
+        ## queue -> [(routing_key, body)] ready for basic_get
+        self.queued = queued if queued is not None else {}
+        self.is_open = True
+        self.tag = 0
+
+    def close(self):
+        self.is_open = False
+
+    def confirm_delivery(self):
+        self.log.append(("confirm_delivery",))
+
+    def queue_unbind(self, **kwargs):
+        self.log.append(("queue_unbind", kwargs["queue"], kwargs["routing_key"]))
+
+    def queue_delete(self, queue, if_empty=False):
+        self.log.append(("queue_delete", queue))
+
+    def basic_get(self, queue):
+        if not self.queued.get(queue):
+            return None, None, None
+        routing_key, body = self.queued[queue].pop(0)
+        self.tag += 1
+        return SimpleNamespace(routing_key=routing_key, delivery_tag=self.tag), None, body
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.log.append(("basic_publish", exchange, routing_key, body))
+
+    def basic_ack(self, delivery_tag):
+        self.log.append(("basic_ack", delivery_tag))
+
+    def exchange_declare(self, **kwargs):
+        self.log.append(("exchange_declare", kwargs["exchange"]))
+        self.exchange_type = kwargs["exchange_type"]
+
+    def queue_declare(self, queue, **kwargs):
+        self.log.append(("queue_declare", queue))
+        self.arguments = kwargs.get("arguments")
+
+    def queue_bind(self, **kwargs):
+        self.log.append(("queue_bind", kwargs["queue"]))
+        self.binding = (kwargs["exchange"], kwargs["routing_key"])
+
+    def basic_qos(self, prefetch_count, global_qos=False):
+        self.log.append(("basic_qos", prefetch_count, global_qos))
+
+    def basic_consume(self, queue, on_message_callback):
+        self.log.append(("basic_consume", queue))
+
+
+class FakeBlockingConnection:
+    fail_next = 0
+
+    def __init__(self, params):
+        if FakeBlockingConnection.fail_next:
+            FakeBlockingConnection.fail_next -= 1
+            raise pika.exceptions.AMQPConnectionError("refused")
+        self.log = []
+        self.timers = []
+        self.queued = {}
+        self.is_open = True
+
+    def channel(self):
+        return FakeChannel(self.log, self.queued)
+
+    def call_later(self, delay, fn):
+        self.timers.append((delay, fn))
+
+    def close(self):
+        self.is_open = False
+
+
+@pytest.fixture
+def fake_rabbit(monkeypatch):
+    monkeypatch.setattr(rabbit_module.pika, "BlockingConnection", FakeBlockingConnection)
+    monkeypatch.setattr(RabbitMQ, "_connection_params", lambda self: None)
+    monkeypatch.setattr(rabbit_module.time, "sleep", lambda seconds: None)
+    FakeBlockingConnection.fail_next = 0
+
+
+def test_reconnect_replays_topology_qos_consumers_and_timers(fake_rabbit):
+    mq = RabbitMQ(4, "reports", "interactive", "report", "direct")
+    mq.add_queue("bulk", "bulk-report", 10)
+    mq.set_callback(lambda *a: None)
+    mq.set_callback(lambda *a: None, "bulk")
+    mq.set_prefetch(2)
+    mq.call_every(30, lambda: None)
+    old = mq.get_connection()
+
+    FakeBlockingConnection.fail_next = 2
+    mq.reconnect()
+    new = mq.get_connection()
+    assert new is not old and old.is_open is False
+    assert new.log == [
+        ("exchange_declare", "reports"),
+        ("queue_declare", "interactive"), ("queue_bind", "interactive"),
+        ("queue_declare", "bulk"), ("queue_bind", "bulk"),
+        ("basic_qos", 4, False), ("basic_qos", 2, True),
+        ("basic_consume", "interactive"), ("basic_consume", "bulk"),
+    ]
+    assert len(new.timers) == 1
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["rabbitmq.reconnects"] == 1
+    assert snapshot["histograms"]["rabbitmq.recovery_seconds"]["count"] == 1
+
+
+def test_timers_on_replaced_connection_stop(fake_rabbit):
+    calls = []
+    mq = RabbitMQ(1, "reports", "interactive", "report", "direct")
+    mq.call_every(5, lambda: calls.append(1))
+    old = mq.get_connection()
+    mq.reconnect()
+    _, fire = old.timers[0]
+    fire()
+    assert calls == [1]
+    assert len(old.timers) == 1
+
+
+def test_jittered_backoff_is_bounded():
+    assert jittered_backoff(0, base=1, rng=lambda: 1.0) == 1
+    assert jittered_backoff(3, base=1, rng=lambda: 0.5) == 4
+    assert jittered_backoff(20, base=1, cap=30, rng=lambda: 1.0) == 30
+
+
+def test_retry_topology_is_declared_and_replayed(fake_rabbit):
+    mq = RabbitMQ(1, "reports", "interactive", "report", "direct")
+    mq.add_queue("bulk", "bulk-report")
+    mq.declare_retry_queues(5000)
+    assert mq.retry_queues("bulk-report") == ("bulk.retry", "bulk.dead")
+    assert mq.retry_queues("report") == ("interactive.retry", "interactive.dead")
+
+    mq.reconnect()
+    declared = [entry[1] for entry in mq.get_connection().log if entry[0] == "queue_declare"]
+    assert declared == ["interactive", "bulk", "interactive.retry", "interactive.dead", "bulk.retry", "bulk.dead"]
+
+
+def test_retry_properties_count_attempts():
+    properties = pika.BasicProperties(priority=7, headers={"trace": "abc"})
+    retried = rabbit_module.retry_properties(properties, rabbit_module.retry_count(properties) + 1)
+    assert rabbit_module.retry_count(retried) == 1
+    assert retried.priority == 7 and retried.headers["trace"] == "abc"
+    assert rabbit_module.retry_count(rabbit_module.retry_properties(retried, 2)) == 2
+
+
+def test_sharding_declares_ring_member_and_replays_it(fake_rabbit):
+    mq = RabbitMQ(1, "reports", "interactive", "report", "direct", max_priority=10)
+    assert mq.enable_sharding("w1", weight=2, message_ttl_ms=30000) == "interactive.shard.w1"
+    channel = mq.get_channel()
+    assert channel.exchange_type == rabbit_module.CONSISTENT_HASH
+    assert channel.binding == ("reports.shard", "2")
+    assert channel.arguments == {
+        "x-message-ttl": 30000,
+        "x-dead-letter-exchange": "reports",
+        "x-dead-letter-routing-key": "report",
+        "x-max-priority": 10,
+    }
+
+    mq.reconnect()
+    assert mq.get_connection().log[:5] == [
+        ("exchange_declare", "reports"),
+        ("queue_declare", "interactive"), ("queue_bind", "interactive"),
+        ("exchange_declare", "reports.shard"),
+        ("queue_declare", "interactive.shard.w1"),
+    ]
+
+    mq.route_to_shard(42, b"{}")
+    assert mq.get_connection().log[-1] == ("basic_publish", "reports.shard", "42", b"{}")
+
+
+def test_leave_shard_unbinds_then_rehashes_queued_messages(fake_rabbit):
+    mq = RabbitMQ(1, "reports", "interactive", "report", "direct")
+    queue = mq.enable_sharding("w1")
+    mq.set_callback(lambda *a: None, queue)
+    mq.get_connection().queued[queue] = [("7", b"a"), ("9", b"b")]
+    consuming = mq.get_channel()
+    log = mq.get_connection().log
+    del log[:]
+
+    assert mq.leave_shard() == 2
+    assert consuming.is_open is False
+    assert log == [
+        ("confirm_delivery",),
+        ("queue_unbind", queue, "1"),
+        ("basic_publish", "reports.shard", "7", b"a"), ("basic_ack", 1),
+        ("basic_publish", "reports.shard", "9", b"b"), ("basic_ack", 2),
+        ("queue_delete", queue),
+    ]
+    assert mq.shard is None and mq.consumers == []
+    assert metrics.snapshot()["counters"]["rabbitmq.shard_handoffs"] == 2
+    assert mq.leave_shard() == 0
+
+
+def test_expired_from_shard_only_matches_shard_queue_ttl():
+    def properties(queue, reason="expired"):
+        return pika.BasicProperties(headers={"x-death": [{"queue": queue, "reason": reason}]})
+
+    assert rabbit_module.expired_from_shard(properties("interactive.shard.w1"))
+    assert not rabbit_module.expired_from_shard(properties("interactive.retry"))
+    assert not rabbit_module.expired_from_shard(properties("interactive.shard.w1", "rejected"))
+    assert not rabbit_module.expired_from_shard(pika.BasicProperties())
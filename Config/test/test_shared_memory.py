@@ -0,0 +1,34 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from Config.SharedMemory import write_shared, read_shared, ALIGNMENT
+
+
+def test_shared_objects_map_their_arrays(tmp_path):
+    path = tmp_path / "model.shared"
+    coefficients = np.linspace(0, 1, 1001)
+    write_shared({"coef": coefficients, "ints": np.arange(7, dtype=np.int32), "name": "linear"}, str(path))
+    loaded = read_shared(str(path))
+    assert loaded["name"] == "linear"
+    np.testing.assert_array_equal(loaded["coef"], coefficients)
+    assert loaded["ints"].dtype == np.int32 and loaded["ints"].tolist() == list(range(7))
+    for array in (loaded["coef"], loaded["ints"]):
+        assert not array.flags.writeable and not array.flags.owndata
+        assert array.ctypes.data % ALIGNMENT == 0
+    with pytest.raises(ValueError):
+        loaded["coef"][0] = 1.0
+
+    path.write_bytes(b"not shared" * 10)
+    with pytest.raises(ValueError, match="not a shared object file"):
+        read_shared(str(path))
+
+
+def test_concurrent_writers_each_publish_a_complete_file(tmp_path):
+    path = str(tmp_path / "model.shared")
+    objects = [{"coef": np.full(100_000, float(index))} for index in range(8)]
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda obj: write_shared(obj, path), objects))
+    loaded = read_shared(path)["coef"]
+    assert len(loaded) == 100_000 and (loaded == loaded[0]).all()
+    assert os.listdir(tmp_path) == ["model.shared"]
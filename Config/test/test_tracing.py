@@ -0,0 +1,144 @@
+import json
+import pika
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from Config import Tracing
+from Config.Metrics import metrics
+from Config.PostgresClient import PostgresClient
+from Report.main import run_sections
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def exported():
+    spans = []
+    tracer = Tracing.install(Tracing.Tracer(spans.extend, interval=0.01))
+    yield spans
+    Tracing.install(None)
+    assert tracer.thread is None
+
+
+def finished(spans):
+    Tracing.stop()
+    return {span.name: span for span in spans}
+
+
+def test_traceparent_round_trip_and_validation():
+    context = Tracing.parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01", "vendor=1")
+    assert context == Tracing.SpanContext(TRACE_ID, PARENT_ID, True, "vendor=1")
+    assert Tracing.format_traceparent(context) == f"00-{TRACE_ID}-{PARENT_ID}-01"
+    assert Tracing.parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00".encode()).sampled is False
+    ## Later versions may append fields
+    assert Tracing.parse_traceparent(f"01-{TRACE_ID}-{PARENT_ID}-01-extra") is not None
+    for invalid in (None, "", "garbage", f"00-{TRACE_ID}-{PARENT_ID}-01-extra", f"ff-{TRACE_ID}-{PARENT_ID}-01",
+                    f"00-{'0' * 32}-{PARENT_ID}-01", f"00-{TRACE_ID}-{'0' * 16}-01", f"00-{TRACE_ID[:-1]}-{PARENT_ID}-01"):
+        assert Tracing.parse_traceparent(invalid) is None
+
+
+def test_spans_are_noops_while_tracing_is_off():
+    with Tracing.span("report.message") as span:
+        assert span is None
+        assert Tracing.inject({"retries": 1}) == {"retries": 1}
+    work = object()
+    assert Tracing.traced("analysis.scores", work) is work
+
+
+def test_message_span_continues_the_publisher_trace(exported):
+    properties = pika.BasicProperties(headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01", "tracestate": "v=1"})
+    with Tracing.span("report.message", parent=Tracing.extract(properties), kind=Tracing.CONSUMER) as message:
+        with Tracing.span("report.fetch"):
+            headers = Tracing.inject()
+        with pytest.raises(ValueError):
+            with Tracing.span("report.analyze"):
+                raise ValueError("bad rows")
+    spans = finished(exported)
+    assert message.context.trace_id == TRACE_ID and message.parent_id == PARENT_ID
+    assert spans["report.fetch"].parent_id == message.context.span_id
+    assert headers == {"traceparent": f"00-{TRACE_ID}-{spans['report.fetch'].context.span_id}-01",
+                       "tracestate": "v=1"}
+    assert spans["report.analyze"].error == "ValueError: bad rows"
+    assert Tracing.current_span() is None
+
+
+def test_sampling_follows_the_parent(exported):
+    Tracing._tracer.sample = 0.0
+    with Tracing.span("unsampled root") as root:
+        with Tracing.span("unsampled child"):
+            pass
+    unsampled = Tracing.parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00")
+    with Tracing.span("remote unsampled", parent=unsampled):
+        pass
+    with Tracing.span("remote sampled", parent=Tracing.parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01")):
+        pass
+    assert root.context.sampled is False
+    assert set(finished(exported)) == {"remote sampled"}
+
+
+def test_analysis_spans_follow_sections_into_the_executor(exported):
+    sections = {"scores": lambda: 1, "learning_disability": lambda: 2}
+    with Tracing.span("report.analyze") as analyze:
+        with ThreadPoolExecutor(2) as executor:
+            results, _ = run_sections(sections, executor)
+    assert results == {"scores": 1, "learning_disability": 2}
+    spans = finished(exported)
+    for name in ("analysis.scores", "analysis.learning_disability"):
+        assert spans[name].parent_id == analyze.context.span_id
+
+
+def test_postgres_queries_are_client_spans(exported):
+    db = PostgresClient.__new__(PostgresClient)
+    with Tracing.span("report.fetch") as fetch:
+        with db._observe("get_student_attendance", "SELECT  count(*)\n FROM sessions", None) as observation:
+            observation["rows"] = 1
+    query = finished(exported)["postgres.get_student_attendance"]
+    assert query.parent_id == fetch.context.span_id and query.kind == Tracing.CLIENT
+    assert query.attributes == {"db.system": "postgresql", "db.operation": "get_student_attendance",
+                                "db.statement": "SELECT count(*) FROM sessions", "db.rows": 1}
+
+
+def test_file_exporter_writes_otlp_json(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracing.Tracer(Tracing.FileExporter(str(path), "pg_reports"))
+    span = tracer.start_span("report.upload", Tracing.parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01"),
+                             links=[Tracing.SpanContext(TRACE_ID, "1" * 16)], attributes={"bytes": 10, "ok": True})
+    span.end()
+    tracer.finish(span)
+    tracer.stop()
+    request = json.loads(path.read_text())
+    resource = request["resourceSpans"][0]
+    assert resource["resource"]["attributes"] == [{"key": "service.name", "value": {"stringValue": "pg_reports"}}]
+    encoded = resource["scopeSpans"][0]["spans"][0]
+    assert encoded["traceId"] == TRACE_ID and encoded["parentSpanId"] == PARENT_ID
+    assert encoded["attributes"] == [{"key": "bytes", "value": {"intValue": "10"}},
+                                     {"key": "ok", "value": {"boolValue": True}}]
+    assert encoded["links"] == [{"traceId": TRACE_ID, "spanId": "1" * 16}]
+    assert encoded["status"] == {"code": 0}
+
+
+def test_export_failures_and_full_queue_are_counted():
+    metrics.reset()
+
+    def failing(spans):
+        raise ConnectionRefusedError("collector down")
+
+    tracer = Tracing.Tracer(failing, queue_size=1, interval=60)
+    tracer.thread = "not started"
+    for name in ("first", "second"):
+        span = tracer.start_span(name)
+        span.end()
+        tracer.finish(span)
+    assert metrics.snapshot()["counters"]["tracing.dropped"] == 1
+    tracer.thread = None
+    tracer._ensure_thread()
+    tracer.stop()
+    assert metrics.snapshot()["counters"]["tracing.export_errors"] == 1
+    metrics.reset()
+
+
+def test_recent_contexts_are_bounded():
+    recent = Tracing.RecentContexts(size=2)
+    for key in range(3):
+        recent.set(key, Tracing.SpanContext(TRACE_ID, f"{key:016x}"))
+    assert recent.get(0) is None and recent.get(2).span_id == f"{2:016x}"
@@ -0,0 +1,67 @@
+import os
+import time
+import pickle
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCheckpointStore:
+    """
+        Checkpoints as pickle files under `directory`, one per report request (keyed by its output key).
+        Only helps when the retry is consumed by the same host; use PostgresCheckpointStore
+        when several workers share the queue.
+    """
+
+    def __init__(self, directory, max_age_seconds=3600):
+        self.directory = directory
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key) -> str:
+        return os.path.join(self.directory, hashlib.sha1(str(key).encode("utf-8")).hexdigest() + ".pkl")
+
+    def save(self, key, stage, artifact):
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump({"stage": stage, "artifact": artifact}, file)
+        os.replace(tmp_path, path)
+
+    def load(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age_seconds:
+                os.remove(path)
+                return None
+            with open(path, "rb") as file:
+                return pickle.load(file)
+        except FileNotFoundError:
+            return None
+
+    def clear(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class PostgresCheckpointStore:
+    """Checkpoints in the stu_tracker.Report_checkpoint side table, visible to every worker."""
+
+    def __init__(self, db, max_age_seconds=3600):
+        self.db = db
+        self.max_age_seconds = max_age_seconds
+
+    def save(self, key, stage, artifact):
+        self.db.save_checkpoint(key, stage, pickle.dumps(artifact))
+
+    def load(self, key):
+        row = self.db.load_checkpoint(key, self.max_age_seconds)
+        if row is None:
+            return None
+        return {"stage": row["stage"], "artifact": pickle.loads(row["artifact"])}
+
+    def clear(self, key):
+        self.db.clear_checkpoint(key)
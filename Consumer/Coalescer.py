@@ -0,0 +1,91 @@
+import time
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+## One report request waiting to be answered: where to ack and where to write the result.
+## body, properties and routing_key are kept so a failed request can be republished for retry.
+ReportRequest = namedtuple(
+    "ReportRequest",
+    ["channel", "delivery_tag", "output_key", "body", "properties", "routing_key"],
+    defaults=(None, None, None),
+)
+
+
+class ReportCoalescer:
+    """
+        Collapses report requests for the same (student_id, semester_id) into one computation.
+
+        The first request for a key opens a window of `window` seconds; requests arriving
+        during it join the group. When the window closes the report is computed once and
+        delivered to every request. The serialized result is then reused for `reuse_ttl`
+        seconds so near-simultaneous repeats (double clicks) are answered without recomputing.
+
+        compute(key, request) -> str serialized report, may raise; `request` opened the group
+        deliver(key, request, js)    write js to request.output_key, mark DONE, ack
+        fail(request, error)         retry or dead-letter the request
+        schedule(delay, fn)          run fn later on the consumer thread (connection.call_later)
+    """
+
+    def __init__(self, compute, deliver, fail, schedule, window=0.2, reuse_ttl=5.0, clock=time.monotonic):
+        self.compute = compute
+        self.deliver = deliver
+        self.fail = fail
+        self.schedule = schedule
+        self.window = window
+        self.reuse_ttl = reuse_ttl
+        self.clock = clock
+        self.pending = {}
+        self.recent = {}
+        self.stats = {"requests": 0, "computed": 0, "coalesced": 0, "reused": 0}
+
+    def submit(self, key, request: ReportRequest):
+        self.stats["requests"] += 1
+        recent = self.recent.get(key)
+        if recent is not None and self.clock() - recent[0] <= self.reuse_ttl:
+            self.stats["reused"] += 1
+            logger.info(f"Reusing report for {key} computed {self.clock() - recent[0]:.2f}s ago")
+            self.deliver(key, request, recent[1])
+            return
+
+        if key in self.pending:
+            self.stats["coalesced"] += 1
+            self.pending[key].append(request)
+            return
+
+        self.pending[key] = [request]
+        self.schedule(self.window, lambda: self.flush(key))
+
+    def flush(self, key):
+        requests = self.pending.pop(key, [])
+        if not requests:
+            return
+        self._prune()
+        try:
+            js = self.compute(key, requests[0])
+        except Exception as e:
+            for request in requests:
+                self.fail(request, e)
+            return
+
+        self.stats["computed"] += 1
+        if self.reuse_ttl > 0:
+            self.recent[key] = (self.clock(), js)
+        if len(requests) > 1:
+            logger.info(f"Coalesced {len(requests)} requests for {key}")
+        for request in requests:
+            self.deliver(key, request, js)
+
+    def reset(self):
+        """Drop pending requests, e.g. after their channel died; the broker redelivers them."""
+        dropped = sum(len(requests) for requests in self.pending.values())
+        self.pending.clear()
+        if dropped:
+            logger.warning(f"Dropped {dropped} pending requests")
+
+    def _prune(self):
+        now = self.clock()
+        expired = [key for key, (at, _) in self.recent.items() if now - at > self.reuse_ttl]
+        for key in expired:
+            del self.recent[key]
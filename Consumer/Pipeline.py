@@ -0,0 +1,183 @@
+import json
+import time
+import logging
+from Config.Metrics import metrics
+from Config.Logs import summary_add
+from Config import Tracing
+
+logger = logging.getLogger(__name__)
+
+FETCH = "fetch"
+ANALYZE = "analyze"
+SERIALIZE = "serialize"
+UPLOAD = "upload"
+MARK_DONE = "mark_done"
+STAGES = [FETCH, ANALYZE, SERIALIZE, UPLOAD, MARK_DONE]
+
+## Stage timings; the names are also read by Consumer/PrefetchController
+STAGE_METRICS = {
+    FETCH: "report.fetch_seconds",
+    ANALYZE: "report.analysis_seconds",
+    SERIALIZE: "report.serialize_seconds",
+    UPLOAD: "report.upload_seconds",
+    MARK_DONE: "report.status_update_seconds",
+}
+## Error counters per dependency for stages that talk to Postgres or S3
+STAGE_ERRORS = {FETCH: "db.errors", UPLOAD: "s3.errors", MARK_DONE: "db.errors"}
+
+
+class StageFailed(Exception):
+    """A pipeline stage failed; the last completed stage has been checkpointed."""
+
+    def __init__(self, stage, cause):
+        super().__init__(f"Report stage '{stage}' failed: {cause!r}")
+        self.stage = stage
+        self.cause = cause
+
+
+class UploadFailed(Exception):
+    pass
+
+
+class ReportPipeline:
+    """
+        Runs a report as explicit stages: fetch -> analyze -> serialize -> upload -> mark_done.
+
+        Checkpoints are written only when a stage fails: the artifact of the last completed
+        stage is saved under the request's output key, so the happy path does no extra I/O. A
+        retry of the same message loads it in compute() and resumes at the failed stage instead
+        of re-fetching and re-analyzing; another request for the same student never sees it.
+        A TypeError while serializing is permanent and is raised as is.
+
+        fetch(student_id, semester_id) -> data     analyze(data) -> report dict
+        upload(output_key, bytes) -> bool           mark_done(output_key)
+        lookup(student_id, semester_id) -> str      optional: a serialized report that is still
+                                                    current (Precompute/), or None to compute it
+
+        A request for only some report sections passes them to fetch, lookup and analyze as an
+        extra last argument.
+    """
+
+    def __init__(self, fetch, analyze, upload, mark_done, store=None, serialize=json.dumps, lookup=None):
+        self.fetch = fetch
+        self.analyze = analyze
+        self.upload = upload
+        self.mark_done = mark_done
+        self.store = store
+        self.serialize = serialize
+        self.lookup = lookup
+        ## Checkpoints loaded by compute(), consumed by deliver() for the same key
+        self.resumed = {}
+
+    def _load(self, key):
+        if self.store is None:
+            return None
+        try:
+            checkpoint = self.store.load(key)
+        except Exception:
+            logger.exception(f"Unable to load checkpoint for {key}")
+            return None
+        if checkpoint is not None:
+            metrics.inc(f"report.resumed.{checkpoint['stage']}")
+            logger.info(f"Resuming {key} after stage '{checkpoint['stage']}'")
+        return checkpoint
+
+    def _fail(self, key, stage, error, completed=None, artifact=None):
+        self.resumed.pop(key, None)
+        metrics.inc(f"report.stage_errors.{stage}")
+        if stage in STAGE_ERRORS:
+            metrics.inc(STAGE_ERRORS[stage])
+        if self.store is not None and completed is not None:
+            try:
+                self.store.save(key, completed, artifact)
+            except Exception:
+                logger.exception(f"Unable to checkpoint {key} after stage '{completed}'")
+        raise StageFailed(stage, error) from error
+
+    def _lookup(self, *request):
+        try:
+            js = self.lookup(*request)
+        except Exception:
+            logger.exception(f"Precomputed report lookup failed for {':'.join(map(str, request))}")
+            return None
+        metrics.inc("report.precomputed_hits" if js is not None else "report.precomputed_misses")
+        return js
+
+    def _stage(self, stage, fn, *args):
+        started = time.perf_counter()
+        try:
+            with Tracing.span(f"report.{stage}"):
+                return fn(*args)
+        finally:
+            seconds = time.perf_counter() - started
+            metrics.observe(STAGE_METRICS[stage], seconds)
+            summary_add(f"{stage}_seconds", seconds)
+
+    def compute(self, key, student_id, semester_id, sections=None) -> str:
+        """fetch, analyze and serialize, resuming from a checkpoint of `key` if there is one."""
+        request = (student_id, semester_id) if sections is None else (student_id, semester_id, sections)
+        extra = request[2:]
+        checkpoint = self._load(key)
+        completed, artifact = None, None
+        if checkpoint is not None:
+            self.resumed[key] = checkpoint
+            completed, artifact = checkpoint["stage"], checkpoint["artifact"]
+        if completed == SERIALIZE:
+            return artifact
+        if completed == UPLOAD:
+            return artifact[1]
+
+        if completed is None and self.lookup is not None:
+            js = self._lookup(*request)
+            if js is not None:
+                return js
+
+        if completed is None:
+            try:
+                artifact = self._stage(FETCH, self.fetch, *request)
+            except Exception as e:
+                self._fail(key, FETCH, e)
+            completed = FETCH
+
+        if completed == FETCH:
+            data = artifact
+            try:
+                artifact = self._stage(ANALYZE, self.analyze, data, *extra)
+            except Exception as e:
+                self._fail(key, ANALYZE, e, FETCH, data)
+
+        report = artifact
+        try:
+            return self._stage(SERIALIZE, self.serialize, report)
+        except TypeError:
+            self.resumed.pop(key, None)
+            self.clear(key)
+            raise
+        except Exception as e:
+            self._fail(key, SERIALIZE, e, ANALYZE, report)
+
+    def deliver(self, key, output_key, js: str):
+        """upload to output_key and mark it DONE, then drop the checkpoint compute() resumed from."""
+        checkpoint = self.resumed.pop(key, None)
+        uploaded = checkpoint is not None and checkpoint["stage"] == UPLOAD and checkpoint["artifact"][0] == output_key
+        if not uploaded:
+            try:
+                ### utf-8 will make it convertable on the frontend Parsable
+                if not self._stage(UPLOAD, self.upload, output_key, js.encode('utf-8')):
+                    raise UploadFailed(f"S3 put_object failed for {output_key}")
+            except Exception as e:
+                self._fail(key, UPLOAD, e, SERIALIZE, js)
+        try:
+            self._stage(MARK_DONE, self.mark_done, output_key)
+        except Exception as e:
+            self._fail(key, MARK_DONE, e, UPLOAD, (output_key, js))
+        if checkpoint is not None:
+            self.clear(key)
+
+    def clear(self, key):
+        if self.store is None:
+            return
+        try:
+            self.store.clear(key)
+        except Exception:
+            logger.exception(f"Unable to clear checkpoint for {key}")
@@ -0,0 +1,115 @@
+import logging
+from Config.Metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+## Metric names recorded by the consumer (main.py) and read back by the controller
+PROCESSING = "report.processing_seconds"
+DB_STAGES = ("report.fetch_seconds", "report.status_update_seconds")
+S3_STAGES = ("report.upload_seconds",)
+ERROR_COUNTERS = ("report.errors", "db.errors", "s3.errors")
+WAIT_PREFIX = "scheduler."
+WAIT_SUFFIX = ".wait_seconds"
+
+
+class PrefetchController:
+    """
+        Adjusts the channel prefetch between `minimum` and `maximum` from what the consumer
+        measured since the last evaluation (deltas of the shared metrics registry):
+
+        - error rate above `error_rate_limit`            -> halve   ("errors")
+        - mean DB stage latency above `db_latency_limit`
+          or `db_slowdown_factor` x its healthy baseline -> halve   ("db_slow")
+        - mean local wait above `max_wait`               -> minus 1 ("latency")
+        - worker busy less than `target_utilization`
+          while the broker still has a backlog           -> plus 1  ("underutilized")
+
+        `apply(count)` sets the prefetch (RabbitMQ.set_prefetch); `backlog()` returns the broker
+        queue depth or None when unknown.
+    """
+
+    def __init__(self, apply, minimum=1, maximum=32, initial=None, backlog=None,
+                 target_utilization=0.85, max_wait=2.0, db_latency_limit=0.5,
+                 db_slowdown_factor=2.0, error_rate_limit=0.05, registry=metrics):
+        self.apply = apply
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backlog = backlog
+        self.target_utilization = target_utilization
+        self.max_wait = max_wait
+        self.db_latency_limit = db_latency_limit
+        self.db_slowdown_factor = db_slowdown_factor
+        self.error_rate_limit = error_rate_limit
+        self.registry = registry
+        self.db_baseline = None
+        self.previous = registry.snapshot()
+        self.prefetch = self._clamp(initial if initial is not None else minimum)
+        self.apply(self.prefetch)
+        self.registry.set("consumer.prefetch", self.prefetch)
+
+    def _clamp(self, value) -> int:
+        return max(self.minimum, min(self.maximum, int(value)))
+
+    def window(self, snapshot) -> dict:
+        """Deltas between the previous snapshot and `snapshot`."""
+        previous = self.previous
+
+        def histogram_delta(name):
+            now = snapshot["histograms"].get(name, {"count": 0, "sum": 0.0})
+            before = previous["histograms"].get(name, {"count": 0, "sum": 0.0})
+            return now["count"] - before["count"], now["sum"] - before["sum"]
+
+        def mean(names):
+            count, total = 0, 0.0
+            for name in names:
+                c, t = histogram_delta(name)
+                count, total = count + c, total + t
+            return (total / count) if count else None
+
+        messages, busy = histogram_delta(PROCESSING)
+        errors = sum(snapshot["counters"].get(n, 0) - previous["counters"].get(n, 0) for n in ERROR_COUNTERS)
+        wait_names = [n for n in snapshot["histograms"] if n.startswith(WAIT_PREFIX) and n.endswith(WAIT_SUFFIX)]
+        elapsed = max(1e-9, snapshot["timestamp"] - previous["timestamp"])
+        return {
+            "messages": messages,
+            "utilization": min(1.0, busy / elapsed),
+            "error_rate": errors / max(1, messages),
+            "db_latency": mean(DB_STAGES),
+            "s3_latency": mean(S3_STAGES),
+            "wait": mean(wait_names),
+        }
+
+    def decide(self, window) -> tuple:
+        if window["error_rate"] > self.error_rate_limit:
+            return self.prefetch // 2, "errors"
+        db_latency = window["db_latency"]
+        if db_latency is not None:
+            slow = db_latency > self.db_latency_limit or (
+                self.db_baseline is not None and db_latency > self.db_baseline * self.db_slowdown_factor)
+            if slow:
+                return self.prefetch // 2, "db_slow"
+            ## only healthy windows move the baseline
+            self.db_baseline = db_latency if self.db_baseline is None else 0.8 * self.db_baseline + 0.2 * db_latency
+        if window["wait"] is not None and window["wait"] > self.max_wait:
+            return self.prefetch - 1, "latency"
+        if window["messages"] and window["utilization"] < self.target_utilization:
+            backlog = self.backlog() if self.backlog is not None else None
+            if backlog is None or backlog > 0:
+                return self.prefetch + 1, "underutilized"
+        return self.prefetch, "hold"
+
+    def evaluate(self) -> tuple:
+        snapshot = self.registry.snapshot()
+        window = self.window(snapshot)
+        self.previous = snapshot
+        target, reason = self.decide(window)
+        target = self._clamp(target)
+
+        self.registry.inc(f"prefetch.decisions.{reason}")
+        self.registry.set("consumer.utilization", round(window["utilization"], 4))
+        if target != self.prefetch:
+            logger.info(f"Prefetch {self.prefetch} -> {target} ({reason}): {window}")
+            self.apply(target)
+            self.prefetch = target
+        self.registry.set("consumer.prefetch", self.prefetch)
+        return target, reason
@@ -0,0 +1,93 @@
+import time
+import logging
+from collections import deque, OrderedDict
+from Config.Metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+
+class FairShareScheduler:
+    """
+        Local dispatch queue in front of the report handler.
+
+        Classes are served in precedence order (`classes[0]` first), so interactive work
+        always goes before bulk work. To keep bulk from starving, after `max_consecutive`
+        dispatches of a higher class while a lower class is waiting, one item of the lower
+        class is dispatched (0 = strict precedence).
+        Within a class, organizations are served round-robin so one organization's bulk
+        regeneration cannot monopolize the worker.
+    """
+
+    def __init__(self, classes=(INTERACTIVE, BULK), max_consecutive=20, clock=time.monotonic):
+        self.classes = list(classes)
+        self.max_consecutive = max_consecutive
+        self.clock = clock
+        ## class -> OrderedDict(org -> deque[(enqueued_at, item)]); dict order is the round-robin order
+        self.queues = {klass: OrderedDict() for klass in self.classes}
+        self.consecutive = 0
+
+    def submit(self, item, klass, org=None, enqueued_at=None):
+        if klass not in self.queues:
+            raise ValueError(f"Unknown scheduling class: {klass}")
+        orgs = self.queues[klass]
+        if org not in orgs:
+            orgs[org] = deque()
+        orgs[org].append((enqueued_at if enqueued_at is not None else self.clock(), item))
+        metrics.inc(f"scheduler.{klass}.submitted")
+        self._record_depth(klass)
+
+    def clear(self):
+        """Forget every buffered item (their deliveries are redelivered after a reconnect)."""
+        for klass in self.classes:
+            self.queues[klass].clear()
+            self._record_depth(klass)
+        self.consecutive = 0
+
+    def depth(self, klass=None) -> int:
+        if klass is not None:
+            return sum(len(q) for q in self.queues[klass].values())
+        return sum(self.depth(k) for k in self.classes)
+
+    def __len__(self):
+        return self.depth()
+
+    def next(self):
+        """Pop the next item to process, or None when nothing is waiting."""
+        waiting = [klass for klass in self.classes if self.queues[klass]]
+        if not waiting:
+            return None
+        klass = waiting[0]
+        if len(waiting) > 1 and self.max_consecutive and self.consecutive >= self.max_consecutive:
+            klass = waiting[1]
+            self.consecutive = 0
+        elif len(waiting) > 1:
+            self.consecutive += 1
+        else:
+            self.consecutive = 0
+
+        orgs = self.queues[klass]
+        org, queue = next(iter(orgs.items()))
+        enqueued_at, item = queue.popleft()
+        del orgs[org]
+        if queue:
+            ## re-append so the organization goes to the back of the round-robin order
+            orgs[org] = queue
+
+        metrics.inc(f"scheduler.{klass}.dispatched")
+        metrics.observe(f"scheduler.{klass}.wait_seconds", max(0.0, self.clock() - enqueued_at))
+        self._record_depth(klass)
+        return item
+
+    def _record_depth(self, klass):
+        metrics.set(f"scheduler.{klass}.depth", self.depth(klass))
+
+
+def classify(default_class, properties, interactive_priority=5) -> str:
+    """Scheduling class of a message: its AMQP priority when set, otherwise the queue's class."""
+    priority = getattr(properties, "priority", None)
+    if priority is None:
+        return default_class
+    return INTERACTIVE if priority >= interactive_priority else BULK
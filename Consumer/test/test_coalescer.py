@@ -0,0 +1,95 @@
+# test_coalescer.py
+import pytest
+
+from Consumer.Coalescer import ReportCoalescer, ReportRequest
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def harness():
+    state = {"scheduled": [], "computed": [], "delivered": [], "failed": []}
+    clock = FakeClock()
+
+    def compute(key, request):
+        state["computed"].append(key)
+        if key[0] == "bad":
+            raise TypeError("not serializable")
+        return f"report:{key[0]}:{key[1]}"
+
+    coalescer = ReportCoalescer(
+        compute=compute,
+        deliver=lambda key, request, js: state["delivered"].append((request.output_key, js)),
+        fail=lambda request, error: state["failed"].append((request.output_key, type(error))),
+        schedule=lambda delay, fn: state["scheduled"].append((delay, fn)),
+        window=0.5,
+        reuse_ttl=5.0,
+        clock=clock,
+    )
+    return coalescer, state, clock
+
+
+def request(tag, key):
+    return ReportRequest(channel=None, delivery_tag=tag, output_key=key)
+
+
+def run_scheduled(state):
+    scheduled, state["scheduled"] = state["scheduled"], []
+    for _, fn in scheduled:
+        fn()
+
+
+def test_duplicates_in_window_are_computed_once(harness):
+    coalescer, state, _ = harness
+    coalescer.submit((1, 2), request(1, "a.json"))
+    coalescer.submit((1, 2), request(2, "b.json"))
+    coalescer.submit((3, 2), request(3, "c.json"))
+    assert len(state["scheduled"]) == 2
+    assert state["scheduled"][0][0] == 0.5
+
+    run_scheduled(state)
+    assert state["computed"] == [(1, 2), (3, 2)]
+    assert state["delivered"] == [
+        ("a.json", "report:1:2"), ("b.json", "report:1:2"), ("c.json", "report:3:2"),
+    ]
+    assert coalescer.stats["coalesced"] == 1
+
+
+def test_recent_result_is_reused_within_ttl(harness):
+    coalescer, state, clock = harness
+    coalescer.submit((1, 2), request(1, "a.json"))
+    run_scheduled(state)
+
+    clock.now = 3.0
+    coalescer.submit((1, 2), request(2, "b.json"))
+    assert state["scheduled"] == []
+    assert state["delivered"][-1] == ("b.json", "report:1:2")
+    assert coalescer.stats["reused"] == 1
+
+
+def test_expired_result_is_recomputed(harness):
+    coalescer, state, clock = harness
+    coalescer.submit((1, 2), request(1, "a.json"))
+    run_scheduled(state)
+
+    clock.now = 10.0
+    coalescer.submit((1, 2), request(2, "b.json"))
+    run_scheduled(state)
+    assert state["computed"] == [(1, 2), (1, 2)]
+    assert (1, 2) in coalescer.recent
+
+
+def test_serialization_error_fails_every_request(harness):
+    coalescer, state, _ = harness
+    coalescer.submit(("bad", 2), request(1, "a.json"))
+    coalescer.submit(("bad", 2), request(2, "b.json"))
+    run_scheduled(state)
+    assert state["failed"] == [("a.json", TypeError), ("b.json", TypeError)]
+    assert state["delivered"] == []
+    assert ("bad", 2) not in coalescer.recent
@@ -0,0 +1,192 @@
+# test_pipeline.py
+import pytest
+
+from Consumer.Pipeline import ReportPipeline, StageFailed, FETCH, ANALYZE, SERIALIZE, UPLOAD, MARK_DONE
+from Consumer.Checkpoint import LocalCheckpointStore
+from Config.Metrics import metrics
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+class Stages:
+    """Counts calls per stage; `failures` maps a stage to how many times it should fail."""
+
+    def __init__(self, **failures):
+        self.failures = failures
+        self.calls = {FETCH: 0, ANALYZE: 0, UPLOAD: 0, MARK_DONE: 0}
+        self.uploaded = {}
+        self.done = []
+
+    def _maybe_fail(self, stage):
+        self.calls[stage] += 1
+        if self.failures.get(stage, 0) > 0:
+            self.failures[stage] -= 1
+            raise ConnectionError(f"{stage} is down")
+
+    def fetch(self, student_id, semester_id):
+        self._maybe_fail(FETCH)
+        return {"student_id": student_id, "semester_id": semester_id}
+
+    def analyze(self, data):
+        self._maybe_fail(ANALYZE)
+        return {"scores": [data["student_id"], data["semester_id"]]}
+
+    def upload(self, output_key, body):
+        self.calls[UPLOAD] += 1
+        if self.failures.get(UPLOAD, 0) > 0:
+            self.failures[UPLOAD] -= 1
+            return False
+        self.uploaded[output_key] = body
+        return True
+
+    def mark_done(self, output_key):
+        self._maybe_fail(MARK_DONE)
+        self.done.append(output_key)
+
+
+def make_pipeline(stages, store):
+    return ReportPipeline(stages.fetch, stages.analyze, stages.upload, stages.mark_done, store=store)
+
+
+def run(pipeline, output_key="out.json"):
+    js = pipeline.compute(output_key, 7, 3)
+    pipeline.deliver(output_key, output_key, js)
+
+
+def test_happy_path_writes_no_checkpoint(tmp_path):
+    stages = Stages()
+    store = LocalCheckpointStore(str(tmp_path))
+    run(make_pipeline(stages, store))
+    assert stages.uploaded == {"out.json": b'{"scores": [7, 3]}'}
+    assert stages.done == ["out.json"]
+    assert list(tmp_path.iterdir()) == []
+    assert metrics.snapshot()["histograms"]["report.fetch_seconds"]["count"] == 1
+
+
+def test_analysis_failure_resumes_without_refetching(tmp_path):
+    stages = Stages(**{ANALYZE: 1})
+    store = LocalCheckpointStore(str(tmp_path))
+    pipeline = make_pipeline(stages, store)
+    with pytest.raises(StageFailed) as failed:
+        run(pipeline)
+    assert failed.value.stage == ANALYZE
+    assert store.load("out.json")["stage"] == FETCH
+
+    run(pipeline)
+    assert stages.calls[FETCH] == 1 and stages.calls[ANALYZE] == 2
+    assert stages.done == ["out.json"]
+    assert store.load("out.json") is None
+    assert metrics.snapshot()["counters"]["report.resumed.fetch"] == 1
+
+
+def test_failed_upload_is_retried_from_serialized_report(tmp_path):
+    stages = Stages(**{UPLOAD: 1})
+    store = LocalCheckpointStore(str(tmp_path))
+    pipeline = make_pipeline(stages, store)
+    with pytest.raises(StageFailed) as failed:
+        run(pipeline)
+    assert failed.value.stage == UPLOAD
+    assert store.load("out.json")["stage"] == SERIALIZE
+    assert metrics.snapshot()["counters"]["s3.errors"] == 1
+
+    run(pipeline)
+    assert stages.calls == {FETCH: 1, ANALYZE: 1, UPLOAD: 2, MARK_DONE: 1}
+    assert "out.json" in stages.uploaded
+
+
+def test_status_failure_does_not_upload_twice(tmp_path):
+    stages = Stages(**{MARK_DONE: 1})
+    store = LocalCheckpointStore(str(tmp_path))
+    pipeline = make_pipeline(stages, store)
+    with pytest.raises(StageFailed):
+        run(pipeline)
+    run(pipeline)
+    assert stages.calls[UPLOAD] == 1 and stages.calls[MARK_DONE] == 2
+    assert stages.done == ["out.json"]
+
+
+def test_upload_checkpoint_only_covers_its_output_key(tmp_path):
+    stages = Stages(**{MARK_DONE: 1})
+    store = LocalCheckpointStore(str(tmp_path))
+    pipeline = make_pipeline(stages, store)
+    with pytest.raises(StageFailed):
+        run(pipeline, "a.json")
+    run(pipeline, "b.json")
+    assert sorted(stages.uploaded) == ["a.json", "b.json"]
+
+
+def test_requests_for_the_same_student_do_not_share_checkpoints(tmp_path):
+    stages = Stages(**{ANALYZE: 1})
+    store = LocalCheckpointStore(str(tmp_path))
+    pipeline = make_pipeline(stages, store)
+    with pytest.raises(StageFailed):
+        run(pipeline, "a.json")
+    run(pipeline, "b.json")
+    assert stages.calls[FETCH] == 2
+    assert store.load("b.json") is None
+    assert store.load("a.json")["stage"] == FETCH
+
+    run(pipeline, "a.json")
+    assert stages.calls[FETCH] == 2 and sorted(stages.done) == ["a.json", "b.json"]
+    assert store.load("a.json") is None
+
+
+def test_serialization_error_is_permanent(tmp_path):
+    stages = Stages()
+    store = LocalCheckpointStore(str(tmp_path))
+    pipeline = ReportPipeline(
+        lambda s, sem: {"when": object()}, lambda data: data, stages.upload, stages.mark_done, store=store,
+    )
+    with pytest.raises(TypeError):
+        pipeline.compute("7:3", 7, 3)
+    assert store.load("7:3") is None
+
+
+def test_expired_checkpoint_is_ignored(tmp_path):
+    store = LocalCheckpointStore(str(tmp_path), max_age_seconds=-1)
+    store.save("7:3", FETCH, {"student_id": 7})
+    assert store.load("7:3") is None
+
+
+def test_precomputed_report_skips_fetch_and_analyze():
+    stages = Stages()
+    precomputed = {(7, 3): '{"scores": "precomputed"}'}
+    pipeline = ReportPipeline(stages.fetch, stages.analyze, stages.upload, stages.mark_done,
+                              lookup=lambda s, sem: precomputed.get((s, sem)))
+    run(pipeline)
+    assert stages.calls[FETCH] == 0 and stages.calls[ANALYZE] == 0
+    assert stages.uploaded == {"out.json": b'{"scores": "precomputed"}'}
+
+    precomputed.clear()
+    run(pipeline, "fresh.json")
+    assert stages.calls[FETCH] == 1
+    assert metrics.snapshot()["counters"]["report.precomputed_misses"] == 1
+
+
+def test_failing_lookup_falls_back_to_compute():
+    stages = Stages()
+
+    def lookup(student_id, semester_id):
+        raise RuntimeError("Database query failed")
+
+    pipeline = ReportPipeline(stages.fetch, stages.analyze, stages.upload, stages.mark_done, lookup=lookup)
+    run(pipeline)
+    assert stages.uploaded == {"out.json": b'{"scores": [7, 3]}'}
+
+
+def test_sections_reach_fetch_lookup_and_analyze():
+    seen = []
+    pipeline = ReportPipeline(
+        fetch=lambda student_id, semester_id, sections: seen.append(("fetch", sections)) or [student_id],
+        analyze=lambda data, sections: seen.append(("analyze", sections)) or {"data": data},
+        upload=lambda output_key, body: True,
+        mark_done=lambda output_key: None,
+        lookup=lambda student_id, semester_id, sections: seen.append(("lookup", sections)),
+    )
+    assert pipeline.compute("7:3:all_scores", 7, 3, ("all_scores",)) == '{"data": [7]}'
+    assert seen == [("lookup", ("all_scores",)), ("fetch", ("all_scores",)), ("analyze", ("all_scores",))]
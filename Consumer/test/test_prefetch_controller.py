@@ -0,0 +1,76 @@
+# test_prefetch_controller.py
+from Config.Metrics import MetricsRegistry
+from Consumer.PrefetchController import PrefetchController
+
+
+class Harness:
+    def __init__(self, backlog=10, **kwargs):
+        self.registry = MetricsRegistry()
+        self.applied = []
+        self.now = 1000.0
+        self.registry.snapshot = self._snapshot(self.registry.snapshot)
+        self.backlog_value = backlog
+        self.controller = PrefetchController(
+            apply=self.applied.append, minimum=1, maximum=8, initial=4,
+            backlog=lambda: self.backlog_value, registry=self.registry, **kwargs)
+
+    def _snapshot(self, snapshot):
+        def wrapped():
+            out = snapshot()
+            out["timestamp"] = self.now
+            return out
+        return wrapped
+
+    def run_window(self, messages=10, processing=0.1, db=0.05, errors=0, wait=None, seconds=10.0):
+        for _ in range(messages):
+            self.registry.observe("report.processing_seconds", processing)
+            self.registry.observe("report.fetch_seconds", db)
+            if wait is not None:
+                self.registry.observe("scheduler.interactive.wait_seconds", wait)
+        if errors:
+            self.registry.inc("report.errors", errors)
+        self.now += seconds
+        return self.controller.evaluate()
+
+
+def test_initial_prefetch_is_applied():
+    h = Harness()
+    assert h.applied == [4]
+    assert h.registry.snapshot()["gauges"]["consumer.prefetch"] == 4
+
+
+def test_underutilized_worker_with_backlog_increases():
+    h = Harness()
+    assert h.run_window(messages=10, processing=0.1) == (5, "underutilized")
+    assert h.applied[-1] == 5
+
+
+def test_no_backlog_holds():
+    h = Harness(backlog=0)
+    assert h.run_window(messages=10, processing=0.1) == (4, "hold")
+    assert h.applied == [4]
+
+
+def test_saturated_worker_holds():
+    h = Harness()
+    assert h.run_window(messages=10, processing=1.0) == (4, "hold")
+
+
+def test_errors_halve_prefetch():
+    h = Harness()
+    assert h.run_window(messages=10, errors=3) == (2, "errors")
+
+
+def test_db_slowdown_against_baseline_halves():
+    h = Harness(db_latency_limit=10.0)
+    h.run_window(messages=10, processing=1.0, db=0.05)
+    assert h.run_window(messages=10, processing=1.0, db=0.2) == (2, "db_slow")
+
+
+def test_local_wait_decrements_and_respects_minimum():
+    h = Harness(max_wait=1.0)
+    assert h.run_window(messages=10, processing=1.0, wait=3.0) == (3, "latency")
+    for _ in range(5):
+        h.run_window(messages=10, errors=5)
+    assert h.controller.prefetch == 1
+    assert h.registry.snapshot()["counters"]["prefetch.decisions.errors"] == 5
@@ -0,0 +1,89 @@
+# test_scheduler.py
+from types import SimpleNamespace
+import pytest
+
+from Consumer.Scheduler import FairShareScheduler, classify, INTERACTIVE, BULK
+from Config.Metrics import metrics, Histogram
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def drain(scheduler):
+    out = []
+    while (item := scheduler.next()) is not None:
+        out.append(item)
+    return out
+
+
+def test_interactive_goes_before_bulk():
+    scheduler = FairShareScheduler(max_consecutive=0)
+    scheduler.submit("bulk-1", BULK, org=1)
+    scheduler.submit("bulk-2", BULK, org=1)
+    scheduler.submit("int-1", INTERACTIVE, org=1)
+    assert drain(scheduler) == ["int-1", "bulk-1", "bulk-2"]
+
+
+def test_organizations_share_a_class_round_robin():
+    scheduler = FairShareScheduler()
+    for i in range(3):
+        scheduler.submit(f"a{i}", BULK, org="A")
+    scheduler.submit("b0", BULK, org="B")
+    scheduler.submit("c0", BULK, org="C")
+    assert drain(scheduler) == ["a0", "b0", "c0", "a1", "a2"]
+
+
+def test_bulk_is_not_starved():
+    scheduler = FairShareScheduler(max_consecutive=2)
+    scheduler.submit("bulk", BULK, org=1)
+    for i in range(4):
+        scheduler.submit(f"int-{i}", INTERACTIVE, org=1)
+    assert drain(scheduler) == ["int-0", "int-1", "bulk", "int-2", "int-3"]
+
+
+def test_depth_and_wait_metrics():
+    clock = FakeClock()
+    scheduler = FairShareScheduler(clock=clock)
+    scheduler.submit("int-1", INTERACTIVE, org=1)
+    scheduler.submit("bulk-1", BULK, org=1)
+    assert scheduler.depth(INTERACTIVE) == 1 and len(scheduler) == 2
+
+    clock.now = 0.3
+    scheduler.next()
+    snapshot = metrics.snapshot()
+    assert snapshot["gauges"]["scheduler.interactive.depth"] == 0
+    assert snapshot["gauges"]["scheduler.bulk.depth"] == 1
+    assert snapshot["histograms"]["scheduler.interactive.wait_seconds"]["count"] == 1
+    assert snapshot["histograms"]["scheduler.interactive.wait_seconds"]["max"] == pytest.approx(0.3)
+
+
+def test_unknown_class_is_rejected():
+    with pytest.raises(ValueError):
+        FairShareScheduler().submit("x", "urgent")
+
+
+def test_classify_uses_message_priority():
+    assert classify(BULK, SimpleNamespace(priority=None)) == BULK
+    assert classify(BULK, SimpleNamespace(priority=9)) == INTERACTIVE
+    assert classify(INTERACTIVE, SimpleNamespace(priority=1)) == BULK
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.05, 0.5, 5.0):
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    assert histogram.quantile(1.0) == 5.0
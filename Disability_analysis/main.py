@@ -1,15 +1,63 @@
-import pickle
-import pandas as pd
 import logging
-
-logging.basicConfig(
-    level=logging.INFO, # Adjust to logging.DEBUG for more verbose logs
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from Models.main import load_model, LOGISTIC_MODEL_PATH
 
 logger = logging.getLogger(__name__)
 
 
+def exam_score(row) -> float:
+    """The row's normalized score; feature store rows carry it as norm."""
+    if row.get("norm") is not None:
+        return float(row["norm"])
+    return float(row.get("score") / row.get("max_score")) * 100
+
+
+def previous_score(prev_row, row) -> float:
+    """The model's Previous_Scores input: prev_row's score over row's max_score, stored as prev_score."""
+    if row.get("prev_score") is not None:
+        return float(row["prev_score"])
+    return float(prev_row.get("score") / row.get("max_score")) * 100
+
+
+"""
+    Package list of classifications and the student's normalized scores into descriptive dict
+"""
+def prediction_summary(predictions_: list, data: list) -> dict:
+    pred = None
+    if len(predictions_) <= 3:
+        return {
+            "classification": int(0),
+            "notes": 'Not enough data to make prognosis.',
+            "confidence": float(100),
+            "data": data
+        }
+    positive = predictions_.count(1)
+    negative = predictions_.count(0)
+    if positive == negative:
+        pred = {
+            "classification": int(0),
+            "notes": 'Split prediction, unsure of prognosis.',
+            "confidence": float(50),
+            "data": data
+        }
+    elif positive > negative:
+        confidence = float(positive / len(predictions_)) * 100
+        pred = {
+            "classification": int(1),
+            "notes": 'Postitive classification, based on previous assessment scores and questionnaires',
+            "confidence": float(confidence),
+            "data": data
+        }
+    else:
+        confidence = float(negative / len(predictions_)) * 100
+        pred = {
+            "classification": int(1),
+            "notes": 'Negative classification, based on previous assessment scores and questionnaires',
+            "confidence": float(confidence),
+            "data": data
+        }
+    return pred
+
+
 class DisabilityAnalysis:
     def __init__(self, assessment_data: list[dict], attendance_data: dict):
         self.assessment_data = assessment_data
@@ -22,67 +70,29 @@ class DisabilityAnalysis:
         return not self.attendance_data
 
     def assessment_data_values_(self) ->list:
-        values = []
-        for row in self.assessment_data:
-            score = row.get('score')
-            max_score = row.get('max_score')
-            norm = float(score/max_score) * 100 
-            values.append(norm)
-        return values
+        return [exam_score(row) for row in self.assessment_data]
 
 
     """
         Package list of classifications into descriptive dict
     """
     def prediction_dict(self, predictions_: list) -> dict:
-        pred = None
-        if len(predictions_) <= 3:
-            return {
-                "classification": int(0),
-                "notes": 'Not enough data to make prognosis.',
-                "confidence": float(100),
-                "data": self.assessment_data_values_()
-            }
-        positive = predictions_.count(1)
-        negative = predictions_.count(0)
-        if positive == negative:
-            pred = {
-                "classification": int(0),
-                "notes": 'Split prediction, unsure of prognosis.',
-                "confidence": float(50),
-                "data": self.assessment_data_values_()
-            }
-        elif positive > negative:
-            confidence = float(positive / len(predictions_)) * 100
-            pred = {
-                "classification": int(1),
-                "notes": 'Postitive classification, based on previous assessment scores and questionnaires',
-                "confidence": float(confidence),
-                "data": self.assessment_data_values_()
-            }
-        else:
-            confidence = float(negative / len(predictions_)) * 100
-            pred = {
-                "classification": int(1),
-                "notes": 'Negative classification, based on previous assessment scores and questionnaires',
-                "confidence": float(confidence),
-                "data": self.assessment_data_values_()
-            }
-        return pred
+        return prediction_summary(predictions_, self.assessment_data_values_())
     
 
     def get_attendance_ratio(self)->float:
         return float(self.attendance_data.get('present')) /float(self.attendance_data.get('total_sessions')) * 100 
 
     def student_analysis_(self) ->dict:
+        import pandas as pd
+
         if self.isAssessmentDataEmpty():
             return None
         if self.isAttendanceDataEmpty():
             return None
         disability_model = None
         try:
-            with open("./Models/logistic_model.pkl", 'rb') as file:
-                disability_model = pickle.load(file)
+            disability_model = load_model(LOGISTIC_MODEL_PATH)
         except OSError as e:
             logging.info("unable to load logistic_model.pkl")
             return None
@@ -92,13 +102,11 @@ class DisabilityAnalysis:
         for i in range(1, len(self.assessment_data)):
             prev_row = self.assessment_data[i-1]
             row = self.assessment_data[i]
-            exam_score = float(row.get("score") / row.get("max_score")) * 100
-            prev_score = float(prev_row.get("score") / row.get("max_score")) * 100
             tutor_sessions = float(row.get("tutor_sessions"))
             df = pd.DataFrame([{
                 "Attendance": float(attendance_ratio),
-                "Previous_Scores": float(prev_score),
-                "Exam_Score": float(exam_score),
+                "Previous_Scores": previous_score(prev_row, row),
+                "Exam_Score": exam_score(row),
                 "Tutoring_Sessions": float(tutor_sessions)
             }])
             prediction = disability_model.predict(df)[0]
@@ -26,6 +26,15 @@ class DummyModel:
         return np.array(out, dtype=int)
 
 
+class Recorder(DummyModel):
+    """DummyModel keeping the rows it was asked to predict."""
+    inputs = []
+
+    def predict(self, X):
+        Recorder.inputs.append(X.iloc[0].to_dict())
+        return super().predict(X)
+
+
 @pytest.fixture
 def assessment_data():
     # 4 records produce 3 predictions in student_analysis_
@@ -144,4 +153,23 @@ def test_student_analysis_mixed_predictions(assessment_data, attendance_data, tm
     da = DisabilityAnalysis(assessment_data, attendance_data)
     out = da.student_analysis_()
     assert out["classification"] == 0
-    assert "Not enough data" in out["notes"]
\ No newline at end of file
+    assert "Not enough data" in out["notes"]
+
+
+def test_student_analysis_reads_stored_model_inputs(assessment_data, attendance_data, tmp_path, monkeypatch):
+    models_dir = tmp_path / "Models"
+    models_dir.mkdir()
+    with open(models_dir / "logistic_model.pkl", "wb") as f:
+        pickle.dump(Recorder(returns=1), f)
+    monkeypatch.chdir(tmp_path)
+
+    # Feature store rows (Migrations/features.py) carry the normalized scores, not score/max_score
+    stored = [{"tutor_sessions": row["tutor_sessions"], "norm": row["score"] / row["max_score"] * 100,
+               "prev_score": None if i == 0 else assessment_data[i - 1]["score"] / row["max_score"] * 100}
+              for i, row in enumerate(assessment_data)]
+    Recorder.inputs = []
+    out = DisabilityAnalysis(stored, attendance_data).student_analysis_()
+    from_stored, Recorder.inputs = Recorder.inputs, []
+    assert out == DisabilityAnalysis(assessment_data, attendance_data).student_analysis_()
+    assert from_stored == Recorder.inputs
+    assert from_stored[0]["Previous_Scores"] == 80.0 and from_stored[0]["Exam_Score"] == 70.0
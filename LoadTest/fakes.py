@@ -0,0 +1,265 @@
+import time
+import heapq
+import random
+import itertools
+from collections import namedtuple
+from datetime import datetime, timedelta
+from Config.QueryCache import QueryCache, cached
+from Config.PostgresClient import QUERY_CACHE_SIZE, QUERY_CACHE_TTLS
+
+## What pika hands the consumer callback for a delivery
+Method = namedtuple("Method", ["delivery_tag", "routing_key"])
+
+
+class InMemoryChannel:
+    """The channel methods the consumer uses; acks and nacks are reported to the broker."""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def basic_ack(self, delivery_tag):
+        self.broker.settle(delivery_tag, "acked")
+
+    def basic_nack(self, delivery_tag, requeue=False):
+        self.broker.settle(delivery_tag, "nacked")
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.broker.publish(routing_key, body, properties, exchange)
+
+
+class InMemoryBroker:
+    """
+        Stand-in for Config.RabbitMQ with the same methods main.py calls on `mq`. Messages are
+        delivered in publish order to the registered callback, at most `prefetch` unacked at a
+        time like a real channel; `<queue>.retry` redelivers after `retry_delay` seconds and
+        `<queue>.dead` only records. Timers run on the consumer loop as with call_later.
+    """
+
+    def __init__(self, queue="reports", routing_key="report", prefetch=1, retry_delay=0.0, clock=time.monotonic):
+        self.queue = queue
+        self.routing_key = routing_key
+        self.prefetch = prefetch
+        self.retry_delay = retry_delay
+        self.clock = clock
+        self.channel = InMemoryChannel(self)
+        self.callback = None
+        self.sequence = itertools.count()
+        self.tags = itertools.count(1)
+        self.ready = []
+        self.timers = []
+        self.unacked = {}
+        self.waiting = set()
+        self.dead = []
+        self.dead_bodies = set()
+        ## body -> (outcome, time) once a message is acked or nacked with no retry pending
+        self.outcomes = {}
+
+    ## ---- the RabbitMQ wrapper interface ----
+    def publish(self, routing_key, body, properties=None, exchange=""):
+        if routing_key.endswith(".dead"):
+            self.dead.append((body, properties))
+            self.dead_bodies.add(body)
+        elif routing_key.endswith(".retry"):
+            self.enqueue(body, properties, self.clock() + self.retry_delay)
+        else:
+            self.enqueue(body, properties, self.clock())
+
+    def retry_queues(self, routing_key):
+        return f"{self.queue}.retry", f"{self.queue}.dead"
+
+    def call_later(self, delay, fn):
+        heapq.heappush(self.timers, (self.clock() + delay, next(self.sequence), fn))
+
+    def call_every(self, interval, fn):
+        def fire():
+            try:
+                fn()
+            finally:
+                self.call_later(interval, fire)
+        self.call_later(interval, fire)
+
+    def set_callback(self, callback_, queue=None):
+        self.callback = callback_
+
+    def set_prefetch(self, prefetch_count, global_qos=True):
+        self.prefetch = prefetch_count
+
+    def queue_depth(self, queue=None) -> int:
+        return sum(1 for at, _, _, _ in self.ready if at <= self.clock())
+
+    def get_channel(self):
+        return self.channel
+
+    ## ---- driving the consumer ----
+    def enqueue(self, body, properties, at):
+        self.waiting.add(body)
+        heapq.heappush(self.ready, (at, next(self.sequence), body, properties))
+
+    def settle(self, delivery_tag, outcome):
+        body = self.unacked.pop(delivery_tag)
+        ## A failed message is republished to retry or dead before its ack
+        if body not in self.waiting and body not in self.dead_bodies:
+            self.outcomes[body] = (outcome, self.clock())
+
+    def completed(self) -> int:
+        """Messages with a final outcome: acked, nacked or dead-lettered."""
+        return len(self.outcomes) + len(self.dead)
+
+    def next_event(self):
+        candidates = [self.timers[0][0]] if self.timers else []
+        if self.ready and len(self.unacked) < self.prefetch:
+            candidates.append(self.ready[0][0])
+        return min(candidates) if candidates else None
+
+    def step(self) -> bool:
+        """Run due timers, then deliver one due message if the prefetch window allows it."""
+        now = self.clock()
+        progressed = False
+        while self.timers and self.timers[0][0] <= now:
+            _, _, fn = heapq.heappop(self.timers)
+            fn()
+            progressed = True
+        if self.ready and self.ready[0][0] <= now and len(self.unacked) < self.prefetch:
+            _, _, body, properties = heapq.heappop(self.ready)
+            self.waiting.discard(body)
+            tag = next(self.tags)
+            self.unacked[tag] = body
+            self.callback(self.channel, Method(tag, self.routing_key), properties, body)
+            progressed = True
+        return progressed
+
+    def run(self, done, timeout):
+        """Consume until done() or `timeout` seconds pass, sleeping until the next due event."""
+        deadline = self.clock() + timeout
+        while not done() and self.clock() < deadline:
+            if self.step():
+                continue
+            upcoming = self.next_event()
+            if upcoming is None:
+                break
+            time.sleep(max(0.0, min(upcoming, deadline) - self.clock()))
+
+
+class FakeS3:
+    """Records puts; fails a `failure_rate` share of them like S3Instance.put_object (returns False)."""
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.puts = {}
+        self.failures = 0
+
+    def put_object(self, key, body) -> bool:
+        if self.latency:
+            time.sleep(self.latency)
+        if self.rng.random() < self.failure_rate:
+            self.failures += 1
+            return False
+        self.puts[key] = len(body)
+        return True
+
+
+"""
+    History size per student from a spec: "fixed:N", "uniform:LOW:HIGH" or "lognormal:MU:SIGMA"
+    (rounded, at least 1). The same student always gets the same size.
+"""
+def history_sizes(spec: str):
+    kind, *args = spec.split(":")
+    values = [float(a) for a in args]
+    if kind == "fixed":
+        return lambda rng: int(values[0])
+    if kind == "uniform":
+        return lambda rng: rng.randint(int(values[0]), int(values[1]))
+    if kind == "lognormal":
+        return lambda rng: max(1, round(rng.lognormvariate(values[0], values[1])))
+    raise ValueError(f"Unknown history distribution '{spec}'")
+
+
+class FakePostgresClient:
+    """
+        The PostgresClient methods used by the report path, answering with synthetic
+        stu_tracker rows. `latency` seconds are slept per query to stand in for round trips.
+        QUERY_CACHE_SIZE enables the same read-through cache as PostgresClient.
+    """
+
+    def __init__(self, history="uniform:5:40", latency=0.0, questionnaire_share=0.5, seed=0):
+        self.size = history_sizes(history)
+        self.latency = latency
+        self.questionnaire_share = questionnaire_share
+        self.seed = seed
+        self.students = {}
+        self.queries = 0
+        self.statuses = []
+        self.cache = QueryCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTLS) if QUERY_CACHE_SIZE > 0 else None
+
+    def _query(self):
+        self.queries += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _student(self, student_id, semester_id):
+        key = (student_id, semester_id)
+        if key not in self.students:
+            rng = random.Random(f"{self.seed}:{student_id}:{semester_id}")
+            start = datetime(2025, 1, 6)
+            rows = []
+            for i in range(self.size(rng)):
+                pre, mid, post = rng.choice([(True, False, False), (False, True, False), (False, False, True)])
+                subject = rng.randint(1, 4)
+                rows.append({
+                    "session_date": start - timedelta(days=i),
+                    "score": rng.randint(0, 100),
+                    "max_score": 100,
+                    "subject_id": subject,
+                    "subject": f"Subject {subject}",
+                    "pre": pre, "mid": mid, "post": post,
+                    "alpha_identifier": f"A-{i // 3}",
+                    "assessment_title": f"Assessment {i}",
+                    "title": f"Assessment {i}",
+                    "sleep_hours": rng.randint(4, 9), "effort_score": rng.randint(1, 5),
+                    "tutor_sessions": rng.randint(0, 4), "sports_hours": rng.randint(0, 6),
+                    "peer_influence": rng.randint(1, 5), "study_hours": rng.randint(0, 12),
+                    "questionnaire_id": i if rng.random() < self.questionnaire_share else None,
+                })
+            total = rng.randint(10, 60)
+            attendance = {"total_sessions": total, "present": rng.randint(0, total)}
+            attendance["absent"] = total - attendance["present"]
+            self.students[key] = (rows, attendance)
+        return self.students[key]
+
+    def get_all_student_assessments(self, student_id, semester_id: None):
+        self._query()
+        rows, _ = self._student(student_id, semester_id)
+        return [dict(row) for row in rows] or None
+
+    def get_student_prior_assessments_guestionnaire(self, student_id, semester_id: None):
+        self._query()
+        rows, _ = self._student(student_id, semester_id)
+        return [dict(row) for row in rows if row["questionnaire_id"] is not None] or None
+
+    @cached("attendance")
+    def get_student_attendance(self, student_id, semester_id: None):
+        self._query()
+        return dict(self._student(student_id, semester_id)[1])
+
+    def update_event_queue(self, params):
+        self._query()
+        self.statuses.append(params)
+
+    def fetch_one(self, query, params=None):
+        self._query()
+        return {"ok": 1}
+
+    def save_checkpoint(self, checkpoint_key, stage, artifact: bytes):
+        self._query()
+
+    def load_checkpoint(self, checkpoint_key, max_age_seconds):
+        self._query()
+        return None
+
+    def clear_checkpoint(self, checkpoint_key):
+        self._query()
+
+    def close(self):
+        pass
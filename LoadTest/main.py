@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import resource
+import multiprocessing
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 90, 95, 99)
+## Stage histograms copied from each worker's metrics registry into the report
+STAGE_METRICS = (
+    "report.processing_seconds", "report.fetch_seconds", "report.analysis_seconds",
+    "report.serialize_seconds", "report.upload_seconds", "report.status_update_seconds",
+)
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def latency_summary(latencies) -> dict:
+    summary = {f"p{p}": percentile(latencies, p) for p in PERCENTILES}
+    summary["max"] = max(latencies) if latencies else None
+    summary["mean"] = sum(latencies) / len(latencies) if latencies else None
+    return summary
+
+
+def message_bodies(worker, messages, students, semester_id, seed):
+    """Report requests for one worker; student ids repeat when `students` < messages."""
+    rng = random.Random(f"{seed}:{worker}")
+    for i in range(messages):
+        yield json.dumps({
+            "s3_output_key": f"loadtest/{worker}/{i}.json",
+            "student_id": rng.randint(1, students),
+            "semester_id": semester_id,
+            "organization_id": rng.randint(1, 3),
+        }).encode("utf-8")
+
+
+def run_worker(config: dict) -> dict:
+    """
+        One consumer process: the real main.py callback, pipeline and coalescer, wired to the
+        in-memory broker, FakePostgresClient (or a real database) and FakeS3. `env` overrides
+        are applied before main is imported so every knob is read the same way as in production.
+    """
+    os.environ.update({key: str(value) for key, value in config.get("env", {}).items()})
+    import pika
+    import main
+    from Config import Tracing
+    from Config.Metrics import metrics
+    from LoadTest.fakes import InMemoryBroker, FakeS3, FakePostgresClient
+
+    if config.get("postgres"):
+        from Config.PostgresClient import PostgresClient
+        factory = PostgresClient
+    else:
+        def factory():
+            return FakePostgresClient(config["history"], config["db_latency"], seed=config["seed"])
+    db = factory()
+    if main.WARM_START:
+        from Startup.main import StartupReport, warm_up
+        warm_up(db, StartupReport())
+    s3 = FakeS3(config["s3_latency"], config["s3_failure_rate"], seed=config["seed"])
+    mq = InMemoryBroker(prefetch=main.PREFETCH_COUNT, retry_delay=main.RETRY_DELAY_MS / 1000)
+    pool, executor = main.create_parallel(db, factory)
+    pipeline = main.create_pipeline(db, s3, main.create_checkpoint_store(db), pool, executor)
+    coalescer = main.create_coalescer(db, mq, pipeline) if main.COALESCE_WINDOW > 0 else None
+    mq.set_callback(main.create_callback(db, mq, pipeline, coalescer))
+    metrics.reset()
+
+    worker, messages = config["worker"], config["messages"]
+    interval = 1.0 / config["rate"] if config["rate"] else 0.0
+    started = mq.clock()
+    published = {}
+    for i, body in enumerate(message_bodies(worker, messages, config["students"], config["semester_id"], config["seed"])):
+        ## Stands in for the publisher's side of the trace when TRACE_EXPORT is set
+        with Tracing.span("loadtest.publish", kind=Tracing.PRODUCER):
+            properties = pika.BasicProperties(timestamp=int(time.time()), delivery_mode=2, headers=Tracing.inject())
+        mq.enqueue(body, properties, started + i * interval)
+        published[body] = started + i * interval
+
+    mq.run(lambda: mq.completed() >= messages, config["timeout"])
+    elapsed = mq.clock() - started
+
+    outcomes = mq.outcomes
+    latencies = [at - published[body] for body, (outcome, at) in outcomes.items() if outcome == "acked"]
+    snapshot = metrics.snapshot()
+    counters = snapshot["counters"]
+    if executor is not None:
+        executor.shutdown()
+        pool.close()
+    db.close()
+    ## Pool workers exit without running atexit handlers
+    Tracing.stop()
+    return {
+        "worker": worker,
+        "messages": messages,
+        "completed": sum(1 for outcome, _ in outcomes.values() if outcome == "acked"),
+        "nacked": sum(1 for outcome, _ in outcomes.values() if outcome == "nacked"),
+        "dead_lettered": len(mq.dead),
+        "retries": int(counters.get("report.retries", 0)),
+        "s3_puts": len(s3.puts),
+        "s3_failures": s3.failures,
+        "elapsed_seconds": elapsed,
+        "latencies": latencies,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "stages": {name: snapshot["histograms"][name] for name in STAGE_METRICS if name in snapshot["histograms"]},
+    }
+
+
+def summarize(results, wall_seconds) -> dict:
+    latencies = [latency for result in results for latency in result["latencies"]]
+    messages = sum(result["messages"] for result in results)
+    failed = sum(result["nacked"] + result["dead_lettered"] for result in results)
+    return {
+        "messages": messages,
+        "workers": len(results),
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_second": round(sum(r["completed"] for r in results) / wall_seconds, 2) if wall_seconds else None,
+        "latency_seconds": latency_summary(latencies),
+        "errors": {
+            "failed": failed,
+            "retries": sum(result["retries"] for result in results),
+            "s3_failures": sum(result["s3_failures"] for result in results),
+            "error_rate": round(failed / messages, 4) if messages else 0.0,
+        },
+        "per_worker": [
+            {
+                "worker": result["worker"],
+                "completed": result["completed"],
+                "throughput_per_second": round(result["completed"] / result["elapsed_seconds"], 2)
+                if result["elapsed_seconds"] else None,
+                "peak_rss_mb": round(result["peak_rss_mb"], 1),
+                "stages": result["stages"],
+            }
+            for result in results
+        ],
+    }
+
+
+def run(config: dict) -> dict:
+    """Split the load across `workers` spawned processes and summarize their results."""
+    workers = config["workers"]
+    configs = []
+    for worker in range(workers):
+        share = config["messages"] // workers + (1 if worker < config["messages"] % workers else 0)
+        configs.append(config | {"worker": worker, "messages": share, "rate": config["rate"] / workers})
+    started = time.perf_counter()
+    ## spawn: every worker imports main fresh with the env overrides, like a separate container
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        results = pool.map(run_worker, configs)
+    return summarize(results, time.perf_counter() - started)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the report consumer against local stand-ins")
+    parser.add_argument("--messages", type=int, default=200, help="report requests to publish")
+    parser.add_argument("--rate", type=float, default=50.0, help="messages per second across all workers (0 = all at once)")
+    parser.add_argument("--workers", type=int, default=1, help="consumer processes")
+    parser.add_argument("--students", type=int, default=1000, help="distinct students; fewer than messages creates duplicates")
+    parser.add_argument("--semester-id", type=int, default=1)
+    parser.add_argument("--history", default="uniform:5:40", help="assessments per student: fixed:N, uniform:LOW:HIGH, lognormal:MU:SIGMA")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="seconds slept per fake Postgres query")
+    parser.add_argument("--postgres", action="store_true", help="use the database from .env (seed it with Migrations.seed) instead of the fake")
+    parser.add_argument("--s3-latency", type=float, default=0.0, help="seconds slept per fake S3 put")
+    parser.add_argument("--s3-failure-rate", type=float, default=0.0, help="share of fake S3 puts that fail")
+    parser.add_argument("--timeout", type=float, default=600.0, help="seconds before a worker stops waiting")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="consumer setting for the workers, e.g. --env COALESCE_WINDOW=0.2 --env PREFETCH_COUNT=8")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    env = {"CHECKPOINT_STORE": ""}
+    env.update(dict(item.split("=", 1) for item in args.env))
+    config = {
+        "messages": args.messages, "rate": args.rate, "workers": args.workers, "students": args.students,
+        "semester_id": args.semester_id, "history": args.history, "db_latency": args.db_latency,
+        "postgres": args.postgres, "s3_latency": args.s3_latency, "s3_failure_rate": args.s3_failure_rate,
+        "timeout": args.timeout, "seed": args.seed, "env": env,
+    }
+    report = run(config)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    return 0 if report["errors"]["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    from Config.Environment import configure_logging
+    configure_logging()
+    sys.exit(main())
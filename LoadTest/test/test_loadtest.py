@@ -0,0 +1,84 @@
+# test_loadtest.py
+import random
+import pytest
+
+from LoadTest.fakes import InMemoryBroker, FakePostgresClient, FakeS3, history_sizes
+from LoadTest.main import run, latency_summary
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_broker_respects_prefetch_and_retries():
+    clock = FakeClock()
+    broker = InMemoryBroker(prefetch=2, retry_delay=5.0, clock=clock)
+    seen = []
+
+    def callback(channel, method, properties, body):
+        seen.append((method.delivery_tag, body))
+        if body == b"flaky" and len(seen) < 4:
+            broker.publish("reports.retry", body)
+            channel.basic_ack(method.delivery_tag)
+
+    broker.set_callback(callback)
+    for body in (b"a", b"b", b"flaky"):
+        broker.enqueue(body, None, 0.0)
+    while broker.step():
+        pass
+    ## a and b are held unacked, so flaky waits for the prefetch window
+    assert [body for _, body in seen] == [b"a", b"b"]
+    broker.get_channel().basic_ack(1)
+    broker.get_channel().basic_ack(2)
+    while broker.step():
+        pass
+    assert seen[-1][1] == b"flaky" and b"flaky" not in broker.outcomes
+    clock.now = 5.0
+    while broker.step():
+        pass
+    broker.get_channel().basic_ack(seen[-1][0])
+    assert broker.outcomes[b"flaky"] == ("acked", 5.0)
+    assert broker.completed() == 3
+
+
+def test_fake_postgres_history_distribution_is_deterministic():
+    db = FakePostgresClient("uniform:3:6", seed=1)
+    rows = db.get_all_student_assessments(7, 1)
+    assert 3 <= len(rows) <= 6
+    assert rows == FakePostgresClient("uniform:3:6", seed=1).get_all_student_assessments(7, 1)
+    assert db.queries == 1
+    assert history_sizes("fixed:4")(random.Random()) == 4
+    with pytest.raises(ValueError):
+        history_sizes("poisson:3")
+
+
+def test_fake_s3_failure_rate():
+    s3 = FakeS3(failure_rate=1.0)
+    assert s3.put_object("a.json", b"{}") is False
+    assert s3.failures == 1 and s3.puts == {}
+
+
+def test_latency_summary():
+    summary = latency_summary([0.1 * i for i in range(1, 11)])
+    assert summary["p50"] == pytest.approx(0.5) or summary["p50"] == pytest.approx(0.6)
+    assert summary["max"] == pytest.approx(1.0)
+    assert latency_summary([])["p99"] is None
+
+
+def test_end_to_end_run_with_retries():
+    report = run({
+        "messages": 6, "rate": 0, "workers": 1, "students": 3, "semester_id": 1,
+        "history": "fixed:4", "db_latency": 0.0, "postgres": False, "s3_latency": 0.0,
+        "s3_failure_rate": 0.3, "timeout": 120, "seed": 2,
+        "env": {"CHECKPOINT_STORE": "", "RETRY_DELAY_MS": "0", "MAX_RETRIES": "20"},
+    })
+    assert report["messages"] == 6
+    assert report["errors"]["failed"] == 0
+    assert report["errors"]["retries"] == report["errors"]["s3_failures"]
+    assert report["per_worker"][0]["completed"] == 6
+    assert report["per_worker"][0]["peak_rss_mb"] > 0
+    assert report["latency_seconds"]["p50"] is not None
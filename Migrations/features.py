@@ -0,0 +1,332 @@
+import sys
+import logging
+from Config.Environment import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+## stu_tracker.Student_features: one row per student and semester holding what the report
+## fetch step needs, so PostgresClient.get_student_features replaces three joins and the
+## attendance aggregate with a primary-key read.
+##   total_sessions/present/absent   the get_student_attendance counts
+##   assessments                     get_all_student_assessments rows, in the same order, each with
+##                                   its normalized score (norm)
+##   questionnaire                   get_student_prior_assessments_guestionnaire rows, in the same order,
+##                                   each with norm and the row before's score over its max_score
+##                                   (prev_score): the model inputs but for the attendance ratio
+## The analyses read norm and prev_score where a row has them instead of recomputing them.
+## Statement-level triggers keep it current. Every touched student/semester has its attendance
+## recounted when Session_students changes, and its rows rebuilt when Assessments_students changes
+## or an update to Sessions, Assessments, Subjects or Pre_assessment_questionnaire changes a column
+## the report reads. A Subjects or Assessments edit rebuilds every student who took it. Both run
+## under a per student/semester advisory lock, so concurrent writers never overwrite each other.
+STATEMENTS = [
+    """
+        CREATE TABLE IF NOT EXISTS stu_tracker.Student_features (
+            student_id int NOT NULL,
+            semester_id int NOT NULL,
+            total_sessions int NOT NULL DEFAULT 0,
+            present int NOT NULL DEFAULT 0,
+            absent int NOT NULL DEFAULT 0,
+            assessments jsonb NOT NULL DEFAULT '[]',
+            questionnaire jsonb NOT NULL DEFAULT '[]',
+            updated_at timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (student_id, semester_id)
+        );
+    """,
+    """
+        CREATE OR REPLACE FUNCTION stu_tracker.refresh_student_assessment_features(p_student int, p_semester int)
+        RETURNS void LANGUAGE plpgsql AS $$
+        BEGIN
+            -- Serialize refreshes of one student/semester: the recompute below then runs with a
+            -- snapshot that includes rows committed by a concurrent writer that held the lock
+            PERFORM pg_advisory_xact_lock(p_student, p_semester);
+            INSERT INTO stu_tracker.Student_features AS f (student_id, semester_id, assessments, questionnaire)
+            SELECT p_student, p_semester,
+                COALESCE((
+                    SELECT jsonb_agg(jsonb_build_object(
+                        'session_date', ss.session_date, 'score', ast.score, 'max_score', asmt.max_score,
+                        'subject_id', asmt.subject_id, 'subject', sj.title,
+                        'pre', asmt.pre, 'post', asmt.post, 'mid', asmt.mid,
+                        'alpha_identifier', asmt.alpha_identifier, 'assessment_title', asmt.title,
+                        'norm', ast.score::float8 / NULLIF(asmt.max_score, 0)::float8 * 100
+                    ) ORDER BY ss.session_date DESC, ast.id DESC)
+                    FROM stu_tracker.Assessments_students ast
+                    LEFT JOIN stu_tracker.Sessions ss ON ss.id = ast.session_id
+                    LEFT JOIN stu_tracker.Assessments asmt ON asmt.id = ast.assessment_id
+                    LEFT JOIN stu_tracker.Subjects sj ON sj.id = asmt.subject_id
+                    WHERE ast.student_id = p_student AND ast.semester_id = p_semester
+                ), '[]'::jsonb),
+                COALESCE((
+                    SELECT jsonb_agg(q.item ORDER BY q.rn)
+                    FROM (
+                        SELECT ROW_NUMBER() OVER w AS rn, jsonb_build_object(
+                            'session_date', ss.session_date, 'score', ast.score, 'max_score', asmt.max_score,
+                            'subject_id', asmt.subject_id, 'title', asmt.title,
+                            'sleep_hours', paq.sleep_hours, 'effort_score', paq.effort_score,
+                            'tutor_sessions', paq.tutor_sessions, 'sports_hours', paq.sports_hours,
+                            'peer_influence', paq.peer_influence, 'study_hours', paq.study_hours,
+                            'questionnaire_id', paq.id, 'subject', sj.title,
+                            'norm', ast.score::float8 / NULLIF(asmt.max_score, 0)::float8 * 100,
+                            'prev_score', (LAG(ast.score) OVER w)::float8 / NULLIF(asmt.max_score, 0)::float8 * 100
+                        ) AS item
+                        FROM stu_tracker.Assessments_students ast
+                        LEFT JOIN stu_tracker.Sessions ss ON ss.id = ast.session_id
+                        LEFT JOIN stu_tracker.Assessments asmt ON asmt.id = ast.assessment_id
+                        LEFT JOIN stu_tracker.Pre_assessment_questionnaire paq ON paq.id = ast.questionnaire_id
+                        LEFT JOIN stu_tracker.Subjects sj ON sj.id = asmt.subject_id
+                        WHERE ast.student_id = p_student AND ast.semester_id = p_semester
+                            AND ast.questionnaire_id IS NOT NULL
+                        WINDOW w AS (ORDER BY ss.session_date DESC, ast.id DESC)
+                    ) q
+                ), '[]'::jsonb)
+            ON CONFLICT (student_id, semester_id) DO UPDATE
+            SET assessments = EXCLUDED.assessments, questionnaire = EXCLUDED.questionnaire, updated_at = now();
+        END $$;
+    """,
+    """
+        CREATE OR REPLACE FUNCTION stu_tracker.assessments_students_features() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM stu_tracker.refresh_student_assessment_features(k.student_id, k.semester_id)
+                FROM (SELECT DISTINCT student_id, semester_id FROM new_rows) k
+                WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL;
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM stu_tracker.refresh_student_assessment_features(k.student_id, k.semester_id)
+                FROM (SELECT DISTINCT student_id, semester_id FROM old_rows) k
+                WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL;
+            ELSE
+                PERFORM stu_tracker.refresh_student_assessment_features(k.student_id, k.semester_id)
+                FROM (SELECT student_id, semester_id FROM new_rows
+                      UNION SELECT student_id, semester_id FROM old_rows) k
+                WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL;
+            END IF;
+            RETURN NULL;
+        END $$;
+    """,
+    """
+        CREATE OR REPLACE FUNCTION stu_tracker.session_students_features() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            -- Recounted under refresh_student_attendance_features' lock rather than adjusted by
+            -- deltas, which a concurrent recount of the same student/semester would overwrite
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM stu_tracker.refresh_student_attendance_features(k.student_id, k.semester_id)
+                FROM (
+                    SELECT r.student_id, st.semester_id
+                    FROM old_rows r JOIN stu_tracker.Sessions st ON st.id = r.session_id
+                    UNION
+                    -- The session is gone already: recount every semester held for the student
+                    SELECT f.student_id, f.semester_id
+                    FROM old_rows r JOIN stu_tracker.Student_features f ON f.student_id = r.student_id
+                    WHERE NOT EXISTS (SELECT 1 FROM stu_tracker.Sessions st WHERE st.id = r.session_id)
+                ) k
+                WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL
+                ORDER BY k.student_id, k.semester_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                PERFORM stu_tracker.refresh_student_attendance_features(k.student_id, k.semester_id)
+                FROM (
+                    SELECT DISTINCT r.student_id, st.semester_id
+                    FROM new_rows r JOIN stu_tracker.Sessions st ON st.id = r.session_id
+                ) k
+                WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL
+                ORDER BY k.student_id, k.semester_id;
+            END IF;
+            RETURN NULL;
+        END $$;
+    """,
+    """
+        CREATE OR REPLACE FUNCTION stu_tracker.refresh_student_attendance_features(p_student int, p_semester int)
+        RETURNS void LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_advisory_xact_lock(p_student, p_semester);
+            INSERT INTO stu_tracker.Student_features AS f (student_id, semester_id, total_sessions, present, absent)
+            SELECT p_student, p_semester, COUNT(*),
+                COALESCE(SUM(CASE WHEN NOT ss.absent THEN 1 ELSE 0 END), 0),
+                COALESCE(SUM(CASE WHEN ss.absent THEN 1 ELSE 0 END), 0)
+            FROM stu_tracker.Session_students ss
+            JOIN stu_tracker.Sessions st ON st.id = ss.session_id
+            WHERE ss.student_id = p_student AND st.semester_id = p_semester
+            ON CONFLICT (student_id, semester_id) DO UPDATE
+            SET total_sessions = EXCLUDED.total_sessions, present = EXCLUDED.present,
+                absent = EXCLUDED.absent, updated_at = now();
+        END $$;
+    """,
+    """
+        CREATE OR REPLACE FUNCTION stu_tracker.sessions_features() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM stu_tracker.refresh_student_assessment_features(k.student_id, k.semester_id)
+            FROM (
+                SELECT DISTINCT ast.student_id, ast.semester_id
+                FROM new_rows r
+                JOIN old_rows o ON o.id = r.id
+                JOIN stu_tracker.Assessments_students ast ON ast.session_id = r.id
+                WHERE r.session_date IS DISTINCT FROM o.session_date
+            ) k
+            WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL;
+            -- A session moved to another semester takes its attendance with it
+            PERFORM stu_tracker.refresh_student_attendance_features(k.student_id, k.semester_id)
+            FROM (
+                SELECT ss.student_id, r.semester_id
+                FROM new_rows r
+                JOIN old_rows o ON o.id = r.id
+                JOIN stu_tracker.Session_students ss ON ss.session_id = r.id
+                WHERE r.semester_id IS DISTINCT FROM o.semester_id
+                UNION
+                SELECT ss.student_id, o.semester_id
+                FROM new_rows r
+                JOIN old_rows o ON o.id = r.id
+                JOIN stu_tracker.Session_students ss ON ss.session_id = r.id
+                WHERE r.semester_id IS DISTINCT FROM o.semester_id
+            ) k
+            WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL;
+            RETURN NULL;
+        END $$;
+    """,
+    """
+        CREATE OR REPLACE FUNCTION stu_tracker.assessments_features() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM stu_tracker.refresh_student_assessment_features(k.student_id, k.semester_id)
+            FROM (
+                SELECT DISTINCT ast.student_id, ast.semester_id
+                FROM new_rows r
+                JOIN old_rows o ON o.id = r.id
+                JOIN stu_tracker.Assessments_students ast ON ast.assessment_id = r.id
+                WHERE (r.title, r.max_score, r.subject_id, r.pre, r.mid, r.post, r.alpha_identifier)
+                    IS DISTINCT FROM (o.title, o.max_score, o.subject_id, o.pre, o.mid, o.post, o.alpha_identifier)
+            ) k
+            WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL;
+            RETURN NULL;
+        END $$;
+    """,
+    """
+        CREATE OR REPLACE FUNCTION stu_tracker.subjects_features() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM stu_tracker.refresh_student_assessment_features(k.student_id, k.semester_id)
+            FROM (
+                SELECT DISTINCT ast.student_id, ast.semester_id
+                FROM new_rows r
+                JOIN old_rows o ON o.id = r.id
+                JOIN stu_tracker.Assessments asmt ON asmt.subject_id = r.id
+                JOIN stu_tracker.Assessments_students ast ON ast.assessment_id = asmt.id
+                WHERE r.title IS DISTINCT FROM o.title
+            ) k
+            WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL;
+            RETURN NULL;
+        END $$;
+    """,
+    """
+        CREATE OR REPLACE FUNCTION stu_tracker.questionnaire_features() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM stu_tracker.refresh_student_assessment_features(k.student_id, k.semester_id)
+            FROM (
+                SELECT DISTINCT ast.student_id, ast.semester_id
+                FROM new_rows r
+                JOIN old_rows o ON o.id = r.id
+                JOIN stu_tracker.Assessments_students ast ON ast.questionnaire_id = r.id
+                WHERE (r.sleep_hours, r.effort_score, r.tutor_sessions, r.sports_hours, r.peer_influence, r.study_hours)
+                    IS DISTINCT FROM
+                    (o.sleep_hours, o.effort_score, o.tutor_sessions, o.sports_hours, o.peer_influence, o.study_hours)
+            ) k
+            WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL;
+            RETURN NULL;
+        END $$;
+    """,
+]
+
+## (trigger, table, event, transition tables, function)
+TRIGGERS = [
+    ("assessments_students_features_ins", "stu_tracker.Assessments_students", "INSERT",
+     "NEW TABLE AS new_rows", "stu_tracker.assessments_students_features"),
+    ("assessments_students_features_upd", "stu_tracker.Assessments_students", "UPDATE",
+     "OLD TABLE AS old_rows NEW TABLE AS new_rows", "stu_tracker.assessments_students_features"),
+    ("assessments_students_features_del", "stu_tracker.Assessments_students", "DELETE",
+     "OLD TABLE AS old_rows", "stu_tracker.assessments_students_features"),
+    ("session_students_features_ins", "stu_tracker.Session_students", "INSERT",
+     "NEW TABLE AS new_rows", "stu_tracker.session_students_features"),
+    ("session_students_features_upd", "stu_tracker.Session_students", "UPDATE",
+     "OLD TABLE AS old_rows NEW TABLE AS new_rows", "stu_tracker.session_students_features"),
+    ("session_students_features_del", "stu_tracker.Session_students", "DELETE",
+     "OLD TABLE AS old_rows", "stu_tracker.session_students_features"),
+    ("sessions_features_upd", "stu_tracker.Sessions", "UPDATE",
+     "OLD TABLE AS old_rows NEW TABLE AS new_rows", "stu_tracker.sessions_features"),
+    ("assessments_features_upd", "stu_tracker.Assessments", "UPDATE",
+     "OLD TABLE AS old_rows NEW TABLE AS new_rows", "stu_tracker.assessments_features"),
+    ("subjects_features_upd", "stu_tracker.Subjects", "UPDATE",
+     "OLD TABLE AS old_rows NEW TABLE AS new_rows", "stu_tracker.subjects_features"),
+    ("questionnaire_features_upd", "stu_tracker.Pre_assessment_questionnaire", "UPDATE",
+     "OLD TABLE AS old_rows NEW TABLE AS new_rows", "stu_tracker.questionnaire_features"),
+]
+
+
+def trigger_statements(triggers=TRIGGERS) -> list:
+    statements = []
+    for name, table, event, transitions, function in triggers:
+        statements.append(f"DROP TRIGGER IF EXISTS {name} ON {table};")
+        statements.append(
+            f"CREATE TRIGGER {name} AFTER {event} ON {table} REFERENCING {transitions} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION {function}();"
+        )
+    return statements
+
+
+def apply_feature_store(db):
+    """Create the table, maintenance functions and triggers (idempotent)."""
+    for statement in STATEMENTS + trigger_statements():
+        db.execute(statement)
+    logger.info("Feature store table and triggers are in place")
+
+
+def rebuild_features(db, semester_id=None):
+    """
+        Backfill (or repair) Student_features from the base tables. Run after apply_feature_store
+        so rows written meanwhile are covered by the triggers; attendance counts are replaced.
+    """
+    params = (semester_id,) if semester_id is not None else None
+    semester_filter = "AND st.semester_id = %s" if semester_id is not None else ""
+    db.execute(f"""
+        INSERT INTO stu_tracker.Student_features AS f (student_id, semester_id, total_sessions, present, absent)
+        SELECT ss.student_id, st.semester_id, COUNT(*),
+            SUM(CASE WHEN NOT ss.absent THEN 1 ELSE 0 END),
+            SUM(CASE WHEN ss.absent THEN 1 ELSE 0 END)
+        FROM stu_tracker.Session_students ss
+        JOIN stu_tracker.Sessions st ON st.id = ss.session_id
+        WHERE ss.student_id IS NOT NULL AND st.semester_id IS NOT NULL {semester_filter}
+        GROUP BY ss.student_id, st.semester_id
+        ON CONFLICT (student_id, semester_id) DO UPDATE
+        SET total_sessions = EXCLUDED.total_sessions, present = EXCLUDED.present,
+            absent = EXCLUDED.absent, updated_at = now();
+    """, params)
+    semester_filter = "AND semester_id = %s" if semester_id is not None else ""
+    db.execute(f"""
+        SELECT stu_tracker.refresh_student_assessment_features(k.student_id, k.semester_id)
+        FROM (
+            SELECT DISTINCT student_id, semester_id FROM stu_tracker.Assessments_students
+            WHERE student_id IS NOT NULL AND semester_id IS NOT NULL {semester_filter}
+        ) k;
+    """, params)
+    logger.info("Rebuilt Student_features" + (f" for semester {semester_id}" if semester_id is not None else ""))
+
+
+def main(argv=None):
+    from Config.PostgresClient import PostgresClient
+
+    configure_logging()
+    argv = sys.argv[1:] if argv is None else argv
+    db = PostgresClient()
+    try:
+        apply_feature_store(db)
+        if "--rebuild" in argv:
+            rebuild_features(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import sys
+import logging
+from Config.Environment import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+## Indexes backing the PostgresClient report queries.
+## (name, table, definition) -- definition is everything after ON <table>.
+INDEXES = [
+    # get_all_student_assessments / get_assessment_aggregates: student (+ semester) lookup,
+    # covering the columns joined or read so the heap is only touched for visibility.
+    ("assessments_students_student_semester_idx", "stu_tracker.Assessments_students",
+     "(student_id, semester_id) INCLUDE (session_id, assessment_id, score, questionnaire_id)"),
+    # get_student_prior_assessments: rows without a questionnaire
+    ("assessments_students_no_questionnaire_idx", "stu_tracker.Assessments_students",
+     "(student_id, semester_id) INCLUDE (session_id, assessment_id, score) WHERE questionnaire_id IS NULL"),
+    # get_student_prior_assessments_guestionnaire: rows with a questionnaire
+    ("assessments_students_questionnaire_idx", "stu_tracker.Assessments_students",
+     "(student_id, semester_id) INCLUDE (session_id, assessment_id, score, questionnaire_id) WHERE questionnaire_id IS NOT NULL"),
+    # get_student_attendance: the student's sessions, then the semester of each session
+    ("session_students_student_idx", "stu_tracker.Session_students",
+     "(student_id) INCLUDE (session_id, absent)"),
+    ("sessions_id_semester_idx", "stu_tracker.Sessions",
+     "(id) INCLUDE (semester_id, session_date)"),
+    # update_event_queue
+    ("student_report_s3_output_key_idx", "stu_tracker.Student_report",
+     "(s3_output_key)"),
+]
+
+
+## Tables owned by this service (created idempotently before the indexes)
+TABLES = [
+    # Consumer/Checkpoint.PostgresCheckpointStore: last completed stage of a failed report
+    """
+        CREATE TABLE IF NOT EXISTS stu_tracker.Report_checkpoint (
+            checkpoint_key text PRIMARY KEY,
+            stage text NOT NULL,
+            artifact bytea,
+            saved_at timestamptz NOT NULL DEFAULT now()
+        );
+    """,
+]
+
+
+def index_statements(concurrently=True) -> list:
+    option = "CONCURRENTLY " if concurrently else ""
+    return [
+        f"CREATE INDEX {option}IF NOT EXISTS {name} ON {table} {definition};"
+        for name, table, definition in INDEXES
+    ]
+
+
+def apply_indexes(db, concurrently=True):
+    """
+        Create the service tables and every index in INDEXES. CONCURRENTLY does not block
+        writes but cannot run inside a transaction, which is fine with PostgresClient's
+        autocommit connection.
+    """
+    for statement in TABLES:
+        db.execute(statement)
+    for statement in index_statements(concurrently):
+        logger.info(f"Applying: {statement}")
+        db.execute(statement)
+    for table in sorted({table for _, table, _ in INDEXES}):
+        db.execute(f"ANALYZE {table};")
+
+
+def main(argv=None):
+    from Config.PostgresClient import PostgresClient
+
+    configure_logging()
+    argv = sys.argv[1:] if argv is None else argv
+    db = PostgresClient()
+    try:
+        apply_indexes(db, concurrently="--no-concurrently" not in argv)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import sys
+import json
+import logging
+from Config.Environment import configure_logging
+from Config.PostgresClient import PostgresClient
+
+logger = logging.getLogger(__name__)
+
+## Large tables that must be reached through an index by the report queries
+GUARDED_TABLES = {"assessments_students", "session_students", "student_report"}
+
+
+class QueryCapture(PostgresClient):
+    """PostgresClient that records the SQL each report method would run instead of running it."""
+
+    def __init__(self):
+        self.conn = None
+        self.captured = []
+
+    def fetch_one(self, query, params=None, **kwargs):
+        self.captured.append((query, params))
+        return None
+
+    def fetch_all(self, query, params=None, **kwargs):
+        self.captured.append((query, params))
+        return []
+
+    def execute(self, query, params=None, **kwargs):
+        self.captured.append((query, params))
+
+
+def report_queries(student_id, semester_id) -> list:
+    """(name, query, params, analyze) for every query the consumer runs for one report."""
+    calls = [
+        ("get_all_student_assessments", lambda db: db.get_all_student_assessments(student_id, semester_id), True),
+        ("get_student_prior_assessments", lambda db: db.get_student_prior_assessments(student_id, semester_id), True),
+        ("get_student_prior_assessments_guestionnaire",
+         lambda db: db.get_student_prior_assessments_guestionnaire(student_id, semester_id), True),
+        ("get_student_attendance", lambda db: db.get_student_attendance(student_id, semester_id), True),
+        ("get_assessment_aggregates", lambda db: db.get_assessment_aggregates(student_id, semester_id), True),
+        # UPDATE: plan only, EXPLAIN ANALYZE would modify the row
+        ("update_event_queue", lambda db: db.update_event_queue(("DONE", "seed/1.json")), False),
+    ]
+    queries = []
+    for name, call, analyze in calls:
+        capture = QueryCapture()
+        call(capture)
+        for query, params in capture.captured:
+            queries.append((name, query, params, analyze))
+    return queries
+
+
+def walk_plan(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk_plan(child)
+
+
+def find_seq_scans(plan, guarded_tables=GUARDED_TABLES) -> list:
+    """Relation names of sequential scans on guarded tables anywhere in an EXPLAIN JSON plan."""
+    return [
+        node.get("Relation Name")
+        for node in walk_plan(plan["Plan"])
+        if node.get("Node Type") == "Seq Scan" and str(node.get("Relation Name")).lower() in guarded_tables
+    ]
+
+
+def explain(db, query, params, analyze=True) -> dict:
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    row = db.fetch_one(f"EXPLAIN ({options}) {query.strip().rstrip(';')}", params)
+    plan = row["QUERY PLAN"]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def pick_student(db):
+    """The student/semester with the longest history in the seeded database."""
+    row = db.fetch_one(
+        "SELECT student_id, semester_id FROM stu_tracker.Assessments_students "
+        "GROUP BY student_id, semester_id ORDER BY COUNT(*) DESC LIMIT 1;"
+    )
+    if row is None:
+        raise RuntimeError("No rows in stu_tracker.Assessments_students; seed the database first")
+    return row["student_id"], row["semester_id"]
+
+
+def check_plans(db, student_id=None, semester_id=None, guarded_tables=GUARDED_TABLES) -> list:
+    """EXPLAIN every report query; returns one result dict per query with any regressions."""
+    if student_id is None:
+        student_id, semester_id = pick_student(db)
+    results = []
+    for name, query, params, analyze in report_queries(student_id, semester_id):
+        plan = explain(db, query, params, analyze)
+        seq_scans = find_seq_scans(plan, guarded_tables)
+        results.append({
+            "query": name,
+            "seq_scans": seq_scans,
+            "execution_ms": plan.get("Execution Time"),
+            "shared_hit_blocks": plan["Plan"].get("Shared Hit Blocks"),
+            "shared_read_blocks": plan["Plan"].get("Shared Read Blocks"),
+        })
+    return results
+
+
+def main(argv=None):
+    from Migrations.seed import seed
+    from Migrations.main import apply_indexes
+
+    configure_logging()
+    argv = sys.argv[1:] if argv is None else argv
+    db = PostgresClient()
+    try:
+        if "--seed" in argv:
+            seed(db)
+        if "--apply-indexes" in argv:
+            apply_indexes(db)
+        results = check_plans(db)
+    finally:
+        db.close()
+
+    failed = [r for r in results if r["seq_scans"]]
+    for result in results:
+        status = "FAIL" if result["seq_scans"] else "ok"
+        logger.info(f"[{status}] {json.dumps(result)}")
+    if failed:
+        logger.error(f"{len(failed)} report queries regressed to sequential scans")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
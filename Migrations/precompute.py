@@ -0,0 +1,219 @@
+import logging
+from Config.Environment import configure_logging
+from Migrations.features import trigger_statements
+
+logger = logging.getLogger(__name__)
+
+## NOTIFY channel the precompute worker LISTENs on; payloads are "<student_id>:<semester_id>"
+CHANNEL = "report_inputs"
+
+## stu_tracker.Precomputed_report: one row per student and semester whose report inputs changed.
+## Every write to Assessments_students or Session_students, and every update to Sessions, Assessments,
+## Subjects or Pre_assessment_questionnaire that changes a column the report reads, bumps `version`
+## of the affected rows and sends a NOTIFY. The precompute worker (Precompute/main.py) regenerates
+## the report, uploads it under `s3_key` and records the version it read as `computed_version`.
+## The report is current only while both versions are equal, so a write racing a regeneration
+## leaves the row stale, and stale rows double as the worker's backlog after a restart or a lost
+## LISTEN connection.
+STATEMENTS = [
+    """
+        CREATE TABLE IF NOT EXISTS stu_tracker.Precomputed_report (
+            student_id int NOT NULL,
+            semester_id int NOT NULL,
+            version bigint NOT NULL DEFAULT 1,
+            computed_version bigint,
+            s3_key text,
+            changed_at timestamptz NOT NULL DEFAULT now(),
+            computed_at timestamptz,
+            PRIMARY KEY (student_id, semester_id)
+        );
+    """,
+    """
+        CREATE INDEX IF NOT EXISTS precomputed_report_stale
+        ON stu_tracker.Precomputed_report (changed_at)
+        WHERE computed_version IS DISTINCT FROM version;
+    """,
+    f"""
+        CREATE OR REPLACE FUNCTION stu_tracker.report_inputs_changed(p_student int, p_semester int)
+        RETURNS void LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO stu_tracker.Precomputed_report AS p (student_id, semester_id)
+            VALUES (p_student, p_semester)
+            ON CONFLICT (student_id, semester_id) DO UPDATE
+            SET version = p.version + 1, changed_at = now();
+            PERFORM pg_notify('{CHANNEL}', p_student || ':' || p_semester);
+        END $$;
+    """,
+    """
+        CREATE OR REPLACE FUNCTION stu_tracker.assessments_students_changed() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM stu_tracker.report_inputs_changed(k.student_id, k.semester_id)
+                FROM (SELECT DISTINCT student_id, semester_id FROM new_rows) k
+                WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL;
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM stu_tracker.report_inputs_changed(k.student_id, k.semester_id)
+                FROM (SELECT DISTINCT student_id, semester_id FROM old_rows) k
+                WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL;
+            ELSE
+                PERFORM stu_tracker.report_inputs_changed(k.student_id, k.semester_id)
+                FROM (SELECT student_id, semester_id FROM new_rows
+                      UNION SELECT student_id, semester_id FROM old_rows) k
+                WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL;
+            END IF;
+            RETURN NULL;
+        END $$;
+    """,
+    """
+        CREATE OR REPLACE FUNCTION stu_tracker.session_students_changed() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM stu_tracker.report_inputs_changed(k.student_id, k.semester_id)
+                FROM (SELECT DISTINCT r.student_id, st.semester_id FROM new_rows r
+                      JOIN stu_tracker.Sessions st ON st.id = r.session_id) k
+                WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL;
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM stu_tracker.report_inputs_changed(k.student_id, k.semester_id)
+                FROM (SELECT DISTINCT r.student_id, st.semester_id FROM old_rows r
+                      JOIN stu_tracker.Sessions st ON st.id = r.session_id) k
+                WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL;
+            ELSE
+                PERFORM stu_tracker.report_inputs_changed(k.student_id, k.semester_id)
+                FROM (SELECT r.student_id, st.semester_id FROM new_rows r
+                      JOIN stu_tracker.Sessions st ON st.id = r.session_id
+                      UNION SELECT r.student_id, st.semester_id FROM old_rows r
+                      JOIN stu_tracker.Sessions st ON st.id = r.session_id) k
+                WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL;
+            END IF;
+            RETURN NULL;
+        END $$;
+    """,
+    """
+        CREATE OR REPLACE FUNCTION stu_tracker.sessions_changed() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM stu_tracker.report_inputs_changed(k.student_id, k.semester_id)
+            FROM (
+                SELECT ast.student_id, ast.semester_id
+                FROM new_rows r
+                JOIN old_rows o ON o.id = r.id
+                JOIN stu_tracker.Assessments_students ast ON ast.session_id = r.id
+                WHERE r.session_date IS DISTINCT FROM o.session_date
+                UNION
+                SELECT ss.student_id, r.semester_id
+                FROM new_rows r
+                JOIN old_rows o ON o.id = r.id
+                JOIN stu_tracker.Session_students ss ON ss.session_id = r.id
+                WHERE r.semester_id IS DISTINCT FROM o.semester_id
+                UNION
+                SELECT ss.student_id, o.semester_id
+                FROM new_rows r
+                JOIN old_rows o ON o.id = r.id
+                JOIN stu_tracker.Session_students ss ON ss.session_id = r.id
+                WHERE r.semester_id IS DISTINCT FROM o.semester_id
+            ) k
+            WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL;
+            RETURN NULL;
+        END $$;
+    """,
+    """
+        CREATE OR REPLACE FUNCTION stu_tracker.assessments_changed() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM stu_tracker.report_inputs_changed(k.student_id, k.semester_id)
+            FROM (
+                SELECT DISTINCT ast.student_id, ast.semester_id
+                FROM new_rows r
+                JOIN old_rows o ON o.id = r.id
+                JOIN stu_tracker.Assessments_students ast ON ast.assessment_id = r.id
+                WHERE (r.title, r.max_score, r.subject_id, r.pre, r.mid, r.post, r.alpha_identifier)
+                    IS DISTINCT FROM (o.title, o.max_score, o.subject_id, o.pre, o.mid, o.post, o.alpha_identifier)
+            ) k
+            WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL;
+            RETURN NULL;
+        END $$;
+    """,
+    """
+        CREATE OR REPLACE FUNCTION stu_tracker.subjects_changed() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM stu_tracker.report_inputs_changed(k.student_id, k.semester_id)
+            FROM (
+                SELECT DISTINCT ast.student_id, ast.semester_id
+                FROM new_rows r
+                JOIN old_rows o ON o.id = r.id
+                JOIN stu_tracker.Assessments asmt ON asmt.subject_id = r.id
+                JOIN stu_tracker.Assessments_students ast ON ast.assessment_id = asmt.id
+                WHERE r.title IS DISTINCT FROM o.title
+            ) k
+            WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL;
+            RETURN NULL;
+        END $$;
+    """,
+    """
+        CREATE OR REPLACE FUNCTION stu_tracker.questionnaire_changed() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM stu_tracker.report_inputs_changed(k.student_id, k.semester_id)
+            FROM (
+                SELECT DISTINCT ast.student_id, ast.semester_id
+                FROM new_rows r
+                JOIN old_rows o ON o.id = r.id
+                JOIN stu_tracker.Assessments_students ast ON ast.questionnaire_id = r.id
+                WHERE (r.sleep_hours, r.effort_score, r.tutor_sessions, r.sports_hours, r.peer_influence, r.study_hours)
+                    IS DISTINCT FROM
+                    (o.sleep_hours, o.effort_score, o.tutor_sessions, o.sports_hours, o.peer_influence, o.study_hours)
+            ) k
+            WHERE k.student_id IS NOT NULL AND k.semester_id IS NOT NULL;
+            RETURN NULL;
+        END $$;
+    """,
+]
+
+## (trigger, table, event, transition tables, function)
+TRIGGERS = [
+    ("assessments_students_changed_ins", "stu_tracker.Assessments_students", "INSERT",
+     "NEW TABLE AS new_rows", "stu_tracker.assessments_students_changed"),
+    ("assessments_students_changed_upd", "stu_tracker.Assessments_students", "UPDATE",
+     "OLD TABLE AS old_rows NEW TABLE AS new_rows", "stu_tracker.assessments_students_changed"),
+    ("assessments_students_changed_del", "stu_tracker.Assessments_students", "DELETE",
+     "OLD TABLE AS old_rows", "stu_tracker.assessments_students_changed"),
+    ("session_students_changed_ins", "stu_tracker.Session_students", "INSERT",
+     "NEW TABLE AS new_rows", "stu_tracker.session_students_changed"),
+    ("session_students_changed_upd", "stu_tracker.Session_students", "UPDATE",
+     "OLD TABLE AS old_rows NEW TABLE AS new_rows", "stu_tracker.session_students_changed"),
+    ("session_students_changed_del", "stu_tracker.Session_students", "DELETE",
+     "OLD TABLE AS old_rows", "stu_tracker.session_students_changed"),
+    ("sessions_changed_upd", "stu_tracker.Sessions", "UPDATE",
+     "OLD TABLE AS old_rows NEW TABLE AS new_rows", "stu_tracker.sessions_changed"),
+    ("assessments_changed_upd", "stu_tracker.Assessments", "UPDATE",
+     "OLD TABLE AS old_rows NEW TABLE AS new_rows", "stu_tracker.assessments_changed"),
+    ("subjects_changed_upd", "stu_tracker.Subjects", "UPDATE",
+     "OLD TABLE AS old_rows NEW TABLE AS new_rows", "stu_tracker.subjects_changed"),
+    ("questionnaire_changed_upd", "stu_tracker.Pre_assessment_questionnaire", "UPDATE",
+     "OLD TABLE AS old_rows NEW TABLE AS new_rows", "stu_tracker.questionnaire_changed"),
+]
+
+
+def apply_precompute(db):
+    """Create the table, the change notification functions and triggers (idempotent)."""
+    for statement in STATEMENTS + trigger_statements(TRIGGERS):
+        db.execute(statement)
+    logger.info("Precomputed_report table and change triggers are in place")
+
+
+def main(argv=None):
+    from Config.PostgresClient import PostgresClient
+
+    configure_logging()
+    db = PostgresClient()
+    try:
+        apply_precompute(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import sys
+import logging
+from Config.Environment import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+## Minimal stu_tracker schema: only the tables and columns the report queries touch.
+SCHEMA = """
+    CREATE SCHEMA IF NOT EXISTS stu_tracker;
+    CREATE TABLE IF NOT EXISTS stu_tracker.Subjects (
+        id int PRIMARY KEY, title text, description text, organization_id int);
+    CREATE TABLE IF NOT EXISTS stu_tracker.Sessions (
+        id int PRIMARY KEY, session_date timestamp, semester_id int);
+    CREATE TABLE IF NOT EXISTS stu_tracker.Assessments (
+        id int PRIMARY KEY, title text, max_score numeric, subject_id int,
+        pre boolean, mid boolean, post boolean, alpha_identifier text);
+    CREATE TABLE IF NOT EXISTS stu_tracker.Pre_assessment_questionnaire (
+        id int PRIMARY KEY, student_id int, assessment_id int, subject_id int,
+        created_at timestamp DEFAULT now(), sleep_hours numeric, effort_score numeric,
+        tutor_sessions numeric, parental_help numeric, sports_hours numeric,
+        peer_influence numeric, study_hours numeric);
+    CREATE TABLE IF NOT EXISTS stu_tracker.Assessments_students (
+        id serial PRIMARY KEY, student_id int, semester_id int, session_id int,
+        assessment_id int, score numeric, questionnaire_id int);
+    CREATE TABLE IF NOT EXISTS stu_tracker.Session_students (
+        id serial PRIMARY KEY, session_id int, student_id int, absent boolean);
+    CREATE TABLE IF NOT EXISTS stu_tracker.Student_report (
+        id serial PRIMARY KEY, s3_output_key text, status text);
+"""
+
+## Deterministic synthetic data generated server-side with generate_series.
+SEED = """
+    INSERT INTO stu_tracker.Subjects (id, title, description, organization_id)
+    SELECT g, 'Subject ' || g, 'Seeded subject', 1 + g %% 3
+    FROM generate_series(1, %(subjects)s) g;
+
+    INSERT INTO stu_tracker.Sessions (id, session_date, semester_id)
+    SELECT g, timestamp '2025-01-06' + g * interval '1 hour', 1 + g %% %(semesters)s
+    FROM generate_series(1, %(sessions)s) g;
+
+    INSERT INTO stu_tracker.Assessments (id, title, max_score, subject_id, pre, mid, post, alpha_identifier)
+    SELECT g, 'Assessment ' || g, 100, 1 + g %% %(subjects)s, g %% 3 = 0, g %% 3 = 1, g %% 3 = 2, 'A-' || g / 3
+    FROM generate_series(1, %(assessments)s) g;
+
+    INSERT INTO stu_tracker.Pre_assessment_questionnaire
+        (id, student_id, assessment_id, subject_id, sleep_hours, effort_score, tutor_sessions,
+         parental_help, sports_hours, peer_influence, study_hours)
+    SELECT g, 1 + (g - 1) / %(history)s, 1 + g %% %(assessments)s, 1 + g %% %(subjects)s,
+        5 + g %% 4, 1 + g %% 5, g %% 4, g %% 3, g %% 5, g %% 3, 1 + g %% 6
+    FROM generate_series(1, %(students)s * %(history)s) g
+    WHERE g %% 2 = 0;
+
+    INSERT INTO stu_tracker.Assessments_students
+        (student_id, semester_id, session_id, assessment_id, score, questionnaire_id)
+    SELECT 1 + (g - 1) / %(history)s, 1 + (1 + g %% %(sessions)s) %% %(semesters)s, 1 + g %% %(sessions)s,
+        1 + g %% %(assessments)s, 40 + (g * 37) %% 61, CASE WHEN g %% 2 = 0 THEN g END
+    FROM generate_series(1, %(students)s * %(history)s) g;
+
+    INSERT INTO stu_tracker.Session_students (session_id, student_id, absent)
+    SELECT 1 + g %% %(sessions)s, 1 + (g - 1) / %(history)s, g %% 5 = 0
+    FROM generate_series(1, %(students)s * %(history)s) g;
+
+    INSERT INTO stu_tracker.Student_report (s3_output_key, status)
+    SELECT 'seed/' || g || '.json', 'PENDING'
+    FROM generate_series(1, %(students)s) g;
+"""
+
+DEFAULT_SIZES = {
+    "students": 2000,
+    "history": 40,
+    "subjects": 12,
+    "sessions": 4000,
+    "semesters": 4,
+    "assessments": 600,
+}
+
+
+def create_schema(db):
+    db.execute(SCHEMA)
+
+
+def seed(db, **sizes):
+    """Create the schema and load synthetic rows; `students * history` rows per fact table."""
+    params = DEFAULT_SIZES | sizes
+    create_schema(db)
+    logger.info(f"Seeding stu_tracker with {params}")
+    db.execute(SEED, params)
+    db.execute("ANALYZE;")
+    return params
+
+
+def main(argv=None):
+    from Config.PostgresClient import PostgresClient
+
+    configure_logging()
+    argv = sys.argv[1:] if argv is None else argv
+    sizes = {}
+    for arg in argv:
+        key, _, value = arg.lstrip("-").partition("=")
+        if key in DEFAULT_SIZES:
+            sizes[key] = int(value)
+    db = PostgresClient()
+    try:
+        seed(db, **sizes)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# test_migrations.py
+import os
+import pytest
+
+from Migrations.main import INDEXES, index_statements
+from Migrations.features import TRIGGERS, trigger_statements
+from Migrations.plan_check import report_queries, find_seq_scans, check_plans
+
+POSTGRES_TEST_DSN = os.getenv("POSTGRES_TEST_DSN")
+
+
+def test_index_statements_are_idempotent():
+    statements = index_statements()
+    assert len(statements) == len(INDEXES)
+    assert all("CONCURRENTLY IF NOT EXISTS" in s for s in statements)
+    assert all("CONCURRENTLY" not in s for s in index_statements(concurrently=False))
+
+
+def test_partial_indexes_match_questionnaire_filters():
+    definitions = " ".join(definition for _, _, definition in INDEXES)
+    assert "WHERE questionnaire_id IS NULL" in definitions
+    assert "WHERE questionnaire_id IS NOT NULL" in definitions
+
+
+def test_feature_store_triggers_are_statement_level():
+    statements = trigger_statements()
+    assert len(statements) == 2 * len(TRIGGERS)
+    drops, creates = statements[::2], statements[1::2]
+    assert all(s.startswith("DROP TRIGGER IF EXISTS") for s in drops)
+    assert all("FOR EACH STATEMENT" in s and "REFERENCING" in s for s in creates)
+    tables = {table for _, table, _, _, _ in TRIGGERS}
+    assert tables == {"stu_tracker.Assessments_students", "stu_tracker.Session_students", "stu_tracker.Sessions",
+                      "stu_tracker.Assessments", "stu_tracker.Subjects", "stu_tracker.Pre_assessment_questionnaire"}
+
+
+def test_report_queries_are_captured_without_database():
+    queries = report_queries(7, 2)
+    names = [name for name, _, _, _ in queries]
+    assert "get_all_student_assessments" in names
+    assert "get_student_attendance" in names
+    for name, query, params, analyze in queries:
+        assert "stu_tracker" in query
+        if name != "update_event_queue":
+            assert list(params) == [7, 2]
+            assert analyze is True
+        else:
+            assert analyze is False
+
+
+def test_find_seq_scans_on_guarded_tables():
+    plan = {"Plan": {
+        "Node Type": "Nested Loop",
+        "Plans": [
+            {"Node Type": "Seq Scan", "Relation Name": "assessments_students"},
+            {"Node Type": "Seq Scan", "Relation Name": "subjects"},
+            {"Node Type": "Index Scan", "Relation Name": "sessions"},
+        ],
+    }}
+    assert find_seq_scans(plan) == ["assessments_students"]
+
+
+def test_find_seq_scans_clean_plan():
+    plan = {"Plan": {"Node Type": "Index Only Scan", "Relation Name": "session_students"}}
+    assert find_seq_scans(plan) == []
+
+
+@pytest.mark.skipif(not POSTGRES_TEST_DSN, reason="POSTGRES_TEST_DSN not set")
+def test_seeded_database_plans_use_indexes():
+    import psycopg2
+    from Config.PostgresClient import PostgresClient
+    from Migrations.seed import seed
+    from Migrations.main import apply_indexes
+
+    db = PostgresClient.__new__(PostgresClient)
+    db.conn = psycopg2.connect(POSTGRES_TEST_DSN)
+    try:
+        seed(db, students=500)
+        apply_indexes(db, concurrently=False)
+        results = check_plans(db)
+        assert [r for r in results if r["seq_scans"]] == []
+    finally:
+        db.conn.rollback()
+        db.conn.close()
@@ -0,0 +1,74 @@
+import os
+import pickle
+import threading
+import logging
+from Config.SharedMemory import write_shared, read_shared
+
+logger = logging.getLogger(__name__)
+
+LINEAR_MODEL_PATH = './Models/linear_model.pkl'
+LOGISTIC_MODEL_PATH = './Models/logistic_model.pkl'
+## Directory of memory-mapped copies of the models (e.g. /dev/shm/pg_reports); empty unpickles per process
+SHARED_MODEL_DIR = os.getenv("SHARED_MODEL_DIR", "")
+
+_models = {}
+_lock = threading.Lock()
+
+
+def load_model(path):
+    """
+        Unpickle a model once per process. The cache is keyed by absolute path and
+        re-reads the file only when its mtime or size changes.
+        Raises OSError when the file does not exist, like open() would.
+    """
+    full_path = os.path.abspath(path)
+    stat = os.stat(full_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _models.get(full_path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    if SHARED_MODEL_DIR:
+        model = load_shared_model(full_path, signature, SHARED_MODEL_DIR)
+    else:
+        with open(full_path, 'rb') as file:
+            model = pickle.load(file)
+    with _lock:
+        _models[full_path] = (signature, model)
+    logger.info(f"Loaded model {full_path}")
+    return model
+
+
+def shared_model_path(path, signature, directory) -> str:
+    """The mapped copy of `path` at `signature`; a retrained model gets a new file."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(directory, f"{name}-{signature[0]}-{signature[1]}.shared")
+
+
+def load_shared_model(path, signature, directory):
+    """
+        The model with its parameter arrays mapped read-only from SHARED_MODEL_DIR. The first
+        process to load a model version publishes it; the others map the same pages.
+    """
+    shared_path = shared_model_path(path, signature, directory)
+    if not os.path.exists(shared_path):
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'rb') as file:
+            write_shared(pickle.load(file), shared_path)
+        logger.info(f"Published {path} to {shared_path}")
+        ## Processes still using an older version keep its pages after the unlink
+        prefix = os.path.basename(shared_path).rsplit("-", 2)[0] + "-"
+        for entry in os.listdir(directory):
+            if entry.startswith(prefix) and entry.endswith(".shared") and entry != os.path.basename(shared_path):
+                ## Another worker publishing the same version may have removed it first
+                try:
+                    os.remove(os.path.join(directory, entry))
+                except FileNotFoundError:
+                    pass
+    return read_shared(shared_path)
+
+
+def clear_models():
+    with _lock:
+        _models.clear()
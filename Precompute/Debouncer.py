@@ -0,0 +1,65 @@
+import time
+
+
+class Debouncer:
+    """
+        Collects change notifications per key and releases a key once it has been quiet for
+        `quiet` seconds, or `max_delay` seconds after its first change if changes keep coming
+        (a class entering grades all afternoon still gets a report).
+    """
+
+    def __init__(self, quiet=30.0, max_delay=300.0, clock=time.monotonic):
+        self.quiet = quiet
+        self.max_delay = max_delay
+        self.clock = clock
+        ## key -> (first change, release deadline)
+        self.pending = {}
+
+    def touch(self, key):
+        now = self.clock()
+        first = self.pending[key][0] if key in self.pending else now
+        self.pending[key] = (first, min(now + self.quiet, first + self.max_delay))
+
+    def defer(self, key, delay):
+        """Put a released key back, due again in `delay` seconds."""
+        now = self.clock()
+        self.pending[key] = (now, now + delay)
+
+    def due(self) -> list:
+        """Remove and return the keys whose deadline has passed, oldest deadline first."""
+        now = self.clock()
+        keys = sorted((deadline, key) for key, (_, deadline) in self.pending.items() if deadline <= now)
+        for _, key in keys:
+            del self.pending[key]
+        return [key for _, key in keys]
+
+    def next_deadline(self):
+        if not self.pending:
+            return None
+        return min(deadline for _, deadline in self.pending.values())
+
+    def __len__(self):
+        return len(self.pending)
+
+
+class TokenBucket:
+    """`rate` regenerations per second on average, at most `burst` back to back; rate <= 0 is unlimited."""
+
+    def __init__(self, rate=1.0, burst=1, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.tokens = float(self.burst)
+        self.updated = clock()
+
+    def take(self) -> float:
+        """Take a token and return 0, or return the seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
@@ -0,0 +1,195 @@
+import os
+import sys
+import json
+import logging
+from Config.Environment import load_environment, configure_logging
+from Config.Metrics import metrics
+from Config import Tracing
+from Migrations.precompute import CHANNEL
+from Precompute.Debouncer import Debouncer, TokenBucket
+
+logger = logging.getLogger(__name__)
+load_environment()
+
+## Seconds without a new change before a student's report is regenerated
+PRECOMPUTE_QUIET     = float(os.getenv("PRECOMPUTE_QUIET", "30"))
+## Upper bound on the wait for a student whose data keeps changing
+PRECOMPUTE_MAX_DELAY = float(os.getenv("PRECOMPUTE_MAX_DELAY", "300"))
+## Regenerations per second, and how many may run back to back after an idle period
+PRECOMPUTE_RATE      = float(os.getenv("PRECOMPUTE_RATE", "1"))
+PRECOMPUTE_BURST     = int(os.getenv("PRECOMPUTE_BURST", "5"))
+## Pause while the interactive queue holds more than this many messages; -1 disables the check
+PRECOMPUTE_MAX_BACKLOG = int(os.getenv("PRECOMPUTE_MAX_BACKLOG", "0"))
+PRECOMPUTE_BACKOFF   = float(os.getenv("PRECOMPUTE_BACKOFF", "5"))
+
+
+def precomputed_key(key) -> str:
+    student_id, semester_id = key
+    return f"precomputed/{student_id}/{semester_id}.json"
+
+
+def parse_payload(payload):
+    try:
+        student_id, semester_id = payload.split(":")
+        return int(student_id), int(semester_id)
+    except ValueError:
+        logger.warning(f"Ignoring malformed notification {payload!r}")
+        return None
+
+
+class PrecomputeWorker:
+    """
+        Regenerates reports in the background when their inputs change.
+
+        Triggers from Migrations/precompute.py bump stu_tracker.Precomputed_report.version and
+        NOTIFY "<student_id>:<semester_id>". Notifications are debounced per key, then each
+        report is computed, uploaded under precomputed_key() and recorded with the version read
+        before computing. A notified student's rows are first dropped from the client's
+        QueryCache, so the report is not computed from reads cached before the change.
+        Regeneration is paced by a token bucket and pauses while busy() reports interactive
+        work waiting, so it only uses spare capacity.
+
+        compute(student_id, semester_id) -> str    serialized report
+        busy() -> bool                             True while interactive requests are queued
+    """
+
+    def __init__(self, db, s3, compute, debouncer: Debouncer, limiter: TokenBucket, busy=None,
+                 backoff=5.0, channel=CHANNEL):
+        self.db = db
+        self.s3 = s3
+        self.compute = compute
+        self.debouncer = debouncer
+        self.limiter = limiter
+        self.busy = busy
+        self.backoff = backoff
+        self.channel = channel
+        self.conn = None
+        self.stats = {"notifications": 0, "regenerated": 0, "errors": 0, "deferred": 0}
+
+    def start(self):
+        self.db.listen(self.channel)
+        self.resync()
+
+    def resync(self):
+        """Queue every stale report: covers notifications missed while stopped or disconnected."""
+        self.conn = self.db.conn
+        rows = self.db.get_stale_precomputed_reports()
+        for row in rows:
+            key = (row["student_id"], row["semester_id"])
+            self.db.invalidate_student(*key)
+            self.debouncer.touch(key)
+        logger.info(f"Precompute backlog after resync: {len(self.debouncer)} reports")
+
+    def poll(self, timeout):
+        payloads = self.db.wait_notifications(timeout)
+        if self.db.conn is not self.conn:
+            self.resync()
+        for payload in payloads:
+            key = parse_payload(payload)
+            if key is not None:
+                self.stats["notifications"] += 1
+                ## The client's QueryCache may hold the rows from before the change for longer than
+                ## the quiet period; the regeneration must read the ones the new version counts
+                self.db.invalidate_student(*key)
+                self.debouncer.touch(key)
+
+    def flush(self):
+        """Regenerate due reports while the rate limit and the interactive backlog allow."""
+        keys = self.debouncer.due()
+        for index, key in enumerate(keys):
+            delay = self.backoff if self.busy is not None and self.busy() else self.limiter.take()
+            if delay > 0:
+                for waiting in keys[index:]:
+                    self.debouncer.defer(waiting, delay)
+                self.stats["deferred"] += len(keys) - index
+                return
+            self.regenerate(key)
+
+    def regenerate(self, key):
+        with Tracing.span("precompute.regenerate", student_id=key[0], semester_id=key[1]):
+            self._regenerate(key)
+
+    def _regenerate(self, key):
+        version = self.db.get_report_version(*key)
+        if version is None:
+            return
+        try:
+            with metrics.time("precompute.seconds"):
+                js = self.compute(*key)
+                s3_key = precomputed_key(key)
+                if not self.s3.put_object(s3_key, js.encode("utf-8")):
+                    raise RuntimeError(f"S3 put_object failed for {s3_key}")
+            ## A change committed meanwhile has bumped version past the one recorded here,
+            ## so the report stays stale and its notification queues another regeneration
+            self.db.save_precomputed_report(*key, s3_key, version)
+            self.stats["regenerated"] += 1
+            metrics.inc("precompute.reports")
+        except Exception:
+            ## The row stays stale: on-demand requests compute it, the next change or resync retries
+            self.stats["errors"] += 1
+            metrics.inc("precompute.errors")
+            logger.exception(f"Unable to precompute report for {key}")
+
+    def run(self, max_wait=60.0):
+        self.start()
+        while True:
+            deadline = self.debouncer.next_deadline()
+            timeout = max_wait
+            if deadline is not None:
+                timeout = min(max_wait, max(0.0, deadline - self.debouncer.clock()))
+            self.poll(timeout)
+            self.flush()
+
+
+def interactive_backlog(mq, queue, limit):
+    """busy() for PrecomputeWorker: more than `limit` messages ready in the interactive queue."""
+    from Config.RabbitMQ import RECOVERABLE_ERRORS
+
+    def busy():
+        try:
+            return mq.queue_depth(queue) > limit
+        except RECOVERABLE_ERRORS as e:
+            ## The connection idles between checks and may have missed heartbeats
+            logger.warning(f"Lost RabbitMQ connection: {e!r}")
+            mq.reconnect()
+            return mq.queue_depth(queue) > limit
+
+    return busy
+
+
+def main(argv=None):
+    import main as consumer
+    from Config.PostgresClient import PostgresClient
+    from Config.RabbitMQ import RabbitMQ
+    from S3.main import S3Instance
+
+    configure_logging()
+    db = PostgresClient()
+    busy, mq = None, None
+    if PRECOMPUTE_MAX_BACKLOG >= 0:
+        mq = RabbitMQ(1, consumer.EXCHANGE, consumer.QUEUE, consumer.ROUTING_KEY, consumer.EXCHANGE_TYPE,
+                      consumer.QUEUE_MAX_PRIORITY)
+        busy = interactive_backlog(mq, consumer.QUEUE, PRECOMPUTE_MAX_BACKLOG)
+    worker = PrecomputeWorker(
+        db,
+        S3Instance("tracker-student-reports"),
+        compute=lambda student_id, semester_id: json.dumps(
+            consumer.analyze_stage(consumer.fetch_stage(db, student_id, semester_id))),
+        debouncer=Debouncer(PRECOMPUTE_QUIET, PRECOMPUTE_MAX_DELAY),
+        limiter=TokenBucket(PRECOMPUTE_RATE, PRECOMPUTE_BURST),
+        busy=busy,
+        backoff=PRECOMPUTE_BACKOFF,
+    )
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        logger.info("Shutting down")
+    finally:
+        if mq is not None and mq.get_connection().is_open:
+            mq.get_connection().close()
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+# test_precompute.py
+import os
+import pytest
+
+from Config.QueryCache import QueryCache, cached
+from Config.PostgresClient import PostgresClient
+from Precompute.Debouncer import Debouncer, TokenBucket
+from Precompute.main import PrecomputeWorker, precomputed_key, parse_payload
+from Migrations.precompute import CHANNEL, TRIGGERS, apply_precompute
+
+POSTGRES_TEST_DSN = os.getenv("POSTGRES_TEST_DSN")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeDb:
+    """Precomputed_report rows and a notification inbox, as PostgresClient exposes them."""
+
+    def __init__(self):
+        self.conn = object()
+        self.versions = {}
+        self.saved = {}
+        self.inbox = []
+        self.listening = []
+
+    def change(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+        self.inbox.append(f"{key[0]}:{key[1]}")
+
+    def listen(self, channel):
+        self.listening.append(channel)
+
+    def wait_notifications(self, timeout):
+        payloads, self.inbox = self.inbox, []
+        return payloads
+
+    def get_stale_precomputed_reports(self):
+        return [{"student_id": s, "semester_id": sem} for (s, sem), version in self.versions.items()
+                if self.saved.get((s, sem), (None, None))[1] != version]
+
+    def get_report_version(self, student_id, semester_id):
+        return self.versions.get((student_id, semester_id))
+
+    def save_precomputed_report(self, student_id, semester_id, s3_key, version):
+        self.saved[(student_id, semester_id)] = (s3_key, version)
+
+    def invalidate_student(self, student_id, semester_id=None):
+        pass
+
+
+class CachedDb(FakeDb):
+    """FakeDb with attendance read through a QueryCache and PostgresClient's invalidation."""
+
+    def __init__(self, clock):
+        super().__init__()
+        self.cache = QueryCache(ttls={"attendance": 60}, clock=clock)
+        self.attendance = {}
+
+    @cached("attendance")
+    def get_student_attendance(self, student_id, semester_id):
+        return dict(self.attendance[(student_id, semester_id)])
+
+    invalidate_student = PostgresClient.invalidate_student
+
+
+class FakeS3:
+    def __init__(self):
+        self.puts = {}
+
+    def put_object(self, key, body):
+        self.puts[key] = body
+        return True
+
+
+def make_worker(db, clock, rate=0, burst=1, busy=None, compute=None):
+    computed = []
+
+    def default_compute(student_id, semester_id):
+        computed.append((student_id, semester_id))
+        return f'{{"student": {student_id}}}'
+
+    worker = PrecomputeWorker(
+        db, FakeS3(), compute or default_compute,
+        Debouncer(quiet=10, max_delay=60, clock=clock),
+        TokenBucket(rate, burst, clock=clock),
+        busy=busy, backoff=5,
+    )
+    return worker, computed
+
+
+def test_debouncer_waits_for_quiet_period():
+    clock = Clock()
+    debouncer = Debouncer(quiet=10, max_delay=60, clock=clock)
+    debouncer.touch("a")
+    clock.now = 8
+    debouncer.touch("a")
+    clock.now = 12
+    assert debouncer.due() == []
+    clock.now = 18
+    assert debouncer.due() == ["a"]
+    assert len(debouncer) == 0
+
+
+def test_debouncer_max_delay_bounds_continuous_changes():
+    clock = Clock()
+    debouncer = Debouncer(quiet=10, max_delay=30, clock=clock)
+    for t in range(0, 40, 5):
+        clock.now = t
+        debouncer.touch("a")
+        if debouncer.due():
+            break
+    assert clock.now == 30
+
+
+def test_token_bucket_paces_after_burst():
+    clock = Clock()
+    bucket = TokenBucket(rate=2, burst=2, clock=clock)
+    assert bucket.take() == 0 and bucket.take() == 0
+    assert bucket.take() == pytest.approx(0.5)
+    clock.now = 0.5
+    assert bucket.take() == 0
+    assert TokenBucket(rate=0, clock=clock).take() == 0
+
+
+def test_parse_payload():
+    assert parse_payload("7:3") == (7, 3)
+    assert parse_payload("garbage") is None
+    assert precomputed_key((7, 3)) == "precomputed/7/3.json"
+
+
+def test_notifications_are_debounced_into_one_regeneration():
+    clock, db = Clock(), FakeDb()
+    worker, computed = make_worker(db, clock)
+    worker.start()
+    assert db.listening == [CHANNEL]
+    for t in (0, 2, 4):
+        clock.now = t
+        db.change((7, 3))
+        worker.poll(0)
+        worker.flush()
+    assert computed == []
+    clock.now = 15
+    worker.flush()
+    assert computed == [(7, 3)]
+    assert db.saved[(7, 3)] == ("precomputed/7/3.json", 3)
+    assert worker.s3.puts["precomputed/7/3.json"] == b'{"student": 7}'
+
+
+def test_change_during_regeneration_leaves_report_stale():
+    clock, db = Clock(), FakeDb()
+
+    def compute(student_id, semester_id):
+        db.change((student_id, semester_id))
+        return "{}"
+
+    worker, _ = make_worker(db, clock, compute=compute)
+    worker.start()
+    db.change((7, 3))
+    worker.poll(0)
+    clock.now = 10
+    worker.flush()
+    assert db.saved[(7, 3)][1] == 1 and db.versions[(7, 3)] == 2
+    worker.poll(0)
+    assert (7, 3) in worker.debouncer.pending
+
+
+def test_rate_limit_and_interactive_backlog_defer_work():
+    clock, db = Clock(), FakeDb()
+    interactive = {"waiting": True}
+    worker, computed = make_worker(db, clock, rate=1, burst=1, busy=lambda: interactive["waiting"])
+    worker.start()
+    for student in range(3):
+        db.change((student, 1))
+    worker.poll(0)
+    clock.now = 10
+    worker.flush()
+    assert computed == [] and len(worker.debouncer) == 3
+
+    interactive["waiting"] = False
+    clock.now = 15
+    worker.flush()
+    assert computed == [(0, 1)]
+    assert worker.stats["deferred"] == 5
+    clock.now = 16
+    worker.flush()
+    assert computed == [(0, 1), (1, 1)]
+
+
+def test_resync_after_reconnect_picks_up_missed_changes():
+    clock, db = Clock(), FakeDb()
+    worker, computed = make_worker(db, clock)
+    worker.start()
+    db.versions[(9, 2)] = 4
+    db.conn = object()
+    worker.poll(0)
+    clock.now = 10
+    worker.flush()
+    assert computed == [(9, 2)]
+
+
+def test_failed_regeneration_is_not_recorded():
+    clock, db = Clock(), FakeDb()
+
+    def compute(student_id, semester_id):
+        raise RuntimeError("Database query failed")
+
+    worker, _ = make_worker(db, clock, compute=compute)
+    worker.start()
+    db.change((7, 3))
+    worker.poll(0)
+    clock.now = 10
+    worker.flush()
+    assert db.saved == {} and worker.stats["errors"] == 1
+
+
+def test_apply_precompute_installs_statement_triggers():
+    class Recorder:
+        def __init__(self):
+            self.statements = []
+
+        def execute(self, statement, params=None, idempotent=False):
+            self.statements.append(statement)
+
+    db = Recorder()
+    apply_precompute(db)
+    assert any("pg_notify('report_inputs'" in s for s in db.statements)
+    creates = [s for s in db.statements if s.startswith("CREATE TRIGGER")]
+    assert len(creates) == len(TRIGGERS)
+    assert all("FOR EACH STATEMENT" in s for s in creates)
+
+
+@pytest.mark.skipif(not POSTGRES_TEST_DSN, reason="POSTGRES_TEST_DSN not set")
+def test_postgres_edits_to_joined_tables_bump_versions():
+    import psycopg2
+    from Config.PostgresClient import PostgresClient
+    from Migrations.seed import seed
+
+    db = PostgresClient.__new__(PostgresClient)
+    db.conn = psycopg2.connect(POSTGRES_TEST_DSN)
+    try:
+        seed(db, students=10)
+        apply_precompute(db)
+        row = db.fetch_one(
+            "SELECT ast.student_id, ast.semester_id, ast.session_id, ast.assessment_id, ast.questionnaire_id, "
+            "asmt.subject_id FROM stu_tracker.Assessments_students ast "
+            "JOIN stu_tracker.Assessments asmt ON asmt.id = ast.assessment_id "
+            "WHERE ast.questionnaire_id IS NOT NULL ORDER BY ast.id LIMIT 1;")
+
+        def version():
+            found = db.fetch_one("SELECT version FROM stu_tracker.Precomputed_report "
+                                 "WHERE student_id = %s AND semester_id = %s;", (row["student_id"], row["semester_id"]))
+            return found["version"] if found is not None else 0
+
+        edits = [
+            ("UPDATE stu_tracker.Assessments SET max_score = max_score * 2 WHERE id = %s;", row["assessment_id"]),
+            ("UPDATE stu_tracker.Subjects SET title = title || ' (renamed)' WHERE id = %s;", row["subject_id"]),
+            ("UPDATE stu_tracker.Pre_assessment_questionnaire SET study_hours = study_hours + 1 WHERE id = %s;",
+             row["questionnaire_id"]),
+            ("UPDATE stu_tracker.Sessions SET session_date = session_date + interval '1 day' WHERE id = %s;",
+             row["session_id"]),
+        ]
+        for statement, key in edits:
+            before = version()
+            db.execute(statement, (key,))
+            assert version() > before, statement
+
+        # Updates that leave the report's columns as they were do not
+        before = version()
+        db.execute("UPDATE stu_tracker.Subjects SET description = 'edited' WHERE id = %s;", (row["subject_id"],))
+        db.execute("UPDATE stu_tracker.Assessments SET title = title WHERE id = %s;", (row["assessment_id"],))
+        assert version() == before
+    finally:
+        db.conn.rollback()
+        db.conn.close()
+
+
+def test_regeneration_reads_attendance_changed_after_it_was_cached():
+    clock = Clock()
+    db = CachedDb(clock)
+    db.attendance[(7, 3)] = {"present": 8}
+    worker, _ = make_worker(db, clock, compute=lambda s, sem: str(db.get_student_attendance(s, sem)["present"]))
+    worker.start()
+    db.change((7, 3))
+    worker.poll(0)
+    clock.now = 10
+    worker.flush()
+    assert worker.s3.puts["precomputed/7/3.json"] == b"8"
+
+    ## Within the attendance TTL, so only the invalidation keeps the cached row out
+    db.attendance[(7, 3)] = {"present": 9}
+    db.change((7, 3))
+    clock.now = 20
+    worker.poll(0)
+    clock.now = 30
+    worker.flush()
+    assert worker.s3.puts["precomputed/7/3.json"] == b"9"
+    assert db.saved[(7, 3)] == ("precomputed/7/3.json", 2)
@@ -0,0 +1,303 @@
+import time
+import logging
+from concurrent.futures import TimeoutError as FutureTimeout
+from Config import Deadline, Tracing
+from Config.Deadline import DeadlineExceeded
+from Config.Metrics import metrics
+from Config.Logs import summary_set
+from Assessment_analysis.main import AssessmentAnalysis, AssessmentAggregates
+from Disability_analysis.main import DisabilityAnalysis
+
+logger = logging.getLogger(__name__)
+
+## Sections left out of a report whose deadline has passed; every other section is cheap
+EXPENSIVE_SECTIONS = ("learning_disability", "scores_linear_regression")
+
+## The three report inputs, in fetch result order
+ASSESSMENTS, QUESTIONNAIRE, ATTENDANCE = 0, 1, 2
+## The inputs only the EXPENSIVE_SECTIONS read, not fetched once the deadline is low
+EXPENSIVE_INPUTS = (QUESTIONNAIRE, ATTENDANCE)
+## Top-level report sections a request can ask for: the report_sections analyses behind each and
+## the inputs they read. Only the last two load a model.
+SECTIONS = {
+    "all_scores": (("scores", "data", "labels"), (ASSESSMENTS,)),
+    "subject_bias": (("subject_bias",), (ASSESSMENTS,)),
+    "assessment_comparison": (("assessment_comparison",), (ASSESSMENTS,)),
+    "learning_disability": (("learning_disability",), (QUESTIONNAIRE, ATTENDANCE)),
+    "learning_disability_linear_regression": (("scores_linear_regression",), (QUESTIONNAIRE, ATTENDANCE)),
+}
+
+
+def parse_sections(requested):
+    """
+        The requested sections as a tuple in report order, or None for the whole report (nothing
+        requested, or every section). Raises ValueError for names that are not SECTIONS.
+    """
+    if not requested:
+        return None
+    if isinstance(requested, str):
+        requested = [requested]
+    unknown = set(requested) - set(SECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown report sections: {', '.join(sorted(map(str, unknown)))}")
+    sections = tuple(name for name in SECTIONS if name in requested)
+    return None if len(sections) == len(SECTIONS) else sections
+
+
+def section_inputs(sections) -> set:
+    """Positions of the report inputs `sections` read (all three for the whole report)."""
+    if sections is None:
+        return {ASSESSMENTS, QUESTIONNAIRE, ATTENDANCE}
+    return {index for name in sections for index in SECTIONS[name][1]}
+
+
+def select_sections(report, sections) -> dict:
+    """`report` with only `sections` (plus generated_at and skipped_sections); None keeps it whole."""
+    if sections is None:
+        return report
+    return {key: value for key, value in report.items()
+            if key in sections or key in ("generated_at", "skipped_sections")}
+
+
+## PostgresClient methods behind fetch_report_data and fetch_report_data_pushdown, in result order
+REPORT_QUERIES = ("get_all_student_assessments", "get_student_prior_assessments_guestionnaire", "get_student_attendance")
+PUSHDOWN_QUERIES = ("get_assessment_aggregates", "get_student_prior_assessments_guestionnaire", "get_student_attendance")
+
+
+def affordable_inputs(inputs) -> set:
+    """
+        `inputs` without those only the EXPENSIVE_SECTIONS read once the current deadline is
+        low; the deadline is then marked degraded, so run_sections skips those sections.
+    """
+    deadline = Deadline.current_deadline()
+    if deadline is None or not inputs & set(EXPENSIVE_INPUTS) or not deadline.low():
+        return inputs
+    degrade(deadline)
+    return inputs - set(EXPENSIVE_INPUTS)
+
+
+def degrade(deadline):
+    if not deadline.degraded:
+        deadline.degraded = True
+        metrics.inc("report.degraded_fetches")
+
+
+def expensive_input(fetch, *args):
+    """fetch(*args) for one of the EXPENSIVE_INPUTS, or None if the deadline cancelled it (degrading the report)."""
+    try:
+        return fetch(*args)
+    except DeadlineExceeded:
+        degrade(Deadline.current_deadline())
+        return None
+
+
+def fetch_inputs(db, queries, student_id, semester_id, sections=None):
+    """One after the other, the `queries` `sections` need; the assessments go first so they keep the budget."""
+    inputs = section_inputs(sections)
+    results = [None, None, None]
+    if ASSESSMENTS in inputs:
+        results[ASSESSMENTS] = getattr(db, queries[ASSESSMENTS])(student_id, semester_id)
+    for index in sorted(affordable_inputs(inputs - {ASSESSMENTS})):
+        results[index] = expensive_input(getattr(db, queries[index]), student_id, semester_id)
+    return tuple(results)
+
+
+def fetch_report_data(db, student_id, semester_id, sections=None):
+    """Run the report queries `sections` need (all three by default) for one student and semester."""
+    return fetch_inputs(db, REPORT_QUERIES, student_id, semester_id, sections)
+
+
+def fetch_report_data_pushdown(db, student_id, semester_id, sections=None):
+    """Like fetch_report_data, but the all-assessments rows are replaced by their SQL aggregates."""
+    return fetch_inputs(db, PUSHDOWN_QUERIES, student_id, semester_id, sections)
+
+
+def fetch_report_data_parallel(pool, executor, student_id, semester_id, queries=REPORT_QUERIES, sections=None):
+    """The report queries in flight at once, each on its own connection from `pool` (PostgresPool)."""
+    def run(name):
+        with pool.client() as db:
+            return getattr(db, name)(student_id, semester_id)
+
+    inputs = section_inputs(sections)
+    inputs = (inputs & {ASSESSMENTS}) | affordable_inputs(inputs - {ASSESSMENTS})
+    futures = [Deadline.submit(executor, run, name) if index in inputs else None
+               for index, name in enumerate(queries)]
+    results = [None, None, None]
+    for index, future in enumerate(futures):
+        if future is None:
+            continue
+        results[index] = future.result() if index == ASSESSMENTS else expensive_input(future.result)
+    return tuple(results)
+
+
+def fetch_report_data_features(db, student_id, semester_id):
+    """
+        Like fetch_report_data, from one primary-key read of stu_tracker.Student_features
+        (Migrations/features.py). Falls back to the report queries when the row is missing.
+    """
+    features = db.get_student_features(student_id, semester_id) if semester_id is not None else None
+    if features is None:
+        return fetch_report_data(db, student_id, semester_id)
+    attendance_data = None
+    if features["total_sessions"]:
+        attendance_data = {
+            "total_sessions": features["total_sessions"],
+            "present": features["present"],
+            "absent": features["absent"],
+        }
+    return features["assessments"] or None, features["questionnaire"] or None, attendance_data
+
+
+def build_report(assessment_data_all, assessment_data_w_q, attendance_data, executor=None, deadline=None,
+                 sections=None) -> dict:
+    """Run the analyses of `sections` (every one by default) over the fetched rows and package the report dict."""
+    an = AssessmentAnalysis(assessment_data_all, attendance_data)
+    return package_report(an, assessment_data_w_q, attendance_data, executor, deadline, sections)
+
+
+def build_report_pushdown(aggregates, assessment_data_w_q, attendance_data, executor=None, deadline=None,
+                          sections=None) -> dict:
+    """Build the same report dict from PostgresClient.get_assessment_aggregates output."""
+    an = AssessmentAggregates(aggregates)
+    return package_report(an, assessment_data_w_q, attendance_data, executor, deadline, sections)
+
+
+def report_sections(an, da, anq) -> dict:
+    """The analyses of one report; none of them reads another's result."""
+    return {
+        "scores": an.assessment_moving_average_,
+        "data": an.get_dataset_,
+        "labels": an.get_dataset_labels_,
+        "subject_bias": an.subject_moving_average_bias_,
+        "assessment_comparison": an.get_dataset_assessment_,
+        "learning_disability": da.student_analysis_,
+        "scores_linear_regression": anq.assessment_analysis_lr_,
+    }
+
+
+def run_sections(sections, executor=None, deadline=None):
+    """
+        (results, skipped) of the report_sections. Once `deadline` has passed, or its inputs were
+        not fetched (degraded), the EXPENSIVE_SECTIONS that have not started are skipped. With an
+        `executor` the report also stops waiting for them at the deadline. A section that is
+        already running cannot be cancelled: it keeps its worker thread until it returns, so the
+        executor needs room for len(EXPENSIVE_SECTIONS) such threads besides the report's own.
+    """
+    def skip(name):
+        return name in EXPENSIVE_SECTIONS and deadline is not None and (deadline.degraded or deadline.expired())
+
+    sections = {name: Tracing.traced(f"analysis.{name}", analysis) for name, analysis in sections.items()}
+    results, skipped = {}, []
+    if executor is None:
+        for name, analysis in sections.items():
+            if skip(name):
+                results[name] = None
+                skipped.append(name)
+            else:
+                results[name] = analysis()
+        return results, skipped
+
+    futures = {name: Deadline.submit(executor, analysis) for name, analysis in sections.items() if not skip(name)}
+    for name in sections:
+        future = futures.get(name)
+        if future is None:
+            results[name] = None
+            skipped.append(name)
+            continue
+        if name not in EXPENSIVE_SECTIONS or deadline is None:
+            results[name] = future.result()
+            continue
+        try:
+            results[name] = future.result(timeout=max(0.0, deadline.remaining()))
+        except FutureTimeout:
+            if not future.cancel():
+                metrics.inc("report.abandoned_sections")
+            results[name] = None
+            skipped.append(name)
+    return results, skipped
+
+
+def package_report(an, assessment_data_w_q, attendance_data, executor=None, deadline=None, sections=None) -> dict:
+    """
+        Run the report_sections and assemble the report dict. With an `executor` they run
+        concurrently, so the analysis stage takes about as long as its slowest section.
+        Sections skipped for the `deadline` are None and listed under "skipped_sections".
+        With `sections` (see parse_sections) only their analyses run and only they are in
+        the report; models are loaded by the analyses, so none is loaded unless needed.
+    """
+    da = DisabilityAnalysis(assessment_data_w_q, attendance_data)
+    anq = AssessmentAnalysis(assessment_data_w_q, attendance_data)
+    generated_at = time.time()
+    analyses = report_sections(an, da, anq)
+    results = dict.fromkeys(analyses)
+    if sections is not None:
+        wanted = {name for section in sections for name in SECTIONS[section][0]}
+        analyses = {name: analysis for name, analysis in analyses.items() if name in wanted}
+    computed, skipped = run_sections(analyses, executor, deadline)
+    results.update(computed)
+    report = {
+        "generated_at": generated_at,
+        "all_scores": {
+            "scores": results["scores"],
+            "data": results["data"],
+            "labels": results["labels"]
+        },
+        "subject_bias": results["subject_bias"],
+        "assessment_comparison" : results["assessment_comparison"],
+        "learning_disability": results["learning_disability"], 
+        "learning_disability_linear_regression": {
+            "scores_linear_regression": results["scores_linear_regression"],
+        }
+    }
+    if skipped:
+        report["skipped_sections"] = skipped
+        metrics.inc("report.partial")
+        summary_set("skipped_sections", ",".join(skipped))
+        for name in skipped:
+            metrics.inc(f"report.skipped_sections.{name}")
+        logger.warning(f"Deadline passed, report sent without {', '.join(skipped)}")
+    return select_sections(report, sections)
+
+
+def fetch_cohort_data(db, semester_id, student_ids=None, frames=False):
+    """
+        The three report queries for a whole semester (or a list of students), one round trip
+        each. `frames` reads them with COPY into DataFrames, which CohortAnalysis takes as is;
+        numeric columns then arrive as floats rather than Decimals.
+    """
+    assessments = db.get_cohort_assessments(semester_id, student_ids, frame=frames)
+    questionnaire = db.get_cohort_assessments_questionnaire(semester_id, student_ids, frame=frames)
+    attendance = db.get_cohort_attendance(semester_id, student_ids, frame=frames)
+    return assessments, questionnaire, attendance
+
+
+def build_cohort_reports(assessments, questionnaire, attendance) -> dict:
+    """{student_id: report dict} with the same content package_report builds per student."""
+    from Cohort_analysis.main import CohortAnalysis
+
+    cohort = CohortAnalysis(assessments, questionnaire, attendance)
+    scores = cohort.assessment_moving_average_()
+    data = cohort.get_dataset_()
+    labels = cohort.get_dataset_labels_()
+    bias = cohort.subject_moving_average_bias_()
+    comparison = cohort.get_dataset_assessment_()
+    disability = cohort.student_analysis_()
+    linear_regression = cohort.assessment_analysis_lr_()
+    generated_at = time.time()
+    return {
+        student_id: {
+            "generated_at": generated_at,
+            "all_scores": {
+                "scores": scores.get(student_id),
+                "data": data.get(student_id),
+                "labels": labels.get(student_id)
+            },
+            "subject_bias": bias.get(student_id),
+            "assessment_comparison": comparison.get(student_id),
+            "learning_disability": disability.get(student_id),
+            "learning_disability_linear_regression": {
+                "scores_linear_regression": linear_regression.get(student_id),
+            }
+        }
+        for student_id in cohort.student_ids()
+    }
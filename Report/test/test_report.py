@@ -0,0 +1,490 @@
+# test_report.py
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import pandas as pd
+import pytest
+
+from Assessment_analysis.main import AssessmentAnalysis, AssessmentAggregates
+from Report.main import build_report, build_report_pushdown, fetch_report_data, fetch_report_data_features, \
+    fetch_report_data_parallel, run_sections, parse_sections, REPORT_QUERIES
+from Config.Deadline import Deadline, DeadlineExceeded, deadline_scope
+from Config.PostgresPool import PostgresPool
+
+POSTGRES_TEST_DSN = os.getenv("POSTGRES_TEST_DSN")
+
+
+def make_row(i, subject, alpha, score, max_score, kind):
+    return {
+        "session_date": datetime(2025, 3, 1 + 2 * (12 - i)),
+        "score": score, "max_score": max_score,
+        "subject_id": 1 if subject == "Algebra" else 2, "subject": subject,
+        "pre": kind == "pre", "mid": kind == "mid", "post": kind == "post",
+        "alpha_identifier": alpha, "assessment_title": f"{subject} {i}",
+    }
+
+
+@pytest.fixture
+def assessment_rows():
+    # Ordered like get_all_student_assessments (session_date DESC)
+    return [
+        make_row(0, "Algebra", "ALG-1", 80, 100, "post"),
+        make_row(1, "Geometry", "GEO-1", 0, 80, "pre"),
+        make_row(2, "Algebra", "ALG-1", 90, 100, "mid"),
+        make_row(3, "Geometry", "GEO-1", 60, 80, "mid"),
+        make_row(4, "Algebra", "ALG-1", 70, 100, "pre"),
+        make_row(5, "Geometry", "GEO-2", 70, 80, None),
+        make_row(6, "Algebra", "ALG-2", 55, 100, "pre"),
+        make_row(7, "Algebra", "ALG-2", 65, 100, "pre"),
+    ]
+
+
+def contract_aggregates(rows):
+    """
+        Contract of PostgresClient.get_assessment_aggregates, restated step by step in pandas so
+        AssessmentAggregates can be tested offline. It does not run the SQL: the postgres tests
+        below (make test-postgres) check the real query against it and against AssessmentAnalysis.
+    """
+    if not rows:
+        return None
+    frame = pd.DataFrame({
+        "rn": range(1, len(rows) + 1),
+        "norm": [float(r["score"]) / float(r["max_score"]) * 100 for r in rows],
+        "label": [r["assessment_title"] for r in rows],
+        "subject": [r["subject"] for r in rows],
+        "alpha_identifier": [r["alpha_identifier"] for r in rows],
+        "key_type": ["post" if r["post"] else "mid" if r["mid"] else "pre" if r["pre"] else None for r in rows],
+    })
+    sma = frame["norm"].rolling(5).mean().fillna(0)
+    cma = frame["norm"].expanding().mean()
+    series = [{"norm": n, "label": l, "sma": s, "cma": c}
+              for n, l, s, c in zip(frame["norm"], frame["label"], sma, cma)]
+
+    subjects = []
+    for subject, group in frame.groupby("subject", sort=False):
+        prev = group["norm"].shift()
+        change = [0 if pd.isna(p) or p == 0 else n / p - 1 for n, p in zip(group["norm"], prev)]
+        subjects.append({
+            "subject": subject, "mean": group["norm"].mean(),
+            "percent_change": sum(change) / len(change),
+            "infinite_change": bool(((prev == 0) & (group["norm"] != 0)).any()),
+        })
+
+    pivot = []
+    classified = frame[frame["key_type"].notna()]
+    for alpha, group in classified.groupby("alpha_identifier", sort=False):
+        entry = {"alpha_identifier": alpha}
+        for key in ("pre", "mid", "post"):
+            match = group[group["key_type"] == key]
+            entry[key] = match["norm"].iloc[-1] if len(match) else None
+        pivot.append(entry)
+    return {"series": series, "subjects": subjects, "pivot": pivot}
+
+
+def assert_same_output(a, b):
+    if isinstance(b, dict):
+        assert set(a) == set(b)
+        for key in b:
+            assert_same_output(a[key], b[key])
+    elif isinstance(b, list):
+        assert len(a) == len(b)
+        for x, y in zip(a, b):
+            assert_same_output(x, y)
+    elif isinstance(b, float):
+        assert a == pytest.approx(b, rel=1e-9, abs=1e-12)
+    else:
+        assert a == b
+
+
+def check_parity(aggregates, rows):
+    an = AssessmentAnalysis(rows, {})
+    ag = AssessmentAggregates(aggregates)
+    assert_same_output(ag.get_dataset_(), an.get_dataset_())
+    assert_same_output(ag.get_dataset_labels_(), an.get_dataset_labels_())
+    assert_same_output(ag.assessment_moving_average_(), an.assessment_moving_average_())
+    assert_same_output(ag.subject_moving_average_bias_(), an.subject_moving_average_bias_())
+    assert_same_output(ag.assessment_moving_average_subject_(), an.assessment_moving_average_subject_())
+    assert_same_output(ag.get_dataset_assessment_(), an.get_dataset_assessment_())
+
+
+def test_aggregates_match_python_implementation(assessment_rows):
+    check_parity(contract_aggregates(assessment_rows), assessment_rows)
+
+
+def test_aggregates_short_history(assessment_rows):
+    rows = assessment_rows[:2]
+    check_parity(contract_aggregates(rows), rows)
+
+
+def test_aggregates_empty_returns_none():
+    ag = AssessmentAggregates(None)
+    assert ag.get_dataset_() is None
+    assert ag.assessment_moving_average_() is None
+    assert ag.subject_moving_average_bias_() is None
+    assert ag.assessment_moving_average_subject_() is None
+    assert ag.get_dataset_assessment_() is None
+
+
+def test_build_report_pushdown_matches_build_report(assessment_rows):
+    python = build_report(assessment_rows, None, None)
+    pushdown = build_report_pushdown(contract_aggregates(assessment_rows), None, None)
+    python.pop("generated_at")
+    pushdown.pop("generated_at")
+    assert_same_output(pushdown, python)
+
+
+class FeatureDb:
+    """get_student_features plus the three report queries, counting calls."""
+
+    def __init__(self, features, rows):
+        self.features = features
+        self.rows = rows
+        self.calls = []
+
+    def get_student_features(self, student_id, semester_id):
+        self.calls.append("get_student_features")
+        return self.features
+
+    def get_all_student_assessments(self, student_id, semester_id):
+        self.calls.append("get_all_student_assessments")
+        return self.rows
+
+    def get_student_prior_assessments_guestionnaire(self, student_id, semester_id):
+        self.calls.append("get_student_prior_assessments_guestionnaire")
+        return None
+
+    def get_student_attendance(self, student_id, semester_id):
+        self.calls.append("get_student_attendance")
+        return {"total_sessions": 10, "present": 8, "absent": 2}
+
+
+def test_fetch_report_data_features_is_one_lookup(assessment_rows):
+    features = {"total_sessions": 10, "present": 8, "absent": 2, "assessments": assessment_rows, "questionnaire": []}
+    db = FeatureDb(features, assessment_rows)
+    data = fetch_report_data_features(db, 7, 1)
+    assert db.calls == ["get_student_features"]
+    assert data == fetch_report_data(FeatureDb(None, assessment_rows), 7, 1)
+
+
+def test_fetch_report_data_features_empty_row_matches_queries():
+    features = {"total_sessions": 0, "present": 0, "absent": 0, "assessments": [], "questionnaire": []}
+    assert fetch_report_data_features(FeatureDb(features, None), 7, 1) == (None, None, None)
+
+
+def test_fetch_report_data_features_falls_back(assessment_rows):
+    db = FeatureDb(None, assessment_rows)
+    assert fetch_report_data_features(db, 7, 1)[0] == assessment_rows
+    assert db.calls[0] == "get_student_features"
+    assert "get_all_student_assessments" in db.calls
+
+    # Whole-history reports have no semester row to read
+    db = FeatureDb({"total_sessions": 1}, assessment_rows)
+    fetch_report_data_features(db, 7, None)
+    assert "get_student_features" not in db.calls
+
+
+class SlowDb(FeatureDb):
+    """FeatureDb whose report queries take `latency` seconds each."""
+
+    def __init__(self, rows, latency):
+        super().__init__(None, rows)
+        self.latency = latency
+
+    def get_all_student_assessments(self, student_id, semester_id):
+        time.sleep(self.latency)
+        return super().get_all_student_assessments(student_id, semester_id)
+
+    def get_student_prior_assessments_guestionnaire(self, student_id, semester_id):
+        time.sleep(self.latency)
+        return super().get_student_prior_assessments_guestionnaire(student_id, semester_id)
+
+    def get_student_attendance(self, student_id, semester_id):
+        time.sleep(self.latency)
+        return super().get_student_attendance(student_id, semester_id)
+
+
+def test_parallel_fetch_matches_serial_and_overlaps_queries(assessment_rows):
+    pool = PostgresPool(3, lambda: SlowDb(assessment_rows, 0.1))
+    with ThreadPoolExecutor(3) as executor:
+        started = time.perf_counter()
+        data = fetch_report_data_parallel(pool, executor, 7, 1)
+        elapsed = time.perf_counter() - started
+    assert data == fetch_report_data(FeatureDb(None, assessment_rows), 7, 1)
+    assert elapsed < 0.25
+
+
+def test_parallel_analyses_build_the_same_report(assessment_rows):
+    questionnaire = [dict(row, title=row["assessment_title"], study_hours=4, tutor_sessions=1, sports_hours=2)
+                     for row in assessment_rows]
+    attendance = {"total_sessions": 10, "present": 8, "absent": 2}
+    serial = build_report(assessment_rows, questionnaire, attendance)
+    with ThreadPoolExecutor(4) as executor:
+        parallel = build_report(assessment_rows, questionnaire, attendance, executor=executor)
+    serial.pop("generated_at")
+    parallel.pop("generated_at")
+    assert parallel == serial
+
+
+def test_expired_deadline_leaves_out_expensive_sections(assessment_rows):
+    questionnaire = [dict(row, title=row["assessment_title"], study_hours=4, tutor_sessions=1, sports_hours=2)
+                     for row in assessment_rows]
+    attendance = {"total_sessions": 10, "present": 8, "absent": 2}
+    now = [0.0]
+    deadline = Deadline(1.0, clock=lambda: now[0])
+    full = build_report(assessment_rows, questionnaire, attendance, deadline=deadline)
+    now[0] = 2.0
+    partial = build_report(assessment_rows, questionnaire, attendance, deadline=deadline)
+
+    assert "skipped_sections" not in full
+    assert partial["skipped_sections"] == ["learning_disability", "scores_linear_regression"]
+    assert partial["learning_disability"] is None
+    assert partial["learning_disability_linear_regression"] == {"scores_linear_regression": None}
+    for section in ("all_scores", "subject_bias", "assessment_comparison"):
+        assert partial[section] == full[section]
+
+
+def test_parallel_sections_are_not_awaited_past_the_deadline():
+    sections = {
+        "scores": lambda: 1,
+        "learning_disability": lambda: time.sleep(0.5) or "late",
+        "scores_linear_regression": lambda: 2,
+    }
+    with ThreadPoolExecutor(3) as executor:
+        started = time.perf_counter()
+        results, skipped = run_sections(sections, executor, Deadline(0.05))
+        elapsed = time.perf_counter() - started
+    assert elapsed < 0.3
+    assert skipped == ["learning_disability"]
+    assert results == {"scores": 1, "learning_disability": None, "scores_linear_regression": 2}
+
+
+class CancellingDb(FeatureDb):
+    """FeatureDb whose attendance query is cancelled by the report deadline."""
+
+    def get_student_attendance(self, student_id, semester_id):
+        super().get_student_attendance(student_id, semester_id)
+        raise DeadlineExceeded("Query cancelled by the report deadline")
+
+
+def test_low_deadline_skips_the_expensive_inputs(assessment_rows):
+    now = [0.0]
+    deadline = Deadline(1.0, clock=lambda: now[0], reserve=0.5)
+    db = FeatureDb(None, assessment_rows)
+    with deadline_scope(deadline):
+        full = build_report(*fetch_report_data(db, 7, 1), deadline=deadline)
+        now[0] = 0.6
+        data = fetch_report_data(db, 7, 1)
+        with ThreadPoolExecutor(3) as executor:
+            partial = build_report(*data, executor=executor, deadline=deadline)
+    assert db.calls[3:] == ["get_all_student_assessments"]
+    assert data == (assessment_rows, None, None)
+    assert "skipped_sections" not in full and deadline.degraded and not deadline.expired()
+    assert partial["skipped_sections"] == ["learning_disability", "scores_linear_regression"]
+    for section in ("all_scores", "subject_bias", "assessment_comparison"):
+        assert partial[section] == full[section]
+
+
+def test_cancelled_expensive_query_degrades_the_report(assessment_rows):
+    deadline = Deadline(1.0)
+    with deadline_scope(deadline):
+        data = fetch_report_data(CancellingDb(None, assessment_rows), 7, 1)
+    assert data == (assessment_rows, None, None) and deadline.degraded
+
+    deadline = Deadline(1.0)
+    pool = PostgresPool(3, lambda: CancellingDb(None, assessment_rows))
+    with deadline_scope(deadline), ThreadPoolExecutor(3) as executor:
+        data = fetch_report_data_parallel(pool, executor, 7, 1)
+    assert data == (assessment_rows, None, None) and deadline.degraded
+
+
+def test_parse_sections():
+    assert parse_sections(None) is None
+    assert parse_sections([]) is None
+    assert parse_sections(["subject_bias", "all_scores"]) == ("all_scores", "subject_bias")
+    assert parse_sections("learning_disability") == ("learning_disability",)
+    everything = ["all_scores", "subject_bias", "assessment_comparison", "learning_disability",
+                  "learning_disability_linear_regression"]
+    assert parse_sections(everything) is None
+    with pytest.raises(ValueError, match="scores"):
+        parse_sections(["all_scores", "scores"])
+
+
+def test_selected_sections_fetch_only_their_queries(assessment_rows):
+    db = FeatureDb(None, assessment_rows)
+    data = fetch_report_data(db, 7, 1, ("all_scores", "subject_bias"))
+    assert db.calls == ["get_all_student_assessments"]
+    assert data == (assessment_rows, None, None)
+
+    db = FeatureDb(None, assessment_rows)
+    fetch_report_data(db, 7, 1, ("learning_disability",))
+    assert db.calls == ["get_student_prior_assessments_guestionnaire", "get_student_attendance"]
+
+    clients = []
+    pool = PostgresPool(3, lambda: clients.append(FeatureDb(None, assessment_rows)) or clients[-1])
+    with ThreadPoolExecutor(3) as executor:
+        data = fetch_report_data_parallel(pool, executor, 7, 1, REPORT_QUERIES, ("assessment_comparison",))
+    assert data == (assessment_rows, None, None)
+    assert [call for client in clients for call in client.calls] == ["get_all_student_assessments"]
+
+
+def test_selected_sections_skip_other_analyses_and_models(assessment_rows, monkeypatch):
+    questionnaire = [dict(row, title=row["assessment_title"], study_hours=4, tutor_sessions=1, sports_hours=2)
+                     for row in assessment_rows]
+    attendance = {"total_sessions": 10, "present": 8, "absent": 2}
+    full = build_report(assessment_rows, questionnaire, attendance)
+
+    def no_model(path):
+        raise AssertionError(f"{path} loaded for a report without model-backed sections")
+
+    monkeypatch.setattr("Assessment_analysis.main.load_model", no_model)
+    monkeypatch.setattr("Disability_analysis.main.load_model", no_model)
+    sections = ("all_scores", "assessment_comparison")
+    partial = build_report(assessment_rows, None, None, sections=sections)
+    assert set(partial) == {"generated_at", "all_scores", "assessment_comparison"}
+    for section in sections:
+        assert partial[section] == full[section]
+
+
+# ---- Parity against a live Postgres (disposable database, everything is rolled back) ----
+@pytest.mark.skipif(not POSTGRES_TEST_DSN, reason="POSTGRES_TEST_DSN not set")
+def test_postgres_aggregates_match_python(assessment_rows):
+    import psycopg2
+    from Config.PostgresClient import PostgresClient
+    from Migrations.seed import SCHEMA
+
+    db = PostgresClient.__new__(PostgresClient)
+    db.conn = psycopg2.connect(POSTGRES_TEST_DSN)
+    try:
+        with db.conn.cursor() as cursor:
+            cursor.execute(SCHEMA)
+            cursor.execute("INSERT INTO stu_tracker.Subjects (id, title) VALUES (1, 'Algebra'), (2, 'Geometry');")
+            for i, row in enumerate(assessment_rows):
+                cursor.execute(
+                    "INSERT INTO stu_tracker.Sessions (id, session_date, semester_id) VALUES (%s, %s, 1);",
+                    (i + 1, row["session_date"]))
+                cursor.execute(
+                    "INSERT INTO stu_tracker.Assessments (id, title, max_score, subject_id, pre, mid, post, alpha_identifier) "
+                    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s);",
+                    (i + 1, row["assessment_title"], row["max_score"], row["subject_id"],
+                     row["pre"], row["mid"], row["post"], row["alpha_identifier"]))
+                cursor.execute(
+                    "INSERT INTO stu_tracker.Assessments_students (student_id, semester_id, session_id, assessment_id, score) "
+                    "VALUES (7, 1, %s, %s, %s);",
+                    (i + 1, i + 1, row["score"]))
+
+        rows = db.get_all_student_assessments(7, 1)
+        check_parity(db.get_assessment_aggregates(7, 1), rows)
+        check_parity(db.get_assessment_aggregates(7, None), db.get_all_student_assessments(7, None))
+        assert db.get_assessment_aggregates(8, 1) is None
+    finally:
+        db.conn.rollback()
+        db.conn.close()
+
+
+@pytest.mark.skipif(not POSTGRES_TEST_DSN, reason="POSTGRES_TEST_DSN not set")
+def test_postgres_aggregates_match_python_on_seeded_schema():
+    import psycopg2
+    from Config.PostgresClient import PostgresClient
+    from Migrations.seed import seed
+
+    db = PostgresClient.__new__(PostgresClient)
+    db.conn = psycopg2.connect(POSTGRES_TEST_DSN)
+    try:
+        seed(db, students=40, history=30)
+        pairs = db.fetch_all(
+            "SELECT DISTINCT student_id, semester_id FROM stu_tracker.Assessments_students ORDER BY 1, 2;")
+        assert len(pairs) > 40
+        for pair in pairs:
+            s, sem = pair["student_id"], pair["semester_id"]
+            rows = db.get_all_student_assessments(s, sem)
+            check_parity(db.get_assessment_aggregates(s, sem), rows)
+            assert_same_output(db.get_assessment_aggregates(s, sem), contract_aggregates(rows))
+        for s in (1, 2, 40):
+            check_parity(db.get_assessment_aggregates(s, None), db.get_all_student_assessments(s, None))
+    finally:
+        db.conn.rollback()
+        db.conn.close()
+
+
+def report_without_timestamp(data):
+    report = build_report(*data)
+    report.pop("generated_at")
+    # numeric columns come back as Decimal from the queries and as float from jsonb
+    return json.loads(json.dumps(report, default=float))
+
+
+@pytest.mark.skipif(not POSTGRES_TEST_DSN, reason="POSTGRES_TEST_DSN not set")
+def test_postgres_feature_store_matches_report_queries():
+    import psycopg2
+    from Config.PostgresClient import PostgresClient
+    from Migrations.seed import seed
+    from Migrations.features import apply_feature_store, rebuild_features
+
+    db = PostgresClient.__new__(PostgresClient)
+    db.conn = psycopg2.connect(POSTGRES_TEST_DSN)
+    try:
+        seed(db, students=50)
+        apply_feature_store(db)
+        rebuild_features(db)
+        pairs = db.fetch_all(
+            "SELECT DISTINCT student_id, semester_id FROM stu_tracker.Assessments_students "
+            "WHERE semester_id IS NOT NULL ORDER BY 1, 2 LIMIT 20;")
+        for pair in pairs:
+            s, sem = pair["student_id"], pair["semester_id"]
+            features = db.get_student_features(s, sem)
+            assert features is not None
+            assert_same_output([row["norm"] for row in features["assessments"]],
+                               AssessmentAnalysis(db.get_all_student_assessments(s, sem), {}).get_dataset_())
+            questionnaire = features["questionnaire"]
+            assert all(row["prev_score"] is not None for row in questionnaire[1:])
+            assert_same_output(report_without_timestamp(fetch_report_data_features(db, s, sem)),
+                               report_without_timestamp(fetch_report_data(db, s, sem)))
+
+        # Writes after the backfill are picked up by the triggers
+        s, sem = pairs[0]["student_id"], pairs[0]["semester_id"]
+        db.execute(
+            "INSERT INTO stu_tracker.Assessments_students (student_id, semester_id, session_id, assessment_id, score) "
+            "SELECT student_id, semester_id, session_id, assessment_id, score / 2 FROM stu_tracker.Assessments_students "
+            "WHERE student_id = %s AND semester_id = %s LIMIT 3;", (s, sem))
+        db.execute(
+            "DELETE FROM stu_tracker.Session_students WHERE ctid IN (SELECT ss.ctid FROM stu_tracker.Session_students ss "
+            "JOIN stu_tracker.Sessions st ON st.id = ss.session_id WHERE ss.student_id = %s AND st.semester_id = %s LIMIT 1);",
+            (s, sem))
+        assert fetch_report_data_features(db, s, sem)[2] == db.get_student_attendance(s, sem)
+        assert_same_output(report_without_timestamp(fetch_report_data_features(db, s, sem)),
+                           report_without_timestamp(fetch_report_data(db, s, sem)))
+
+        # So are edits to the rows the report joins in
+        questionnaire = db.fetch_one(
+            "SELECT student_id, semester_id, session_id, assessment_id, questionnaire_id "
+            "FROM stu_tracker.Assessments_students WHERE questionnaire_id IS NOT NULL ORDER BY id LIMIT 1;")
+        s, sem = questionnaire["student_id"], questionnaire["semester_id"]
+        db.execute("UPDATE stu_tracker.Assessments SET max_score = max_score * 2, title = title || ' (v2)' "
+                   "WHERE id = %s;", (questionnaire["assessment_id"],))
+        db.execute("UPDATE stu_tracker.Subjects SET title = title || ' (renamed)';")
+        db.execute("UPDATE stu_tracker.Sessions SET session_date = session_date - interval '90 days' WHERE id = %s;",
+                   (questionnaire["session_id"],))
+        db.execute("UPDATE stu_tracker.Pre_assessment_questionnaire SET study_hours = study_hours + 5 WHERE id = %s;",
+                   (questionnaire["questionnaire_id"],))
+        assert_same_output(report_without_timestamp(fetch_report_data_features(db, s, sem)),
+                           report_without_timestamp(fetch_report_data(db, s, sem)))
+
+        moved = db.fetch_one("SELECT id, semester_id FROM stu_tracker.Sessions WHERE id IN "
+                             "(SELECT session_id FROM stu_tracker.Session_students WHERE student_id = %s) LIMIT 1;", (s,))
+        db.execute("UPDATE stu_tracker.Sessions SET semester_id = semester_id + 1 WHERE id = %s;", (moved["id"],))
+        for semester in (moved["semester_id"], moved["semester_id"] + 1):
+            assert fetch_report_data_features(db, s, semester)[2] == db.get_student_attendance(s, semester)
+
+        # Attendance of a session deleted first is recounted when its rows go
+        gone = db.fetch_one("SELECT ss.session_id, st.semester_id FROM stu_tracker.Session_students ss "
+                            "JOIN stu_tracker.Sessions st ON st.id = ss.session_id WHERE ss.student_id = %s LIMIT 1;",
+                            (s,))
+        db.execute("DELETE FROM stu_tracker.Sessions WHERE id = %s;", (gone["session_id"],))
+        db.execute("DELETE FROM stu_tracker.Session_students WHERE session_id = %s;", (gone["session_id"],))
+        assert fetch_report_data_features(db, s, gone["semester_id"])[2] == \
+            db.get_student_attendance(s, gone["semester_id"])
+    finally:
+        db.conn.rollback()
+        db.conn.close()
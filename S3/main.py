@@ -1,8 +1,19 @@
-import boto3
-from botocore.exceptions import BotoCoreError, ClientError
+import threading
 
 ## Asuuming the base role for CLI
-s3 = boto3.client('s3')
+## The boto3 client is created on first use so that importing this module stays cheap.
+_s3 = None
+_s3_lock = threading.Lock()
+
+
+def get_client():
+    global _s3
+    if _s3 is None:
+        with _s3_lock:
+            if _s3 is None:
+                import boto3
+                _s3 = boto3.client('s3')
+    return _s3
 
 
 class S3Instance:
@@ -11,8 +22,9 @@ class S3Instance:
         self.bucket = bucket
     
     def put_object(self, key, body)-> bool:
+        from botocore.exceptions import BotoCoreError, ClientError
         try:
-            s3.put_object(
+            get_client().put_object(
                 Bucket=self.bucket,
                 Key=str("student_reports/"+key),
                 Body=body,
@@ -21,7 +33,16 @@ class S3Instance:
             return True
         except (BotoCoreError, ClientError) as e:
             return False
+
+    def get_object(self, key):
+        """Body of student_reports/<key>, or None if it is missing or unreadable."""
+        from botocore.exceptions import BotoCoreError, ClientError
+        try:
+            response = get_client().get_object(Bucket=self.bucket, Key=str("student_reports/"+key))
+            return response["Body"].read()
+        except (BotoCoreError, ClientError):
+            return None
     
 
 
-    
\ No newline at end of file
+    
@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import logging
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+ARROW = "arrow"
+PARQUET = "parquet"
+MANIFEST = "manifest.json"
+
+## Columns of the PostgresClient cohort queries. Postgres numeric columns are stored as float64 so
+## they can be mapped without conversion; reports built from a snapshot can therefore differ from
+## the Decimal path in the last bit, like the feature store's jsonb.
+SCHEMAS = {
+    "assessments": pa.schema([
+        ("student_id", pa.int64()), ("session_date", pa.timestamp("us")),
+        ("score", pa.float64()), ("max_score", pa.float64()), ("subject_id", pa.int64()),
+        ("subject", pa.string()), ("pre", pa.bool_()), ("post", pa.bool_()), ("mid", pa.bool_()),
+        ("alpha_identifier", pa.string()), ("assessment_title", pa.string()),
+    ]),
+    "questionnaire": pa.schema([
+        ("student_id", pa.int64()), ("session_date", pa.timestamp("us")),
+        ("score", pa.float64()), ("max_score", pa.float64()), ("subject_id", pa.int64()),
+        ("title", pa.string()), ("sleep_hours", pa.float64()), ("effort_score", pa.float64()),
+        ("tutor_sessions", pa.float64()), ("sports_hours", pa.float64()), ("peer_influence", pa.float64()),
+        ("study_hours", pa.float64()), ("questionnaire_id", pa.int64()), ("subject", pa.string()),
+    ]),
+    "attendance": pa.schema([
+        ("student_id", pa.int64()), ("total_sessions", pa.int64()),
+        ("present", pa.int64()), ("absent", pa.int64()),
+    ]),
+}
+## PostgresClient method behind each table
+QUERIES = {
+    "assessments": "get_cohort_assessments",
+    "questionnaire": "get_cohort_assessments_questionnaire",
+    "attendance": "get_cohort_attendance",
+}
+## What CohortAnalysis reads from each table; everything else stays on disk
+ANALYSIS_COLUMNS = {
+    "assessments": ["student_id", "score", "max_score", "subject", "pre", "mid", "post",
+                    "alpha_identifier", "assessment_title"],
+    "questionnaire": ["student_id", "score", "max_score", "subject", "title", "tutor_sessions",
+                      "study_hours", "sports_hours"],
+    "attendance": ["student_id", "total_sessions", "present"],
+}
+
+
+def to_table(rows, schema) -> pa.Table:
+    """Query rows (dicts) as a table of `schema`; Decimals become floats where the schema says so."""
+    columns = []
+    for field in schema:
+        values = [row.get(field.name) for row in rows]
+        if pa.types.is_floating(field.type):
+            values = [float(v) if v is not None else None for v in values]
+        elif pa.types.is_integer(field.type):
+            values = [int(v) if v is not None else None for v in values]
+        columns.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def snapshot_dir(directory, semester_id) -> str:
+    return os.path.join(directory, f"semester={semester_id}")
+
+
+def write_table(table, path, fmt):
+    """
+        Write through a temporary file and rename: readers holding the old file mapped keep
+        their pages (truncating a mapped file in place kills them with SIGBUS).
+    """
+    tmp_path = f"{path}.tmp"
+    if fmt == ARROW:
+        ## Uncompressed IPC file, so a read maps the column buffers instead of decoding them
+        with ipc.new_file(tmp_path, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+
+def export_semester(db, semester_id, directory, fmt=ARROW, student_ids=None) -> dict:
+    """Run the three cohort queries once and write them under snapshot_dir(); returns the manifest."""
+    if fmt not in (ARROW, PARQUET):
+        raise ValueError(f"Unknown snapshot format {fmt!r}")
+    target = snapshot_dir(directory, semester_id)
+    os.makedirs(target, exist_ok=True)
+    manifest = {"semester_id": semester_id, "format": fmt, "exported_at": time.time(),
+                "student_ids": list(student_ids) if student_ids is not None else None, "tables": {}}
+    for name, schema in SCHEMAS.items():
+        started = time.perf_counter()
+        rows = getattr(db, QUERIES[name])(semester_id, student_ids)
+        table = to_table(rows, schema)
+        path = os.path.join(target, f"{name}.{fmt}")
+        write_table(table, path, fmt)
+        manifest["tables"][name] = {"file": os.path.basename(path), "rows": table.num_rows,
+                                    "bytes": os.path.getsize(path)}
+        logger.info(f"Snapshot {name} of semester {semester_id}: {table.num_rows} rows "
+                    f"in {time.perf_counter() - started:.2f}s")
+    with open(os.path.join(target, MANIFEST + ".tmp"), "w") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(os.path.join(target, MANIFEST + ".tmp"), os.path.join(target, MANIFEST))
+    return manifest
+
+
+class SemesterSnapshot:
+    """
+        Read side of export_semester. Arrow files are memory-mapped: numeric, boolean and
+        timestamp columns are used in place by pyarrow and, when they have no nulls, by pandas
+        too. Parquet files are decoded, but only the requested columns are read.
+    """
+
+    def __init__(self, directory, semester_id):
+        self.path = snapshot_dir(directory, semester_id)
+        with open(os.path.join(self.path, MANIFEST)) as file:
+            self.manifest = json.load(file)
+        self.semester_id = semester_id
+
+    def table(self, name, columns=None, student_ids=None) -> pa.Table:
+        path = os.path.join(self.path, self.manifest["tables"][name]["file"])
+        if self.manifest["format"] == ARROW:
+            table = ipc.open_file(pa.memory_map(path, "r")).read_all()
+            if columns is not None:
+                table = table.select(columns)
+        else:
+            table = pq.read_table(path, columns=columns, memory_map=True)
+        if student_ids is not None:
+            table = table.filter(pc.is_in(table["student_id"], pa.array(list(student_ids), pa.int64())))
+        return table
+
+    def frame(self, name, columns=None, student_ids=None):
+        """The table as a DataFrame; missing strings are None, as in rows from the database."""
+        table = self.table(name, columns, student_ids)
+        frame = table.to_pandas(split_blocks=True)
+        for field in table.schema:
+            if pa.types.is_string(field.type) and table[field.name].null_count:
+                column = frame[field.name].astype(object)
+                frame[field.name] = column.where(column.notna(), None)
+        return frame
+
+    def report_data(self, student_ids=None) -> tuple:
+        """(assessments, questionnaire, attendance) frames with only ANALYSIS_COLUMNS, for CohortAnalysis."""
+        return tuple(self.frame(name, ANALYSIS_COLUMNS[name], student_ids) for name in SCHEMAS)
+
+    def cohort(self, student_ids=None):
+        from Cohort_analysis.main import CohortAnalysis
+
+        return CohortAnalysis(*self.report_data(student_ids))
@@ -0,0 +1,61 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from Config.Environment import load_environment, configure_logging
+from Snapshot.SemesterSnapshot import SemesterSnapshot, export_semester, ARROW, PARQUET
+
+logger = logging.getLogger(__name__)
+load_environment()
+
+## Where semester snapshots are written and read, one semester=<id>/ directory each
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+
+
+def write_reports(snapshot: SemesterSnapshot, output, student_ids=None) -> int:
+    """Build every student's report from the snapshot and write them as JSON lines."""
+    from Report.main import build_cohort_reports
+
+    started = time.perf_counter()
+    reports = build_cohort_reports(*snapshot.report_data(student_ids))
+    with open(output, "w") as file:
+        for student_id, report in reports.items():
+            file.write(json.dumps({"student_id": student_id, "semester_id": snapshot.semester_id,
+                                   "report": report}, default=float) + "\n")
+    logger.info(f"Wrote {len(reports)} reports to {output} in {time.perf_counter() - started:.2f}s")
+    return len(reports)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar semester snapshots for offline analysis.")
+    parser.add_argument("--dir", default=SNAPSHOT_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="snapshot a semester from Postgres")
+    export.add_argument("--semester", type=int, required=True)
+    export.add_argument("--students", help="comma separated student ids (default: the whole semester)")
+    export.add_argument("--format", choices=[ARROW, PARQUET], default=ARROW)
+    reports = commands.add_parser("reports", help="build the semester's reports from its snapshot")
+    reports.add_argument("--semester", type=int, required=True)
+    reports.add_argument("--students", help="comma separated student ids (default: all)")
+    reports.add_argument("--output", required=True, help="JSON lines file")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    student_ids = [int(s) for s in args.students.split(",")] if args.students else None
+    if args.command == "export":
+        from Config.PostgresClient import PostgresClient
+
+        db = PostgresClient()
+        try:
+            print(json.dumps(export_semester(db, args.semester, args.dir, args.format, student_ids), indent=2))
+        finally:
+            db.close()
+    else:
+        write_reports(SemesterSnapshot(args.dir, args.semester), args.output, student_ids)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
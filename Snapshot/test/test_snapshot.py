@@ -0,0 +1,98 @@
+# test_snapshot.py
+import json
+import random
+from decimal import Decimal
+from datetime import datetime, timedelta
+import pyarrow as pa
+import pytest
+
+from Report.main import build_cohort_reports
+from Snapshot.SemesterSnapshot import SemesterSnapshot, export_semester, ARROW, PARQUET
+from Snapshot.main import write_reports
+
+
+class CohortDb:
+    """The three cohort queries over generated rows, like PostgresClient returns them."""
+
+    def __init__(self, students=30, seed=3):
+        rng = random.Random(seed)
+        self.assessments, self.questionnaire, self.attendance = [], [], []
+        for student_id in sorted(rng.sample(range(1, 10000), students)):
+            for i in range(rng.randint(0, 12)):
+                pre, mid, post = rng.choice([(True, False, False), (False, True, False), (False, False, True)])
+                row = {
+                    "student_id": student_id, "session_date": datetime(2025, 3, 1) - timedelta(days=i),
+                    "score": Decimal(rng.randint(0, 100)), "max_score": Decimal(rng.choice([50, 100])),
+                    "subject_id": 1, "subject": rng.choice(["Algebra", "Biology", None]),
+                    "pre": pre, "mid": mid, "post": post,
+                    "alpha_identifier": rng.choice(["ALG-1", "BIO-1", None]), "assessment_title": f"Quiz {i}",
+                }
+                self.assessments.append(row)
+                if rng.random() < 0.6:
+                    self.questionnaire.append(dict(
+                        row, title=row["assessment_title"], sleep_hours=Decimal(7), effort_score=Decimal(3),
+                        tutor_sessions=Decimal(rng.randint(0, 4)), sports_hours=Decimal(rng.randint(0, 6)),
+                        peer_influence=Decimal(1), study_hours=Decimal(rng.randint(0, 15)), questionnaire_id=i))
+            total = rng.randint(1, 30)
+            present = rng.randint(0, total)
+            self.attendance.append({"student_id": student_id, "total_sessions": total,
+                                    "present": present, "absent": total - present})
+        self.calls = []
+
+    def _select(self, rows, student_ids):
+        return [row for row in rows if student_ids is None or row["student_id"] in student_ids]
+
+    def get_cohort_assessments(self, semester_id, student_ids=None):
+        self.calls.append("assessments")
+        return self._select(self.assessments, student_ids)
+
+    def get_cohort_assessments_questionnaire(self, semester_id, student_ids=None):
+        self.calls.append("questionnaire")
+        return self._select(self.questionnaire, student_ids)
+
+    def get_cohort_attendance(self, semester_id, student_ids=None):
+        self.calls.append("attendance")
+        return self._select(self.attendance, student_ids)
+
+
+def comparable(reports):
+    for report in reports.values():
+        report.pop("generated_at")
+    return json.loads(json.dumps(reports, default=float))
+
+
+@pytest.mark.parametrize("fmt", [ARROW, PARQUET])
+def test_reports_from_snapshot_match_reports_from_rows(tmp_path, fmt):
+    db = CohortDb()
+    manifest = export_semester(db, 4, tmp_path, fmt)
+    assert db.calls == ["assessments", "questionnaire", "attendance"]
+    assert manifest["tables"]["assessments"]["rows"] == len(db.assessments)
+
+    snapshot = SemesterSnapshot(tmp_path, 4)
+    expected = comparable(build_cohort_reports(db.assessments, db.questionnaire, db.attendance))
+    got = comparable(build_cohort_reports(*snapshot.report_data()))
+    assert got == expected
+
+
+def test_arrow_snapshot_is_mapped_not_copied(tmp_path):
+    export_semester(CohortDb(), 4, tmp_path, ARROW)
+    snapshot = SemesterSnapshot(tmp_path, 4)
+    before = pa.total_allocated_bytes()
+    table = snapshot.table("assessments", ["student_id", "score", "max_score"])
+    assert table.column_names == ["student_id", "score", "max_score"]
+    assert pa.total_allocated_bytes() == before
+
+
+def test_snapshot_filters_students_and_writes_reports(tmp_path):
+    db = CohortDb()
+    export_semester(db, 4, tmp_path, ARROW)
+    snapshot = SemesterSnapshot(tmp_path, 4)
+    some = sorted({row["student_id"] for row in db.assessments})[:3]
+    frame = snapshot.frame("assessments", ["student_id", "subject"], some)
+    assert set(frame["student_id"]) <= set(some)
+    assert None in set(snapshot.frame("assessments", ["subject"])["subject"])
+
+    output = tmp_path / "reports.jsonl"
+    assert write_reports(snapshot, output, some) == len(some)
+    lines = [json.loads(line) for line in output.read_text().splitlines()]
+    assert {line["student_id"] for line in lines} == set(some)
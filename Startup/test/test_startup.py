@@ -0,0 +1,123 @@
+# test_startup.py
+import os
+import sys
+import json
+import pickle
+import pytest
+import subprocess
+
+from Startup.main import StartupReport, sample_report_data, warm_up, mark_ready, clear_ready
+from Models.main import load_model
+from Report.main import build_report
+
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeDB:
+    def __init__(self):
+        self.queries = []
+
+    def fetch_one(self, query, params=None):
+        self.queries.append(query)
+        return {"ok": 1}
+
+
+class DummyModel:
+    def __init__(self, value):
+        self.value = value
+
+    def predict(self, X):
+        return [self.value] * len(X)
+
+
+def test_startup_report_records_phases():
+    report = StartupReport()
+    report.record("imports", 0.25)
+    with report.phase("connect"):
+        pass
+    out = report.as_dict()
+    assert out["phases"]["imports"] == 0.25
+    assert "connect" in out["phases"]
+    assert out["total"] >= 0
+
+
+def test_warm_up_runs_every_phase():
+    db = FakeDB()
+    report = StartupReport()
+    warm_up(db, report)
+    assert {"models", "database", "analysis"} <= set(report.phases)
+    assert len(db.queries) == 1
+
+
+def test_sample_report_data_produces_full_report():
+    out = build_report(*sample_report_data())
+    assert out["all_scores"]["data"]
+    assert out["assessment_comparison"]
+    assert out["learning_disability"] is not None
+    assert out["learning_disability_linear_regression"]["scores_linear_regression"]
+    json.dumps(out)
+
+
+def test_mark_ready_writes_and_clears_file(tmp_path):
+    path = tmp_path / "ready.json"
+    report = StartupReport()
+    report.record("imports", 0.1)
+    mark_ready(report, str(path))
+    assert json.loads(path.read_text())["phases"]["imports"] == 0.1
+    clear_ready(str(path))
+    assert not path.exists()
+
+
+def test_load_model_is_cached_until_file_changes(tmp_path):
+    path = tmp_path / "model.pkl"
+    with open(path, "wb") as f:
+        pickle.dump(DummyModel(1), f)
+    first = load_model(str(path))
+    assert load_model(str(path)) is first
+
+    with open(path, "wb") as f:
+        pickle.dump(DummyModel(22), f)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert load_model(str(path)).value == 22
+
+
+def test_load_model_missing_raises_oserror(tmp_path):
+    with pytest.raises(OSError):
+        load_model(str(tmp_path / "missing.pkl"))
+
+
+def test_warm_up_without_database_skips_it():
+    report = StartupReport()
+    warm_up(None, report)
+    assert {"models", "analysis"} <= set(report.phases) and "database" not in report.phases
+
+
+def test_shared_models_are_mapped_and_republished_when_retrained(tmp_path, monkeypatch):
+    import numpy as np
+    import Models.main
+
+    shared = tmp_path / "shared"
+    monkeypatch.setattr(Models.main, "SHARED_MODEL_DIR", str(shared))
+    path = tmp_path / "model.pkl"
+    with open(path, "wb") as f:
+        pickle.dump(DummyModel(np.arange(4.0)), f)
+    first = load_model(str(path))
+    assert first.value.tolist() == [0.0, 1.0, 2.0, 3.0] and not first.value.flags.writeable
+    assert len(os.listdir(shared)) == 1
+
+    with open(path, "wb") as f:
+        pickle.dump(DummyModel(np.ones(2)), f)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert load_model(str(path)).value.tolist() == [1.0, 1.0]
+    ## The old version was unlinked, but the process still holding it keeps its pages
+    assert len(os.listdir(shared)) == 1 and first.value.sum() == 6.0
+
+
+def test_importing_the_consumer_leaves_pandas_numpy_and_pyarrow_unloaded():
+    ## A fresh interpreter: this one has them loaded already
+    script = "import sys, main; print(','.join(m for m in ('pandas', 'numpy', 'pyarrow') if m in sys.modules))"
+    loaded = subprocess.run([sys.executable, "-c", script], cwd=REPO, capture_output=True, text=True, check=True)
+    assert loaded.stdout.strip() == ""
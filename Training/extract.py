@@ -0,0 +1,114 @@
+import os
+import csv
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+## Numeric columns written to every spool chunk
+COLUMNS = [
+    "student_id", "norm", "prev_score", "next_norm",
+    "study_hours", "tutor_sessions", "sports_hours", "attendance", "label",
+]
+
+## One row per questionnaire assessment, with the inputs AssessmentAnalysis.assessment_analysis_lr_
+## and DisabilityAnalysis.student_analysis_ build at inference time. Rows are windowed per student
+## and semester in the same order as the report queries (session_date DESC), so:
+##   prev_score  the previous row in that order, normalized by the current max_score (DisabilityAnalysis)
+##   next_norm   the same neighbouring row, normalized by its own max_score: the chronologically
+##               next assessment, used as the linear regression target
+## attendance is the student's attendance ratio for the semester, as in get_student_attendance.
+FEATURE_QUERY = """
+    WITH attendance AS (
+        SELECT
+            ss.student_id,
+            st.semester_id,
+            SUM(CASE WHEN NOT ss.absent THEN 1 ELSE 0 END)::float8 / COUNT(*)::float8 * 100 AS attendance
+        FROM stu_tracker.Session_students ss
+        JOIN stu_tracker.Sessions st ON st.id = ss.session_id
+        GROUP BY ss.student_id, st.semester_id
+    )
+    SELECT
+        ast.student_id,
+        ast.score::float8 / asmt.max_score::float8 * 100 AS norm,
+        LAG(ast.score::float8) OVER w / asmt.max_score::float8 * 100 AS prev_score,
+        LAG(ast.score::float8 / asmt.max_score::float8 * 100) OVER w AS next_norm,
+        paq.study_hours::float8 AS study_hours,
+        paq.tutor_sessions::float8 AS tutor_sessions,
+        paq.sports_hours::float8 AS sports_hours,
+        att.attendance
+    FROM stu_tracker.Assessments_students ast
+    JOIN stu_tracker.Sessions ss ON ss.id = ast.session_id
+    JOIN stu_tracker.Assessments asmt ON asmt.id = ast.assessment_id
+    JOIN stu_tracker.Pre_assessment_questionnaire paq ON paq.id = ast.questionnaire_id
+    JOIN attendance att ON att.student_id = ast.student_id AND att.semester_id = ast.semester_id
+    WHERE ast.questionnaire_id IS NOT NULL AND asmt.max_score > 0 {semester_filter}
+    WINDOW w AS (PARTITION BY ast.student_id, ast.semester_id ORDER BY ss.session_date DESC, ast.id DESC)
+"""
+
+
+def load_labels(path) -> dict:
+    """
+        {student_id: 0/1} from a CSV with student_id,label columns. The database has no learning
+        disability outcome, so logistic training needs labels from outside (e.g. confirmed
+        assessments exported by the school).
+    """
+    labels = {}
+    with open(path, newline="") as file:
+        for row in csv.DictReader(file):
+            labels[int(row["student_id"])] = int(row["label"])
+    return labels
+
+
+def _chunk_arrays(db, query, params, chunk_size, labels):
+    """{column: float64 array} per chunk: COPY into DataFrames when the client has it, else dict rows."""
+    copy_frames = getattr(db, "copy_frames", None)
+    if copy_frames is not None:
+        for frame in copy_frames(query, params, chunk_size):
+            if frame.empty:
+                continue
+            arrays = {column: frame[column].to_numpy(dtype=float, na_value=np.nan)
+                      for column in COLUMNS if column != "label"}
+            arrays["label"] = frame["student_id"].map(labels).to_numpy(dtype=float, na_value=np.nan)
+            yield arrays
+        return
+    for chunk in db.fetch_chunks(query, params, chunk_size):
+        arrays = {
+            column: np.array([np.nan if row[column] is None else row[column] for row in chunk], dtype=float)
+            for column in COLUMNS if column != "label"
+        }
+        arrays["label"] = np.array([labels.get(row["student_id"], np.nan) for row in chunk], dtype=float)
+        yield arrays
+
+
+def extract(db, spool_dir, chunk_size=50000, semester_id=None, labels=None) -> list:
+    """
+        Stream FEATURE_QUERY (with COPY, or through a server-side cursor) and write each chunk
+        as a float64 .npz file under `spool_dir`. Memory is bounded by `chunk_size`; the spool
+        lets every training pass and cross-validation fold re-read the data without another
+        query. Returns the chunk paths.
+    """
+    os.makedirs(spool_dir, exist_ok=True)
+    params = None
+    semester_filter = ""
+    if semester_id is not None:
+        semester_filter = "AND ast.semester_id = %s"
+        params = (semester_id,)
+    query = FEATURE_QUERY.format(semester_filter=semester_filter)
+    labels = labels or {}
+
+    paths, rows = [], 0
+    for index, arrays in enumerate(_chunk_arrays(db, query, params, chunk_size, labels)):
+        path = os.path.join(spool_dir, f"chunk_{index:05d}.npz")
+        np.savez(path, **arrays)
+        paths.append(path)
+        rows += len(arrays["label"])
+    logger.info(f"Extracted {rows} rows into {len(paths)} chunks under {spool_dir}")
+    return paths
+
+
+def read_chunks(paths):
+    """Yield {column: array} for each spooled chunk, one at a time."""
+    for path in paths:
+        with np.load(path) as data:
+            yield {column: data[column] for column in COLUMNS}
@@ -0,0 +1,154 @@
+import os
+import sys
+import json
+import pickle
+import shutil
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from Models.main import LINEAR_MODEL_PATH, LOGISTIC_MODEL_PATH
+from Training.extract import extract, load_labels
+from Training.models import LINEAR, LOGISTIC, train, evaluate, combine, score
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATHS = {LINEAR: LINEAR_MODEL_PATH, LOGISTIC: LOGISTIC_MODEL_PATH}
+
+
+def load_current(path):
+    try:
+        with open(path, "rb") as file:
+            return pickle.load(file)
+    except OSError:
+        return None
+
+
+def cross_validate_fold(task: dict) -> dict:
+    """Train on every fold but one, then score the candidate and the current model on it."""
+    kind, paths, folds, fold = task["kind"], task["paths"], task["folds"], task["fold"]
+    candidate = train(kind, paths, folds, exclude=fold, epochs=task["epochs"], seed=task["seed"])
+    result = {"fold": fold, "candidate": None, "current": None, "current_error": None}
+    if candidate is not None:
+        result["candidate"] = evaluate(candidate, kind, paths, folds, include=fold)
+    current = load_current(task["current_path"])
+    if current is not None:
+        try:
+            result["current"] = evaluate(current, kind, paths, folds, include=fold)
+        except Exception as e:
+            result["current_error"] = repr(e)
+            logger.warning(f"Current {kind} model cannot score the extracted features: {e!r}")
+    return result
+
+
+def train_full(task: dict):
+    return train(task["kind"], task["paths"], epochs=task["epochs"], seed=task["seed"])
+
+
+def promote(model, path):
+    """Atomically replace the model at `path`, keeping the previous file as <path>.prev."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        pickle.dump(model, file)
+    if os.path.exists(path):
+        shutil.copy2(path, f"{path}.prev")
+    ## Consumers reload on mtime change (Models.main.load_model) and never see a partial file
+    os.replace(tmp_path, path)
+    logger.info(f"Promoted new model to {path}")
+
+
+def train_and_compare(kind, paths, folds=5, epochs=5, seed=0, workers=None, current_path=None, min_improvement=0.0,
+                      dry_run=False, force=False) -> dict:
+    """
+        Cross-validate `kind` across a process pool (one fold per task, plus the final fit on
+        all rows) and promote the final model only if its CV score beats the current model's
+        on the same held-out rows by more than `min_improvement`. A current model that fails
+        to score any fold blocks the promotion unless `force`.
+    """
+    current_path = current_path or MODEL_PATHS[kind]
+    tasks = [
+        {"kind": kind, "paths": paths, "folds": folds, "fold": fold, "epochs": epochs, "seed": seed,
+         "current_path": current_path}
+        for fold in range(folds)
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        final = pool.submit(train_full, {"kind": kind, "paths": paths, "epochs": epochs, "seed": seed})
+        results = list(pool.map(cross_validate_fold, tasks))
+        model = final.result()
+
+    candidate = combine([r["candidate"] for r in results if r["candidate"] is not None])
+    unscored = [r["current_error"] for r in results if r["current_error"] is not None]
+    has_current = all(r["current"] is not None for r in results)
+    current = combine([r["current"] for r in results]) if has_current else None
+    report = {
+        "kind": kind,
+        "rows": candidate["rows"],
+        "candidate_score": score(kind, candidate),
+        "current_score": score(kind, current) if current is not None else None,
+        "promoted": False,
+    }
+    if model is None:
+        report["reason"] = "no training data"
+    elif unscored and not force:
+        report["reason"] = f"current model could not be scored ({unscored[0]}); use --force to replace it"
+    elif current is not None and report["candidate_score"] <= report["current_score"] + min_improvement:
+        report["reason"] = "candidate does not beat the current model"
+    elif dry_run:
+        report["reason"] = "dry run"
+    else:
+        promote(model, current_path)
+        report["promoted"] = True
+    logger.info(f"Training report: {json.dumps(report)}")
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the report models on stu_tracker data")
+    parser.add_argument("--kind", choices=[LINEAR, LOGISTIC, "both"], default="both")
+    parser.add_argument("--labels", help="CSV with student_id,label for the learning disability model")
+    parser.add_argument("--semester-id", type=int)
+    parser.add_argument("--chunk-size", type=int, default=50000, help="rows per server-side cursor fetch")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--workers", type=int, help="processes for cross-validation (default: CPU count)")
+    parser.add_argument("--min-improvement", type=float, default=0.0)
+    parser.add_argument("--spool", help="directory for extracted chunks (default: a temporary directory)")
+    parser.add_argument("--dry-run", action="store_true", help="report scores without promoting")
+    parser.add_argument("--force", action="store_true",
+                        help="promote even when the current model cannot be scored on the new features")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from Config.Environment import configure_logging
+    from Config.PostgresClient import PostgresClient
+
+    configure_logging()
+    args = parse_args(argv)
+    kinds = [LINEAR, LOGISTIC] if args.kind == "both" else [args.kind]
+    if LOGISTIC in kinds and not args.labels:
+        logger.warning("No --labels given; the learning disability model has no training target and is skipped")
+        kinds.remove(LOGISTIC)
+    labels = load_labels(args.labels) if args.labels else None
+
+    spool = args.spool or tempfile.mkdtemp(prefix="training-")
+    db = PostgresClient()
+    try:
+        paths = extract(db, spool, args.chunk_size, args.semester_id, labels)
+    finally:
+        db.close()
+    try:
+        reports = [
+            train_and_compare(kind, paths, args.folds, args.epochs, workers=args.workers,
+                              min_improvement=args.min_improvement, dry_run=args.dry_run, force=args.force)
+            for kind in kinds
+        ]
+    finally:
+        if not args.spool:
+            shutil.rmtree(spool, ignore_errors=True)
+    print(json.dumps(reports, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
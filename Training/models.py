@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+from sklearn.linear_model import SGDRegressor, SGDClassifier
+from Cohort_analysis.main import LR_FEATURES, DISABILITY_FEATURES
+from Training.extract import read_chunks
+
+LINEAR = "linear"
+LOGISTIC = "logistic"
+
+
+def linear_frame(chunk) -> tuple:
+    """Inputs of assessment_analysis_lr_ and the next assessment's score as target."""
+    X = pd.DataFrame({
+        "Hours_Studied": chunk["study_hours"],
+        "Attendance": chunk["attendance"],
+        "Previous_Scores": chunk["norm"],
+        "Tutoring_Sessions": chunk["tutor_sessions"],
+        "Physical_Activity": chunk["sports_hours"],
+    })[LR_FEATURES]
+    return X, chunk["next_norm"]
+
+
+def logistic_frame(chunk) -> tuple:
+    """Inputs of student_analysis_ (rows after a student's first) and the external label."""
+    X = pd.DataFrame({
+        "Attendance": chunk["attendance"],
+        "Previous_Scores": chunk["prev_score"],
+        "Exam_Score": chunk["norm"],
+        "Tutoring_Sessions": chunk["tutor_sessions"],
+    })[DISABILITY_FEATURES]
+    return X, chunk["label"]
+
+
+FRAMES = {LINEAR: linear_frame, LOGISTIC: logistic_frame}
+
+
+def batches(kind, paths, folds=1, include=None, exclude=None):
+    """
+        (X, y) per spooled chunk with incomplete rows dropped. Students are assigned to folds
+        by student_id % folds so a student's rows never sit on both sides of a split.
+    """
+    for chunk in read_chunks(paths):
+        X, y = FRAMES[kind](chunk)
+        keep = np.isfinite(X.to_numpy()).all(axis=1) & np.isfinite(y)
+        fold = chunk["student_id"].astype(np.int64) % folds
+        if include is not None:
+            keep &= fold == include
+        if exclude is not None:
+            keep &= fold != exclude
+        if keep.any():
+            yield X[keep].reset_index(drop=True), y[keep]
+
+
+def train(kind, paths, folds=1, exclude=None, epochs=5, seed=0):
+    """
+        Fit out of core: one pass to fit the scaler (and class weights), then `epochs` passes
+        of partial_fit over the chunks. Returns a Pipeline with the same predict(DataFrame)
+        interface as the pickles in Models/, or None when there is no training data.
+    """
+    poly = PolynomialFeatures(degree=2) if kind == LINEAR else None
+    scaler = StandardScaler()
+    counts = {}
+    rows = 0
+    for X, y in batches(kind, paths, folds, exclude=exclude):
+        if poly is not None:
+            if not hasattr(poly, "n_output_features_"):
+                poly.fit(X)
+            X = poly.transform(X)
+        scaler.partial_fit(X)
+        rows += len(y)
+        if kind == LOGISTIC:
+            for label, count in zip(*np.unique(y, return_counts=True)):
+                counts[int(label)] = counts.get(int(label), 0) + int(count)
+    if rows == 0 or (kind == LOGISTIC and len(counts) < 2):
+        return None
+
+    if kind == LINEAR:
+        estimator = SGDRegressor(random_state=seed)
+    else:
+        ## Balanced weights stand in for the SMOTE step of the original model
+        weights = {label: rows / (len(counts) * count) for label, count in counts.items()}
+        estimator = SGDClassifier(loss="log_loss", class_weight=weights, random_state=seed)
+    classes = np.array(sorted(counts)) if kind == LOGISTIC else None
+    for _ in range(epochs):
+        for X, y in batches(kind, paths, folds, exclude=exclude):
+            if poly is not None:
+                X = poly.transform(X)
+            X = scaler.transform(X)
+            if classes is not None:
+                estimator.partial_fit(X, y.astype(int), classes=classes)
+            else:
+                estimator.partial_fit(X, y)
+
+    steps = [("scaler", scaler), ("model", estimator)]
+    if poly is not None:
+        steps.insert(0, ("poly", poly))
+    return Pipeline(steps)
+
+
+def evaluate(model, kind, paths, folds=1, include=None) -> dict:
+    """
+        Sufficient statistics of model on the selected rows, so folds can be combined:
+        squared error sum for the linear model, per-class hits for the logistic one.
+    """
+    stats = {"rows": 0, "squared_error": 0.0, "hits": {}, "support": {}}
+    for X, y in batches(kind, paths, folds, include=include):
+        predicted = np.asarray(model.predict(X), dtype=float)
+        stats["rows"] += len(y)
+        if kind == LINEAR:
+            stats["squared_error"] += float(np.sum((predicted - y) ** 2))
+        else:
+            for label in np.unique(y):
+                mask = y == label
+                key = str(int(label))
+                stats["support"][key] = stats["support"].get(key, 0) + int(mask.sum())
+                stats["hits"][key] = stats["hits"].get(key, 0) + int((predicted[mask] == label).sum())
+    return stats
+
+
+def combine(stats: list) -> dict:
+    total = {"rows": 0, "squared_error": 0.0, "hits": {}, "support": {}}
+    for item in stats:
+        total["rows"] += item["rows"]
+        total["squared_error"] += item["squared_error"]
+        for field in ("hits", "support"):
+            for key, value in item[field].items():
+                total[field][key] = total[field].get(key, 0) + value
+    return total
+
+
+def score(kind, stats) -> float:
+    """Higher is better: negative RMSE for the linear model, balanced accuracy for the logistic one."""
+    if not stats["rows"]:
+        return float("-inf")
+    if kind == LINEAR:
+        return -float(np.sqrt(stats["squared_error"] / stats["rows"]))
+    recalls = [stats["hits"].get(key, 0) / support for key, support in stats["support"].items() if support]
+    return float(np.mean(recalls)) if recalls else float("-inf")
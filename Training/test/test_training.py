@@ -0,0 +1,141 @@
+# test_training.py
+import os
+import pickle
+import numpy as np
+import pytest
+
+from Training.extract import extract, read_chunks, load_labels, COLUMNS
+from Training.models import LINEAR, LOGISTIC, train, evaluate, score, batches
+from Training.main import train_and_compare
+
+
+def synthetic_rows(n, seed=0):
+    """next_norm depends linearly on the features; label on low scores and attendance."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(n):
+        norm, attendance = rng.uniform(30, 100), rng.uniform(50, 100)
+        study, tutor, sports = rng.uniform(0, 12), rng.integers(0, 5), rng.uniform(0, 6)
+        rows.append({
+            "student_id": i // 4,
+            "norm": norm,
+            "prev_score": None if i % 4 == 0 else rng.uniform(30, 100),
+            "next_norm": None if i % 4 == 0 else 0.6 * norm + 2 * study + 0.1 * attendance + rng.normal(0, 1),
+            "study_hours": study, "tutor_sessions": tutor, "sports_hours": sports, "attendance": attendance,
+        })
+    return rows
+
+
+class ChunkedDB:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def fetch_chunks(self, query, params=None, chunk_size=10000):
+        self.queries.append((query, params))
+        for start in range(0, len(self.rows), chunk_size):
+            yield self.rows[start:start + chunk_size]
+
+
+@pytest.fixture
+def spool(tmp_path):
+    rows = synthetic_rows(800)
+    labels = {student: int(student % 3 == 0) for student in range(200)}
+    db = ChunkedDB(rows)
+    paths = extract(db, str(tmp_path / "spool"), chunk_size=150, semester_id=2, labels=labels)
+    return paths, db
+
+
+def test_extract_writes_bounded_chunks(spool):
+    paths, db = spool
+    assert len(paths) == 6
+    query, params = db.queries[0]
+    assert "ast.semester_id = %s" in query and params == (2,)
+    chunks = list(read_chunks(paths))
+    assert sum(len(chunk["norm"]) for chunk in chunks) == 800
+    assert max(len(chunk["norm"]) for chunk in chunks) == 150
+    assert set(chunks[0]) == set(COLUMNS)
+    assert np.isnan(chunks[0]["next_norm"][0])
+
+
+def test_folds_split_by_student(spool):
+    paths, _ = spool
+    held_out = sum(len(y) for _, y in batches(LINEAR, paths, folds=3, include=1))
+    training = sum(len(y) for _, y in batches(LINEAR, paths, folds=3, exclude=1))
+    assert held_out + training == sum(len(y) for _, y in batches(LINEAR, paths))
+    for chunk in read_chunks(paths):
+        students = chunk["student_id"].astype(int)
+        assert set(students[students % 3 == 1]).isdisjoint(students[students % 3 != 1])
+
+
+def test_linear_model_learns_out_of_core(spool):
+    paths, _ = spool
+    model = train(LINEAR, paths, epochs=10)
+    X, _ = next(batches(LINEAR, paths))
+    assert list(model.named_steps["poly"].feature_names_in_) == list(X.columns)
+    rmse = -score(LINEAR, evaluate(model, LINEAR, paths))
+    baseline = np.concatenate([y for _, y in batches(LINEAR, paths)]).std()
+    assert rmse < baseline / 2
+
+
+def test_logistic_needs_two_classes(spool, tmp_path):
+    paths, _ = spool
+    model = train(LOGISTIC, paths, epochs=3)
+    assert list(model.predict(next(batches(LOGISTIC, paths))[0])[:1]) in ([0.0], [1.0])
+    rows = synthetic_rows(40)
+    one_class = extract(ChunkedDB(rows), str(tmp_path / "one"), labels={s: 1 for s in range(10)})
+    assert train(LOGISTIC, one_class) is None
+
+
+class ConstantModel:
+    def __init__(self, value):
+        self.value = value
+
+    def predict(self, X):
+        return np.full(len(X), self.value)
+
+
+class StaleModel:
+    """A current model trained on other features: it cannot score the new ones."""
+
+    def predict(self, X):
+        raise ValueError("X has 7 features, but the model is expecting 5 features as input")
+
+
+def test_promotes_only_when_better(spool, tmp_path):
+    paths, _ = spool
+    current_path = str(tmp_path / "linear_model.pkl")
+    with open(current_path, "wb") as file:
+        pickle.dump(ConstantModel(50.0), file)
+
+    report = train_and_compare(LINEAR, paths, folds=3, epochs=5, workers=2, current_path=current_path)
+    assert report["promoted"] and report["candidate_score"] > report["current_score"]
+    assert os.path.exists(current_path + ".prev")
+    with open(current_path, "rb") as file:
+        assert not isinstance(pickle.load(file), ConstantModel)
+
+    before = os.stat(current_path).st_mtime_ns
+    report = train_and_compare(LINEAR, paths, folds=3, epochs=5, workers=2, current_path=current_path,
+                               min_improvement=1e6)
+    assert not report["promoted"] and os.stat(current_path).st_mtime_ns == before
+
+
+def test_unscorable_current_model_needs_force(spool, tmp_path):
+    paths, _ = spool
+    current_path = str(tmp_path / "linear_model.pkl")
+    with open(current_path, "wb") as file:
+        pickle.dump(StaleModel(), file)
+    before = os.stat(current_path).st_mtime_ns
+
+    report = train_and_compare(LINEAR, paths, folds=3, epochs=5, workers=2, current_path=current_path)
+    assert not report["promoted"] and "could not be scored" in report["reason"]
+    assert os.stat(current_path).st_mtime_ns == before
+
+    report = train_and_compare(LINEAR, paths, folds=3, epochs=5, workers=2, current_path=current_path, force=True)
+    assert report["promoted"] and report["current_score"] is None
+
+
+def test_load_labels(tmp_path):
+    path = tmp_path / "labels.csv"
+    path.write_text("student_id,label\n1,0\n2,1\n")
+    assert load_labels(str(path)) == {1: 0, 2: 1}
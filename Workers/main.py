@@ -0,0 +1,213 @@
+import gc
+import os
+import sys
+import json
+import time
+import signal
+import logging
+import argparse
+import importlib
+import multiprocessing
+from Config import Logs, Tracing
+
+logger = logging.getLogger(__name__)
+
+## Seconds before a worker that exited on its own is forked again
+RESTART_DELAY = float(os.getenv("WORKER_RESTART_DELAY", "1"))
+SPAWN = "spawn"
+FORK = "fork"
+
+
+def freeze():
+    """
+        Move everything allocated so far out of the collector's reach before forking: a full
+        collection in a worker would otherwise write to every object's header and copy the
+        parent's pages one by one.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+def _run_child(index, target):
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    ## The consumer's shutdown path (clear_ready, closing connections) runs on KeyboardInterrupt
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    code = 0
+    try:
+        target(index)
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else 1
+    except KeyboardInterrupt:
+        pass
+    except BaseException:
+        logger.exception(f"Worker {index} failed")
+        code = 1
+    finally:
+        ## os._exit skips atexit, which would flush these
+        Tracing.stop()
+        Logs.stop()
+    os._exit(code)
+
+
+def prefork(workers, target, prepare=None) -> int:
+    """
+        Call `prepare` once, then fork `workers` processes running target(index). Workers share
+        the parent's imported modules, models and warmed caches copy-on-write. A worker that
+        exits is forked again after RESTART_DELAY; SIGTERM or SIGINT stops all of them.
+        Returns once every worker has exited.
+    """
+    if prepare is not None:
+        prepare()
+    freeze()
+    children = {}
+    stopping = False
+
+    def start(index):
+        pid = os.fork()
+        if pid == 0:
+            _run_child(index, target)
+        children[pid] = index
+        logger.info(f"Started worker {index} (pid {pid})")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    previous = {signum: signal.signal(signum, stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        for index in range(workers):
+            start(index)
+        while children:
+            pid, status = os.wait()
+            index = children.pop(pid, None)
+            if index is None or stopping:
+                continue
+            logger.error(f"Worker {index} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}")
+            time.sleep(RESTART_DELAY)
+            if not stopping:
+                start(index)
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+    return 0
+
+
+def memory_usage(pid="self") -> dict:
+    """
+        Resident (rss), proportional (pss: shared pages divided among the processes mapping them)
+        and private (uss) bytes of a process, from /proc/<pid>/smaps_rollup (Linux only).
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {"rss": fields["Rss"], "pss": fields["Pss"], "uss": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+
+def prepare_worker():
+    """What a consumer does before connecting: its imports, the models and one pass through the analyses."""
+    from Startup.main import StartupReport, warm_up
+
+    importlib.import_module("main")
+    warm_up(None, StartupReport())
+
+
+def _serve(ready, stop):
+    """A started worker: a report through the analyses, as its first messages would run, then idle."""
+    from Startup.main import sample_report_data
+    from Report.main import build_report
+
+    json.dumps(build_report(*sample_report_data()), default=str)
+    ready.put(os.getpid())
+    stop.wait()
+
+
+def _spawned_worker(ready, stop):
+    prepare_worker()
+    _serve(ready, stop)
+
+
+def _forking_parent(workers, ready, stop):
+    prepare_worker()
+    freeze()
+    ready.put(os.getpid())
+    context = multiprocessing.get_context(FORK)
+    processes = [context.Process(target=_serve, args=(ready, stop)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def footprint(workers, mode=FORK) -> dict:
+    """
+        Host memory of `workers` consumers started as independent processes (spawn) or forked
+        from one prepared parent (fork, as WORKERS does), once each has served a report. The
+        total is the sum of PSS over every process involved, the parent included.
+    """
+    context = multiprocessing.get_context(SPAWN)
+    ready, stop = context.SimpleQueue(), context.Event()
+    started = time.perf_counter()
+    if mode == SPAWN:
+        processes = [context.Process(target=_spawned_worker, args=(ready, stop)) for _ in range(workers)]
+        expected = workers
+    elif mode == FORK:
+        processes = [context.Process(target=_forking_parent, args=(workers, ready, stop))]
+        expected = workers + 1
+    else:
+        raise ValueError(f"Unknown start mode {mode!r}")
+    for process in processes:
+        process.start()
+    try:
+        pids = [ready.get() for _ in range(expected)]
+        seconds = time.perf_counter() - started
+        usage = {pid: memory_usage(pid) for pid in pids}
+    finally:
+        stop.set()
+        for process in processes:
+            process.join()
+    parent = usage.pop(pids[0]) if mode == FORK else None
+    per_worker = list(usage.values())
+    total = sum(u["pss"] for u in per_worker) + (parent["pss"] if parent else 0)
+    return {
+        "workers": workers, "mode": mode, "ready_seconds": round(seconds, 2),
+        "total_pss_mb": round(total / 2**20, 1),
+        "per_worker_pss_mb": round(total / workers / 2**20, 1),
+        "worker_uss_mb": round(max(u["uss"] for u in per_worker) / 2**20, 1),
+        "worker_rss_mb": round(max(u["rss"] for u in per_worker) / 2**20, 1),
+        "parent_pss_mb": round(parent["pss"] / 2**20, 1) if parent else None,
+    }
+
+
+def memory_report(worker_counts, modes=(SPAWN, FORK)) -> list:
+    return [footprint(workers, mode) for workers in worker_counts for mode in modes]
+
+
+def format_report(rows) -> str:
+    columns = ["workers", "mode", "ready_seconds", "total_pss_mb", "per_worker_pss_mb", "worker_uss_mb"]
+    lines = [" | ".join(columns), " | ".join("---" for _ in columns)]
+    lines += [" | ".join(str(row[column]) for column in columns) for row in rows]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory footprint of consumer workers per worker count.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--mode", action="append", choices=[SPAWN, FORK])
+    parser.add_argument("--json", action="store_true", help="print the rows as JSON")
+    args = parser.parse_args(argv)
+
+    rows = memory_report(args.workers, args.mode or (SPAWN, FORK))
+    print(json.dumps(rows, indent=2) if args.json else format_report(rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
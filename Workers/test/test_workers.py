@@ -0,0 +1,77 @@
+# test_workers.py
+import gc
+import os
+import time
+import signal
+import logging
+import threading
+from Config import Logs
+import Workers.main
+from Workers.main import prefork, memory_usage, footprint, format_report, FORK
+
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+def test_prefork_restarts_workers_and_stops_on_sigterm(tmp_path, monkeypatch):
+    monkeypatch.setattr(Workers.main, "RESTART_DELAY", 0)
+    starts = tmp_path / "starts"
+    prepared = []
+
+    def target(index):
+        with open(starts, "a") as file:
+            file.write(f"{index} {os.getpid()}\n")
+        ## Worker 0 fails once and is forked again
+        if index == 0 and starts.read_text().count("0 ") == 1:
+            raise RuntimeError("lost the broker")
+        while True:
+            time.sleep(0.05)
+
+    def started():
+        return starts.exists() and len(starts.read_text().splitlines()) >= 3
+
+    def terminate():
+        wait_for(started)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    threading.Thread(target=terminate, daemon=True).start()
+    assert prefork(2, target, prepare=lambda: prepared.append(os.getpid())) == 0
+    gc.unfreeze()
+    lines = starts.read_text().splitlines()
+    assert prepared == [os.getpid()]
+    assert sorted(line.split()[0] for line in lines) == ["0", "0", "1"]
+    assert signal.getsignal(signal.SIGTERM) is signal.SIG_DFL
+
+
+def test_forked_worker_gets_its_own_log_writer(tmp_path):
+    path = tmp_path / "worker.log"
+    with open(path, "w") as stream:
+        Logs.install(stream=stream, force=True)
+        try:
+            pid = os.fork()
+            if pid == 0:
+                logging.getLogger("worker").warning("from the worker")
+                Logs.stop()
+                os._exit(0)
+            os.waitpid(pid, 0)
+        finally:
+            Logs.stop()
+            logging.getLogger().handlers.clear()
+    assert "from the worker" in path.read_text()
+
+
+def test_memory_usage_of_this_process():
+    usage = memory_usage()
+    assert 0 < usage["uss"] <= usage["rss"] and 0 < usage["pss"] <= usage["rss"]
+
+
+def test_forked_workers_share_the_prepared_parent():
+    row = footprint(2, FORK)
+    assert row["workers"] == 2 and row["parent_pss_mb"] > 0
+    ## Imports, models and warmed code stay in the parent's pages
+    assert row["worker_uss_mb"] < row["parent_pss_mb"]
+    assert "2 | fork" in format_report([row])
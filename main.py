@@ -1,89 +1,522 @@
+import time
+IMPORT_STARTED = time.perf_counter()
+
 import os
-from Config.RabbitMQ import RabbitMQ
+import signal
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from Config.Environment import load_environment, configure_logging, configure_tracing
+from Config.RabbitMQ import RabbitMQ, RECOVERABLE_ERRORS, retry_count, retry_properties, expired_from_shard
 from Config.PostgresClient import PostgresClient
-from Assessment_analysis.main import AssessmentAnalysis
-from Disability_analysis.main import DisabilityAnalysis
+from Report.main import fetch_report_data, build_report, fetch_report_data_pushdown, build_report_pushdown, \
+    fetch_report_data_features, fetch_report_data_parallel, PUSHDOWN_QUERIES, REPORT_QUERIES, parse_sections, \
+    select_sections, EXPENSIVE_SECTIONS
+from Config.PostgresPool import PostgresPool
+from Startup.main import StartupReport, warm_up, mark_ready, clear_ready
 from S3.main import S3Instance
 from Client.main import Client
-from dotenv import load_dotenv
-import time
+from Consumer.Coalescer import ReportCoalescer, ReportRequest
+from Consumer.Scheduler import FairShareScheduler, classify, INTERACTIVE, BULK
+from Consumer.PrefetchController import PrefetchController
+from Consumer.Pipeline import ReportPipeline, StageFailed
+from Consumer.Checkpoint import LocalCheckpointStore, PostgresCheckpointStore
+from Config.Metrics import metrics
+from Config.QueryStats import query_stats
+from Config.Deadline import Deadline, DeadlineExceeded, deadline_scope, current_deadline
+from Config.Logs import message_summary, summary_set
+from Config import Tracing
 import json
 import logging
 
-# --- 1. Set up basic logging to stdout ---
-logging.basicConfig(
-    level=logging.INFO, # Adjust to logging.DEBUG for more verbose logs
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+IMPORT_FINISHED = time.perf_counter()
+
+configure_logging()
+configure_tracing()
 logger = logging.getLogger(__name__)
 
-load_dotenv()
+load_environment()
 
 
 EXCHANGE     = os.getenv("EXCHANGE")
 QUEUE        = os.getenv("QUEUE")
 ROUTING_KEY  = os.getenv("ROUTING_KEY")
 RABBIT_LOCAL  = os.getenv("RABBIT_LOCAL")
-PREFETCH_COUNT = 1
+## Pre-load models, the DB connection and the analysis code paths before subscribing
+WARM_START   = os.getenv("WARM_START", "0") == "1"
+## Let Postgres compute the moving averages, subject bias and pre/mid/post pivot
+SQL_PUSHDOWN = os.getenv("SQL_PUSHDOWN", "0") == "1"
+## Read the report inputs from stu_tracker.Student_features (python -m Migrations.features --rebuild)
+FEATURE_STORE = os.getenv("FEATURE_STORE", "0") == "1"
+## Run one report's queries concurrently on pooled connections and its analyses on a thread pool
+PARALLEL_REPORT      = os.getenv("PARALLEL_REPORT", "0") == "1"
+PARALLEL_CONNECTIONS = int(os.getenv("PARALLEL_CONNECTIONS", "3"))
+PARALLEL_WORKERS     = int(os.getenv("PARALLEL_WORKERS", "4"))
+## Serve reports the precompute worker (python -m Precompute.main) already generated, if still current
+USE_PRECOMPUTED = os.getenv("USE_PRECOMPUTED", "0") == "1"
+## Seconds one report may take before its queries are cancelled (statement_timeout) and the expensive
+## sections are left out of it (0 = no deadline)
+REPORT_DEADLINE = float(os.getenv("REPORT_DEADLINE", "0"))
+## Seconds of that budget kept for the cheap sections: with no more left, the questionnaire and attendance
+## queries are not sent and the expensive sections that read them are skipped
+REPORT_DEADLINE_RESERVE = float(os.getenv("REPORT_DEADLINE_RESERVE", "0"))
+## Seconds to collect duplicate (student_id, semester_id) requests before computing once; 0 disables.
+## Messages can only join a group if the broker delivers them, so pair this with PREFETCH_COUNT > 1.
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", "0"))
+## Seconds a coalesced result is reused for repeats of the same student and semester
+COALESCE_REUSE_TTL = float(os.getenv("COALESCE_REUSE_TTL", "5"))
+PREFETCH_COUNT = int(os.getenv("PREFETCH_COUNT", "1"))
+## Optional second queue for class-wide regenerations; QUEUE then only carries interactive requests
+BULK_QUEUE       = os.getenv("BULK_QUEUE")
+BULK_ROUTING_KEY = os.getenv("BULK_ROUTING_KEY")
+## Enables AMQP priorities on the queues; messages with priority >= INTERACTIVE_PRIORITY are interactive
+QUEUE_MAX_PRIORITY   = int(os.getenv("QUEUE_MAX_PRIORITY", "0")) or None
+INTERACTIVE_PRIORITY = int(os.getenv("INTERACTIVE_PRIORITY", "5"))
+## Interactive dispatches in a row before one waiting bulk request is let through (0 = strict)
+SCHEDULER_MAX_CONSECUTIVE = int(os.getenv("SCHEDULER_MAX_CONSECUTIVE", "20"))
+## With QUERY_CACHE_SIZE > 0: drop cached rows as soon as the change triggers of
+## Migrations/precompute.py report a write, polled every QUERY_CACHE_LISTEN seconds (0 = TTLs only)
+QUERY_CACHE_LISTEN = float(os.getenv("QUERY_CACHE_LISTEN", "0"))
+## Student-affinity sharding: with a worker id set, requests are re-hashed by student_id onto per-worker
+## queues (needs the rabbitmq_consistent_hash_exchange plugin). Ids should survive restarts, e.g. 0..N-1.
+SHARD_WORKER_ID      = os.getenv("SHARD_WORKER_ID", "")
+SHARD_WEIGHT         = int(os.getenv("SHARD_WEIGHT", "1"))
+## Milliseconds before a request stuck in the queue of a stopped worker returns to QUEUE
+SHARD_MESSAGE_TTL_MS = int(os.getenv("SHARD_MESSAGE_TTL_MS", "60000"))
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "60"))
+## Adaptive prefetch: re-evaluated every PREFETCH_INTERVAL seconds within [PREFETCH_MIN, PREFETCH_MAX]
+ADAPTIVE_PREFETCH = os.getenv("ADAPTIVE_PREFETCH", "0") == "1"
+PREFETCH_MIN      = int(os.getenv("PREFETCH_MIN", "1"))
+PREFETCH_MAX      = int(os.getenv("PREFETCH_MAX", "16"))
+PREFETCH_INTERVAL = float(os.getenv("PREFETCH_INTERVAL", "10"))
+DB_LATENCY_LIMIT  = float(os.getenv("DB_LATENCY_LIMIT", "0.5"))
+## Failed stages are retried through <queue>.retry after RETRY_DELAY_MS, at most MAX_RETRIES
+## times, then parked in <queue>.dead. MAX_RETRIES=0 restores nack without requeue.
+MAX_RETRIES    = int(os.getenv("MAX_RETRIES", "5"))
+RETRY_DELAY_MS = int(os.getenv("RETRY_DELAY_MS", "10000"))
+## Where the last completed stage of a failed report is kept: local, postgres, or empty to disable.
+## local only helps when the retry lands on the same host; postgres needs `make migrate`.
+CHECKPOINT_STORE = os.getenv("CHECKPOINT_STORE", "local")
+CHECKPOINT_DIR   = os.getenv("CHECKPOINT_DIR", "/tmp/report-checkpoints")
+CHECKPOINT_TTL   = float(os.getenv("CHECKPOINT_TTL", "3600"))
+## Consumer processes per container, forked from one parent that imports, loads the models (mapped from
+## SHARED_MODEL_DIR when set) and warms the analyses once. Shard ids become <SHARD_WORKER_ID>-<index>.
+WORKERS = int(os.getenv("WORKERS", "1"))
 EXCHANGE_TYPE = "direct"
 ERROR = "ERROR"
 DONE = "DONE"
 
-def create_callback(db):
+def fetch_stage(db, student_id, semester_id, pool=None, executor=None, sections=None):
+    if SQL_PUSHDOWN:
+        if pool is not None:
+            return fetch_report_data_parallel(pool, executor, student_id, semester_id, PUSHDOWN_QUERIES, sections)
+        return fetch_report_data_pushdown(db, student_id, semester_id, sections)
+    if FEATURE_STORE:
+        ## One primary-key read whatever the sections
+        return fetch_report_data_features(db, student_id, semester_id)
+    if pool is not None:
+        return fetch_report_data_parallel(pool, executor, student_id, semester_id, REPORT_QUERIES, sections)
+    return fetch_report_data(db, student_id, semester_id, sections)
+
+
+def analyze_stage(data, executor=None, sections=None) -> dict:
+    if SQL_PUSHDOWN:
+        return build_report_pushdown(*data, executor=executor, deadline=current_deadline(), sections=sections)
+    return build_report(*data, executor=executor, deadline=current_deadline(), sections=sections)
+
+
+def create_parallel(db, factory=None):
+    """(PostgresPool, executor) for PARALLEL_REPORT, sharing db's query cache, or (None, None)."""
+    if not PARALLEL_REPORT:
+        return None, None
+    pool = PostgresPool(PARALLEL_CONNECTIONS, factory, cache=getattr(db, "cache", None))
+    ## Fetches take at most PARALLEL_CONNECTIONS workers, so analyses never wait on a connection. Expensive
+    ## sections abandoned at a REPORT_DEADLINE keep their thread until they return; the extra workers keep
+    ## them from delaying the next report's sections.
+    workers = max(PARALLEL_WORKERS, PARALLEL_CONNECTIONS)
+    if REPORT_DEADLINE > 0:
+        workers += len(EXPENSIVE_SECTIONS)
+    executor = ThreadPoolExecutor(workers, thread_name_prefix="report")
+    return pool, executor
+
+
+def precomputed_stage(db, s3, student_id, semester_id, sections=None):
+    """The precomputed report (cut down to `sections`) if no input changed since it was generated, else None."""
+    s3_key = db.get_precomputed_report(student_id, semester_id)
+    if s3_key is None:
+        return None
+    body = s3.get_object(s3_key)
+    if body is None:
+        return None
+    if sections is not None:
+        return json.dumps(select_sections(json.loads(body), sections))
+    return body.decode("utf-8")
+
+
+def create_checkpoint_store(db):
+    if CHECKPOINT_STORE == "postgres":
+        return PostgresCheckpointStore(db, CHECKPOINT_TTL)
+    if CHECKPOINT_STORE == "local":
+        return LocalCheckpointStore(CHECKPOINT_DIR, CHECKPOINT_TTL)
+    return None
+
+
+def create_pipeline(db, s3, store=None, pool=None, executor=None) -> ReportPipeline:
+    return ReportPipeline(
+        fetch=lambda student_id, semester_id, sections=None: fetch_stage(
+            db, student_id, semester_id, pool, executor, sections),
+        analyze=lambda data, sections=None: analyze_stage(data, executor, sections),
+        upload=s3.put_object,
+        mark_done=lambda output_key: db.update_event_queue((DONE, output_key)),
+        store=store,
+        lookup=(lambda student_id, semester_id, sections=None: precomputed_stage(
+            db, s3, student_id, semester_id, sections))
+        if USE_PRECOMPUTED else None,
+    )
+
+
+def summary_fields(key, span=None) -> dict:
+    """Fields of a request's summary line (and span attributes); trace_id ties the line to its trace."""
+    fields = {"student_id": key[0], "semester_id": key[1]}
+    if key[2] is not None:
+        fields["sections"] = ",".join(key[2])
+    if span is not None:
+        fields["trace_id"] = span.context.trace_id
+        span.attributes.update(fields)
+    return fields
+
+
+def deliver_report(db, mq, pipeline: ReportPipeline, key, request: ReportRequest, js: str):
+    try:
+        pipeline.deliver(request.output_key, request.output_key, js)
+    except StageFailed as e:
+        fail_report(db, mq, request, e)
+        return
+    request.channel.basic_ack(delivery_tag=request.delivery_tag)
+    summary_set("outcome", DONE)
+
+
+def fail_report(db, mq, request: ReportRequest, error):
+    """
+        StageFailed is transient: republish to <queue>.retry with the attempt count and ack.
+        Anything else, or a request out of retries, goes to <queue>.dead and is marked ERROR. So
+        does a stage that ran out of REPORT_DEADLINE: a retry would get the same budget.
+    """
+    metrics.inc("report.errors")
+    if MAX_RETRIES <= 0 or request.body is None:
+        logger.error(f"Report {request.output_key} failed: {error!r}")
+        request.channel.basic_nack(delivery_tag=request.delivery_tag, requeue=False)
+        db.update_event_queue((ERROR, request.output_key))
+        summary_set("outcome", ERROR)
+        return
+
+    attempt = retry_count(request.properties) + 1
+    retry_queue, dead_queue = mq.retry_queues(request.routing_key)
+    retryable = isinstance(error, StageFailed) and not isinstance(error.cause, DeadlineExceeded)
+    if retryable and attempt <= MAX_RETRIES:
+        logger.warning(f"Report {request.output_key} failed, retry {attempt}/{MAX_RETRIES}: {error}")
+        metrics.inc("report.retries")
+        mq.publish(retry_queue, request.body, retry_properties(request.properties, attempt))
+        request.channel.basic_ack(delivery_tag=request.delivery_tag)
+        summary_set("outcome", "retry")
+        return
+
+    logger.error(f"Report {request.output_key} dead-lettered after {attempt - 1} retries: {error!r}")
+    metrics.inc("report.dead_lettered")
+    mq.publish(dead_queue, request.body, retry_properties(request.properties, attempt - 1))
+    request.channel.basic_ack(delivery_tag=request.delivery_tag)
+    db.update_event_queue((ERROR, request.output_key))
+    summary_set("outcome", "dead_lettered")
+
+
+@contextmanager
+def report_deadline():
+    """REPORT_DEADLINE for the report computed in the block; overruns are counted and measured."""
+    if REPORT_DEADLINE <= 0:
+        yield None
+        return
+    deadline = Deadline(REPORT_DEADLINE, reserve=REPORT_DEADLINE_RESERVE)
+    try:
+        with deadline_scope(deadline):
+            yield deadline
+    finally:
+        if deadline.expired():
+            metrics.inc("report.deadline_misses")
+            metrics.observe("report.deadline_overrun_seconds", -deadline.remaining())
+
+
+def compute_report(pipeline: ReportPipeline, key, request: ReportRequest, span=None) -> str:
+    """A coalesced group's report, checkpointed under the output key of the request that opened it."""
+    with metrics.time("report.processing_seconds"), report_deadline(), \
+            message_summary(logger, "Report computed", **summary_fields(key, span)):
+        return pipeline.compute(request.output_key, *key)
+
+
+def create_coalescer(db, mq, pipeline: ReportPipeline) -> ReportCoalescer:
+    """
+        One computation answers several messages, so it gets a trace of its own; each message's
+        delivery span joins the publisher's trace and links to the computation that answered it.
+    """
+    computed = Tracing.RecentContexts()
+
+    def compute(key, request):
+        with Tracing.span("report.compute") as span:
+            if span is not None:
+                computed.set(key, span.context)
+            return compute_report(pipeline, key, request, span)
+
+    def deliver(key, request, js):
+        with Tracing.span("report.deliver", parent=Tracing.extract(request.properties), kind=Tracing.CONSUMER,
+                          links=[computed.get(key)], output_key=request.output_key) as span, \
+                message_summary(logger, "Report delivered", output_key=request.output_key,
+                                **summary_fields(key, span)):
+            deliver_report(db, mq, pipeline, key, request, js)
+
+    return ReportCoalescer(
+        compute=compute,
+        deliver=deliver,
+        fail=lambda request, error: fail_report(db, mq, request, error),
+        schedule=mq.call_later,
+        window=COALESCE_WINDOW,
+        reuse_ttl=COALESCE_REUSE_TTL,
+    )
+
+
+def create_callback(db, mq, pipeline: ReportPipeline, coalescer=None):
+
     def on_message_test(channel, method, properties, body):
+        ## The publisher's traceparent header, if any, makes this message part of its trace
+        with Tracing.span("report.message", parent=Tracing.extract(properties), kind=Tracing.CONSUMER, **{
+            "messaging.system": "rabbitmq", "messaging.destination": method.routing_key,
+            "messaging.redelivered": getattr(method, "redelivered", None),
+        }) as span:
+            handle_message(channel, method, properties, body, span)
+
+    def handle_message(channel, method, properties, body, span):
         client = Client(body)
-        assessment_data_all = db.get_all_student_assessments(client.get_student_id(), client.get_semester_id())
-        assessment_data_w_q = db.get_student_prior_assessments_guestionnaire(client.get_student_id(), client.get_semester_id())
-        attendance_data = db.get_student_attendance(client.get_student_id(), client.get_semester_id())
-
-        da = DisabilityAnalysis(assessment_data_w_q, attendance_data)
-        an = AssessmentAnalysis(assessment_data_all, attendance_data)
-        anq = AssessmentAnalysis(assessment_data_w_q, attendance_data)
-        df = {
-            "generated_at": time.time(),
-            "all_scores": {
-                "scores": an.assessment_moving_average_(),
-                "data": an.get_dataset_(),
-                "labels": an.get_dataset_labels_()
-            },
-            "subject_bias": an.subject_moving_average_bias_(),
-            "assessment_comparison" : an.get_dataset_assessment_(),
-            "learning_disability": da.student_analysis_(), 
-            "learning_disability_linear_regression": {
-                "scores_linear_regression": anq.assessment_analysis_lr_(),
-            }
-        }
+        request = ReportRequest(
+            channel, method.delivery_tag, client.get_output_key(), body, properties, method.routing_key,
+        )
         try:
-            js = json.dumps(df)
-            s3 = S3Instance("tracker-student-reports")
-            ### utf-8 will make it convertable on the frontend Parsable
-            s3.put_object(client.get_output_key(), js.encode('utf-8'))
-            db.update_event_queue((DONE, client.get_output_key()))
-            channel.basic_ack(delivery_tag=method.delivery_tag)
-        except TypeError as e:
-            channel.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-            db.update_event_queue((ERROR, client.get_output_key()))
+            sections = parse_sections(client.get_sections())
+        except ValueError as e:
+            fail_report(db, mq, request, e)
+            return
+        key = (client.get_student_id(), client.get_semester_id(), sections)
+        if sections is not None:
+            metrics.inc("report.section_requests")
+        if coalescer is not None:
+            summary_fields(key, span)
+            coalescer.submit(key, request)
+            return
+        with metrics.time("report.processing_seconds"), \
+                message_summary(logger, "Report", output_key=request.output_key, **summary_fields(key, span)):
+            try:
+                with report_deadline():
+                    js = pipeline.compute(request.output_key, *key)
+            except Exception as e:
+                fail_report(db, mq, request, e)
+                return
+            deliver_report(db, mq, pipeline, key, request, js)
             
     return on_message_test
 
         
 
+def create_scheduled_callback(scheduler, queue_class):
+    """Buffer deliveries in the scheduler; consume_scheduled hands them to the report callback."""
+    def on_message_scheduled(channel, method, properties, body):
+        klass = classify(queue_class, properties, INTERACTIVE_PRIORITY)
+        if getattr(properties, "timestamp", None):
+            metrics.observe(f"queue.{klass}.broker_wait_seconds", max(0.0, time.time() - properties.timestamp))
+        scheduler.submit((channel, method, properties, body), klass, Client(body).get_organization_id())
+
+    return on_message_scheduled
+
+
+def create_shard_router(mq, callback):
+    """
+        Consumer of the shared QUEUE when sharding: forward each request to the shard exchange
+        keyed by student_id, so one worker sees all requests of a student and its coalescer and
+        query cache get the repeats. Requests that expired out of a stopped worker's shard queue
+        are handed to `callback` here instead of going around the ring again.
+    """
+    def on_message_shared(channel, method, properties, body):
+        if expired_from_shard(properties):
+            metrics.inc("shard.expired")
+            callback(channel, method, properties, body)
+            return
+        mq.route_to_shard(Client(body).get_student_id(), body, properties)
+        channel.basic_ack(delivery_tag=method.delivery_tag)
+        metrics.inc("shard.routed")
+
+    return on_message_shared
+
+
+def consume_scheduled(mq, scheduler, callback):
+    while True:
+        ## Poll without blocking while work is buffered so new interactive arrivals are seen first
+        mq.get_connection().process_data_events(time_limit=0 if len(scheduler) else 1)
+        item = scheduler.next()
+        if item is not None:
+            callback(*item)
+
+
+def consume(mq, scheduler, coalescer, callback):
+    """Consume until interrupted, recovering in-process from broker connection failures."""
+    while True:
+        try:
+            if scheduler is not None:
+                consume_scheduled(mq, scheduler, callback)
+            else:
+                mq.get_channel().start_consuming()
+            return
+        except RECOVERABLE_ERRORS as e:
+            logger.error(f"Lost RabbitMQ connection: {e!r}")
+            ## Deliveries buffered on the dead channel cannot be acked; the broker redelivers them
+            if scheduler is not None:
+                scheduler.clear()
+            if coalescer is not None:
+                coalescer.reset()
+            mq.reconnect()
+
+
+def schedule_metrics(mq, queues):
+    def report():
+        for klass, queue in queues.items():
+            try:
+                metrics.set(f"queue.{klass}.broker_depth", mq.queue_depth(queue))
+            except Exception:
+                logger.exception(f"Unable to read depth of queue {queue}")
+        metrics.dump()
+
+    mq.call_every(METRICS_INTERVAL, report)
+
+
+def schedule_cache_invalidation(mq, db):
+    from Migrations.precompute import CHANNEL
+    from Precompute.main import parse_payload
+
+    db.listen(CHANNEL)
+
+    def invalidate():
+        try:
+            payloads = db.wait_notifications(0)
+        except Exception:
+            logger.exception("Unable to read cache invalidation notifications")
+            return
+        for payload in payloads:
+            key = parse_payload(payload)
+            if key is not None:
+                db.invalidate_student(*key)
+
+    mq.call_every(QUERY_CACHE_LISTEN, invalidate)
+
+
+def schedule_prefetch_controller(mq, queues) -> PrefetchController:
+    controller = PrefetchController(
+        apply=mq.set_prefetch,
+        minimum=PREFETCH_MIN,
+        maximum=PREFETCH_MAX,
+        initial=PREFETCH_COUNT,
+        backlog=lambda: sum(mq.queue_depth(queue) for queue in queues.values()),
+        db_latency_limit=DB_LATENCY_LIMIT,
+    )
+
+    def evaluate():
+        try:
+            controller.evaluate()
+        except Exception:
+            logger.exception("Prefetch controller evaluation failed")
+
+    mq.call_every(PREFETCH_INTERVAL, evaluate)
+    return controller
+
+
+def install_stats_dump():
+    """`kill -USR1 <pid>` logs the per-query Postgres statistics and writes QUERY_STATS_FILE if set."""
+    signal.signal(signal.SIGUSR1, lambda signum, frame: query_stats.dump())
+
+
+def prepare_workers():
+    """Runs once in the parent before WORKERS consumers are forked; no connection is left open."""
+    startup = StartupReport(IMPORT_STARTED)
+    warm_up(None, startup)
+    logger.info(f"Prepared {WORKERS} workers: {json.dumps(startup.as_dict())}")
+
+
+def run_worker(index):
+    global SHARD_WORKER_ID
+    if SHARD_WORKER_ID:
+        SHARD_WORKER_ID = f"{SHARD_WORKER_ID}-{index}"
+    main()
+
+
 def main():
-    db = PostgresClient()
-    mq = RabbitMQ(PREFETCH_COUNT, EXCHANGE, QUEUE, ROUTING_KEY, EXCHANGE_TYPE)
-    callback = create_callback(db)
-    mq.set_callback(callback)
-    channel = mq.get_channel()
-    connection = mq.get_connection()
-    logging.info(f"[*] Waiting for message in {QUEUE}. ")
+    install_stats_dump()
+    startup = StartupReport(IMPORT_STARTED)
+    startup.record("imports", IMPORT_FINISHED - IMPORT_STARTED)
+    with startup.phase("postgres_connect"):
+        db = PostgresClient()
+    if WARM_START:
+        warm_up(db, startup)
+    with startup.phase("rabbitmq_connect"):
+        ## With adaptive prefetch the per-consumer limit is the upper bound and the controller
+        ## moves the per-channel limit underneath it
+        consumer_prefetch = PREFETCH_MAX if ADAPTIVE_PREFETCH else PREFETCH_COUNT
+        mq = RabbitMQ(consumer_prefetch, EXCHANGE, QUEUE, ROUTING_KEY, EXCHANGE_TYPE, QUEUE_MAX_PRIORITY)
+        queues = {INTERACTIVE: QUEUE}
+        if SHARD_WORKER_ID:
+            queues[INTERACTIVE] = mq.enable_sharding(SHARD_WORKER_ID, SHARD_WEIGHT, SHARD_MESSAGE_TTL_MS)
+        if BULK_QUEUE:
+            mq.add_queue(BULK_QUEUE, BULK_ROUTING_KEY, QUEUE_MAX_PRIORITY)
+            queues[BULK] = BULK_QUEUE
+        if MAX_RETRIES > 0:
+            mq.declare_retry_queues(RETRY_DELAY_MS)
+        pool, executor = create_parallel(db)
+        pipeline = create_pipeline(db, S3Instance("tracker-student-reports"), create_checkpoint_store(db),
+                                   pool, executor)
+        coalescer = create_coalescer(db, mq, pipeline) if COALESCE_WINDOW > 0 else None
+        callback = create_callback(db, mq, pipeline, coalescer)
+        scheduler = None
+        interactive = callback
+        if BULK_QUEUE or QUEUE_MAX_PRIORITY:
+            scheduler = FairShareScheduler(max_consecutive=SCHEDULER_MAX_CONSECUTIVE)
+            for klass, queue in queues.items():
+                mq.set_callback(create_scheduled_callback(scheduler, klass), queue)
+            interactive = create_scheduled_callback(scheduler, INTERACTIVE)
+        else:
+            mq.set_callback(callback, queues[INTERACTIVE])
+        if SHARD_WORKER_ID:
+            mq.set_callback(create_shard_router(mq, interactive), QUEUE)
+    schedule_metrics(mq, queues)
+    if db.cache is not None and QUERY_CACHE_LISTEN > 0:
+        schedule_cache_invalidation(mq, db)
+    if ADAPTIVE_PREFETCH:
+        schedule_prefetch_controller(mq, queues)
+    mark_ready(startup)
+    logging.info(f"[*] Waiting for message in {', '.join(queues.values())}. ")
     try:
-        channel.start_consuming()
+        consume(mq, scheduler, coalescer, callback)
     except KeyboardInterrupt:
         logging.info("Shutting down")
     finally:
-        channel.close()
-        connection.close()
+        clear_ready()
+        connection = mq.get_connection()
+        if SHARD_WORKER_ID and connection.is_open:
+            try:
+                mq.leave_shard()
+            except Exception:
+                logger.exception("Unable to hand the shard queue over; its TTL returns the requests to QUEUE")
+        if connection.is_open:
+            connection.close()
+        if executor is not None:
+            executor.shutdown(wait=False)
+            pool.close()
         db.close()
     
 if __name__ == "__main__":
-    main()
+    if WORKERS > 1:
+        from Workers.main import prefork
+        prefork(WORKERS, run_worker, prepare_workers)
+    else:
+        main()